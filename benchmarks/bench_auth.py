@@ -0,0 +1,167 @@
+"""
+Authenticated request throughput: the user lookup done by get_current_user
+on every protected request (connection per call, SQLite connection pool,
+in-memory user cache), then end-to-end GET /auth/me requests per second against a live server.
+
+Runs against a temporary database (USERS_DB_PATH), never data/users.db.
+
+Usage (from the repository root):
+    python benchmarks/bench_auth.py [--threads 16] [--seconds 5] [--port 8766] [--skip-http]
+"""
+
+import argparse
+import http.client
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+BENCH_EMAIL = "bench@shellia.local"
+
+
+def run_threads(worker, threads: int, seconds: float):
+    """Run `worker()` in a loop on `threads` threads; return (calls/s, errors)."""
+    deadline = time.monotonic() + seconds
+    counts = [0] * threads
+    errors = [0] * threads
+
+    def loop(i):
+        while time.monotonic() < deadline:
+            try:
+                worker()
+                counts[i] += 1
+            except Exception:
+                errors[i] += 1
+
+    pool = [threading.Thread(target=loop, args=(i,)) for i in range(threads)]
+    start = time.monotonic()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return sum(counts) / (time.monotonic() - start), sum(errors)
+
+
+def connect_per_call(db_path: Path, email: str, login_every: int):
+    """Former UserManager access pattern: one sqlite3.connect() per call, rollback journal."""
+    counter = [0]
+
+    def worker():
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("SELECT * FROM users WHERE email = ?", (email,)).fetchone()
+        conn.close()
+        counter[0] += 1
+        if login_every and counter[0] % login_every == 0:
+            conn = sqlite3.connect(db_path)
+            conn.execute("UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE email = ?", (email,))
+            conn.commit()
+            conn.close()
+    return worker
+
+
+def pooled(user_manager, email: str, login_every: int, cached: bool = False):
+    counter = [0]
+    lookup = user_manager.get_user_cached if cached else user_manager.get_user_by_email
+
+    def worker():
+        lookup(email)
+        counter[0] += 1
+        if login_every and counter[0] % login_every == 0:
+            user_manager._update_last_login(email)
+    return worker
+
+
+def http_worker(port: int, token: str):
+    local = threading.local()
+
+    def worker():
+        if not hasattr(local, "conn"):
+            local.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        local.conn.request("GET", "/auth/me", headers={"Authorization": f"Bearer {token}"})
+        resp = local.conn.getresponse()
+        resp.read()
+        if resp.status != 200:
+            raise RuntimeError(resp.status)
+    return worker
+
+
+def wait_for_server(port: int, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/auth/config")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.05)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--login-every", type=int, default=20,
+                        help="one last_login write every N lookups per thread (0 = reads only)")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--skip-http", action="store_true")
+    args = parser.parse_args()
+
+    tmp = Path(tempfile.mkdtemp(prefix="shellia-bench-"))
+    os.environ["USERS_DB_PATH"] = str(tmp / "users.db")
+    os.environ.setdefault("SECRET_KEY", "bench")
+    sys.path.insert(0, str(SRC_DIR))
+    from core.auth import USER_MIGRATIONS, create_access_token, user_manager
+
+    # Insert the user directly (no per-user directory is created)
+    with user_manager.db.transaction() as conn:
+        conn.execute("INSERT INTO users (email, hashed_password) VALUES (?, ?)",
+                     (BENCH_EMAIL, user_manager.get_password_hash("bench-password")))
+
+    # Baseline database: same schema, default rollback journal
+    legacy_db = tmp / "legacy.db"
+    conn = sqlite3.connect(legacy_db)
+    conn.executescript(USER_MIGRATIONS[0][2])
+    conn.execute("INSERT INTO users (email) VALUES (?)", (BENCH_EMAIL,))
+    conn.commit()
+    conn.close()
+
+    print(f"user lookups, {args.threads} threads, {args.seconds:.0f}s, "
+          f"1 write every {args.login_every or '∞'} lookups")
+    for label, worker in (
+        ("connect per call (rollback journal)", connect_per_call(legacy_db, BENCH_EMAIL, args.login_every)),
+        ("SQLitePool (WAL, cached statements)", pooled(user_manager, BENCH_EMAIL, args.login_every)),
+        ("user cache (AUTH_USER_CACHE_TTL)", pooled(user_manager, BENCH_EMAIL, args.login_every, cached=True)),
+    ):
+        rate, errors = run_threads(worker, args.threads, args.seconds)
+        print(f"  {label:38} {rate:10.0f} ops/s   errors {errors}")
+
+    if args.skip_http:
+        return
+
+    token = create_access_token({"sub": BENCH_EMAIL})
+    env = dict(os.environ)
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not wait_for_server(args.port, 30):
+            raise RuntimeError("server did not answer /auth/config in time")
+        rate, errors = run_threads(http_worker(args.port, token), args.threads, args.seconds)
+        print(f"\nGET /auth/me (keep-alive), {args.threads} client threads")
+        print(f"  {'authenticated requests':38} {rate:10.0f} req/s   errors {errors}")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Cold-start benchmark: time from process spawn to the first successful
+GET /auth/config, plus the heaviest imports of `import main`.
+
+Usage (from the repository root):
+    python benchmarks/bench_cold_start.py [--runs 5] [--port 8765] [--top 15]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+
+
+def wait_for_auth_config(port: int, timeout: float) -> bool:
+    url = f"http://127.0.0.1:{port}/auth/config"
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as resp:
+                if resp.status == 200:
+                    return True
+        except Exception:
+            time.sleep(0.01)
+    return False
+
+
+def measure_cold_start(port: int, timeout: float) -> float:
+    """Spawn uvicorn and return seconds until /auth/config answers 200."""
+    env = dict(os.environ, SECRET_KEY=os.getenv("SECRET_KEY", "bench"))
+    start = time.monotonic()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=SRC_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        if not wait_for_auth_config(port, timeout):
+            raise RuntimeError("server did not answer /auth/config in time")
+        return time.monotonic() - start
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def import_profile(top: int):
+    """Return the `top` slowest modules (cumulative µs) of `import main`."""
+    env = dict(os.environ, SECRET_KEY=os.getenv("SECRET_KEY", "bench"))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = re.match(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s+(.*)$", line)
+        if match:
+            rows.append((int(match.group(2)), match.group(3).strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = [measure_cold_start(args.port, args.timeout) for _ in range(args.runs)]
+    print(f"cold start to first /auth/config ({args.runs} runs)")
+    print(f"  min    {min(timings) * 1000:8.1f} ms")
+    print(f"  median {statistics.median(timings) * 1000:8.1f} ms")
+    print(f"  max    {max(timings) * 1000:8.1f} ms")
+
+    print(f"\nslowest imports of `import main` (cumulative)")
+    for cumulative_us, module in import_profile(args.top):
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -42,4 +42,6 @@ exec python3 -m uvicorn main:app \
     --host 0.0.0.0 \
     --port 8000 \
     --workers 1 \
+    --proxy-headers \
+    --forwarded-allow-ips "${FORWARDED_ALLOW_IPS:-127.0.0.1}" \
     --log-level info
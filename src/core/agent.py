@@ -0,0 +1,182 @@
+# core/agent.py
+
+import os
+import time
+from typing import Dict, Iterator, List, Optional
+import logging
+
+from .ai_interface import split_reference, with_reference
+from .metrics import metrics
+from .risk_classifier import LEVEL_ORDER, LOW, classify_command, max_risk
+from .safe_commands import is_side_effect_free
+from .usage_meter import BudgetExceededError, normalize_usage
+
+logger = logging.getLogger(__name__)
+
+# Plafonds côté serveur (une requête peut demander moins, jamais plus)
+AGENT_MAX_ITERATIONS = int(os.getenv("AGENT_MAX_ITERATIONS", "8"))
+AGENT_MAX_SECONDS = float(os.getenv("AGENT_MAX_SECONDS", "120"))
+AGENT_MAX_TOKENS = int(os.getenv("AGENT_MAX_TOKENS", "60000"))
+AGENT_MAX_RISK = os.getenv("AGENT_MAX_RISK", "low").lower()
+AGENT_MAX_COMMANDS_PER_STEP = int(os.getenv("AGENT_MAX_COMMANDS_PER_STEP", "5"))
+
+# Sortie renvoyée dans les événements (le contexte complet reste dans le ContextStore)
+MAX_EVENT_OUTPUT_CHARS = 4000
+
+AGENT_INSTRUCTIONS = """[Agent mode] The commands you propose with risk "{max_risk}" or lower are executed \
+automatically on the host (at "low", only plain read-only invocations such as `df -h` or \
+`systemctl status nginx`) and their output is sent back to you. Investigate step by step with read-only \
+commands first. When you have enough information, give your final diagnosis without proposing new commands.
+
+Task: {goal}"""
+
+FOLLOW_UP = """[Agent mode] Step {iteration}: the commands below were executed, their output is in the \
+recent terminal commands. Continue the investigation, or give the final diagnosis without proposing commands.
+
+{summary}"""
+
+
+class AgentLoop:
+    """
+    Boucle proposer → exécuter → observer menée côté serveur : les commandes
+    proposées par l'IA dont le risque ne dépasse pas max_risk sont exécutées
+    dans la session shell de l'utilisateur (au plafond "low", seulement les
+    invocations de core.safe_commands), leur sortie est renvoyée à l'IA,
+    jusqu'à une réponse sans commande ou l'épuisement d'un budget
+    (itérations, tokens, durée). Chaque étape est émise comme un événement.
+    """
+
+    def __init__(self, provider, executor, context_store,
+                 max_iterations: int = AGENT_MAX_ITERATIONS,
+                 max_seconds: float = AGENT_MAX_SECONDS,
+                 max_tokens: int = AGENT_MAX_TOKENS,
+                 max_risk_level: str = AGENT_MAX_RISK,
+                 system_profile: Optional[str] = None,
+                 reference: Optional[str] = None,
+                 chat_history: Optional[List[Dict]] = None):
+        self.provider = provider
+        self.executor = executor
+        self.context_store = context_store
+        self.max_iterations = max(1, min(max_iterations, AGENT_MAX_ITERATIONS))
+        self.max_seconds = max(1.0, min(max_seconds, AGENT_MAX_SECONDS))
+        self.max_tokens = max(1, min(max_tokens, AGENT_MAX_TOKENS))
+        # Le niveau demandé ne peut pas dépasser le plafond du serveur
+        ceiling = AGENT_MAX_RISK if AGENT_MAX_RISK in LEVEL_ORDER else "low"
+        requested = max_risk_level if max_risk_level in LEVEL_ORDER else ceiling
+        self.max_risk = requested if LEVEL_ORDER[requested] <= LEVEL_ORDER[ceiling] else ceiling
+        self.system_profile = system_profile
+        # Runbooks et relevé de l'hôte, joints au premier message seulement
+        self.reference = reference
+        self.history: List[Dict] = list(chat_history or [])
+        # Tours ajoutés pendant la boucle (à conserver dans la conversation)
+        self.transcript: List[Dict] = []
+
+    def _refusal(self, command: Dict) -> Optional[str]:
+        """Raison pour laquelle la commande n'est pas exécutée sans l'utilisateur (None si autorisée)."""
+        # Le niveau retenu est le plus élevé entre celui du modèle et le classifieur local
+        risk = max_risk(command.get("risk", "high"), classify_command(command["cmd"])["level"])
+        command["risk"] = risk
+        if LEVEL_ORDER[risk] > LEVEL_ORDER[self.max_risk]:
+            return f"risque supérieur à '{self.max_risk}'"
+        # Au plafond "low", le classifieur ne suffit pas (il peut sous-estimer) :
+        # seules les invocations de la liste blanche sans effet de bord passent
+        if self.max_risk == LOW and not is_side_effect_free(command["cmd"]):
+            return "hors de la liste des commandes sans effet de bord"
+        return None
+
+    def run(self, goal: str) -> Iterator[Dict]:
+        """Exécute la boucle et émet les événements (start, ai, result, skipped, done)."""
+        start = time.monotonic()
+        tokens = 0
+        iteration = 0
+        message = with_reference(AGENT_INSTRUCTIONS.format(max_risk=self.max_risk, goal=goal), self.reference)
+        final_markdown = ""
+        reason = "iterations"
+
+        yield {"type": "start", "goal": goal, "max_risk": self.max_risk,
+               "max_iterations": self.max_iterations, "max_seconds": self.max_seconds,
+               "max_tokens": self.max_tokens}
+
+        while iteration < self.max_iterations:
+            if time.monotonic() - start >= self.max_seconds:
+                reason = "time"
+                break
+            if tokens >= self.max_tokens:
+                reason = "tokens"
+                break
+            iteration += 1
+
+            try:
+                result = self.provider.ask(
+                    context=self.context_store.get(),
+                    user_message=message,
+                    chat_history=self.history,
+                    system_profile=self.system_profile,
+                )
+            except BudgetExceededError as e:
+                yield {"type": "error", "iteration": iteration, "message": str(e)}
+                reason = "budget"
+                break
+            except Exception as e:
+                logger.error(f"Agent: erreur du provider IA: {e}")
+                yield {"type": "error", "iteration": iteration, "message": str(e)}
+                reason = "error"
+                break
+
+            usage = normalize_usage(result.get("usage"))
+            tokens += usage["prompt_tokens"] + usage["completion_tokens"]
+            final_markdown = result.get("markdown", "")
+            self.history += [{"role": "user", "content": message},
+                             {"role": "assistant", "content": final_markdown}]
+            # La conversation conservée ne garde pas les documents de référence
+            self.transcript += [{"role": "user", "content": split_reference(message)[0]},
+                                {"role": "assistant", "content": final_markdown}]
+
+            commands = result.get("commands") or []
+            yield {"type": "ai", "iteration": iteration, "markdown": final_markdown,
+                   "commands": commands, "tokens": tokens}
+
+            if result.get("error"):
+                reason = "error"
+                break
+            if not commands:
+                reason = "answered"
+                break
+
+            refusals = [self._refusal(c) for c in commands]
+            allowed = [c for c, refusal in zip(commands, refusals) if refusal is None]
+            runnable = allowed[:AGENT_MAX_COMMANDS_PER_STEP]
+            for command, refusal in zip(commands, refusals):
+                if command in runnable:
+                    continue
+                yield {"type": "skipped", "iteration": iteration, "cmd": command["cmd"],
+                       "risk": command["risk"],
+                       "reason": refusal or "trop de commandes pour une étape"}
+            if not runnable:
+                # Il reste des commandes à risque : la main revient à l'utilisateur
+                reason = "approval_required"
+                break
+
+            summary_lines = []
+            for command in runnable:
+                remaining = self.max_seconds - (time.monotonic() - start)
+                if remaining <= 0:
+                    break
+                output = self.executor.execute(command["cmd"], timeout=max(1, int(min(30, remaining))))
+                self.context_store.add(command["cmd"], output["stdout"], output["stderr"])
+                metrics.inc("agent_commands", 1, risk=command["risk"])
+                summary_lines.append(f"- `{command['cmd']}` → exit {output.get('return_code')}")
+                yield {"type": "result", "iteration": iteration, "cmd": command["cmd"],
+                       "risk": command["risk"],
+                       "stdout": output["stdout"][-MAX_EVENT_OUTPUT_CHARS:],
+                       "stderr": output["stderr"][-MAX_EVENT_OUTPUT_CHARS:],
+                       "return_code": output.get("return_code")}
+
+            message = FOLLOW_UP.format(iteration=iteration, summary="\n".join(summary_lines))
+
+        elapsed = time.monotonic() - start
+        metrics.inc("agent_runs", 1, reason=reason)
+        metrics.observe("agent_run_seconds", elapsed)
+        metrics.observe("agent_run_iterations", iteration)
+        yield {"type": "done", "reason": reason, "iterations": iteration, "tokens": tokens,
+               "elapsed": round(elapsed, 3), "markdown": final_markdown}
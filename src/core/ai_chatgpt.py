@@ -1,19 +1,19 @@
 # core/ai_chatgpt.py
 
-from .ai_interface import AIProvider
+import json
+
+from .ai_interface import AIProvider, BatchFailedError
 from typing import List, Dict, Optional
 from openai import OpenAI
 
+from .rate_limiter import KeyLimiter, call_with_limits
+from .model_router import select_model
+from .command_parser import (
+    attach_commands, render_commands_block, repair_json,
+    COMMANDS_TOOL_NAME, COMMANDS_TOOL_DESCRIPTION, COMMANDS_TOOL_SCHEMA, COMMANDS_TOOL_PROMPT,
+)
 
-class ChatGPTProvider(AIProvider):
-    def __init__(self, api_key: str):
-        self.client = OpenAI(api_key=api_key)
-
-    def ask(self, context: List[Dict], user_message: str,
-            chat_history: List[Dict] = None,
-            system_profile: Optional[str] = None) -> Dict:
-
-        system_prompt = """You are a Linux system administration assistant.
+SYSTEM_PROMPT = """You are a Linux system administration assistant.
 You must NEVER execute commands yourself.
 You respond in Markdown for consistent and professional formatting.
 
@@ -40,6 +40,29 @@ IMPORTANT:
 - Clearly explain what you are proposing
 - You are in a continuous conversation — take the context of previous exchanges into account"""
 
+
+class ChatGPTProvider(AIProvider):
+    def __init__(self, api_key: str, model: str = "gpt-4o-mini",
+                 limiter: Optional[KeyLimiter] = None, user: str = "anonymous",
+                 fast_model: Optional[str] = None, native_commands: bool = False):
+        if limiter:
+            # Les nouvelles tentatives sont gérées par le limiteur (coordonnées entre utilisateurs)
+            self.client = OpenAI(api_key=api_key, max_retries=0)
+        else:
+            self.client = OpenAI(api_key=api_key)
+        self.model = model
+        # Modèle rapide pour les questions simples (optionnel)
+        self.fast_model = fast_model
+        self.limiter = limiter
+        self.user = user
+        # Commandes renvoyées via function calling plutôt qu'un bloc JSON dans le markdown
+        self.native_commands = native_commands
+
+    def _build_request(self, context: List[Dict], user_message: str,
+                       chat_history: Optional[List[Dict]] = None,
+                       system_profile: Optional[str] = None) -> Dict:
+        """Construit les paramètres de chat.completions.create (partagés avec le mode batch)."""
+        system_prompt = SYSTEM_PROMPT + (COMMANDS_TOOL_PROMPT if self.native_commands else "")
         if system_profile:
             system_prompt += f"\n\n**Active profile context:**\n{system_profile}"
 
@@ -63,10 +86,162 @@ IMPORTANT:
 
         messages.append({"role": "user", "content": user_prompt})
 
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
+        model = select_model("chatgpt", self.model, self.fast_model,
+                             context, user_message, chat_history, system_profile)
+        params = {"model": model, "messages": messages}
+        if self.native_commands:
+            params["tools"] = [{
+                "type": "function",
+                "function": {
+                    "name": COMMANDS_TOOL_NAME,
+                    "description": COMMANDS_TOOL_DESCRIPTION,
+                    "parameters": COMMANDS_TOOL_SCHEMA,
+                },
+            }]
+        return params
+
+    @staticmethod
+    def _field(obj, name: str):
+        """Accès uniforme aux objets du SDK et aux dicts (résultats batch)."""
+        return obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+
+    def _parse_message(self, message) -> Dict:
+        """Texte markdown et, en mode natif, commandes issues des appels de fonction."""
+        result = {"markdown": self._field(message, "content") or ""}
+        tool_calls = self._field(message, "tool_calls") or []
+        for call in tool_calls:
+            function = self._field(call, "function")
+            if not function or self._field(function, "name") != COMMANDS_TOOL_NAME:
+                continue
+            arguments, _ = repair_json(self._field(function, "arguments") or "{}")
+            result.setdefault("commands", [])
+            if isinstance(arguments, dict):
+                result["commands"].extend(arguments.get("commands") or [])
+        return result
+
+    def _finalize(self, result: Dict) -> Dict:
+        """Valide les commandes ; en mode natif, les recopie dans le markdown pour l'historique."""
+        native = "commands" in result
+        attach_commands(result, provider="chatgpt")
+        if native and result["commands"]:
+            result["markdown"] = (result["markdown"] + "\n\n" + render_commands_block(result["commands"])).strip()
+        return result
+
+    @staticmethod
+    def _parse_usage(usage) -> Optional[Dict]:
+        """Convertit l'usage OpenAI (objet ou dict) au format commun des providers."""
+        if usage is None:
+            return None
+        if isinstance(usage, dict):
+            prompt = usage.get("prompt_tokens", 0) or 0
+            completion = usage.get("completion_tokens", 0) or 0
+            cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens", 0) or 0
+        else:
+            prompt = usage.prompt_tokens or 0
+            completion = usage.completion_tokens or 0
+            details = getattr(usage, "prompt_tokens_details", None)
+            cached = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+        return {
+            "input_tokens": prompt - cached,
+            "output_tokens": completion,
+            "cache_read_input_tokens": cached,
+        }
 
-        content = response.choices[0].message.content
-        return {"markdown": content}
+    def ask(self, context: List[Dict], user_message: str,
+            chat_history: List[Dict] = None,
+            system_profile: Optional[str] = None) -> Dict:
+
+        params = self._build_request(context, user_message, chat_history, system_profile)
+
+        try:
+            response = call_with_limits(self.limiter, self.user,
+                                        lambda: self.client.chat.completions.create(**params))
+
+            result = self._parse_message(response.choices[0].message)
+            result["model"] = params["model"]
+
+            usage = self._parse_usage(getattr(response, "usage", None))
+            if usage:
+                result["usage"] = usage
+            return self._finalize(result)
+
+        except Exception as e:
+            # openai.APIError (dont le 429 relancé par call_with_limits après ses
+            # nouvelles tentatives) : même format d'erreur que les autres providers
+            error_markdown = f"""## ❌ Erreur API OpenAI
+
+```
+{str(e)}
+```"""
+            return {"markdown": error_markdown, "error": str(e), "commands": []}
+
+    # ------------------------------------------------------------------
+    # Mode batch (Batch API : fichier JSONL traité de façon asynchrone, coût réduit)
+    # ------------------------------------------------------------------
+
+    def submit_batch(self, items: List[Dict]) -> str:
+        """
+        Soumet un lot de requêtes.
+
+        Args:
+            items: [{"custom_id", "context", "user_message", "system_profile"}]
+
+        Returns:
+            Identifiant du batch côté OpenAI
+        """
+        lines = []
+        for item in items:
+            body = self._build_request(item.get("context", []), item["user_message"],
+                                       None, item.get("system_profile"))
+            lines.append(json.dumps({
+                "custom_id": item["custom_id"],
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": body,
+            }, ensure_ascii=False))
+        payload = ("\n".join(lines) + "\n").encode("utf-8")
+
+        def submit():
+            input_file = self.client.files.create(file=("batch.jsonl", payload), purpose="batch")
+            return self.client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+            )
+
+        return call_with_limits(self.limiter, self.user, submit).id
+
+    def poll_batch(self, batch_id: str) -> Optional[Dict[str, Dict]]:
+        """Retourne {custom_id: résultat} quand le batch est terminé, None sinon."""
+        # Interrogations soumises au limiteur de la clé (nouvelles tentatives sur 429)
+        batch = call_with_limits(self.limiter, self.user, lambda: self.client.batches.retrieve(batch_id))
+        if batch.status in ("failed", "expired", "cancelled"):
+            raise BatchFailedError(f"Batch OpenAI {batch_id} terminé en statut {batch.status}")
+        if batch.status != "completed":
+            return None
+
+        results = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = call_with_limits(self.limiter, self.user,
+                                       lambda file_id=file_id: self.client.files.content(file_id).text)
+            for line in content.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                body = response.get("body") or {}
+                if response.get("status_code") == 200 and body.get("choices"):
+                    result = self._parse_message(body["choices"][0]["message"])
+                    result["model"] = body.get("model", self.model)
+                    usage = self._parse_usage(body.get("usage"))
+                    if usage:
+                        result["usage"] = usage
+                    result = self._finalize(result)
+                else:
+                    error = entry.get("error") or body.get("error") or "unknown error"
+                    result = {"markdown": f"## ❌ Erreur API OpenAI\n\n```\n{error}\n```",
+                              "error": str(error), "commands": []}
+                results[entry["custom_id"]] = result
+        return results
@@ -4,19 +4,15 @@ from .ai_interface import AIProvider
 from typing import List, Dict, Optional
 from anthropic import Anthropic
 
+from .metrics import metrics
+from .rate_limiter import KeyLimiter, call_with_limits
+from .model_router import select_model
+from .command_parser import (
+    attach_commands, render_commands_block,
+    COMMANDS_TOOL_NAME, COMMANDS_TOOL_DESCRIPTION, COMMANDS_TOOL_SCHEMA, COMMANDS_TOOL_PROMPT,
+)
 
-class ClaudeProvider(AIProvider):
-    """Implémentation de l'interface AIProvider pour Claude (Anthropic)."""
-
-    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514"):
-        self.client = Anthropic(api_key=api_key)
-        self.model = model
-
-    def ask(self, context: List[Dict], user_message: str,
-            chat_history: List[Dict] = None,
-            system_profile: Optional[str] = None) -> Dict:
-
-        system_prompt = """You are an expert Linux and Unix systems administration assistant.
+SYSTEM_PROMPT = """You are an expert Linux and Unix systems administration assistant.
 
 **IMPORTANT RULES:**
 1. You must NEVER execute commands yourself
@@ -52,8 +48,88 @@ When proposing commands to execute, you MUST format them in a JSON block like th
 - **"medium"**: Reversible changes (systemctl restart, chmod, file editing)
 - **"high"**: Deletions, system stops, critical changes (rm -rf, reboot, dd, etc.)"""
 
-        if system_profile:
-            system_prompt += f"\n\n**Active profile context:**\n{system_profile}"
+# Marqueur de cache Anthropic : tout le préfixe jusqu'à ce bloc inclus est mis en cache
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+class ClaudeProvider(AIProvider):
+    """Implémentation de l'interface AIProvider pour Claude (Anthropic)."""
+
+    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514",
+                 base_url: Optional[str] = None,
+                 limiter: Optional[KeyLimiter] = None, user: str = "anonymous",
+                 fast_model: Optional[str] = None, native_commands: bool = False):
+        # base_url permet de viser un proxy ou une API de test locale
+        client_kwargs = {"api_key": api_key}
+        if base_url:
+            client_kwargs["base_url"] = base_url
+        if limiter:
+            # Les nouvelles tentatives sont gérées par le limiteur (coordonnées entre utilisateurs)
+            client_kwargs["max_retries"] = 0
+        self.client = Anthropic(**client_kwargs)
+        self.model = model
+        # Modèle rapide pour les questions simples (optionnel)
+        self.fast_model = fast_model
+        self.limiter = limiter
+        self.user = user
+        # Commandes renvoyées via un outil (tool use) plutôt qu'un bloc JSON dans le markdown
+        self.native_commands = native_commands
+
+    def _build_system(self, system_profile: Optional[str]) -> List[Dict]:
+        """
+        Construit le system prompt en blocs cachables : le prompt statique,
+        puis le profil actif (stable sur toute la session).
+        """
+        prompt = SYSTEM_PROMPT + (COMMANDS_TOOL_PROMPT if self.native_commands else "")
+        if not system_profile:
+            return [{"type": "text", "text": prompt, "cache_control": CACHE_CONTROL}]
+        return [
+            {"type": "text", "text": prompt},
+            {"type": "text", "text": f"**Active profile context:**\n{system_profile}",
+             "cache_control": CACHE_CONTROL},
+        ]
+
+    @staticmethod
+    def _mark_history_prefix(messages: List[Dict]) -> List[Dict]:
+        """
+        Place un point de cache sur le dernier message de l'historique
+        (avant le nouveau tour utilisateur) : les tours précédents forment un
+        préfixe stable, réutilisé d'un tour à l'autre.
+        """
+        if len(messages) < 2:
+            return messages
+        marked = list(messages)
+        prefix_end = marked[-2]
+        marked[-2] = {
+            "role": prefix_end["role"],
+            "content": [{"type": "text", "text": prefix_end["content"], "cache_control": CACHE_CONTROL}],
+        }
+        return marked
+
+    def _record_usage(self, usage, model: str) -> Dict:
+        """Extrait les compteurs de tokens (dont cache) et les publie dans les métriques."""
+        data = {
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+        }
+        labels = {"provider": "claude", "model": model}
+        metrics.inc("ai_input_tokens", data["input_tokens"], **labels)
+        metrics.inc("ai_output_tokens", data["output_tokens"], **labels)
+        metrics.inc("ai_prompt_cache_write_tokens", data["cache_creation_input_tokens"], **labels)
+        metrics.inc("ai_prompt_cache_read_tokens", data["cache_read_input_tokens"], **labels)
+        metrics.inc("ai_prompt_cache_requests", 1,
+                    outcome="hit" if data["cache_read_input_tokens"] else "miss", **labels)
+        return data
+
+    def _build_request(self, context: List[Dict], user_message: str,
+                       chat_history: Optional[List[Dict]] = None,
+                       system_profile: Optional[str] = None) -> Dict:
+        """Construit les paramètres de messages.create (partagés avec le mode batch)."""
+        system_blocks = self._build_system(system_profile)
+        model = select_model("claude", self.model, self.fast_model,
+                             context, user_message, chat_history, system_profile)
 
         # Construire les messages multi-tour
         messages = []
@@ -99,15 +175,59 @@ When proposing commands to execute, you MUST format them in a JSON block like th
         if not cleaned:
             cleaned = [{"role": "user", "content": user_content}]
 
+        params = {
+            "model": model,
+            "max_tokens": 4096,
+            "system": system_blocks,
+            "messages": self._mark_history_prefix(cleaned),
+        }
+        if self.native_commands:
+            params["tools"] = [{
+                "name": COMMANDS_TOOL_NAME,
+                "description": COMMANDS_TOOL_DESCRIPTION,
+                "input_schema": COMMANDS_TOOL_SCHEMA,
+            }]
+        return params
+
+    @staticmethod
+    def _parse_message(message) -> Dict:
+        """Texte markdown et, en mode natif, commandes issues de l'appel d'outil."""
+        texts, commands, native = [], [], False
+        for block in message.content:
+            if block.type == "text":
+                texts.append(block.text)
+            elif block.type == "tool_use" and block.name == COMMANDS_TOOL_NAME:
+                native = True
+                commands.extend((block.input or {}).get("commands") or [])
+
+        result = {"markdown": "\n\n".join(texts)}
+        if native:
+            result["commands"] = commands
+        return result
+
+    def _finalize(self, result: Dict) -> Dict:
+        """Valide les commandes ; en mode natif, les recopie dans le markdown pour l'historique."""
+        native = "commands" in result
+        attach_commands(result, provider="claude")
+        if native and result["commands"]:
+            result["markdown"] = (result["markdown"] + "\n\n" + render_commands_block(result["commands"])).strip()
+        return result
+
+    def ask(self, context: List[Dict], user_message: str,
+            chat_history: List[Dict] = None,
+            system_profile: Optional[str] = None) -> Dict:
+
+        params = self._build_request(context, user_message, chat_history, system_profile)
+        model = params["model"]
+
         try:
-            response = self.client.messages.create(
-                model=self.model,
-                max_tokens=4096,
-                system=system_prompt,
-                messages=cleaned
-            )
-            content = response.content[0].text
-            return {"markdown": content}
+            response = call_with_limits(self.limiter, self.user,
+                                        lambda: self.client.messages.create(**params))
+            result = self._parse_message(response)
+            result["model"] = model
+            if getattr(response, "usage", None) is not None:
+                result["usage"] = self._record_usage(response.usage, model)
+            return self._finalize(result)
 
         except Exception as e:
             error_markdown = f"""## ❌ Erreur API Claude
@@ -115,4 +235,56 @@ When proposing commands to execute, you MUST format them in a JSON block like th
 ```
 {str(e)}
 ```"""
-            return {"markdown": error_markdown}
+            return {"markdown": error_markdown, "error": str(e), "commands": []}
+
+    # ------------------------------------------------------------------
+    # Mode batch (Message Batches API : traitement asynchrone, coût réduit)
+    # ------------------------------------------------------------------
+
+    def submit_batch(self, items: List[Dict]) -> str:
+        """
+        Soumet un lot de requêtes.
+
+        Args:
+            items: [{"custom_id", "context", "user_message", "system_profile"}]
+
+        Returns:
+            Identifiant du batch côté Anthropic
+        """
+        requests = [
+            {
+                "custom_id": item["custom_id"],
+                "params": self._build_request(item.get("context", []), item["user_message"],
+                                              None, item.get("system_profile")),
+            }
+            for item in items
+        ]
+        batch = call_with_limits(self.limiter, self.user,
+                                 lambda: self.client.messages.batches.create(requests=requests))
+        return batch.id
+
+    def poll_batch(self, batch_id: str) -> Optional[Dict[str, Dict]]:
+        """Retourne {custom_id: résultat} quand le batch est terminé, None sinon."""
+        # Interrogations soumises au limiteur de la clé (nouvelles tentatives sur 429/529)
+        batch = call_with_limits(self.limiter, self.user,
+                                 lambda: self.client.messages.batches.retrieve(batch_id))
+        if batch.processing_status != "ended":
+            return None
+
+        entries = call_with_limits(self.limiter, self.user,
+                                   lambda: list(self.client.messages.batches.results(batch_id)))
+        results = {}
+        for entry in entries:
+            if entry.result.type == "succeeded":
+                message = entry.result.message
+                result = self._parse_message(message)
+                result["model"] = message.model
+                if getattr(message, "usage", None) is not None:
+                    result["usage"] = self._record_usage(message.usage, message.model)
+                result = self._finalize(result)
+            else:
+                error = getattr(entry.result, "error", None) or entry.result.type
+                result = {"markdown": f"## ❌ Erreur API Claude\n\n```\n{error}\n```",
+                          "error": str(error), "commands": []}
+            results[entry.custom_id] = result
+        return results
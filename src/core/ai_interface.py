@@ -1,7 +1,29 @@
 # core/ai_interface.py
 
 from abc import ABC, abstractmethod
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
+
+# Documents de référence (extraits de runbooks, relevé de l'hôte) : ils varient
+# à chaque question, ils sont donc joints au dernier message utilisateur, après
+# ce séparateur, et non au system prompt mis en cache
+REFERENCE_MARKER = "**Reference material (for this request only):**"
+
+
+def with_reference(user_message: str, reference: Optional[str]) -> str:
+    """Joint les documents de référence à la fin du message utilisateur."""
+    if not reference:
+        return user_message
+    return f"{user_message}\n\n{REFERENCE_MARKER}\n\n{reference}"
+
+
+def split_reference(user_message: str) -> Tuple[str, Optional[str]]:
+    """(question, documents de référence) d'un message construit par with_reference."""
+    question, marker, reference = user_message.partition(f"\n\n{REFERENCE_MARKER}\n\n")
+    return (question, reference) if marker else (user_message, None)
+
+
+class BatchFailedError(Exception):
+    """Batch distant terminé sans résultats (échec, expiration, annulation) : inutile de réinterroger."""
 
 
 class AIProvider(ABC):
@@ -13,8 +35,10 @@ class AIProvider(ABC):
             system_profile: Optional[str] = None) -> Dict:
         """
         context: liste d'éléments dict {"command": str, "stdout": str, "stderr": str}
-        user_message: texte du problème
+        user_message: texte du problème, suivi éventuellement des documents de
+                      référence (voir with_reference)
         chat_history: historique [{role: "user"|"assistant", content: str}]
-        system_profile: prompt du profil actif (injecté dans le system prompt)
+        system_profile: prompt du profil actif (injecté dans le system prompt, stable
+                        d'une question à l'autre)
         """
         pass
@@ -0,0 +1,244 @@
+# core/ai_local.py
+
+import json
+import time
+from typing import Dict, Iterator, List, Optional
+import logging
+
+try:
+    import httpx
+    _HAS_HTTPX = True
+except ImportError:
+    import urllib.request
+    _HAS_HTTPX = False
+
+from .ai_interface import AIProvider
+from .metrics import metrics
+from .rate_limiter import KeyLimiter, call_with_limits
+from .command_parser import CommandStreamParser, attach_commands
+
+logger = logging.getLogger(__name__)
+
+# Prompt volontairement court : les modèles locaux ont une fenêtre de contexte réduite
+SYSTEM_PROMPT = """You are a Linux system administration assistant. Never execute commands yourself.
+Answer in concise Markdown. When proposing commands, add a JSON block:
+
+```json
+{"commands": [{"cmd": "shell command", "risk": "low|medium|high", "description": "what it does"}]}
+```
+
+Risk: "low" = read-only, "medium" = reversible changes, "high" = deletions, stops, critical changes.
+Take the previous exchanges into account."""
+
+# Estimation grossière utilisée pour respecter la fenêtre de contexte
+CHARS_PER_TOKEN = 4
+MAX_OUTPUT_CHARS_PER_COMMAND = 2000
+
+
+class LocalProvider(AIProvider):
+    """
+    Provider pour tout serveur compatible OpenAI (llama.cpp server, vLLM, Ollama...)
+    joignable sur le réseau local : aucun aller-retour vers une API distante.
+    """
+
+    def __init__(self, base_url: str, model: str = "local", api_key: str = "",
+                 context_length: int = 8192, max_tokens: int = 1024,
+                 stream: bool = True, timeout: float = 120.0,
+                 limiter: Optional[KeyLimiter] = None, user: str = "anonymous"):
+        self.base_url = base_url.rstrip("/")
+        if not self.base_url.endswith("/v1"):
+            self.base_url += "/v1"
+        self.model = model
+        self.api_key = api_key
+        self.context_length = context_length
+        self.max_tokens = max_tokens
+        self.stream = stream
+        self.timeout = timeout
+        self.limiter = limiter
+        self.user = user
+        self._client = httpx.Client(timeout=timeout) if _HAS_HTTPX else None
+
+    def _headers(self) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return headers
+
+    def _build_messages(self, context: List[Dict], user_message: str,
+                        chat_history: Optional[List[Dict]],
+                        system_profile: Optional[str]) -> List[Dict]:
+        """Construit les messages en restant dans la fenêtre de contexte du modèle."""
+        system_prompt = SYSTEM_PROMPT
+        if system_profile:
+            system_prompt += f"\n\n**Active profile context:**\n{system_profile}"
+
+        context_text = ""
+        for c in context[-5:]:
+            stdout = c["stdout"][-MAX_OUTPUT_CHARS_PER_COMMAND:]
+            stderr = c["stderr"][-MAX_OUTPUT_CHARS_PER_COMMAND:]
+            context_text += f"$ {c['command']}\nstdout:\n{stdout}\nstderr:\n{stderr}\n\n"
+
+        user_prompt = user_message
+        if context_text:
+            user_prompt = f"Recent terminal commands:\n{context_text}\n{user_message}"
+
+        history = [
+            {"role": m["role"], "content": m["content"]}
+            for m in (chat_history or [])
+            if m.get("role") in ("user", "assistant") and m.get("content")
+        ]
+
+        # Budget en caractères : fenêtre - réponse attendue - system - message courant
+        budget = (self.context_length - self.max_tokens) * CHARS_PER_TOKEN
+        budget -= len(system_prompt) + len(user_prompt)
+
+        # Garder les tours les plus récents qui tiennent dans le budget
+        kept = []
+        for msg in reversed(history):
+            budget -= len(msg["content"])
+            if budget < 0:
+                break
+            kept.append(msg)
+        kept.reverse()
+        # Certains templates de chat exigent que l'historique commence par l'utilisateur
+        while kept and kept[0]["role"] == "assistant":
+            kept.pop(0)
+
+        return [{"role": "system", "content": system_prompt}] + kept + [
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _payload(self, messages: List[Dict], stream: bool) -> Dict:
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": self.max_tokens,
+            "stream": stream,
+        }
+        if stream:
+            # Compteurs de tokens dans le dernier événement (vLLM, llama.cpp, Ollama...)
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+
+    @staticmethod
+    def _usage(usage: Optional[Dict], messages: List[Dict], content: str) -> Dict:
+        """
+        Usage au format commun des providers ; estimé à partir de la taille
+        des messages si le serveur ne le renvoie pas (budget et compteurs).
+        """
+        if usage:
+            return {
+                "input_tokens": usage.get("prompt_tokens", 0) or 0,
+                "output_tokens": usage.get("completion_tokens", 0) or 0,
+            }
+        prompt_chars = sum(len(m["content"]) for m in messages)
+        return {
+            "input_tokens": prompt_chars // CHARS_PER_TOKEN,
+            "output_tokens": len(content) // CHARS_PER_TOKEN,
+            "estimated": True,
+        }
+
+    def _post(self, payload: Dict) -> Dict:
+        url = f"{self.base_url}/chat/completions"
+        if _HAS_HTTPX:
+            resp = self._client.post(url, json=payload, headers=self._headers())
+            resp.raise_for_status()
+            return resp.json()
+        req = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                     headers=self._headers(), method="POST")
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.loads(resp.read().decode("utf-8"))
+
+    def _iter_sse_lines(self, payload: Dict) -> Iterator[str]:
+        url = f"{self.base_url}/chat/completions"
+        if _HAS_HTTPX:
+            with self._client.stream("POST", url, json=payload, headers=self._headers()) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    yield line
+        else:
+            req = urllib.request.Request(url, data=json.dumps(payload).encode("utf-8"),
+                                         headers=self._headers(), method="POST")
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                for raw in resp:
+                    yield raw.decode("utf-8").rstrip("\r\n")
+
+    def ask_stream(self, context: List[Dict], user_message: str,
+                   chat_history: List[Dict] = None,
+                   system_profile: Optional[str] = None,
+                   usage: Optional[Dict] = None) -> Iterator[str]:
+        """
+        Génère la réponse au fil de l'eau (Server-Sent Events OpenAI).
+        Si `usage` est fourni, il reçoit les compteurs de tokens envoyés par le serveur.
+        """
+        messages = self._build_messages(context, user_message, chat_history, system_profile)
+        yield from self._stream(messages, usage)
+
+    def _stream(self, messages: List[Dict], usage: Optional[Dict] = None) -> Iterator[str]:
+        for line in self._iter_sse_lines(self._payload(messages, stream=True)):
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                continue
+            if usage is not None and chunk.get("usage"):
+                usage.update(chunk["usage"])
+            for choice in chunk.get("choices") or []:
+                text = (choice.get("delta") or {}).get("content")
+                if text:
+                    yield text
+
+    def ask(self, context: List[Dict], user_message: str,
+            chat_history: List[Dict] = None,
+            system_profile: Optional[str] = None) -> Dict:
+        start = time.monotonic()
+        try:
+            messages = self._build_messages(context, user_message, chat_history, system_profile)
+            if self.stream:
+                first_token_at = None
+                parser = None
+                usage: Dict = {}
+
+                def consume():
+                    nonlocal first_token_at, parser
+                    # Nouveau parseur à chaque tentative (le limiteur peut rejouer l'appel)
+                    parser = CommandStreamParser()
+                    usage.clear()
+                    parts = []
+                    for text in self._stream(messages, usage):
+                        if first_token_at is None:
+                            first_token_at = time.monotonic()
+                        parts.append(text)
+                        # Les blocs JSON sont analysés dès leur clôture, pendant la génération
+                        parser.feed(text)
+                    parser.close()
+                    return "".join(parts)
+
+                content = call_with_limits(self.limiter, self.user, consume)
+                result = {"markdown": content, "model": self.model,
+                          "usage": self._usage(usage, messages, content)}
+                if first_token_at is not None:
+                    result["time_to_first_token"] = first_token_at - start
+                    metrics.observe("ai_time_to_first_token_seconds", first_token_at - start,
+                                    provider="local", model=self.model)
+                return attach_commands(result, provider="local", parser=parser)
+
+            data = call_with_limits(self.limiter, self.user,
+                                    lambda: self._post(self._payload(messages, stream=False)))
+            content = data["choices"][0]["message"]["content"]
+            result = {"markdown": content, "model": self.model,
+                      "usage": self._usage(data.get("usage"), messages, content)}
+            return attach_commands(result, provider="local")
+
+        except Exception as e:
+            logger.error(f"Erreur du modèle local ({self.base_url}): {e}")
+            error_markdown = f"""## ❌ Erreur du modèle local
+
+```
+{str(e)}
+```"""
+            return {"markdown": error_markdown, "error": str(e), "commands": []}
@@ -0,0 +1,178 @@
+# core/ai_router.py
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from .ai_interface import AIProvider
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+ROUTING_POLICIES = ("failover", "latency")
+
+# Nombre de mesures conservées par API pour le p95 glissant
+LATENCY_WINDOW = 100
+
+# Pool partagé : les appels IA sont bloquants (SDK synchrones)
+_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="ai-router")
+
+
+class LatencyTracker:
+    """p95 glissant des latences observées par API."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, deque] = {}
+        self.window = window
+
+    def record(self, api_id: str, seconds: float):
+        with self._lock:
+            self._samples.setdefault(api_id, deque(maxlen=self.window)).append(seconds)
+
+    def p95(self, api_id: str) -> float:
+        """Retourne le p95 (0 si aucune mesure : l'API sera essayée en priorité)."""
+        with self._lock:
+            samples = sorted(self._samples.get(api_id, ()))
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+
+
+# Instance globale : la santé d'un fournisseur est la même pour tous les utilisateurs
+latency_tracker = LatencyTracker()
+
+
+class _Attempt:
+    """Appel d'une API : son échéance propre et une seule issue enregistrée."""
+
+    def __init__(self, api_id: str, timeout: float):
+        self.api_id = api_id
+        self.deadline = time.monotonic() + timeout
+        self._lock = threading.Lock()
+        self._settled = False
+
+    def settle(self) -> bool:
+        """Vrai pour le premier qui tranche l'issue (réponse ou abandon), faux ensuite."""
+        with self._lock:
+            if self._settled:
+                return False
+            self._settled = True
+            return True
+
+
+class RoutedProvider(AIProvider):
+    """
+    Répartit les requêtes sur une liste ordonnée d'APIs.
+
+    - failover : essaie les APIs dans l'ordre, passe à la suivante sur erreur ou timeout
+    - latency  : même principe, mais les APIs sont triées par p95 glissant
+    - hedge_ms : si > 0, lance l'API suivante après hedge_ms sans réponse ;
+                 la première réponse valide l'emporte
+
+    Chaque appel a sa propre échéance (timeout), fixée à son lancement : une
+    requête couverte ne prolonge pas l'attente des appels déjà en cours.
+    """
+
+    def __init__(self, providers: List[Tuple[str, AIProvider]], policy: str = "failover",
+                 hedge_ms: int = 0, timeout: float = 60.0):
+        if not providers:
+            raise ValueError("Au moins une API est requise pour le routage")
+        if policy not in ROUTING_POLICIES:
+            raise ValueError(f"Politique de routage inconnue: {policy}")
+        self.providers = providers
+        self.policy = policy
+        self.hedge_ms = hedge_ms
+        self.timeout = timeout
+        self.model = "+".join(getattr(p, "model", "") for _, p in providers)
+
+    def _ordered(self) -> List[Tuple[str, AIProvider]]:
+        if self.policy == "latency":
+            # sorted() est stable : à p95 égal, l'ordre configuré est conservé
+            return sorted(self.providers, key=lambda item: latency_tracker.p95(item[0]))
+        return list(self.providers)
+
+    def _call(self, attempt: _Attempt, provider: AIProvider, args: tuple) -> Dict:
+        """Appelle un provider, mesure sa latence et normalise les erreurs."""
+        start = time.monotonic()
+        try:
+            result = provider.ask(*args)
+        except Exception as e:
+            result = {"markdown": f"## ❌ Erreur API\n\n```\n{e}\n```", "error": str(e)}
+        elapsed = time.monotonic() - start
+
+        # Un appel déjà abandonné (timeout) a été compté : pas de seconde issue
+        if attempt.settle():
+            outcome = "error" if result.get("error") else "ok"
+            # Une erreur compte comme une réponse lente pour le tri par latence
+            latency_tracker.record(attempt.api_id, elapsed if outcome == "ok" else max(elapsed, self.timeout))
+            metrics.observe("ai_route_latency_seconds", elapsed, api_id=attempt.api_id)
+            metrics.inc("ai_route_attempts", 1, api_id=attempt.api_id, outcome=outcome)
+        return result
+
+    def _submit(self, pending: Dict, api_id: str, provider: AIProvider, args: tuple):
+        attempt = _Attempt(api_id, self.timeout)
+        pending[_executor.submit(self._call, attempt, provider, args)] = attempt
+
+    def ask(self, context: List[Dict], user_message: str,
+            chat_history: List[Dict] = None,
+            system_profile: Optional[str] = None) -> Dict:
+        args = (context, user_message, chat_history, system_profile)
+        candidates = self._ordered()
+        hedge_delay = self.hedge_ms / 1000 if self.hedge_ms > 0 else None
+
+        # {future: _Attempt} des appels en cours
+        pending: Dict = {}
+        last_result: Optional[Dict] = None
+
+        while pending or candidates:
+            if not pending:
+                # Rien en cours : on passe au candidat suivant (failover)
+                api_id, provider = candidates.pop(0)
+                self._submit(pending, api_id, provider, args)
+
+            # Timeout : on abandonne les appels échus (ils finissent en arrière-plan)
+            now = time.monotonic()
+            for future, attempt in list(pending.items()):
+                if attempt.deadline <= now and not future.done():
+                    del pending[future]
+                    if attempt.settle():
+                        logger.warning(f"API {attempt.api_id} sans réponse après {self.timeout}s, bascule")
+                        latency_tracker.record(attempt.api_id, self.timeout)
+                        metrics.inc("ai_route_attempts", 1, api_id=attempt.api_id, outcome="timeout")
+            if not pending:
+                continue
+
+            remaining = min(a.deadline for a in pending.values()) - now
+
+            hedging = hedge_delay is not None and bool(candidates)
+            wait_for = min(hedge_delay, remaining) if hedging else remaining
+            done, _ = wait(list(pending), timeout=max(0.0, wait_for), return_when=FIRST_COMPLETED)
+
+            if not done:
+                if hedging and wait_for >= hedge_delay:
+                    # Requête couverte : on lance l'API suivante en parallèle
+                    api_id, provider = candidates.pop(0)
+                    logger.info(f"Hedging: pas de réponse après {self.hedge_ms} ms, envoi à {api_id}")
+                    metrics.inc("ai_route_hedged", 1, api_id=api_id)
+                    self._submit(pending, api_id, provider, args)
+                continue
+
+            for future in done:
+                api_id = pending.pop(future).api_id
+                result = future.result()
+                if not result.get("error"):
+                    result.setdefault("api_id", api_id)
+                    return result
+                logger.warning(f"API {api_id} en échec, bascule: {result['error']}")
+                last_result = result
+
+        if last_result is not None:
+            return last_result
+        return {
+            "markdown": f"## ❌ Aucune API n'a répondu\n\nDélai dépassé ({self.timeout}s).",
+            "error": "timeout",
+        }
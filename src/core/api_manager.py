@@ -2,13 +2,22 @@
 
 import json
 import os
+import sys
 import base64
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional
 import logging
 
+from .fileutil import atomic_write_json
+
 logger = logging.getLogger(__name__)
 
+# Max number of decrypted API keys kept in memory (0 disables the cache)
+API_KEY_CACHE_SIZE = int(os.getenv("API_KEY_CACHE_SIZE", "256"))
+
 try:
     from cryptography.fernet import Fernet
     import hashlib
@@ -18,18 +27,54 @@ except ImportError:
     logger.warning("cryptography not installed — API keys stored in plain text. Run: pip install cryptography")
 
 
-def _get_fernet():
-    """Create a Fernet instance derived from SECRET_KEY."""
-    if not ENCRYPTION_AVAILABLE:
+@lru_cache(maxsize=4)
+def _derive_fernet(secret: str):
+    """Fernet instance for a secret (derived once per distinct secret)."""
+    if not ENCRYPTION_AVAILABLE or not secret:
         return None
-    secret = os.getenv("SECRET_KEY", "")
-    if not secret:
-        return None
-    # Derive a 32-byte key from SECRET_KEY using SHA-256
+    # Derive a 32-byte key from the secret using SHA-256
     key = hashlib.sha256(secret.encode()).digest()
     return Fernet(base64.urlsafe_b64encode(key))
 
 
+def _get_fernet():
+    """Fernet instance derived from SECRET_KEY (rebuilt only when SECRET_KEY changes)."""
+    return _derive_fernet(os.getenv("SECRET_KEY", ""))
+
+
+class _DecryptedKeyCache:
+    """Bounded LRU of decrypted keys, keyed on (cipher, ciphertext)."""
+
+    def __init__(self, max_size: int = API_KEY_CACHE_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._items: "OrderedDict[tuple, str]" = OrderedDict()
+
+    def get(self, key: tuple) -> Optional[str]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: tuple, value: str):
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+# Shared by all APIManager instances (the same ciphertext is often copied to every user)
+_decrypted_keys = _DecryptedKeyCache()
+
+
 class APIManager:
     """
     Manages AI API configurations (Claude, ChatGPT, etc.).
@@ -61,8 +106,14 @@ class APIManager:
             return value
         f = _get_fernet()
         if f:
+            # A different SECRET_KEY yields a different Fernet instance, hence a cache miss
+            cached = _decrypted_keys.get((f, value))
+            if cached is not None:
+                return cached
             try:
-                return f.decrypt(value[4:].encode()).decode()
+                plain = f.decrypt(value[4:].encode()).decode()
+                _decrypted_keys.put((f, value), plain)
+                return plain
             except Exception:
                 logger.warning("Failed to decrypt API key — key may have been encrypted with a different SECRET_KEY")
                 return ""
@@ -84,11 +135,9 @@ class APIManager:
             self._save_config()
 
     def _save_config(self):
-        """Save configuration to JSON file (keys are encrypted)."""
+        """Save configuration to JSON file (keys are encrypted, atomic replace)."""
         try:
-            self.config_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump({'apis': self.apis}, f, indent=2, ensure_ascii=False)
+            atomic_write_json(self.config_file, {'apis': self.apis}, mode=0o600)
             logger.info("API configuration saved")
             return True
         except Exception as e:
@@ -151,6 +200,75 @@ class APIManager:
         return False
 
 
+def rotated_key(value: str, old_f, new_f) -> Optional[str]:
+    """
+    Stored key re-encrypted with `new_f`, or None when it needs no change (empty,
+    or already encrypted with the new secret). Raises ValueError if it cannot be
+    decrypted with either secret.
+    """
+    if not value:
+        return None
+    if not value.startswith("enc:"):
+        plain = value
+    else:
+        try:
+            plain = old_f.decrypt(value[4:].encode()).decode()
+        except Exception:
+            try:
+                new_f.decrypt(value[4:].encode())
+                return None         # already rotated
+            except Exception:
+                raise ValueError("key cannot be decrypted with either secret")
+    return "enc:" + new_f.encrypt(plain.encode()).decode()
+
+
+def rotation_ciphers(old_secret: str, new_secret: str):
+    """(old, new) Fernet instances; ValueError if a secret or cryptography is missing."""
+    old_f, new_f = _derive_fernet(old_secret), _derive_fernet(new_secret)
+    if old_f is None or new_f is None:
+        raise ValueError("cryptography and both secrets are required for key rotation")
+    return old_f, new_f
+
+
+def rotate_secret(files: List[Path], old_secret: str, new_secret: str, progress=None) -> Dict[str, int]:
+    """
+    Re-encrypt the API keys of every apis.json in `files` from `old_secret` to
+    `new_secret`. Each file is rewritten atomically; keys already encrypted with
+    the new secret are left as they are, so an interrupted run can be resumed.
+    Plain-text keys get encrypted. `progress(index, total, path, rotated, failed)`
+    is called after each file.
+    """
+    old_f, new_f = rotation_ciphers(old_secret, new_secret)
+    totals = {"files": 0, "keys": 0, "failed": 0}
+    for index, path in enumerate(files, 1):
+        rotated = failed = 0
+        try:
+            with open(path, 'r', encoding='utf-8') as fh:
+                data = json.load(fh)
+            for api in data.get('apis', []):
+                try:
+                    value = rotated_key(api.get("api_key"), old_f, new_f)
+                except ValueError:
+                    failed += 1
+                    logger.warning(f"{path}: key of API {api.get('id')} cannot be decrypted, left unchanged")
+                    continue
+                if value is not None:
+                    api["api_key"] = value
+                    rotated += 1
+            if rotated:
+                atomic_write_json(path, data, mode=0o600)
+        except Exception as e:
+            failed += 1
+            logger.error(f"{path}: rotation failed: {e}")
+        totals["files"] += 1
+        totals["keys"] += rotated
+        totals["failed"] += failed
+        if progress:
+            progress(index, len(files), path, rotated, failed)
+    _decrypted_keys.clear()
+    return totals
+
+
 # Global singleton instance
 _api_manager = APIManager()
 
@@ -158,3 +276,40 @@ _api_manager = APIManager()
 def get_api_manager() -> APIManager:
     """Return the global APIManager instance."""
     return _api_manager
+
+
+if __name__ == "__main__":
+    # SECRET_KEY=<old> NEW_SECRET_KEY=<new> python -m core.api_manager rotate-key
+    # Secrets are read from the environment so they never show up in the process list.
+    if len(sys.argv) == 2 and sys.argv[1] == "rotate-key":
+        project_root = Path(__file__).parent.parent.parent
+        files = [p for p in [project_root / "apis.json"] if p.exists()]
+        files += sorted((project_root / "users").glob("*/apis.json"))
+
+        def report(index, total, path, rotated, failed):
+            status = f"{rotated} key(s) re-encrypted" + (f", {failed} FAILED" if failed else "")
+            print(f"[{index}/{total}] {path.relative_to(project_root)}: {status}", flush=True)
+
+        old_secret, new_secret = os.getenv("SECRET_KEY", ""), os.getenv("NEW_SECRET_KEY", "")
+        try:
+            totals = rotate_secret(files, old_secret, new_secret, report)
+            # SHELLIA_CONFIG_BACKEND=sqlite: keys imported into the config database
+            from .config_store import CONFIG_DB_PATH, ConfigStore
+            sources = f"{totals['files']} file(s)"
+            if CONFIG_DB_PATH.exists():
+                db_totals = ConfigStore(CONFIG_DB_PATH).rotate_api_keys(old_secret, new_secret)
+                print(f"{CONFIG_DB_PATH.name}: {db_totals['keys']} key(s) re-encrypted"
+                      + (f", {db_totals['failed']} FAILED" if db_totals["failed"] else ""), flush=True)
+                totals["keys"] += db_totals["keys"]
+                totals["failed"] += db_totals["failed"]
+                sources += f" and {CONFIG_DB_PATH.name}"
+        except ValueError as e:
+            print(f"Error: {e} (set SECRET_KEY and NEW_SECRET_KEY)")
+            sys.exit(1)
+        print(f"Done: {totals['keys']} key(s) in {sources}, {totals['failed']} failure(s). "
+              "Restart the server with SECRET_KEY set to the new value (existing sessions and the "
+              "Microsoft token cache are invalidated).")
+        sys.exit(1 if totals["failed"] else 0)
+    else:
+        print("Usage: SECRET_KEY=<old> NEW_SECRET_KEY=<new> python -m core.api_manager rotate-key")
+        sys.exit(1)
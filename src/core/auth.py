@@ -1,14 +1,20 @@
 # core/auth.py
 
+import asyncio
 import sqlite3
 import os
 import shutil
 import json
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-import bcrypt
+from .db import SQLitePool
+from .metrics import metrics
+from .password_hasher import password_hasher
 
 # Configuration
 SECRET_KEY = os.getenv("SECRET_KEY")
@@ -24,59 +30,58 @@ if not SECRET_KEY:
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 480
 
+# Cache des utilisateurs authentifiés (get_current_user à chaque requête protégée)
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "30"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+# Profil utilisateur signé dans le token : plus aucune lecture en base par requête,
+# mais un compte désactivé garde l'accès jusqu'à l'expiration du token
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("true", "1", "yes")
+USER_CLAIM = "usr"
+
 # Chemin de la base de données
-DB_PATH = Path(__file__).parent.parent.parent / "data" / "users.db"
+DB_PATH = Path(os.getenv("USERS_DB_PATH", str(Path(__file__).parent.parent.parent / "data" / "users.db")))
+
+# Schéma de la base des utilisateurs (appliqué une seule fois par version)
+USER_MIGRATIONS = [
+    (1, "table users", """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            hashed_password TEXT,
+            full_name TEXT,
+            is_active BOOLEAN DEFAULT 1,
+            is_google_auth BOOLEAN DEFAULT 0,
+            google_id TEXT UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            last_login TIMESTAMP
+        )
+    """),
+]
 
 
 class UserManager:
     """Gestionnaire des utilisateurs avec SQLite."""
 
     def __init__(self):
-        """Initialise la base de données."""
-        # Créer le répertoire data s'il n'existe pas
-        DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-        # Créer la table users si elle n'existe pas
-        self._init_db()
-
-    def _init_db(self):
-        """Initialise la base de données avec les tables nécessaires."""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE NOT NULL,
-                hashed_password TEXT,
-                full_name TEXT,
-                is_active BOOLEAN DEFAULT 1,
-                is_google_auth BOOLEAN DEFAULT 0,
-                google_id TEXT UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                last_login TIMESTAMP
-            )
-        """)
-
-        conn.commit()
-        conn.close()
+        """Initialise la base de données (pool de connexions et migrations)."""
+        self.db = SQLitePool(DB_PATH, migrations=USER_MIGRATIONS)
+        # {email: (utilisateur, timestamp)}, ordre LRU
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Incrémenté à chaque invalidation : une lecture concurrente ne réinsère pas une valeur périmée
+        self._generation = 0
 
     def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        """Vérifie un mot de passe."""
-        return bcrypt.checkpw(
-            plain_password.encode("utf-8"),
-            hashed_password.encode("utf-8")
-        )
+        """Vérifie un mot de passe (pool de hachage borné, peut lever HasherOverloadedError)."""
+        return password_hasher.verify(plain_password, hashed_password)
 
     def get_password_hash(self, password: str) -> str:
-        """Hache un mot de passe."""
-        return bcrypt.hashpw(
-            password.encode("utf-8"),
-            bcrypt.gensalt()
-        ).decode("utf-8")
+        """Hache un mot de passe au coût BCRYPT_ROUNDS."""
+        return password_hasher.hash(password)
 
     def create_user(self, email: str, password: Optional[str] = None,
-                   full_name: Optional[str] = None, google_id: Optional[str] = None) -> dict:
+                   full_name: Optional[str] = None, google_id: Optional[str] = None,
+                   hashed_password: Optional[str] = None) -> dict:
         """
         Crée un nouvel utilisateur.
 
@@ -85,46 +90,38 @@ class UserManager:
             password: Mot de passe (optionnel si google_id fourni)
             full_name: Nom complet (optionnel)
             google_id: ID Google (pour authentification Google)
+            hashed_password: Mot de passe déjà haché (password_hasher.hash_async)
 
         Returns:
             Dictionnaire avec les informations de l'utilisateur
         """
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        # Hacher le mot de passe hors transaction (bcrypt est lent)
+        if hashed_password is None and password:
+            hashed_password = self.get_password_hash(password)
+        is_google_auth = google_id is not None
 
         try:
-            # Vérifier si l'utilisateur existe déjà
-            cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-            if cursor.fetchone():
-                raise ValueError("Cet email est déjà utilisé")
-
-            # Hacher le mot de passe si fourni
-            hashed_password = self.get_password_hash(password) if password else None
-            is_google_auth = google_id is not None
-
-            # Insérer l'utilisateur
-            cursor.execute("""
-                INSERT INTO users (email, hashed_password, full_name, is_google_auth, google_id)
-                VALUES (?, ?, ?, ?, ?)
-            """, (email, hashed_password, full_name, is_google_auth, google_id))
-
-            conn.commit()
-            user_id = cursor.lastrowid
-
-            # Créer le répertoire utilisateur
-            self._create_user_directory(email)
+            with self.db.transaction() as conn:
+                # Vérifier si l'utilisateur existe déjà
+                if conn.execute("SELECT id FROM users WHERE email = ?", (email,)).fetchone():
+                    raise ValueError("Cet email est déjà utilisé")
+
+                # Insérer l'utilisateur
+                cursor = conn.execute("""
+                    INSERT INTO users (email, hashed_password, full_name, is_google_auth, google_id)
+                    VALUES (?, ?, ?, ?, ?)
+                """, (email, hashed_password, full_name, is_google_auth, google_id))
+                user = dict(conn.execute("SELECT * FROM users WHERE id = ?", (cursor.lastrowid,)).fetchone())
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Erreur lors de la création de l'utilisateur: {e}")
 
-            # Retourner les informations de l'utilisateur
-            cursor.execute("SELECT * FROM users WHERE id = ?", (user_id,))
-            user = dict(cursor.fetchone())
+        self.invalidate_user(email)
 
-            return self._user_dict(user)
+        # Créer le répertoire utilisateur
+        self._create_user_directory(email)
 
-        except sqlite3.IntegrityError as e:
-            raise ValueError(f"Erreur lors de la création de l'utilisateur: {e}")
-        finally:
-            conn.close()
+        # Retourner les informations de l'utilisateur
+        return self._user_dict(user)
 
     def _create_user_directory(self, email: str):
         """Crée la structure de répertoires pour un utilisateur et copie les données globales."""
@@ -162,50 +159,74 @@ class UserManager:
 
     def get_user_by_email(self, email: str) -> Optional[dict]:
         """Récupère un utilisateur par son email."""
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-        user = cursor.fetchone()
-        conn.close()
-
+        user = self.db.fetchone("SELECT * FROM users WHERE email = ?", (email,))
         return self._user_dict(dict(user)) if user else None
 
+    def get_user_cached(self, email: str) -> Optional[dict]:
+        """
+        Comme get_user_by_email, via un cache mémoire de AUTH_USER_CACHE_TTL secondes
+        (invalidé à chaque modification de l'utilisateur par ce processus).
+        """
+        now = time.monotonic()
+        with self._cache_lock:
+            entry = self._cache.get(email)
+            if entry and now - entry[1] < AUTH_USER_CACHE_TTL:
+                self._cache.move_to_end(email)
+                metrics.inc("auth_user_cache", 1, outcome="hit")
+                return dict(entry[0])
+            generation = self._generation
+
+        metrics.inc("auth_user_cache", 1, outcome="miss")
+        user = self.get_user_by_email(email)
+        # Les utilisateurs inconnus ne sont pas mis en cache (inscription imminente possible)
+        if user and AUTH_USER_CACHE_TTL > 0:
+            with self._cache_lock:
+                if generation != self._generation:
+                    return user
+                self._cache[email] = (dict(user), now)
+                self._cache.move_to_end(email)
+                while len(self._cache) > AUTH_USER_CACHE_SIZE:
+                    self._cache.popitem(last=False)
+        return user
+
+    def invalidate_user(self, email: str):
+        """Retire un utilisateur du cache (à appeler après toute modification)."""
+        with self._cache_lock:
+            self._cache.pop(email, None)
+            self._generation += 1
+
     def get_user_by_google_id(self, google_id: str) -> Optional[dict]:
         """Récupère un utilisateur par son Google ID."""
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM users WHERE google_id = ?", (google_id,))
-        user = cursor.fetchone()
-        conn.close()
-
+        user = self.db.fetchone("SELECT * FROM users WHERE google_id = ?", (google_id,))
         return self._user_dict(dict(user)) if user else None
 
-    def authenticate_user(self, email: str, password: str) -> Optional[dict]:
-        """Authentifie un utilisateur avec email et mot de passe."""
-        # Récupérer l'utilisateur avec le hash (sans passer par _user_dict)
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-        row = cursor.fetchone()
-        conn.close()
-
+    def _user_with_password(self, email: str) -> Optional[dict]:
+        """Utilisateur avec son hachage (sans passer par _user_dict), None sans mot de passe."""
+        row = self.db.fetchone("SELECT * FROM users WHERE email = ?", (email,))
         if not row:
             return None
-
         user = dict(row)
+        # Utilisateur Google sans mot de passe
+        return user if user.get("hashed_password") else None
 
-        if not user.get("hashed_password"):
-            # Utilisateur Google sans mot de passe
+    def authenticate_user(self, email: str, password: str) -> Optional[dict]:
+        """Authentifie un utilisateur avec email et mot de passe."""
+        user = self._user_with_password(email)
+        if not user or not self.verify_password(password, user["hashed_password"]):
             return None
+        return self._complete_login(email, password, user)
 
-        if not self.verify_password(password, user["hashed_password"]):
+    async def authenticate_user_async(self, email: str, password: str) -> Optional[dict]:
+        """Comme authenticate_user, sans bloquer de thread pendant la vérification bcrypt."""
+        user = await asyncio.to_thread(self._user_with_password, email)
+        if not user or not await password_hasher.verify_async(password, user["hashed_password"]):
             return None
+        return await asyncio.to_thread(self._complete_login, email, password, user)
+
+    def _complete_login(self, email: str, password: str, user: dict) -> dict:
+        # Ancien coût bcrypt : rehacher en arrière-plan, sans rallonger la connexion
+        if password_hasher.needs_rehash(user["hashed_password"]):
+            password_hasher.rehash_async(password, lambda hashed: self._update_password_hash(email, hashed))
 
         # Mettre à jour last_login
         self._update_last_login(email)
@@ -214,17 +235,17 @@ class UserManager:
 
     def _update_last_login(self, email: str):
         """Met à jour la date de dernière connexion."""
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute("""
+        self.db.execute("""
             UPDATE users
             SET last_login = CURRENT_TIMESTAMP
             WHERE email = ?
         """, (email,))
+        self.invalidate_user(email)
 
-        conn.commit()
-        conn.close()
+    def _update_password_hash(self, email: str, hashed_password: str):
+        """Remplace le hachage du mot de passe (rehachage à un nouveau coût)."""
+        self.db.execute("UPDATE users SET hashed_password = ? WHERE email = ?", (hashed_password, email))
+        self.invalidate_user(email)
 
     def _user_dict(self, user: dict) -> dict:
         """Convertit un utilisateur en dictionnaire sans le mot de passe."""
@@ -257,6 +278,35 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def user_claims(user: dict) -> dict:
+    """Claims à ajouter au token (profil signé) si AUTH_TRUST_TOKEN_CLAIMS est actif."""
+    if not AUTH_TRUST_TOKEN_CLAIMS:
+        return {}
+    return {USER_CLAIM: {
+        "id": user["id"],
+        "full_name": user.get("full_name"),
+        "is_active": user["is_active"],
+        "is_google_auth": user["is_google_auth"],
+        "created_at": user.get("created_at"),
+    }}
+
+
+def user_from_claims(payload: dict) -> Optional[dict]:
+    """Utilisateur reconstruit depuis un token signé (None si le token n'a pas de profil)."""
+    claims = payload.get(USER_CLAIM)
+    if not AUTH_TRUST_TOKEN_CLAIMS or not isinstance(claims, dict) or not payload.get("sub"):
+        return None
+    return {
+        "id": claims.get("id"),
+        "email": payload["sub"],
+        "full_name": claims.get("full_name"),
+        "is_active": bool(claims.get("is_active", True)),
+        "is_google_auth": bool(claims.get("is_google_auth", False)),
+        "created_at": claims.get("created_at"),
+        "last_login": None,
+    }
+
+
 def verify_token(token: str) -> Optional[dict]:
     """Vérifie un token JWT et retourne les données."""
     try:
@@ -0,0 +1,344 @@
+# core/batch_jobs.py
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import logging
+
+from .ai_interface import BatchFailedError
+from .fileutil import atomic_write_json
+from .metrics import metrics
+from .usage_meter import normalize_usage
+
+logger = logging.getLogger(__name__)
+
+# Appels interactifs simultanés pour les providers sans API batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+# Intervalle (secondes) entre deux interrogations d'un batch distant
+BATCH_POLL_INTERVAL = float(os.getenv("BATCH_POLL_INTERVAL", "30"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+# Erreurs consécutives tolérées en interrogeant un batch distant (backoff exponentiel)
+BATCH_POLL_MAX_ERRORS = int(os.getenv("BATCH_POLL_MAX_ERRORS", "8"))
+BATCH_POLL_BACKOFF_MAX = float(os.getenv("BATCH_POLL_BACKOFF_MAX", "600"))
+# Intervalle minimal (secondes) entre deux écritures de la progression d'un job
+BATCH_SAVE_INTERVAL = float(os.getenv("BATCH_SAVE_INTERVAL", "2"))
+
+# Statuts d'un job
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+
+
+class _ShutdownRequested(Exception):
+    """Arrêt du serveur pendant le traitement d'un job."""
+
+
+class BatchJobManager:
+    """
+    Jobs d'analyse en masse (ex : trier les sorties d'un health-check sur tout un parc).
+
+    Chaque job est traité dans un thread de fond :
+    - si le provider expose submit_batch/poll_batch, le lot est soumis à l'API
+      batch asynchrone du fournisseur (moins cher) puis interrogé périodiquement ;
+    - sinon, les éléments sont envoyés via ask() avec une concurrence bornée.
+
+    L'état et les résultats sont écrits dans un fichier JSON par job. Un batch
+    distant déjà soumis survit à un redémarrage : son interrogation reprend
+    (resume) ; les jobs interactifs en cours sont marqués interrompus.
+    """
+
+    def __init__(self, batches_dir: Path, meter=None, user: str = "anonymous",
+                 concurrency: int = BATCH_CONCURRENCY, poll_interval: float = BATCH_POLL_INTERVAL):
+        self.batches_dir = Path(batches_dir)
+        self.batches_dir.mkdir(parents=True, exist_ok=True)
+        self.meter = meter
+        self.user = user
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._jobs: Dict[str, Dict] = {}
+        # {job_id: {custom_id: position}} et date de la dernière écriture
+        self._positions: Dict[str, Dict[str, int]] = {}
+        self._saved_at: Dict[str, float] = {}
+        # Batches distants à reprendre (resume)
+        self._pending_resume: List[str] = []
+        self._load_jobs()
+
+    def _path(self, job_id: str) -> Path:
+        return self.batches_dir / f"{job_id}.json"
+
+    def _load_jobs(self):
+        """
+        Recharge les jobs existants. Parmi ceux qui tournaient lors de l'arrêt,
+        les batches déjà soumis au fournisseur sont à reprendre, les autres
+        sont interrompus (leurs contextes n'étaient gardés qu'en mémoire).
+        """
+        for path in self.batches_dir.glob("*.json"):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    job = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Job batch illisible ignoré ({path.name}): {e}")
+                continue
+            if job.get("status") in (QUEUED, RUNNING) and job.get("provider_batch_id"):
+                self._jobs[job["id"]] = job
+                self._pending_resume.append(job["id"])
+            elif job.get("status") in (QUEUED, RUNNING):
+                job["status"] = INTERRUPTED
+                job["error"] = "Serveur redémarré pendant le traitement"
+                self._jobs[job["id"]] = job
+                self._save(job)
+            else:
+                self._jobs[job["id"]] = job
+
+    def _save(self, job: Dict):
+        """Écriture atomique (fichier temporaire puis os.replace)."""
+        job["updated_at"] = datetime.now().isoformat()
+        atomic_write_json(self._path(job["id"]), job)
+        self._saved_at[job["id"]] = time.monotonic()
+
+    def _update(self, job: Dict, **fields):
+        with self._lock:
+            job.update(fields)
+            self._save(job)
+
+    def submit(self, provider, items: List[Dict], api_id: str = "") -> Dict:
+        """
+        Crée un job et lance son traitement en arrière-plan.
+
+        Args:
+            provider: AIProvider (avec ou sans submit_batch/poll_batch)
+            items: [{"question", "context"?: [{"command", "stdout", "stderr"}],
+                     "system_profile"?, "id"?}]
+            api_id: API utilisée (pour l'affichage et le comptage d'usage)
+
+        Returns:
+            Résumé du job créé
+        """
+        if not items:
+            raise ValueError("Le lot ne contient aucun élément")
+        if len(items) > BATCH_MAX_ITEMS:
+            raise ValueError(f"Le lot dépasse {BATCH_MAX_ITEMS} éléments")
+
+        job_id = uuid.uuid4().hex
+        use_batch_api = callable(getattr(provider, "submit_batch", None)) and \
+            callable(getattr(provider, "poll_batch", None))
+        now = datetime.now().isoformat()
+        job = {
+            "id": job_id,
+            "status": QUEUED,
+            "mode": "batch_api" if use_batch_api else "interactive",
+            "api_id": api_id,
+            "provider_batch_id": None,
+            "created_at": now,
+            "updated_at": now,
+            "total": len(items),
+            "done": 0,
+            "errors": 0,
+            "error": None,
+            "items": [
+                {
+                    "custom_id": f"item-{index}",
+                    "id": item.get("id") or f"item-{index}",
+                    "question": item["question"],
+                    "result": None,
+                }
+                for index, item in enumerate(items)
+            ],
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._save(job)
+
+        # Les contextes ne sont gardés qu'en mémoire, le temps du traitement
+        requests = [
+            {
+                "custom_id": entry["custom_id"],
+                "context": item.get("context") or [],
+                "user_message": item["question"],
+                "system_profile": item.get("system_profile"),
+            }
+            for entry, item in zip(job["items"], items)
+        ]
+        target = self._run_batch_api if use_batch_api else self._run_interactive
+        self._start(target, job, provider, requests)
+        metrics.inc("ai_batch_jobs", 1, mode=job["mode"])
+        return self._summary(job)
+
+    def resume(self, provider_factory: Callable[[str], object]):
+        """
+        Reprend l'interrogation des batches distants soumis avant un redémarrage.
+
+        Args:
+            provider_factory: instancie le provider d'une API à partir de son id
+        """
+        with self._lock:
+            pending, self._pending_resume = self._pending_resume, []
+        for job_id in pending:
+            job = self._jobs[job_id]
+            try:
+                provider = provider_factory(job["api_id"])
+            except Exception as e:
+                provider = None
+                logger.warning(f"Job batch {job_id}: provider {job['api_id']} indisponible: {e}")
+            if not callable(getattr(provider, "poll_batch", None)):
+                self._update(job, status=INTERRUPTED,
+                             error="Serveur redémarré : le provider du batch n'est plus disponible")
+                continue
+            logger.info(f"Job batch {job_id}: reprise de l'interrogation du batch {job['provider_batch_id']}")
+            metrics.inc("ai_batch_resumed", 1)
+            self._start(self._collect_batch_api, job, provider, None)
+
+    def _start(self, target, job: Dict, provider, requests: Optional[List[Dict]]):
+        threading.Thread(target=self._run, args=(target, job, provider, requests),
+                         name=f"batch-{job['id'][:8]}", daemon=True).start()
+
+    def _run(self, target, job: Dict, provider, requests: Optional[List[Dict]]):
+        self._update(job, status=RUNNING)
+        start = time.monotonic()
+        try:
+            target(job, provider, requests)
+            self._update(job, status=COMPLETED)
+        except _ShutdownRequested:
+            # Un batch soumis reste en cours : il sera repris au prochain démarrage
+            if job.get("provider_batch_id"):
+                self._update(job)
+            else:
+                self._update(job, status=INTERRUPTED, error="Serveur arrêté pendant le traitement")
+        except Exception as e:
+            logger.error(f"Job batch {job['id']} en échec: {e}")
+            self._update(job, status=FAILED, error=str(e))
+        finally:
+            metrics.observe("ai_batch_job_seconds", time.monotonic() - start, mode=job["mode"])
+
+    def _store_result(self, job: Dict, custom_id: str, result: Dict):
+        with self._lock:
+            positions = self._positions.get(job["id"])
+            if positions is None:
+                positions = self._positions[job["id"]] = {
+                    entry["custom_id"]: index for index, entry in enumerate(job["items"])
+                }
+            job["items"][positions[custom_id]]["result"] = result
+            job["done"] += 1
+            if result.get("error"):
+                job["errors"] += 1
+            # Progression visible pendant le traitement, sans réécrire le fichier
+            # à chaque élément (l'état final est écrit à la fin du job)
+            if time.monotonic() - self._saved_at.get(job["id"], 0.0) >= BATCH_SAVE_INTERVAL:
+                self._save(job)
+
+    def _run_interactive(self, job: Dict, provider, requests: List[Dict]):
+        """Repli : appels ask() avec une concurrence bornée."""
+        def process(request: Dict):
+            if self._stop.is_set():
+                raise _ShutdownRequested()
+            try:
+                result = provider.ask(
+                    context=request["context"],
+                    user_message=request["user_message"],
+                    chat_history=None,
+                    system_profile=request["system_profile"],
+                )
+            except Exception as e:
+                result = {"markdown": f"## ❌ Erreur\n\n```\n{e}\n```", "error": str(e)}
+            self._store_result(job, request["custom_id"], result)
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(requests)),
+                                thread_name_prefix=f"batch-{job['id'][:8]}") as pool:
+            for _ in pool.map(process, requests):
+                pass
+
+    def _run_batch_api(self, job: Dict, provider, requests: List[Dict]):
+        """Soumission à l'API batch du fournisseur puis interrogation périodique."""
+        batch_id = provider.submit_batch(requests)
+        self._update(job, provider_batch_id=batch_id)
+        logger.info(f"Job batch {job['id']} soumis ({len(requests)} éléments, batch {batch_id})")
+        self._collect_batch_api(job, provider, requests)
+
+    def _collect_batch_api(self, job: Dict, provider, requests: Optional[List[Dict]] = None):
+        """
+        Interroge le batch distant jusqu'à sa fin puis enregistre les résultats.
+        Une erreur d'interrogation (réseau, 5xx) est retentée avec un backoff
+        exponentiel ; le job n'échoue qu'après BATCH_POLL_MAX_ERRORS erreurs de suite,
+        ou immédiatement si le fournisseur signale un batch terminé en échec
+        (BatchFailedError).
+        """
+        batch_id = job["provider_batch_id"]
+        errors = 0
+        while True:
+            delay = self.poll_interval
+            try:
+                results = provider.poll_batch(batch_id)
+                errors = 0
+            except BatchFailedError:
+                raise
+            except Exception as e:
+                errors += 1
+                if errors > BATCH_POLL_MAX_ERRORS:
+                    raise
+                results = None
+                delay = min(BATCH_POLL_BACKOFF_MAX, self.poll_interval * (2 ** (errors - 1)))
+                logger.warning(f"Job batch {job['id']}: interrogation en échec ({errors}/"
+                               f"{BATCH_POLL_MAX_ERRORS}), nouvelle tentative dans {delay:.0f}s: {e}")
+                metrics.inc("ai_batch_poll_errors", 1)
+            if results is not None:
+                break
+            if self._stop.wait(delay):
+                raise _ShutdownRequested()
+
+        # Éléments sans résultat (tous, sauf reprise après un arrêt pendant l'enregistrement)
+        for entry in job["items"]:
+            if entry["result"] is not None:
+                continue
+            result = results.get(entry["custom_id"]) or {
+                "markdown": "## ❌ Résultat absent du batch", "error": "missing result"
+            }
+            self._store_result(job, entry["custom_id"], result)
+            self._record_usage(job, result)
+
+    def _record_usage(self, job: Dict, result: Dict):
+        """Les appels batch ne passent pas par MeteredProvider : on les compte ici."""
+        if not self.meter:
+            return
+        try:
+            self.meter.record(
+                user=self.user,
+                api_id=job["api_id"],
+                model=result.get("model", ""),
+                outcome="error" if result.get("error") else "batch",
+                **normalize_usage(result.get("usage")),
+            )
+        except Exception as e:
+            logger.error(f"Impossible d'enregistrer l'usage batch: {e}")
+
+    @staticmethod
+    def _summary(job: Dict) -> Dict:
+        return {k: v for k, v in job.items() if k != "items"}
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """Retourne le job complet (avec les résultats disponibles)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        """Liste les jobs (sans les éléments), du plus récent au plus ancien."""
+        with self._lock:
+            jobs = [self._summary(job) for job in self._jobs.values()]
+        return sorted(jobs, key=lambda j: j["created_at"], reverse=True)
+
+    def shutdown(self):
+        """
+        Interrompt l'attente des batches distants en cours (ils restent "running"
+        et sont repris au prochain démarrage) et les jobs interactifs.
+        """
+        self._stop.set()
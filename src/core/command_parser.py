@@ -0,0 +1,326 @@
+# core/command_parser.py
+
+import ast
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from .metrics import metrics
+from .risk_classifier import classify_command, max_risk
+
+logger = logging.getLogger(__name__)
+
+RISK_LEVELS = ("low", "medium", "high")
+
+# Variantes rencontrées dans les réponses des modèles
+RISK_ALIASES = {
+    "safe": "low", "none": "low", "read-only": "low", "readonly": "low", "info": "low",
+    "faible": "low", "bas": "low",
+    "moderate": "medium", "med": "medium", "modéré": "medium", "moyen": "medium",
+    "dangerous": "high", "critical": "high", "destructive": "high", "élevé": "high",
+    "eleve": "high", "haut": "high", "critique": "high",
+}
+
+MAX_COMMAND_LENGTH = 4096
+
+# Outil natif (tool use / function calling) décrivant les commandes proposées
+COMMANDS_TOOL_NAME = "propose_commands"
+COMMANDS_TOOL_DESCRIPTION = "Propose shell commands for the user to review and run."
+COMMANDS_TOOL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "commands": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "cmd": {"type": "string", "description": "Shell command"},
+                    "risk": {"type": "string", "enum": list(RISK_LEVELS)},
+                    "description": {"type": "string", "description": "What the command does"},
+                },
+                "required": ["cmd", "risk", "description"],
+            },
+        }
+    },
+    "required": ["commands"],
+}
+COMMANDS_TOOL_PROMPT = (
+    f"\n\nWhen proposing commands, call the `{COMMANDS_TOOL_NAME}` tool instead of writing "
+    "a JSON block in the answer."
+)
+
+_FENCE_OPEN = re.compile(r"```[ \t]*json[ \t]*\n?", re.IGNORECASE)
+_FENCE_CLOSE = "```"
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_BLOCK_COMMENT = re.compile(r"/\*.*?\*/", re.DOTALL)
+_LINE_COMMENT = re.compile(r"^\s*//.*$", re.MULTILINE)
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "‘": "'", "’": "'"})
+# Dernier recours : objets plats contenant une clé cmd/command
+_COMMAND_OBJECT = re.compile(r"\{[^{}]*[\"'](?:cmd|command)[\"'][^{}]*\}")
+
+
+def _close_brackets(text: str) -> str:
+    """Ferme les chaînes, accolades et crochets laissés ouverts (réponse tronquée)."""
+    stack = []
+    in_string = False
+    escaped = False
+    for ch in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    return _TRAILING_COMMA.sub(r"\1", text.rstrip().rstrip(",")) + "".join(reversed(stack))
+
+
+_UNPARSED = object()
+
+
+_JSON_LITERALS = {"true": "True", "false": "False", "null": "None"}
+# Chaîne entre guillemets (laissée intacte) ou littéral JSON hors chaîne
+_PYTHONISH_TOKEN = re.compile(r"\"(?:\\.|[^\"\\])*\"|'(?:\\.|[^'\\])*'|\b(?:true|false|null)\b")
+
+
+def _to_python_literals(text: str) -> str:
+    """Remplace true/false/null par leurs équivalents Python, hors des chaînes."""
+    return _PYTHONISH_TOKEN.sub(lambda m: _JSON_LITERALS.get(m.group(0), m.group(0)), text)
+
+
+def _try_parse(candidate: str):
+    """JSON strict, puis syntaxe Python (guillemets simples, True/False/None)."""
+    try:
+        return json.loads(candidate)
+    except json.JSONDecodeError:
+        pass
+    try:
+        return ast.literal_eval(_to_python_literals(candidate))
+    except (ValueError, SyntaxError, MemoryError, RecursionError):
+        return _UNPARSED
+
+
+def repair_json(text: str) -> Tuple[Optional[object], bool]:
+    """
+    Parse un bloc JSON produit par un modèle, en corrigeant les défauts courants
+    (virgules finales, commentaires, guillemets typographiques ou simples, troncature).
+
+    Returns:
+        (objet ou None, True si une réparation a été nécessaire)
+    """
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+
+    fixed = text.translate(_SMART_QUOTES)
+    fixed = _BLOCK_COMMENT.sub("", fixed)
+    fixed = _LINE_COMMENT.sub("", fixed)
+    fixed = _TRAILING_COMMA.sub(r"\1", fixed).strip()
+
+    for candidate in (fixed, _close_brackets(fixed)):
+        payload = _try_parse(candidate)
+        if payload is not _UNPARSED:
+            return payload, True
+
+    # Récupérer au moins les objets commande individuels
+    salvaged = []
+    for match in _COMMAND_OBJECT.finditer(fixed):
+        obj = _try_parse(match.group(0))
+        if isinstance(obj, dict):
+            salvaged.append(obj)
+    if salvaged:
+        return {"commands": salvaged}, True
+    return None, True
+
+
+def normalize_risk(value) -> Tuple[str, Optional[str]]:
+    """Ramène un niveau de risque à low/medium/high (retourne aussi un avertissement éventuel)."""
+    if value is None or value == "":
+        return "medium", "risque absent, 'medium' par défaut"
+    risk = str(value).strip().lower()
+    if risk in RISK_LEVELS:
+        return risk, None
+    if risk in RISK_ALIASES:
+        return RISK_ALIASES[risk], None
+    # Niveau inconnu : on reste prudent
+    return "high", f"risque inconnu '{value}', 'high' par défaut"
+
+
+def validate_command(obj) -> Tuple[Optional[Dict], List[str]]:
+    """Valide un objet commande et le normalise en {cmd, risk, description}."""
+    if isinstance(obj, str):
+        obj = {"cmd": obj}
+    if not isinstance(obj, dict):
+        return None, [f"commande ignorée (type {type(obj).__name__})"]
+
+    cmd = obj.get("cmd", obj.get("command"))
+    if not isinstance(cmd, str) or not cmd.strip():
+        return None, ["commande ignorée (champ cmd vide ou absent)"]
+    cmd = cmd.strip()
+    if cmd.startswith("$ "):
+        cmd = cmd[2:].lstrip()
+    if len(cmd) > MAX_COMMAND_LENGTH:
+        return None, [f"commande ignorée (plus de {MAX_COMMAND_LENGTH} caractères)"]
+
+    warnings = []
+    risk, warning = normalize_risk(obj.get("risk"))
+    if warning:
+        warnings.append(f"{cmd[:40]}: {warning}")
+    # Le classifieur local ne peut que relever le niveau annoncé par le modèle
+    local_risk = classify_command(cmd)
+    risk = max_risk(risk, local_risk["level"])
+
+    description = obj.get("description", obj.get("desc", ""))
+    if not isinstance(description, str):
+        description = str(description) if description is not None else ""
+
+    return {"cmd": cmd, "risk": risk, "description": description.strip(),
+            "risk_reasons": local_risk["reasons"]}, warnings
+
+
+def validate_commands(payload) -> Tuple[List[Dict], List[str]]:
+    """Valide le contenu d'un bloc ({"commands": [...]}, liste ou commande seule)."""
+    if isinstance(payload, dict):
+        items = payload.get("commands")
+        if items is None and ("cmd" in payload or "command" in payload):
+            items = [payload]
+    else:
+        items = payload
+    if not isinstance(items, list):
+        return [], ["bloc JSON sans liste 'commands'"]
+
+    commands, warnings = [], []
+    for item in items:
+        command, item_warnings = validate_command(item)
+        warnings.extend(item_warnings)
+        if command:
+            commands.append(command)
+    return commands, warnings
+
+
+class CommandStreamParser:
+    """
+    Extrait les commandes des blocs ```json au fil d'une réponse en streaming :
+    chaque bloc est analysé dès que sa clôture arrive.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._block_start: Optional[int] = None
+        self._seen = set()
+        self.commands: List[Dict] = []
+        self.warnings: List[str] = []
+        self.repaired = False
+
+    def _add_block(self, text: str) -> List[Dict]:
+        text = text.strip()
+        if not text:
+            return []
+        payload, repaired = repair_json(text)
+        self.repaired = self.repaired or repaired
+        if payload is None:
+            self.warnings.append("bloc JSON illisible ignoré")
+            return []
+        commands, warnings = validate_commands(payload)
+        self.warnings.extend(warnings)
+        new = []
+        for command in commands:
+            if command["cmd"] not in self._seen:
+                self._seen.add(command["cmd"])
+                new.append(command)
+        self.commands.extend(new)
+        return new
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Ajoute un fragment de texte ; retourne les commandes des blocs complétés."""
+        self._buffer += chunk
+        new = []
+        while True:
+            if self._block_start is None:
+                match = _FENCE_OPEN.search(self._buffer, self._pos)
+                # Attendre la fin de ligne pour ne pas couper "```json" en deux
+                if not match or (match.end() == len(self._buffer) and not match.group(0).endswith("\n")):
+                    break
+                self._block_start = match.end()
+                self._pos = match.end()
+            end = self._buffer.find(_FENCE_CLOSE, self._pos)
+            if end == -1:
+                break
+            new.extend(self._add_block(self._buffer[self._block_start:end]))
+            self._block_start = None
+            self._pos = end + len(_FENCE_CLOSE)
+        return new
+
+    def close(self) -> List[Dict]:
+        """Fin du flux : analyse un éventuel bloc resté ouvert (réponse tronquée)."""
+        if self._block_start is None:
+            match = _FENCE_OPEN.search(self._buffer, self._pos)
+            if not match:
+                return []
+            self._block_start = match.end()
+        new = self._add_block(self._buffer[self._block_start:])
+        self.repaired = True
+        self._block_start = None
+        self._pos = len(self._buffer)
+        return new
+
+
+def extract_commands(markdown: str) -> Tuple[List[Dict], List[str], bool]:
+    """
+    Extrait et valide les commandes des blocs ```json d'une réponse.
+
+    Returns:
+        (commandes, avertissements, réparation nécessaire)
+    """
+    parser = CommandStreamParser()
+    parser.feed(markdown or "")
+    parser.close()
+    return parser.commands, parser.warnings, parser.repaired
+
+
+def render_commands_block(commands: List[Dict]) -> str:
+    """Bloc ```json équivalent, pour conserver les commandes dans l'historique."""
+    return "```json\n" + json.dumps({"commands": commands}, indent=2, ensure_ascii=False) + "\n```"
+
+
+def attach_commands(result: Dict, provider: str = "",
+                    parser: Optional[CommandStreamParser] = None) -> Dict:
+    """
+    Ajoute au résultat d'un provider la liste validée des commandes proposées.
+
+    Si le provider a déjà fourni des commandes (sortie native), elles sont seulement
+    validées ; si un parseur de flux a suivi la génération, ses commandes sont reprises ;
+    sinon elles sont extraites du markdown.
+    """
+    if result.get("error"):
+        result.setdefault("commands", [])
+        return result
+
+    if parser is not None:
+        commands, warnings = parser.commands, parser.warnings
+        outcome = "repaired" if parser.repaired else "parsed"
+    elif "commands" in result:
+        commands, warnings = validate_commands(result["commands"])
+        outcome = "native"
+    else:
+        commands, warnings, repaired = extract_commands(result.get("markdown", ""))
+        outcome = "repaired" if repaired else "parsed"
+    if warnings:
+        outcome = "invalid" if not commands else outcome
+        logger.warning(f"Commandes IA corrigées [{provider}]: {'; '.join(warnings)}")
+        result["command_warnings"] = warnings
+
+    result["commands"] = commands
+    metrics.inc("ai_command_parse", 1, provider=provider or "unknown", outcome=outcome)
+    return result
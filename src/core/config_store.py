@@ -0,0 +1,373 @@
+# core/config_store.py
+
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+import threading
+
+from .db import SQLitePool
+from .environment_manager import EnvironmentManager
+from .api_manager import APIManager, rotated_key, rotation_ciphers
+from .profile_manager import ProfileManager
+
+logger = logging.getLogger(__name__)
+
+# "files" : .env / apis.json / profiles.json par utilisateur (historique)
+# "sqlite" : une base unique, transactionnelle (fichiers importés au premier accès)
+SHELLIA_CONFIG_BACKEND = os.getenv("SHELLIA_CONFIG_BACKEND", "files").lower()
+CONFIG_DB_PATH = Path(os.getenv("CONFIG_DB_PATH", str(Path(__file__).parent.parent.parent / "data" / "config.db")))
+
+
+class ConfigImportError(Exception):
+    """Levée quand un fichier de configuration existant est illisible : rien n'est importé."""
+
+CONFIG_MIGRATIONS = [
+    (1, "environments, apis, profiles", """
+        CREATE TABLE environments (
+            owner TEXT NOT NULL,
+            name TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (owner, name)
+        ) WITHOUT ROWID;
+        CREATE TABLE apis (
+            owner TEXT NOT NULL,
+            id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (owner, id)
+        ) WITHOUT ROWID;
+        CREATE INDEX idx_apis_position ON apis (owner, position);
+        CREATE TABLE profiles (
+            owner TEXT NOT NULL,
+            id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (owner, id)
+        ) WITHOUT ROWID;
+        CREATE INDEX idx_profiles_position ON profiles (owner, position);
+        CREATE TABLE imported_owners (
+            owner TEXT PRIMARY KEY,
+            source TEXT,
+            imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """),
+]
+
+# Table -> colonne clé (les noms de table ne viennent jamais de l'utilisateur)
+_KEYS = {"environments": "name", "apis": "id", "profiles": "id"}
+
+
+class ConfigStore:
+    """
+    Environnements, APIs et profils de tous les utilisateurs dans une base
+    SQLite : une ligne par élément (JSON), lectures indexées par
+    (propriétaire, clé), écritures ligne par ligne en transaction (deux
+    modifications concurrentes ne s'écrasent plus).
+    """
+
+    def __init__(self, db_path: Path = CONFIG_DB_PATH):
+        self.db = SQLitePool(db_path, migrations=CONFIG_MIGRATIONS)
+
+    def list_rows(self, table: str, owner: str) -> List[Dict]:
+        order = "name" if table == "environments" else "position"
+        rows = self.db.fetchall(f"SELECT data FROM {table} WHERE owner = ? ORDER BY {order}", (owner,))
+        return [json.loads(row["data"]) for row in rows]
+
+    def get(self, table: str, owner: str, key: str) -> Optional[Dict]:
+        row = self.db.fetchone(f"SELECT data FROM {table} WHERE owner = ? AND {_KEYS[table]} = ?", (owner, key))
+        return json.loads(row["data"]) if row else None
+
+    def insert(self, table: str, owner: str, key: str, data: Dict) -> bool:
+        """Ajoute un élément ; False s'il existe déjà."""
+        with self.db.transaction() as conn:
+            return self._insert(conn, table, owner, key, data)
+
+    def _insert(self, conn, table: str, owner: str, key: str, data: Dict) -> bool:
+        cursor = conn.execute(f"""
+            INSERT OR IGNORE INTO {table} (owner, {_KEYS[table]}, position, data)
+            VALUES (?, ?, (SELECT COALESCE(MAX(position), 0) + 1 FROM {table} WHERE owner = ?), ?)
+        """, (owner, key, owner, json.dumps(data, ensure_ascii=False)))
+        return cursor.rowcount > 0
+
+    def update(self, table: str, owner: str, key: str, change: Callable[[Dict], Dict]) -> bool:
+        """
+        Lit, transforme (`change(ancien) -> nouveau`) et réécrit une ligne sous
+        le verrou d'écriture ; False si l'élément n'existe pas.
+        """
+        with self.db.transaction() as conn:
+            row = conn.execute(f"SELECT data FROM {table} WHERE owner = ? AND {_KEYS[table]} = ?",
+                               (owner, key)).fetchone()
+            if not row:
+                return False
+            conn.execute(f"""
+                UPDATE {table} SET data = ?, updated_at = CURRENT_TIMESTAMP
+                WHERE owner = ? AND {_KEYS[table]} = ?
+            """, (json.dumps(change(json.loads(row["data"])), ensure_ascii=False), owner, key))
+            return True
+
+    def delete(self, table: str, owner: str, key: str) -> bool:
+        return self.db.execute(f"DELETE FROM {table} WHERE owner = ? AND {_KEYS[table]} = ?", (owner, key)) > 0
+
+    def rotate_api_keys(self, old_secret: str, new_secret: str) -> Dict[str, int]:
+        """
+        Rechiffre les clés d'API de tous les utilisateurs avec le nouveau secret,
+        en une seule transaction (comme rotate_secret pour les apis.json). Les
+        clés déjà rechiffrées sont laissées telles quelles ; une clé illisible
+        avec les deux secrets est comptée en échec et laissée inchangée.
+        """
+        old_f, new_f = rotation_ciphers(old_secret, new_secret)
+        totals = {"keys": 0, "failed": 0}
+        with self.db.transaction() as conn:
+            for row in conn.execute("SELECT owner, id, data FROM apis").fetchall():
+                api = json.loads(row["data"])
+                try:
+                    value = rotated_key(api.get("api_key"), old_f, new_f)
+                except ValueError:
+                    totals["failed"] += 1
+                    logger.warning(f"Clé de l'API {row['id']} de {row['owner']} indéchiffrable, laissée telle quelle")
+                    continue
+                if value is None:
+                    continue
+                conn.execute("UPDATE apis SET data = ?, updated_at = CURRENT_TIMESTAMP WHERE owner = ? AND id = ?",
+                             (json.dumps({**api, "api_key": value}, ensure_ascii=False), row["owner"], row["id"]))
+                totals["keys"] += 1
+        return totals
+
+    def import_owner(self, owner: str, user_dir: Path) -> Optional[Dict[str, int]]:
+        """
+        Importe une seule fois les fichiers d'un utilisateur (environments/*.env,
+        apis.json, profiles.json). Les fichiers sont laissés en place ; les clés
+        d'API restent chiffrées telles quelles. None si déjà importé.
+
+        Raises:
+            ConfigImportError: apis.json ou profiles.json existe mais ne peut pas
+                être lu ; l'utilisateur n'est pas marqué importé (nouvel essai au
+                prochain accès, une fois le fichier réparé)
+        """
+        if self.db.fetchone("SELECT 1 FROM imported_owners WHERE owner = ?", (owner,)):
+            return None
+        user_dir = Path(user_dir)
+        # Lecture stricte : les gestionnaires fichiers remplacent un fichier illisible
+        # par une liste vide, l'importer ainsi perdrait définitivement la configuration
+        apis = self._read_json(user_dir / "apis.json", {"apis": []}).get("apis", [])
+        profiles = self._read_json(user_dir / "profiles.json", [])
+        if not isinstance(apis, list) or not isinstance(profiles, list):
+            raise ConfigImportError(f"{user_dir}: apis.json ou profiles.json n'a pas le format attendu")
+        environments = {}
+        if (user_dir / "environments").is_dir():
+            env_manager = EnvironmentManager(user_dir / "environments")
+            environments = {e["filename"]: env_manager.get_environment(e["filename"])
+                            for e in env_manager.list_environments()}
+
+        counts = {"environments": 0, "apis": 0, "profiles": 0}
+        with self.db.transaction() as conn:
+            # Un autre processus a pu importer entre-temps
+            if conn.execute("SELECT 1 FROM imported_owners WHERE owner = ?", (owner,)).fetchone():
+                return None
+            for name, data in environments.items():
+                counts["environments"] += self._insert(conn, "environments", owner, name, data or {})
+            for api in apis:
+                if isinstance(api, dict) and api.get("id"):
+                    counts["apis"] += self._insert(conn, "apis", owner, api["id"], api)
+            for profile in profiles:
+                if isinstance(profile, dict) and profile.get("id"):
+                    counts["profiles"] += self._insert(conn, "profiles", owner, profile["id"], profile)
+            conn.execute("INSERT INTO imported_owners (owner, source) VALUES (?, ?)", (owner, str(user_dir)))
+        logger.info(f"Configuration de {owner} importée dans {self.db.db_path.name}: {counts}")
+        return counts
+
+    @staticmethod
+    def _read_json(path: Path, default):
+        """Contenu JSON du fichier (default s'il n'existe pas) ; ConfigImportError s'il est illisible."""
+        if not path.exists():
+            return default
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            raise ConfigImportError(f"{path} illisible: {e}") from e
+        if type(data) is not type(default):
+            raise ConfigImportError(f"{path} n'a pas le format attendu")
+        return data
+
+
+class SQLiteEnvironmentManager(EnvironmentManager):
+    """EnvironmentManager adossé à ConfigStore (même interface)."""
+
+    def __init__(self, store: ConfigStore, owner: str):
+        self.store = store
+        self.owner = owner
+        self.environments_dir = None
+        self.current_env = None
+        self.current_env_data = {}
+
+    def list_environments(self) -> List[Dict[str, str]]:
+        environments = []
+        for name, env_data in self._all():
+            environments.append({
+                "filename": name,
+                "display_name": env_data.get("ENV_NAME", name),
+                "description": env_data.get("ENV_DESCRIPTION", ""),
+                "execution_mode": env_data.get("EXECUTION_MODE", "local"),
+                "ai_provider": env_data.get("AI_PROVIDER", "claude"),
+                "is_active": name == self.current_env
+            })
+        return environments
+
+    def _all(self) -> List[Tuple[str, Dict[str, str]]]:
+        rows = self.store.db.fetchall("SELECT name, data FROM environments WHERE owner = ? ORDER BY name",
+                                      (self.owner,))
+        return [(row["name"], json.loads(row["data"])) for row in rows]
+
+    def get_environment(self, env_name: str) -> Optional[Dict[str, str]]:
+        return self.store.get("environments", self.owner, env_name)
+
+    def create_environment(self, env_name: str, env_data: Dict[str, str]) -> bool:
+        if not self.store.insert("environments", self.owner, env_name, dict(env_data)):
+            logger.warning(f"L'environnement {env_name} existe déjà")
+            return False
+        return True
+
+    def update_environment(self, env_name: str, env_data: Dict[str, str]) -> bool:
+        # Comme la réécriture du fichier .env : le contenu est remplacé
+        if not self.store.update("environments", self.owner, env_name, lambda _: dict(env_data)):
+            logger.warning(f"L'environnement {env_name} n'existe pas")
+            return False
+        return True
+
+    def delete_environment(self, env_name: str) -> bool:
+        # Ne pas supprimer l'environnement actif
+        if env_name == self.current_env:
+            logger.warning(f"Impossible de supprimer l'environnement actif")
+            return False
+        if not self.store.delete("environments", self.owner, env_name):
+            logger.warning(f"L'environnement {env_name} n'existe pas")
+            return False
+        logger.info(f"Environnement {env_name} supprimé")
+        return True
+
+
+class SQLiteAPIManager(APIManager):
+    """APIManager adossé à ConfigStore (clés chiffrées comme dans apis.json)."""
+
+    def __init__(self, store: ConfigStore, owner: str):
+        self.store = store
+        self.owner = owner
+        self.config_file = None
+
+    @property
+    def apis(self) -> List[Dict]:
+        return self.store.list_rows("apis", self.owner)
+
+    def _save_config(self):
+        return True
+
+    def get_api(self, api_id: str) -> Optional[Dict]:
+        result = self.store.get("apis", self.owner, api_id)
+        if result and "api_key" in result:
+            result["api_key"] = self._decrypt_key(result["api_key"])
+        return result
+
+    def create_api(self, api_data: Dict) -> bool:
+        api_data = api_data.copy()
+        if api_data.get("api_key"):
+            api_data["api_key"] = self._encrypt_key(api_data["api_key"])
+        if not self.store.insert("apis", self.owner, api_data.get("id"), api_data):
+            logger.warning(f"API {api_data.get('id')} already exists")
+            return False
+        return True
+
+    def update_api(self, api_id: str, api_data: Dict) -> bool:
+        changes = {**api_data, "id": api_id}
+        if api_data.get("api_key"):
+            changes["api_key"] = self._encrypt_key(api_data["api_key"])
+        return self.store.update("apis", self.owner, api_id, lambda api: {**api, **changes})
+
+    def delete_api(self, api_id: str) -> bool:
+        return self.store.delete("apis", self.owner, api_id)
+
+
+class SQLiteProfileManager(ProfileManager):
+    """ProfileManager adossé à ConfigStore (même interface)."""
+
+    def __init__(self, store: ConfigStore, owner: str):
+        self.store = store
+        self.owner = owner
+        self.profiles_file = None
+
+    def list_profiles(self) -> List[Dict]:
+        return self.store.list_rows("profiles", self.owner)
+
+    def get_profile(self, profile_id: str) -> Optional[Dict]:
+        return self.store.get("profiles", self.owner, profile_id)
+
+    def create_profile(self, data: Dict) -> bool:
+        return self.store.insert("profiles", self.owner, data.get('id'), dict(data))
+
+    def update_profile(self, profile_id: str, data: Dict) -> bool:
+        return self.store.update("profiles", self.owner, profile_id,
+                                 lambda p: {**p, **data, 'id': profile_id})
+
+    def delete_profile(self, profile_id: str) -> bool:
+        return self.store.delete("profiles", self.owner, profile_id)
+
+
+_store: Optional[ConfigStore] = None
+_store_lock = threading.Lock()
+
+
+def get_config_store() -> ConfigStore:
+    """Base de configuration partagée (ouverte au premier usage)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ConfigStore()
+        return _store
+
+
+def create_config_managers(email: str, user_dir: Path) -> Tuple[EnvironmentManager, APIManager, ProfileManager]:
+    """Gestionnaires d'environnements, d'APIs et de profils d'un utilisateur selon SHELLIA_CONFIG_BACKEND."""
+    user_dir = Path(user_dir)
+    if SHELLIA_CONFIG_BACKEND == "sqlite":
+        store = get_config_store()
+        try:
+            store.import_owner(email, user_dir)
+            return (SQLiteEnvironmentManager(store, email), SQLiteAPIManager(store, email),
+                    SQLiteProfileManager(store, email))
+        except ConfigImportError as e:
+            # Rester sur les fichiers plutôt que de servir une configuration vide
+            logger.error(f"Import de la configuration de {email} abandonné, fichiers utilisés: {e}")
+    return (EnvironmentManager(environments_dir=user_dir / "environments"),
+            APIManager(config_file=user_dir / "apis.json"),
+            ProfileManager(profiles_file=user_dir / "profiles.json"))
+
+
+if __name__ == "__main__":
+    # python -m core.config_store migrate : importe tous les utilisateurs existants
+    if len(sys.argv) == 2 and sys.argv[1] == "migrate":
+        users_dir = Path(__file__).parent.parent.parent / "users"
+        user_dirs = sorted(d for d in users_dir.iterdir() if d.is_dir()) if users_dir.exists() else []
+        store = get_config_store()
+        failed = 0
+        for i, user_dir in enumerate(user_dirs, 1):
+            try:
+                counts = store.import_owner(user_dir.name, user_dir)
+            except ConfigImportError as e:
+                failed += 1
+                print(f"[{i}/{len(user_dirs)}] {user_dir.name}: ÉCHEC, non importé ({e})", flush=True)
+                continue
+            status = "déjà importé" if counts is None else ", ".join(f"{n} {k}" for k, n in counts.items())
+            print(f"[{i}/{len(user_dirs)}] {user_dir.name}: {status}", flush=True)
+        print(f"Base: {store.db.db_path} (activez-la avec SHELLIA_CONFIG_BACKEND=sqlite)")
+        if failed:
+            sys.exit(1)
+    else:
+        print("Usage: python -m core.config_store migrate")
+        sys.exit(1)
@@ -0,0 +1,225 @@
+# core/conversation_store.py
+
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Conversations gardées en mémoire (les moins récemment utilisées sont relues du disque)
+CONVERSATION_CACHE_SIZE = int(os.getenv("CONVERSATION_CACHE_SIZE", "32"))
+# Historique envoyé à l'IA : derniers messages, dans une limite de caractères ;
+# les questions plus anciennes sont résumées en tête de l'historique
+CONVERSATION_HISTORY_MESSAGES = int(os.getenv("CONVERSATION_HISTORY_MESSAGES", "20"))
+CONVERSATION_HISTORY_CHARS = int(os.getenv("CONVERSATION_HISTORY_CHARS", "24000"))
+SUMMARY_QUESTION_CHARS = 160
+SUMMARY_MAX_CHARS = 1500
+
+
+class ConversationStore:
+    """
+    Stocke les conversations IA côté serveur, une par fichier JSONL.
+
+    Chaque message est ajouté en fin de fichier (append-only), ce qui permet
+    au client de n'envoyer que le nouveau message et de recharger l'historique
+    page par page. Les conversations survivent aux redémarrages.
+
+    Seules les CONVERSATION_CACHE_SIZE conversations les plus récemment
+    utilisées restent en mémoire, et l'historique envoyé à l'IA est borné
+    (get_history) : la taille du prompt ne croît pas avec la conversation.
+    """
+
+    def __init__(self, conversations_dir: Path, cache_size: int = CONVERSATION_CACHE_SIZE,
+                 history_messages: int = CONVERSATION_HISTORY_MESSAGES,
+                 history_chars: int = CONVERSATION_HISTORY_CHARS):
+        self.conversations_dir = Path(conversations_dir)
+        self.conversations_dir.mkdir(parents=True, exist_ok=True)
+        self.cache_size = max(1, cache_size)
+        self.history_messages = max(2, history_messages)
+        self.history_chars = history_chars
+        self._lock = threading.Lock()
+        # Cache LRU des conversations déjà lues : {conversation_id: [messages]}
+        self._cache: "OrderedDict[str, List[Dict]]" = OrderedDict()
+
+    def _remember(self, conversation_id: str, messages: List[Dict]):
+        """Ajoute au cache LRU (sous verrou) en évinçant la conversation la plus ancienne."""
+        self._cache[conversation_id] = messages
+        self._cache.move_to_end(conversation_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _path(self, conversation_id: str) -> Path:
+        return self.conversations_dir / f"{conversation_id}.jsonl"
+
+    @staticmethod
+    def _is_valid_id(conversation_id: str) -> bool:
+        return bool(conversation_id) and all(c.isalnum() or c in "-_" for c in conversation_id)
+
+    def _load(self, conversation_id: str) -> Optional[List[Dict]]:
+        """Charge une conversation (cache mémoire, sinon disque)."""
+        if conversation_id in self._cache:
+            self._cache.move_to_end(conversation_id)
+            return self._cache[conversation_id]
+
+        path = self._path(conversation_id)
+        if not path.exists():
+            return None
+
+        messages = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    messages.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Ligne tronquée (crash pendant l'écriture) : on l'ignore
+                    logger.warning(f"Ligne invalide ignorée dans {path.name}")
+        self._remember(conversation_id, messages)
+        return messages
+
+    def create_conversation(self) -> str:
+        """Crée une conversation vide et retourne son identifiant."""
+        conversation_id = uuid.uuid4().hex
+        with self._lock:
+            self._path(conversation_id).touch()
+            self._remember(conversation_id, [])
+        return conversation_id
+
+    def exists(self, conversation_id: str) -> bool:
+        if not self._is_valid_id(conversation_id):
+            return False
+        with self._lock:
+            return self._load(conversation_id) is not None
+
+    def append(self, conversation_id: str, role: str, content: str) -> Dict:
+        """Ajoute un message en fin de conversation."""
+        if not self._is_valid_id(conversation_id):
+            raise ValueError(f"Identifiant de conversation invalide: {conversation_id}")
+
+        with self._lock:
+            messages = self._load(conversation_id)
+            if messages is None:
+                messages = []
+                self._remember(conversation_id, messages)
+
+            message = {
+                "seq": len(messages),
+                "role": role,
+                "content": content,
+                "created_at": datetime.utcnow().isoformat(),
+            }
+            with open(self._path(conversation_id), "a", encoding="utf-8") as f:
+                f.write(json.dumps(message, ensure_ascii=False) + "\n")
+            messages.append(message)
+            return message
+
+    def get_history(self, conversation_id: str) -> List[Dict]:
+        """
+        Retourne l'historique au format attendu par AIProvider.ask : les
+        derniers messages seulement, précédés d'un résumé des questions
+        plus anciennes. La fenêtre avance par demi-fenêtre, de sorte que le
+        début de l'historique (préfixe mis en cache) reste stable d'un tour à l'autre.
+        """
+        if not self._is_valid_id(conversation_id):
+            return []
+        with self._lock:
+            messages = list(self._load(conversation_id) or [])
+
+        start = 0
+        if len(messages) > self.history_messages:
+            step = self.history_messages // 2
+            start = ((len(messages) - self.history_messages) // step + 1) * step
+        # Limite en caractères (messages très longs) : on retire les plus anciens
+        total = sum(len(m["content"]) for m in messages[start:])
+        while start < len(messages) - 1 and total > self.history_chars:
+            total -= len(messages[start]["content"])
+            start += 1
+        # L'historique commence par une question de l'utilisateur
+        while start < len(messages) and start > 0 and messages[start]["role"] != "user":
+            start += 1
+
+        history = [{"role": m["role"], "content": m["content"]} for m in messages[start:]]
+        summary = self._summarize(messages[:start])
+        if summary and history:
+            history[0] = {"role": "user", "content": f"{summary}\n\n{history[0]['content']}"}
+        return history
+
+    @staticmethod
+    def _summarize(older: List[Dict]) -> Optional[str]:
+        """Résumé extractif (sans appel IA) des messages sortis de la fenêtre."""
+        questions = [" ".join(m["content"].split())[:SUMMARY_QUESTION_CHARS]
+                     for m in older if m["role"] == "user" and m["content"].strip()]
+        if not questions:
+            return None
+        lines, size = [], 0
+        # Les questions les plus récentes d'abord, dans la limite de SUMMARY_MAX_CHARS
+        for question in reversed(questions):
+            size += len(question) + 3
+            if size > SUMMARY_MAX_CHARS:
+                break
+            lines.append(f"- {question}")
+        lines.reverse()
+        return (f"[Earlier in this conversation ({len(older)} older messages not shown), "
+                f"the user asked:\n" + "\n".join(lines) + "]")
+
+    def get_page(self, conversation_id: str, before: Optional[int] = None,
+                 limit: int = 50) -> Optional[Dict]:
+        """
+        Retourne une page de messages, du plus ancien au plus récent.
+
+        Args:
+            conversation_id: Identifiant de la conversation
+            before: Ne retourner que les messages de seq < before (None = fin)
+            limit: Nombre maximum de messages
+
+        Returns:
+            {"messages": [...], "total": int, "next_before": int|None}
+            ou None si la conversation n'existe pas
+        """
+        if not self._is_valid_id(conversation_id):
+            return None
+        with self._lock:
+            messages = self._load(conversation_id)
+            if messages is None:
+                return None
+
+            total = len(messages)
+            end = total if before is None else max(0, min(before, total))
+            start = max(0, end - max(1, limit))
+            page = messages[start:end]
+
+        return {
+            "messages": page,
+            "total": total,
+            "next_before": start if start > 0 else None,
+        }
+
+    def list_conversations(self) -> List[Dict]:
+        """Liste les conversations (les plus récentes en premier)."""
+        conversations = []
+        for path in self.conversations_dir.glob("*.jsonl"):
+            stat = path.stat()
+            conversations.append({
+                "id": path.stem,
+                "updated_at": datetime.utcfromtimestamp(stat.st_mtime).isoformat(),
+            })
+        return sorted(conversations, key=lambda c: c["updated_at"], reverse=True)
+
+    def delete_conversation(self, conversation_id: str) -> bool:
+        if not self._is_valid_id(conversation_id):
+            return False
+        with self._lock:
+            self._cache.pop(conversation_id, None)
+            path = self._path(conversation_id)
+            if not path.exists():
+                return False
+            path.unlink()
+            return True
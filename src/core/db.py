@@ -0,0 +1,218 @@
+# core/db.py
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+import logging
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+# Attente maximale d'une connexion libre, puis d'un verrou d'écriture (secondes)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+# Requêtes préparées conservées par connexion (cache du module sqlite3)
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "128"))
+
+# Appliquées à chaque nouvelle connexion
+DEFAULT_PRAGMAS = (
+    ("journal_mode", "WAL"),          # lecteurs et écrivain ne se bloquent plus
+    ("synchronous", "NORMAL"),        # sûr en WAL, sans fsync à chaque commit
+    ("busy_timeout", str(DB_BUSY_TIMEOUT_MS)),
+    ("foreign_keys", "ON"),
+    ("temp_store", "MEMORY"),
+    ("cache_size", "-8000"),          # 8 Mo de cache de pages par connexion
+    ("mmap_size", str(64 * 1024 * 1024)),
+)
+
+# (version, description, script SQL ou liste d'instructions)
+Migration = Tuple[int, str, Union[str, Sequence[str]]]
+
+
+def split_statements(script: Union[str, Sequence[str]]) -> List[str]:
+    """
+    Instructions d'un script SQL. Le découpage suit sqlite3.complete_statement :
+    un point-virgule dans une chaîne, un commentaire ou le corps d'un trigger
+    ne coupe pas l'instruction. Une liste d'instructions est prise telle quelle.
+    """
+    if not isinstance(script, str):
+        return [statement for statement in script if statement.strip()]
+    statements, buffer = [], ""
+    pieces = script.split(";")
+    for index, piece in enumerate(pieces):
+        buffer += piece if index == len(pieces) - 1 else piece + ";"
+        if sqlite3.complete_statement(buffer):
+            statements.append(buffer.strip())
+            buffer = ""
+    if buffer.strip():
+        statements.append(buffer.strip())
+    return statements
+
+
+class PoolTimeoutError(Exception):
+    """Levée quand aucune connexion ne se libère dans le délai imparti."""
+
+
+class SQLitePool:
+    """
+    Pool de connexions SQLite thread-safe.
+
+    Les connexions sont ouvertes à la demande (au plus `size`), en mode WAL,
+    et réutilisées : les requêtes préparées restent en cache d'un appel à
+    l'autre tant que le texte SQL est identique. Une connexion n'est utilisée
+    que par un thread à la fois. Les migrations de schéma sont appliquées une
+    seule fois et tracées dans la table schema_migrations.
+    """
+
+    def __init__(self, db_path: Path, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT,
+                 pragmas: Sequence[Tuple[str, str]] = DEFAULT_PRAGMAS,
+                 migrations: Optional[List[Migration]] = None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.pragmas = pragmas
+        # Pile : la connexion la plus récemment rendue (caches chauds) est réutilisée en premier
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+        self._closed = False
+        if migrations:
+            self.migrate(migrations)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.timeout,
+            check_same_thread=False,   # le pool garantit un seul thread à la fois
+            isolation_level=None,      # autocommit ; transactions explicites via transaction()
+            cached_statements=DB_STATEMENT_CACHE,
+        )
+        conn.row_factory = sqlite3.Row
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    def _acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._closed:
+                raise PoolTimeoutError("Pool SQLite fermé")
+            if self._opened < self.size:
+                self._opened += 1
+                metrics.set_gauge("db_pool_connections", self._opened, db=self.db_path.name)
+                try:
+                    return self._connect()
+                except Exception:
+                    self._opened -= 1
+                    raise
+        start = time.monotonic()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            metrics.inc("db_pool_timeouts", 1, db=self.db_path.name)
+            raise PoolTimeoutError(f"Aucune connexion libre après {self.timeout}s ({self.db_path.name})")
+        metrics.observe("db_pool_wait_seconds", time.monotonic() - start, db=self.db_path.name)
+        return conn
+
+    def _release(self, conn: sqlite3.Connection, broken: bool = False):
+        if broken or self._closed:
+            conn.close()
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Emprunte une connexion au pool (rendue à la sortie du bloc)."""
+        conn = self._acquire()
+        broken = False
+        try:
+            yield conn
+        except sqlite3.DatabaseError as e:
+            # Connexion potentiellement inutilisable (fichier corrompu, disque plein...) ;
+            # contraintes, verrous et erreurs SQL ne concernent que la requête
+            broken = not isinstance(e, (sqlite3.IntegrityError, sqlite3.OperationalError,
+                                        sqlite3.ProgrammingError))
+            raise
+        finally:
+            if not broken and conn.in_transaction:
+                conn.rollback()
+            self._release(conn, broken)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Transaction d'écriture : BEGIN IMMEDIATE prend le verrou d'écriture dès le
+        début (pas d'échec « database is locked » au milieu de la transaction).
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def fetchone(self, sql: str, params: Sequence = ()) -> Optional[sqlite3.Row]:
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    def fetchall(self, sql: str, params: Sequence = ()) -> List[sqlite3.Row]:
+        with self.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def execute(self, sql: str, params: Sequence = ()) -> int:
+        """Exécute une écriture isolée ; retourne le nombre de lignes modifiées."""
+        with self.connection() as conn:
+            return conn.execute(sql, params).rowcount
+
+    def migrate(self, migrations: List[Migration]):
+        """Applique, dans l'ordre, les migrations pas encore enregistrées."""
+        with self.transaction() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            applied = {row["version"] for row in conn.execute("SELECT version FROM schema_migrations")}
+            for version, description, script in sorted(migrations):
+                if version in applied:
+                    continue
+                # Instruction par instruction : executescript() validerait la transaction
+                for statement in split_statements(script):
+                    conn.execute(statement)
+                conn.execute("INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                             (version, description))
+                logger.info(f"Migration {self.db_path.name} v{version} appliquée: {description}")
+
+    def schema_version(self) -> int:
+        row = self.fetchone("SELECT MAX(version) AS version FROM schema_migrations")
+        return (row["version"] or 0) if row else 0
+
+    def close(self):
+        """Ferme les connexions inactives ; celles en cours d'usage le seront à leur retour."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._opened -= 1
@@ -1,12 +1,105 @@
 # core/environment_manager.py
 
 import os
+import threading
+import time
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 import logging
 
+from .fileutil import file_signature
+
 logger = logging.getLogger(__name__)
 
+# Intervalle minimal entre deux vérifications (stat) d'un dossier d'environnements :
+# les fichiers modifiés hors de l'application sont vus au plus tard après ce délai
+ENV_INDEX_STAT_INTERVAL = float(os.getenv("ENV_INDEX_STAT_INTERVAL", "2"))
+
+# Fichiers du dossier qui ne sont pas des environnements
+IGNORED_ENV_FILES = ("template.env", ".env.example")
+
+
+class _EnvironmentIndex:
+    """
+    Environnements d'un dossier, parsés et gardés en mémoire.
+
+    La liste des fichiers est relue quand le mtime du dossier change (ajout,
+    suppression, renommage) et un fichier est reparsé quand sa signature
+    (mtime, taille, inode) change. Partagé par tous les gestionnaires du
+    même dossier.
+    """
+
+    def __init__(self, directory: Path, parse: Callable[[Path], Dict[str, str]]):
+        self.directory = directory
+        self._parse = parse
+        self._lock = threading.Lock()
+        # {nom: (signature du fichier, variables)}
+        self._entries: Dict[str, Tuple[tuple, Dict[str, str]]] = {}
+        self._dir_signature = None
+        self._names: List[str] = []
+        self._checked_at: Optional[float] = None
+
+    def _refresh(self):
+        """Met l'index à jour depuis le disque si nécessaire (sous verrou)."""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < ENV_INDEX_STAT_INTERVAL:
+            return
+        self._checked_at = now
+        dir_signature = file_signature(self.directory)
+        if dir_signature != self._dir_signature:
+            self._names = sorted(
+                f.stem for f in self.directory.glob("*.env") if f.name not in IGNORED_ENV_FILES
+            )
+            self._dir_signature = dir_signature
+        entries = {}
+        for name in self._names:
+            path = self.directory / f"{name}.env"
+            signature = file_signature(path)
+            if signature is None:
+                continue
+            cached = self._entries.get(name)
+            entries[name] = cached if cached and cached[0] == signature else (signature, self._parse(path))
+        self._entries = entries
+
+    def all(self) -> Dict[str, Dict[str, str]]:
+        with self._lock:
+            self._refresh()
+            return {name: dict(data) for name, (_, data) in self._entries.items()}
+
+    def get(self, name: str) -> Optional[Dict[str, str]]:
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(name)
+            return dict(entry[1]) if entry else None
+
+    def reload(self, name: str):
+        """Écriture traversante : reparse un fichier que l'on vient d'écrire ou de supprimer."""
+        path = self.directory / f"{name}.env"
+        with self._lock:
+            signature = file_signature(path)
+            if signature is None:
+                self._entries.pop(name, None)
+                if name in self._names:
+                    self._names.remove(name)
+            else:
+                self._entries[name] = (signature, self._parse(path))
+                if name not in self._names:
+                    self._names = sorted(self._names + [name])
+            self._dir_signature = file_signature(self.directory)
+
+
+_indexes: Dict[Path, _EnvironmentIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _get_index(directory: Path, parse: Callable[[Path], Dict[str, str]]) -> _EnvironmentIndex:
+    key = directory.resolve()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = _EnvironmentIndex(key, parse)
+        return index
+
 
 class EnvironmentManager:
     """
@@ -31,6 +124,7 @@ class EnvironmentManager:
 
         self.current_env = None
         self.current_env_data = {}
+        self._index = _get_index(self.environments_dir, self._parse_env_file)
 
     def list_environments(self) -> List[Dict[str, str]]:
         """
@@ -41,14 +135,7 @@ class EnvironmentManager:
         """
         environments = []
 
-        for env_file in self.environments_dir.glob("*.env"):
-            # Ignorer template.env et .env.example
-            if env_file.name in ["template.env", ".env.example"]:
-                continue
-
-            env_name = env_file.stem
-            env_data = self._parse_env_file(env_file)
-
+        for env_name, env_data in self._index.all().items():
             environments.append({
                 "filename": env_name,
                 "display_name": env_data.get("ENV_NAME", env_name),
@@ -70,12 +157,7 @@ class EnvironmentManager:
         Returns:
             Dictionnaire avec toutes les variables d'environnement
         """
-        env_file = self.environments_dir / f"{env_name}.env"
-
-        if not env_file.exists():
-            return None
-
-        return self._parse_env_file(env_file)
+        return self._index.get(env_name)
 
     def create_environment(self, env_name: str, env_data: Dict[str, str]) -> bool:
         """
@@ -95,7 +177,9 @@ class EnvironmentManager:
             logger.warning(f"L'environnement {env_name} existe déjà")
             return False
 
-        return self._write_env_file(env_file, env_data)
+        success = self._write_env_file(env_file, env_data)
+        self._index.reload(env_name)
+        return success
 
     def update_environment(self, env_name: str, env_data: Dict[str, str]) -> bool:
         """
@@ -114,7 +198,9 @@ class EnvironmentManager:
             logger.warning(f"L'environnement {env_name} n'existe pas")
             return False
 
-        return self._write_env_file(env_file, env_data)
+        success = self._write_env_file(env_file, env_data)
+        self._index.reload(env_name)
+        return success
 
     def delete_environment(self, env_name: str) -> bool:
         """
@@ -139,6 +225,7 @@ class EnvironmentManager:
 
         try:
             env_file.unlink()
+            self._index.reload(env_name)
             logger.info(f"Environnement {env_name} supprimé")
             return True
         except Exception as e:
@@ -230,7 +317,7 @@ class EnvironmentManager:
                 # Sections définies
                 sections = {
                     "ENVIRONMENT IDENTIFICATION": ["ENV_NAME", "ENV_DESCRIPTION"],
-                    "API CONFIGURATION": ["AI_API_ID"],
+                    "API CONFIGURATION": ["AI_API_ID", "AI_API_IDS", "AI_ROUTING_POLICY", "AI_HEDGE_MS", "AI_TIMEOUT"],
                     "AI PROVIDER SELECTION": ["AI_PROVIDER"],
                     "CLAUDE (ANTHROPIC) CONFIGURATION": ["ANTHROPIC_API_KEY", "CLAUDE_MODEL"],
                     "CHATGPT (OPENAI) CONFIGURATION": ["OPENAI_API_KEY"],
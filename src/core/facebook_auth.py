@@ -4,13 +4,7 @@ import os
 import urllib.parse
 from typing import Optional
 
-try:
-    import httpx
-    _HAS_HTTPX = True
-except ImportError:
-    import urllib.request
-    import json as _json
-    _HAS_HTTPX = False
+from .http_client import get_json
 
 # Configuration Facebook OAuth
 FACEBOOK_APP_ID = os.getenv("FACEBOOK_APP_ID", "")
@@ -40,10 +34,13 @@ class FacebookAuthProvider:
         }
         return f"{FACEBOOK_AUTH_URL}?{urllib.parse.urlencode(params)}"
 
-    def verify_facebook_callback(self, code: str, redirect_uri: str) -> Optional[dict]:
+    async def verify_facebook_callback(self, code: str, redirect_uri: str) -> Optional[dict]:
         """
         Échange le code d'autorisation contre un token et retourne les infos utilisateur.
 
+        Les deux appels (le second dépend du token du premier) passent par le client
+        HTTP partagé : l'appel à /me réutilise la connexion ouverte vers graph.facebook.com.
+
         Args:
             code: Code d'autorisation reçu du callback
             redirect_uri: URL de callback (doit correspondre)
@@ -63,7 +60,7 @@ class FacebookAuthProvider:
                 "code": code,
             }
 
-            token_data = self._http_get(FACEBOOK_TOKEN_URL, token_params)
+            token_data = await get_json(FACEBOOK_TOKEN_URL, token_params)
 
             if not token_data or "access_token" not in token_data:
                 print(f"❌ Erreur Facebook token: {token_data}")
@@ -77,7 +74,7 @@ class FacebookAuthProvider:
                 "access_token": access_token,
             }
 
-            user_data = self._http_get(FACEBOOK_USER_URL, user_params)
+            user_data = await get_json(FACEBOOK_USER_URL, user_params)
 
             if not user_data or "id" not in user_data:
                 print(f"❌ Erreur Facebook user info: {user_data}")
@@ -98,19 +95,6 @@ class FacebookAuthProvider:
             print(f"❌ Erreur lors de la vérification Facebook: {e}")
             return None
 
-    def _http_get(self, url: str, params: dict) -> Optional[dict]:
-        """Effectue une requête GET et retourne le JSON."""
-        full_url = f"{url}?{urllib.parse.urlencode(params)}"
-
-        if _HAS_HTTPX:
-            with httpx.Client() as client:
-                resp = client.get(full_url)
-                return resp.json()
-        else:
-            req = urllib.request.Request(full_url)
-            with urllib.request.urlopen(req) as resp:
-                return _json.loads(resp.read().decode("utf-8"))
-
     def is_enabled(self) -> bool:
         """Retourne True si l'authentification Facebook est configurée."""
         return bool(self.app_id and self.app_secret)
@@ -0,0 +1,68 @@
+# core/fileutil.py
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+
+class UnreadableFileError(Exception):
+    """Fichier de données existant mais illisible : toute écriture l'écraserait."""
+
+
+def file_signature(path: Path) -> Optional[Tuple[int, int, int]]:
+    """
+    (mtime en ns, taille, inode) d'un fichier, ou None s'il n'existe pas.
+    Change à chaque réécriture, y compris par remplacement atomique.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+def atomic_write_bytes(path: Path, data: bytes, mode: Optional[int] = None):
+    """
+    Écriture atomique et durable : fichier temporaire dans le même répertoire,
+    fsync, os.replace puis fsync du répertoire. Un crash laisse l'ancienne
+    version ou la nouvelle, jamais un fichier vide ou tronqué.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None:
+            os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_dir(path.parent)
+
+
+def atomic_write_json(path: Path, data: Any, mode: Optional[int] = None):
+    """Sérialise `data` (indenté, UTF-8) et l'écrit avec atomic_write_bytes."""
+    atomic_write_bytes(path, json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8"), mode)
+
+
+def _fsync_dir(directory: Path):
+    # Rend le renommage durable ; non supporté sous Windows
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
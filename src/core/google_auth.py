@@ -1,28 +1,192 @@
 # core/google_auth.py
 
+import json
 import os
-from google.oauth2 import id_token
-from google.auth.transport import requests
+import re
+import threading
+import time
 from typing import Optional
 
+from .metrics import metrics
+
+# google-auth et requests sont importés au premier usage (verify_google_token) pour accélérer le démarrage
+
 # Configuration Google OAuth
 GOOGLE_CLIENT_ID     = os.getenv("GOOGLE_CLIENT_ID", "")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET", "")
+# Signing certificates (x509 map or JWKS); overridable to point at a local stand-in
+GOOGLE_CERTS_URL     = os.getenv("GOOGLE_CERTS_URL", "https://www.googleapis.com/oauth2/v1/certs")
+# Refresh this many seconds before the Cache-Control max-age runs out
+GOOGLE_CERTS_REFRESH_MARGIN = int(os.getenv("GOOGLE_CERTS_REFRESH_MARGIN", "300"))
+# Serve the previous certs this long past expiry when Google cannot be reached
+GOOGLE_CERTS_MAX_STALE      = int(os.getenv("GOOGLE_CERTS_MAX_STALE", "3600"))
+GOOGLE_HTTP_TIMEOUT         = float(os.getenv("GOOGLE_HTTP_TIMEOUT", "10"))
+# Upper bound of the backoff between background refreshes after failures
+GOOGLE_CERTS_RETRY_MAX      = int(os.getenv("GOOGLE_CERTS_RETRY_MAX", "300"))
+
+GOOGLE_ISSUERS = ("accounts.google.com", "https://accounts.google.com")
+
+_MAX_AGE = re.compile(r"max-age=(\d+)", re.IGNORECASE)
+
+
+class _CachedResponse:
+    """Minimal google.auth.transport.Response returned for cached certificates."""
+
+    def __init__(self, data: bytes):
+        self.status = 200
+        self.headers = {"content-type": "application/json"}
+        self.data = data
+
+
+class GoogleCertsCache:
+    """
+    Google signing certificates, cached for the Cache-Control max-age of the
+    response and refreshed in the background shortly before they expire.
+
+    All HTTP calls go through one shared requests.Session (kept-alive TLS
+    connection). Once expired, the previous certificates keep being served
+    without waiting, for up to GOOGLE_CERTS_MAX_STALE seconds, while refreshes
+    run in the background with an exponential backoff (retry_base seconds,
+    doubling up to GOOGLE_CERTS_RETRY_MAX). Only a login with no usable
+    certificates waits for a download.
+    """
+
+    def __init__(self, url: str = GOOGLE_CERTS_URL, refresh_margin: int = GOOGLE_CERTS_REFRESH_MARGIN,
+                 max_stale: int = GOOGLE_CERTS_MAX_STALE, default_ttl: int = 3600, min_ttl: int = 60,
+                 retry_base: float = 5, retry_max: float = GOOGLE_CERTS_RETRY_MAX):
+        self.url = url
+        self.refresh_margin = refresh_margin
+        self.max_stale = max_stale
+        self.default_ttl = default_ttl
+        self.min_ttl = min_ttl
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._session = None
+        self._transport = None
+        self._data: Optional[bytes] = None
+        self._expires_at = 0.0
+        self._refreshing = False
+        # Consecutive failed fetches, and no background refresh before _retry_at
+        self._failures = 0
+        self._retry_at = 0.0
+
+    def _get_session(self):
+        if self._session is None:
+            import requests
+            with self._lock:
+                if self._session is None:
+                    self._session = requests.Session()
+        return self._session
+
+    def _ttl(self, headers) -> int:
+        match = _MAX_AGE.search(headers.get("Cache-Control", ""))
+        ttl = int(match.group(1)) if match else self.default_ttl
+        try:
+            # Age: time the response already spent in an intermediate cache
+            ttl -= int(headers.get("Age", "0"))
+        except ValueError:
+            pass
+        return max(self.min_ttl, ttl)
+
+    def _fetch(self) -> bytes:
+        """Download the certificates (one fetch at a time) and store them."""
+        with self._fetch_lock:
+            # Another thread may have refreshed while we were waiting
+            if self._data is not None and time.time() < self._expires_at - self.refresh_margin:
+                return self._data
+            start = time.monotonic()
+            try:
+                response = self._get_session().get(self.url, timeout=GOOGLE_HTTP_TIMEOUT)
+                response.raise_for_status()
+                json.loads(response.content)
+            except Exception:
+                metrics.inc("google_certs_fetch", 1, outcome="error")
+                with self._lock:
+                    self._failures += 1
+                    backoff = min(self.retry_max, self.retry_base * (2 ** (self._failures - 1)))
+                    self._retry_at = time.time() + backoff
+                raise
+            ttl = self._ttl(response.headers)
+            with self._lock:
+                self._data = response.content
+                self._expires_at = time.time() + ttl
+                self._failures = 0
+                self._retry_at = 0.0
+            metrics.inc("google_certs_fetch", 1, outcome="ok")
+            metrics.observe("google_certs_fetch_seconds", time.monotonic() - start)
+            return self._data
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing or time.time() < self._retry_at:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self._fetch()
+            except Exception as e:
+                print(f"⚠️  Google certs background refresh failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing = False
+
+        threading.Thread(target=run, name="google-certs-refresh", daemon=True).start()
+
+    def get(self) -> bytes:
+        """Return the certificates document (raw JSON), fetching it only when needed."""
+        now = time.time()
+        with self._lock:
+            data, expires_at = self._data, self._expires_at
+
+        if data is not None and now < expires_at:
+            metrics.inc("google_certs_cache", 1, outcome="hit")
+            if now >= expires_at - self.refresh_margin:
+                self._refresh_in_background()
+            return data
+
+        if data is not None and now < expires_at + self.max_stale:
+            # Expired: serve the previous certs at once, never block a login on Google
+            metrics.inc("google_certs_cache", 1, outcome="stale")
+            self._refresh_in_background()
+            return data
+
+        metrics.inc("google_certs_cache", 1, outcome="miss")
+        return self._fetch()
+
+    def transport(self):
+        """google.auth transport: certs from the cache, anything else via the shared session."""
+        if self._transport is None:
+            from google.auth.transport import requests as google_requests
+            shared = google_requests.Request(session=self._get_session())
+
+            def request(url, method="GET", body=None, headers=None, timeout=None, **kwargs):
+                if url == self.url and method == "GET" and not body:
+                    return _CachedResponse(self.get())
+                return shared(url, method=method, body=body, headers=headers, timeout=timeout, **kwargs)
+
+            self._transport = request
+        return self._transport
 
 
 class GoogleAuthProvider:
     """Manages Google OpenID Connect authentication."""
 
-    def __init__(self, client_id: Optional[str] = None, client_secret: Optional[str] = None):
+    def __init__(self, client_id: Optional[str] = None, client_secret: Optional[str] = None,
+                 certs: Optional[GoogleCertsCache] = None):
         """
         Initialise the Google Auth provider.
 
         Args:
             client_id:     Google OAuth Client ID     (defaults to GOOGLE_CLIENT_ID env var)
             client_secret: Google OAuth Client Secret (defaults to GOOGLE_CLIENT_SECRET env var)
+            certs:         Signing certificates cache (defaults to GOOGLE_CERTS_URL)
         """
         self.client_id     = client_id     or GOOGLE_CLIENT_ID
         self.client_secret = client_secret or GOOGLE_CLIENT_SECRET
+        self.certs = certs or GoogleCertsCache()
 
         if not self.client_id:
             print("⚠️  GOOGLE_CLIENT_ID not configured. Google authentication will be disabled.")
@@ -40,14 +204,20 @@ class GoogleAuthProvider:
         if not self.client_id:
             raise ValueError("Google Client ID is not configured")
 
+        from google.oauth2 import id_token
+
         try:
-            # Vérifier le token (tolérance de 10s pour les décalages d'horloge)
-            idinfo = id_token.verify_oauth2_token(
+            # Vérifier le token (tolérance de 10s pour les décalages d'horloge) avec les
+            # certificats en cache ; même contrôle d'émetteur que verify_oauth2_token
+            idinfo = id_token.verify_token(
                 token,
-                requests.Request(),
-                self.client_id,
+                self.certs.transport(),
+                audience=self.client_id,
+                certs_url=self.certs.url,
                 clock_skew_in_seconds=10
             )
+            if idinfo.get("iss") not in GOOGLE_ISSUERS:
+                raise ValueError(f"Token invalide: émetteur incorrect ({idinfo.get('iss')})")
 
             # Vérifier que le token est bien pour notre application
             if idinfo['aud'] != self.client_id:
@@ -0,0 +1,216 @@
+# core/host_facts.py
+
+import os
+import sys
+import threading
+import time
+from typing import Dict, Optional
+import logging
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Durée de validité d'un relevé (secondes)
+HOST_FACTS_TTL = int(os.getenv("HOST_FACTS_TTL", "3600"))
+HOST_FACTS_TIMEOUT = int(os.getenv("HOST_FACTS_TIMEOUT", "15"))
+# Délai minimal entre deux relevés automatiques d'un même hôte (relevé en échec)
+HOST_FACTS_RETRY_INTERVAL = int(os.getenv("HOST_FACTS_RETRY_INTERVAL", "300"))
+
+# Un seul aller-retour : chaque section est précédée d'un marqueur "@@nom"
+FACTS_SCRIPT = r"""
+export LC_ALL=C
+echo @@os; (. /etc/os-release 2>/dev/null && echo "$PRETTY_NAME") || uname -s
+echo @@kernel; uname -srm
+echo @@hostname; hostname 2>/dev/null || uname -n
+echo @@pkg; for p in apt dnf yum zypper pacman apk brew; do command -v $p >/dev/null 2>&1 && { echo $p; break; }; done
+echo @@init; ps -p 1 -o comm= 2>/dev/null || cat /proc/1/comm 2>/dev/null
+echo @@cpus; nproc 2>/dev/null || getconf _NPROCESSORS_ONLN
+echo @@load; cat /proc/loadavg 2>/dev/null | cut -d' ' -f1-3
+echo @@mem; free -m 2>/dev/null | awk '/^Mem:/ {print $2" "$7}'
+echo @@disks; df -hP -x tmpfs -x devtmpfs -x squashfs -x overlay 2>/dev/null | awk 'NR>1 {print $5" "$6" "$4}' | sort -rn | head -5
+echo @@failed; systemctl --failed --no-legend --plain 2>/dev/null | awk '{print $1}' | head -10
+echo @@top; ps -eo comm,%mem,%cpu --sort=-%mem 2>/dev/null | awk 'NR>1 && NR<=6 {print $1" "$2" "$3}'
+"""
+
+
+def parse_facts(output: str) -> Dict:
+    """Convertit la sortie de FACTS_SCRIPT en dictionnaire."""
+    sections: Dict[str, list] = {}
+    current = None
+    for line in output.splitlines():
+        line = line.strip()
+        if line.startswith("@@"):
+            current = line[2:]
+            sections[current] = []
+        elif current and line:
+            sections[current].append(line)
+
+    def first(name: str) -> str:
+        return sections.get(name, [""])[0] if sections.get(name) else ""
+
+    facts = {
+        "os": first("os"),
+        "kernel": first("kernel"),
+        "hostname": first("hostname"),
+        "package_manager": first("pkg"),
+        "init_system": first("init"),
+        "cpus": first("cpus"),
+        "load": first("load"),
+        "disks": [],
+        "failed_units": sections.get("failed", []),
+        "top_processes": [],
+    }
+
+    mem = first("mem").split()
+    if len(mem) == 2:
+        facts["memory_mb"] = {"total": mem[0], "available": mem[1]}
+
+    for line in sections.get("disks", []):
+        parts = line.split()
+        if len(parts) == 3:
+            facts["disks"].append({"use": parts[0], "mount": parts[1], "free": parts[2]})
+
+    for line in sections.get("top", []):
+        parts = line.split()
+        if len(parts) == 3:
+            facts["top_processes"].append({"name": parts[0], "mem": parts[1], "cpu": parts[2]})
+
+    return facts
+
+
+def summarize_facts(facts: Dict) -> str:
+    """Résumé compact (quelques lignes) joint aux documents de référence de la question."""
+    lines = []
+    host = " / ".join(v for v in (facts.get("os"), facts.get("kernel")) if v)
+    if host:
+        lines.append(f"- OS: {host}")
+    tools = []
+    if facts.get("package_manager"):
+        tools.append(f"packages: {facts['package_manager']}")
+    if facts.get("init_system"):
+        tools.append(f"init: {facts['init_system']}")
+    if tools:
+        lines.append("- " + ", ".join(tools))
+    resources = []
+    if facts.get("cpus"):
+        resources.append(f"{facts['cpus']} CPU")
+    if facts.get("load"):
+        resources.append(f"load {facts['load']}")
+    if facts.get("memory_mb"):
+        resources.append(f"RAM {facts['memory_mb']['available']}/{facts['memory_mb']['total']} MB free")
+    if resources:
+        lines.append("- " + ", ".join(resources))
+    if facts.get("disks"):
+        lines.append("- Disks: " + ", ".join(f"{d['mount']} {d['use']} used ({d['free']} free)"
+                                            for d in facts["disks"][:3]))
+    if facts.get("failed_units"):
+        lines.append("- Failed units: " + ", ".join(facts["failed_units"][:5]))
+    if facts.get("top_processes"):
+        lines.append("- Top memory: " + ", ".join(f"{p['name']} {p['mem']}%"
+                                                  for p in facts["top_processes"][:3]))
+    if not lines:
+        return ""
+    return "**Host facts (gathered in the background, may be slightly stale):**\n" + "\n".join(lines)
+
+
+class HostFactsCache:
+    """
+    Relevé des caractéristiques d'un hôte (OS, noyau, gestionnaire de paquets,
+    init, ressources principales), collecté en arrière-plan après la connexion
+    et conservé HOST_FACTS_TTL secondes. Un relevé expiré reste servi au
+    prompt pendant son renouvellement, lancé par summary().
+    """
+
+    def __init__(self, ttl: int = HOST_FACTS_TTL, retry_interval: int = HOST_FACTS_RETRY_INTERVAL):
+        self.ttl = ttl
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        # {clé: (facts, timestamp)}
+        self._facts: Dict[str, tuple] = {}
+        self._pending: Dict[str, threading.Thread] = {}
+        # {clé: time.monotonic() du dernier relevé lancé par summary()}
+        self._refreshed_at: Dict[str, float] = {}
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Retourne le relevé s'il est encore valide."""
+        with self._lock:
+            entry = self._facts.get(key)
+        if entry and time.time() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def summary(self, key: str, executor=None) -> str:
+        """
+        Résumé du relevé pour le prompt. Avec l'executor de la session, un relevé
+        expiré (ou absent) est renouvelé en arrière-plan et l'ancien est servi en
+        attendant ; sans executor, seul un relevé valide est résumé.
+        """
+        with self._lock:
+            entry = self._facts.get(key)
+        fresh = entry is not None and time.time() - entry[1] < self.ttl
+        if not fresh and executor is not None:
+            now = time.monotonic()
+            with self._lock:
+                # Relevé en échec : pas une nouvelle tentative à chaque question
+                due = now - self._refreshed_at.get(key, float("-inf")) >= self.retry_interval
+                if due:
+                    self._refreshed_at[key] = now
+            if due:
+                metrics.inc("host_facts_refresh", 1, state="stale" if entry else "missing")
+                self.gather_async(key, executor, force=True)
+        if entry is None or (not fresh and executor is None):
+            return ""
+        return summarize_facts(entry[0])
+
+    def gather(self, key: str, executor) -> Optional[Dict]:
+        """Collecte synchrone (un seul appel isolé, sans toucher à la session de l'utilisateur)."""
+        start = time.monotonic()
+        result = executor.execute_stateless(FACTS_SCRIPT, timeout=HOST_FACTS_TIMEOUT)
+        metrics.observe("host_facts_seconds", time.monotonic() - start)
+        if not result.get("stdout"):
+            logger.warning(f"Relevé de l'hôte impossible ({key}): {result.get('stderr', '').strip()}")
+            metrics.inc("host_facts_gathered", 1, outcome="error")
+            return None
+
+        facts = parse_facts(result["stdout"])
+        facts["gathered_at"] = int(time.time())
+        with self._lock:
+            self._facts[key] = (facts, time.time())
+        metrics.inc("host_facts_gathered", 1, outcome="ok")
+        logger.info(f"Relevé de l'hôte {key}: {facts.get('os')} / {facts.get('kernel')}")
+        return facts
+
+    def gather_async(self, key: str, executor, force: bool = False):
+        """Lance la collecte en arrière-plan si le relevé est absent ou expiré."""
+        if not force and self.get(key) is not None:
+            return
+        if getattr(executor, "mode", "") == "local" and sys.platform == "win32":
+            # Le script de relevé suppose un shell POSIX
+            return
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending and pending.is_alive():
+                return
+
+            def run():
+                try:
+                    self.gather(key, executor)
+                except Exception as e:
+                    logger.error(f"Erreur lors du relevé de l'hôte {key}: {e}")
+                finally:
+                    with self._lock:
+                        self._pending.pop(key, None)
+
+            thread = threading.Thread(target=run, name=f"host-facts-{key}", daemon=True)
+            self._pending[key] = thread
+        thread.start()
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._facts.pop(key, None)
+            self._refreshed_at.pop(key, None)
+
+
+# Instance globale
+host_facts_cache = HostFactsCache()
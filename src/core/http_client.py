@@ -0,0 +1,91 @@
+# core/http_client.py
+
+import asyncio
+import importlib.util
+import json as _json
+import os
+import threading
+import urllib.parse
+import urllib.request
+from typing import Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# httpx est importé au premier usage pour accélérer le démarrage
+_HAS_HTTPX = importlib.util.find_spec("httpx") is not None
+
+HTTP_CLIENT_TIMEOUT = float(os.getenv("HTTP_CLIENT_TIMEOUT", "10"))
+HTTP_CLIENT_MAX_CONNECTIONS = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", "50"))
+
+_lock = threading.Lock()
+_client = None
+_client_loop = None
+# Fermetures en cours des clients remplacés (référence gardée jusqu'à la fin de la tâche)
+_closing = set()
+
+
+def get_async_client():
+    """
+    Client HTTP asynchrone partagé (pool de connexions keep-alive) : deux appels
+    successifs vers le même hôte réutilisent la connexion TLS déjà ouverte.
+    Un client httpx est lié à la boucle asyncio qui l'a créé : celui d'une
+    boucle précédente est fermé avant d'être remplacé.
+    """
+    global _client, _client_loop
+    import httpx
+    loop = asyncio.get_running_loop()
+    with _lock:
+        if _client is None or _client.is_closed or _client_loop is not loop:
+            _discard(_client, _client_loop)
+            _client = httpx.AsyncClient(
+                timeout=HTTP_CLIENT_TIMEOUT,
+                limits=httpx.Limits(max_connections=HTTP_CLIENT_MAX_CONNECTIONS,
+                                    max_keepalive_connections=HTTP_CLIENT_MAX_CONNECTIONS // 2),
+            )
+            _client_loop = loop
+        return _client
+
+
+def _discard(client, loop):
+    """Ferme un client remplacé, sur sa propre boucle si elle tourne encore."""
+    if client is None or client.is_closed:
+        return
+    if loop is not None and loop.is_running() and not loop.is_closed():
+        asyncio.run_coroutine_threadsafe(_close_quietly(client), loop)
+        return
+    # Boucle arrêtée : ses connexions ne peuvent plus être fermées proprement,
+    # mais le client est marqué fermé et son pool libéré
+    task = asyncio.get_running_loop().create_task(_close_quietly(client))
+    _closing.add(task)
+    task.add_done_callback(_closing.discard)
+
+
+async def _close_quietly(client):
+    try:
+        await client.aclose()
+    except Exception as e:
+        logger.debug(f"Fermeture de l'ancien client HTTP: {e}")
+
+
+async def get_json(url: str, params: Optional[dict] = None) -> Optional[dict]:
+    """GET asynchrone retournant le JSON (urllib dans un thread si httpx est absent)."""
+    if _HAS_HTTPX:
+        resp = await get_async_client().get(url, params=params)
+        return resp.json()
+
+    full_url = f"{url}?{urllib.parse.urlencode(params)}" if params else url
+
+    def fetch():
+        with urllib.request.urlopen(urllib.request.Request(full_url), timeout=HTTP_CLIENT_TIMEOUT) as resp:
+            return _json.loads(resp.read().decode("utf-8"))
+    return await asyncio.to_thread(fetch)
+
+
+async def aclose():
+    """Ferme le client partagé (arrêt de l'application)."""
+    global _client
+    with _lock:
+        client, _client = _client, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
@@ -0,0 +1,113 @@
+# core/metrics.py
+
+import threading
+import time
+from collections import deque
+from typing import Dict, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Nombre d'observations conservées par histogramme pour le calcul des percentiles
+HISTOGRAM_WINDOW = 1024
+
+
+def _key(name: str, labels: Dict) -> Tuple:
+    return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+
+class _Histogram:
+    """Fenêtre glissante d'observations (count/sum cumulés, percentiles sur la fenêtre)."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.window = deque(maxlen=HISTOGRAM_WINDOW)
+
+    def observe(self, value: float):
+        self.count += 1
+        self.total += value
+        self.window.append(value)
+
+    def percentile(self, q: float) -> float:
+        if not self.window:
+            return 0.0
+        ordered = sorted(self.window)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def to_dict(self) -> Dict:
+        return {
+            "count": self.count,
+            "sum": round(self.total, 6),
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+        }
+
+
+class MetricsRegistry:
+    """
+    Registre de métriques en mémoire (compteurs, jauges, histogrammes).
+    Thread-safe : les endpoints FastAPI synchrones tournent dans un pool de threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple, float] = {}
+        self._gauges: Dict[Tuple, float] = {}
+        self._histograms: Dict[Tuple, _Histogram] = {}
+        self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Incrémente un compteur."""
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        """Fixe la valeur courante d'une jauge."""
+        key = _key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def add_gauge(self, name: str, delta: float, **labels):
+        """Ajoute delta à une jauge (ex: profondeur de file d'attente)."""
+        key = _key(name, labels)
+        with self._lock:
+            self._gauges[key] = self._gauges.get(key, 0) + delta
+
+    def observe(self, name: str, value: float, **labels):
+        """Ajoute une observation à un histogramme (latence, taille...)."""
+        key = _key(name, labels)
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram()
+            hist.observe(value)
+
+    def snapshot(self) -> Dict:
+        """Retourne toutes les métriques sous forme sérialisable en JSON."""
+        def group(items, render):
+            result: Dict[str, list] = {}
+            for (name, labels), value in items:
+                result.setdefault(name, []).append({"labels": dict(labels), "value": render(value)})
+            return result
+
+        with self._lock:
+            return {
+                "uptime_seconds": round(time.time() - self.started_at, 1),
+                "counters": group(self._counters.items(), lambda v: v),
+                "gauges": group(self._gauges.items(), lambda v: v),
+                "histograms": group(self._histograms.items(), lambda h: h.to_dict()),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+# Instance globale
+metrics = MetricsRegistry()
@@ -1,14 +1,36 @@
 # core/microsoft_auth.py
 
 import os
-from typing import Optional
-import msal
+import pickle
+import threading
+from pathlib import Path
+from typing import Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import msal
+
+# msal est importé au premier usage (_get_msal_app) pour accélérer le démarrage
 
 # Configuration Microsoft OAuth
 MICROSOFT_CLIENT_ID = os.getenv("MICROSOFT_CLIENT_ID", "")
 MICROSOFT_CLIENT_SECRET = os.getenv("MICROSOFT_CLIENT_SECRET", "")
 MICROSOFT_AUTHORITY = "https://login.microsoftonline.com/common"
 MICROSOFT_SCOPES = ["User.Read"]
+# Caches MSAL conservés entre redémarrages : jetons (chiffrés avec SECRET_KEY si possible)
+# et métadonnées HTTP (découverte de l'autorité, endpoints OpenID)
+MSAL_CACHE_DIR = Path(os.getenv("MSAL_CACHE_DIR", str(Path(__file__).parent.parent.parent / "data")))
+MSAL_TOKEN_CACHE_FILE = "msal_token_cache.bin"
+MSAL_HTTP_CACHE_FILE = "msal_http_cache.bin"
+
+
+def _write_private(path: Path, data: bytes):
+    """Écriture atomique d'un fichier lisible par le seul propriétaire."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
 
 
 class MicrosoftAuthProvider:
@@ -22,15 +44,63 @@ class MicrosoftAuthProvider:
             print("⚠️  MICROSOFT_CLIENT_ID non configuré. L'authentification Microsoft sera désactivée.")
 
         self._app = None
-
-    def _get_msal_app(self) -> msal.ConfidentialClientApplication:
-        """Retourne l'application MSAL (lazy init)."""
+        self._token_cache = None
+        self._http_cache: dict = {}
+        self._cache_lock = threading.Lock()
+
+    def _fernet(self):
+        from .api_manager import _get_fernet
+        return _get_fernet()
+
+    def _load_caches(self):
+        """Recharge les caches MSAL persistés (ignorés s'ils sont illisibles)."""
+        import msal
+        self._token_cache = msal.SerializableTokenCache()
+        token_file = MSAL_CACHE_DIR / MSAL_TOKEN_CACHE_FILE
+        if token_file.exists():
+            try:
+                data = token_file.read_bytes()
+                fernet = self._fernet()
+                self._token_cache.deserialize((fernet.decrypt(data) if fernet else data).decode("utf-8"))
+            except Exception as e:
+                print(f"⚠️  Cache de jetons Microsoft ignoré: {e}")
+
+        http_file = MSAL_CACHE_DIR / MSAL_HTTP_CACHE_FILE
+        if http_file.exists():
+            try:
+                with open(http_file, "rb") as f:
+                    self._http_cache = pickle.load(f)
+            except Exception as e:
+                print(f"⚠️  Cache HTTP Microsoft ignoré: {e}")
+                self._http_cache = {}
+
+    def _save_caches(self):
+        """Persiste les caches MSAL s'ils ont changé."""
+        with self._cache_lock:
+            try:
+                if self._token_cache is not None and self._token_cache.has_state_changed:
+                    data = self._token_cache.serialize().encode("utf-8")
+                    fernet = self._fernet()
+                    _write_private(MSAL_CACHE_DIR / MSAL_TOKEN_CACHE_FILE, fernet.encrypt(data) if fernet else data)
+                    self._token_cache.has_state_changed = False
+                _write_private(MSAL_CACHE_DIR / MSAL_HTTP_CACHE_FILE, pickle.dumps(dict(self._http_cache)))
+            except Exception as e:
+                print(f"⚠️  Impossible d'enregistrer les caches Microsoft: {e}")
+
+    def _get_msal_app(self) -> "msal.ConfidentialClientApplication":
+        """Retourne l'application MSAL (lazy init, avec les caches persistés)."""
         if self._app is None:
+            import msal
+            self._load_caches()
             self._app = msal.ConfidentialClientApplication(
                 self.client_id,
                 authority=MICROSOFT_AUTHORITY,
                 client_credential=self.client_secret,
+                token_cache=self._token_cache,
+                http_cache=self._http_cache,
             )
+            # La découverte de l'autorité vient d'être faite (ou lue du cache)
+            self._save_caches()
         return self._app
 
     def get_auth_url(self, redirect_uri: str) -> str:
@@ -83,6 +153,7 @@ class MicrosoftAuthProvider:
                     query_params,
                 )
                 self._current_flow = None
+            self._save_caches()
 
             if "error" in result:
                 print(f"❌ Erreur Microsoft Auth: {result.get('error_description', result.get('error'))}")
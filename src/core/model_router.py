@@ -0,0 +1,88 @@
+# core/model_router.py
+
+import re
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from .ai_interface import split_reference
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Seuils de la classification (heuristiques locales, sans appel réseau)
+LONG_MESSAGE_CHARS = 300
+LARGE_CONTEXT_CHARS = 4000
+LONG_PROFILE_CHARS = 1500
+DEEP_CONVERSATION_TURNS = 8
+CONTEXT_WINDOW = 5
+
+# Mots-clés d'un diagnostic ou d'une tâche en plusieurs étapes (FR/EN)
+_COMPLEX_PATTERN = re.compile(
+    r"\b(why|debug|diagnos\w*|troubleshoot\w*|fix\w*|repair\w*|investigat\w*|optimi[sz]\w*|"
+    r"migrat\w*|script|crash\w*|slow\w*|leak\w*|pourquoi|erreur\w*|panne\w*|plante\w*|"
+    r"r[ée]par\w*|lent\w*|analys\w*|configur\w*)\b",
+    re.IGNORECASE,
+)
+
+# Signes d'erreur dans la sortie des commandes récentes
+_ERROR_PATTERN = re.compile(
+    r"\b(error|failed|failure|fatal|panic|traceback|exception|denied|refused|segfault|"
+    r"oom|killed|timed? ?out|erreur|échec)\b",
+    re.IGNORECASE,
+)
+
+FAST = "fast"
+STRONG = "strong"
+
+
+def classify_request(context: List[Dict], user_message: str,
+                     chat_history: Optional[List[Dict]] = None,
+                     system_profile: Optional[str] = None) -> Tuple[str, List[str]]:
+    """
+    Classe une requête en "fast" (question simple) ou "strong" (diagnostic complexe).
+
+    Returns:
+        (tier, raisons) — les raisons sont journalisées pour ajuster les seuils
+    """
+    reasons = []
+    recent = context[-CONTEXT_WINDOW:]
+    # Seule la question compte, pas les documents de référence joints au message
+    question, _ = split_reference(user_message)
+
+    if len(question) > LONG_MESSAGE_CHARS:
+        reasons.append("long_message")
+    if _COMPLEX_PATTERN.search(question):
+        reasons.append("complex_keywords")
+
+    context_size = sum(len(c.get("stdout", "")) + len(c.get("stderr", "")) for c in recent)
+    if context_size > LARGE_CONTEXT_CHARS:
+        reasons.append("large_context")
+    if any(c.get("stderr", "").strip() for c in recent):
+        reasons.append("stderr_present")
+    elif any(_ERROR_PATTERN.search(c.get("stdout", "")) for c in recent):
+        reasons.append("errors_in_output")
+
+    if system_profile and len(system_profile) > LONG_PROFILE_CHARS:
+        reasons.append("long_profile")
+    if chat_history and len(chat_history) >= DEEP_CONVERSATION_TURNS:
+        reasons.append("deep_conversation")
+
+    return (STRONG if reasons else FAST), reasons
+
+
+def select_model(provider: str, model: str, fast_model: Optional[str],
+                 context: List[Dict], user_message: str,
+                 chat_history: Optional[List[Dict]] = None,
+                 system_profile: Optional[str] = None) -> str:
+    """Retourne le modèle à utiliser : fast_model pour les requêtes simples s'il est configuré."""
+    if not fast_model or fast_model == model:
+        return model
+
+    tier, reasons = classify_request(context, user_message, chat_history, system_profile)
+    chosen = fast_model if tier == FAST else model
+    logger.info(
+        f"Routage modèle [{provider}] tier={tier} model={chosen} "
+        f"reasons={','.join(reasons) or '-'} msg_len={len(split_reference(user_message)[0])}"
+    )
+    metrics.inc("ai_model_route", 1, provider=provider, tier=tier, model=chosen)
+    return chosen
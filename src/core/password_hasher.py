@@ -0,0 +1,189 @@
+# core/password_hasher.py
+
+import asyncio
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Optional, Tuple
+import logging
+
+import bcrypt
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Coût bcrypt des nouveaux hachages (les anciens sont rehachés à la connexion)
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt libère le GIL : ce pool borne le nombre de cœurs pris par l'authentification
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "16"))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "5"))
+
+# Tentatives de connexion par minute (0 = illimité) : par IP, et par couple (IP, compte)
+LOGIN_RATE_PER_IP = int(os.getenv("LOGIN_RATE_PER_IP", "20"))
+LOGIN_RATE_PER_ACCOUNT = int(os.getenv("LOGIN_RATE_PER_ACCOUNT", "10"))
+
+_COST = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+
+class HasherOverloadedError(Exception):
+    """Levée quand la file de hachage est pleine ou que l'attente dépasse le délai."""
+
+
+class LoginRateLimitedError(Exception):
+    """Levée quand une adresse IP ou un compte dépasse son quota de tentatives."""
+
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Trop de tentatives ({scope}), réessayez dans {int(retry_after) + 1}s")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    Hachage et vérification bcrypt dans un pool de threads de taille fixe.
+
+    Au plus `workers` hachages tournent en parallèle et `max_queue` attendent ;
+    au-delà, la demande est rejetée immédiatement (HasherOverloadedError)
+    plutôt que d'occuper un thread de requête et du CPU : une rafale de
+    connexions ne peut pas affamer /execute ou /ai/suggest. Les variantes
+    asynchrones (hash_async, verify_async) attendent le résultat sans
+    bloquer de thread de requête.
+    """
+
+    def __init__(self, workers: int = PASSWORD_HASH_WORKERS, max_queue: int = PASSWORD_HASH_MAX_QUEUE,
+                 rounds: int = BCRYPT_ROUNDS, timeout: float = PASSWORD_HASH_TIMEOUT):
+        self.workers = max(1, workers)
+        self.rounds = rounds
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        # En cours + en attente
+        self._slots = threading.BoundedSemaphore(self.workers + max(0, max_queue))
+
+    def _run(self, fn: Callable, *args, wait: bool = True):
+        if not self._slots.acquire(blocking=False):
+            metrics.inc("password_hash_rejected", 1)
+            raise HasherOverloadedError("Trop de demandes d'authentification en cours, réessayez")
+        start = time.monotonic()
+
+        def task():
+            try:
+                metrics.observe("password_hash_queue_seconds", time.monotonic() - start)
+                return fn(*args)
+            finally:
+                self._slots.release()
+
+        future = self._pool.submit(task)
+        if not wait:
+            return future
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            metrics.inc("password_hash_rejected", 1)
+            raise HasherOverloadedError("Délai d'authentification dépassé, réessayez")
+        finally:
+            metrics.observe("password_hash_seconds", time.monotonic() - start)
+
+    async def _run_async(self, fn: Callable):
+        future = self._run(fn, wait=False)
+        start = time.monotonic()
+        try:
+            # shield : le hachage se termine (et libère sa place) même si l'attente expire
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.timeout)
+        except asyncio.TimeoutError:
+            metrics.inc("password_hash_rejected", 1)
+            raise HasherOverloadedError("Délai d'authentification dépassé, réessayez")
+        finally:
+            metrics.observe("password_hash_seconds", time.monotonic() - start)
+
+    def hash(self, password: str) -> str:
+        return self._run(
+            lambda: bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=self.rounds)).decode("utf-8")
+        )
+
+    def verify(self, password: str, hashed: str) -> bool:
+        return self._run(lambda: bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8")))
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run_async(
+            lambda: bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=self.rounds)).decode("utf-8")
+        )
+
+    async def verify_async(self, password: str, hashed: str) -> bool:
+        return await self._run_async(lambda: bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8")))
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """Vrai si le hachage a été produit avec un autre coût que BCRYPT_ROUNDS."""
+        match = _COST.match(hashed or "")
+        return bool(match) and int(match.group(1)) != self.rounds
+
+    def rehash_async(self, password: str, on_done: Callable[[str], None]):
+        """Rehache en arrière-plan si le pool a de la place (sinon ce sera pour la prochaine fois)."""
+        def job():
+            hashed = bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=self.rounds)).decode("utf-8")
+            try:
+                on_done(hashed)
+            except Exception as e:
+                logger.error(f"Erreur lors de l'enregistrement du nouveau hachage: {e}")
+        try:
+            self._run(job, wait=False)
+        except HasherOverloadedError:
+            pass
+
+
+class LoginRateLimiter:
+    """
+    Quotas de tentatives de connexion par adresse IP et par couple (IP,
+    compte) (token bucket d'une minute), vérifiés avant tout hachage : une
+    attaque par bourrage d'identifiants est rejetée sans coût CPU.
+
+    Le quota d'un compte est propre à chaque IP : un tiers qui multiplie les
+    tentatives sur le compte d'un autre épuise son propre quota, pas celui
+    de la victime. Derrière un reverse proxy, l'IP doit être celle du client
+    (uvicorn --proxy-headers, FORWARDED_ALLOW_IPS), sinon tous partagent le quota du proxy.
+    """
+
+    def __init__(self, per_ip: int = LOGIN_RATE_PER_IP, per_account: int = LOGIN_RATE_PER_ACCOUNT,
+                 max_keys: int = 10000):
+        self.limits = {"ip": per_ip, "account": per_account}
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # {(portée, clé): (jetons, dernier remplissage)}, ordre LRU
+        self._buckets: "OrderedDict[Tuple[str, str], Tuple[float, float]]" = OrderedDict()
+
+    def _take(self, scope: str, key: str, now: float) -> float:
+        """Consomme un jeton ; retourne 0 ou le délai avant le prochain jeton (sous verrou)."""
+        limit = self.limits[scope]
+        if limit <= 0 or not key:
+            return 0.0
+        rate = limit / 60.0
+        tokens, last = self._buckets.get((scope, key), (float(limit), now))
+        tokens = min(float(limit), tokens + (now - last) * rate)
+        if tokens < 1:
+            self._buckets[(scope, key)] = (tokens, now)
+            return (1 - tokens) / rate
+        self._buckets[(scope, key)] = (tokens - 1, now)
+        self._buckets.move_to_end((scope, key))
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return 0.0
+
+    def check(self, ip: Optional[str], account: Optional[str] = None):
+        """Lève LoginRateLimitedError si l'IP ou le compte a épuisé son quota."""
+        now = time.monotonic()
+        account_key = f"{ip or ''}|{account.lower()}" if account else ""
+        with self._lock:
+            for scope, key in (("ip", ip), ("account", account_key)):
+                retry_after = self._take(scope, key, now)
+                if retry_after:
+                    metrics.inc("login_rate_limited", 1, scope=scope)
+                    raise LoginRateLimitedError(scope, retry_after)
+
+
+# Instances globales
+password_hasher = PasswordHasher()
+login_rate_limiter = LoginRateLimiter()
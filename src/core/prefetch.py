@@ -0,0 +1,230 @@
+# core/prefetch.py
+
+import os
+import re
+import shlex
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+import logging
+
+from .metrics import metrics
+from .risk_classifier import LOW
+from .safe_commands import is_side_effect_free
+
+logger = logging.getLogger(__name__)
+
+# Désactivé par défaut ; un environnement peut l'activer avec PREFETCH_COMMANDS=true
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "false").lower() in ("true", "1", "yes")
+# Durée de conservation d'un résultat non réclamé (secondes)
+PREFETCH_TTL = int(os.getenv("PREFETCH_TTL", "60"))
+PREFETCH_TIMEOUT = int(os.getenv("PREFETCH_TIMEOUT", "10"))
+PREFETCH_MAX_COMMANDS = int(os.getenv("PREFETCH_MAX_COMMANDS", "3"))
+PREFETCH_CONCURRENCY = int(os.getenv("PREFETCH_CONCURRENCY", "4"))
+
+# Commandes qui ne se terminent pas seules, sondent le réseau ou attendent un mot de passe
+EXCLUDED_COMMANDS = frozenset("""
+    top htop watch less more ping traceroute tracepath mtr nmap tcpdump curl dig nslookup host
+    sudo doas pkexec cd history alias ulimit
+""".split())
+FOLLOW_OPTIONS = frozenset(["-f", "-F", "--follow", "--follow=name", "--follow=descriptor"])
+# Commandes dont le résultat dépend du répertoire courant sans argument absolu
+CWD_COMMANDS = frozenset(["ls", "ll", "la", "pwd", "find", "du", "tree", "grep", "egrep", "fgrep",
+                          "zgrep", "rg", "cat", "head", "tail", "wc", "stat", "file", "md5sum",
+                          "sha1sum", "sha256sum", "diff", "cmp", "realpath", "readlink", "sort"])
+# Premier argument = motif, pas un fichier
+PATTERN_COMMANDS = frozenset(["grep", "egrep", "fgrep", "zgrep", "rg"])
+_OPERATORS = {";", "&&", "||", "|", "|&"}
+# Préfixe ajouté par l'interface en mode remote pour garder le répertoire de l'onglet
+_CD_PREFIX = re.compile(r"^cd\s+(?:\"[^\"]*\"|'[^']*'|[^\s;&|'\"]+)\s*&&\s*(?P<command>.+)$", re.DOTALL)
+
+
+def strip_cd_prefix(command: str) -> str:
+    """Commande sans le préfixe "cd <répertoire> &&" ajouté par l'interface en mode remote."""
+    command = command.strip()
+    match = _CD_PREFIX.match(command)
+    return match.group("command").strip() if match else command
+
+
+def _is_path_independent(name: str, args: List[str], piped: bool) -> bool:
+    """Vrai si le résultat ne dépend pas du répertoire courant de la session."""
+    operands = [a for a in args if not a.startswith("-")]
+    if name in PATTERN_COMMANDS and operands and not any(a.startswith("-e") for a in args):
+        operands = operands[1:]
+    if not operands:
+        # ls, pwd, du... sans argument lisent le répertoire courant ; dans un pipe, l'entrée
+        return piped or name not in CWD_COMMANDS
+    for operand in operands:
+        if operand in (".", "..") or ("/" in operand and not operand.startswith(("/", "~"))):
+            return False
+        if name in CWD_COMMANDS and not operand.startswith(("/", "~")):
+            return False
+    return True
+
+
+def is_prefetchable(command: str) -> bool:
+    """
+    Vrai si la commande peut être exécutée par anticipation hors de la session :
+    invocation de la liste blanche sans effet de bord (core.safe_commands, et
+    non le classifieur de risque, qui peut sous-estimer), se termine seule, et
+    donne le même résultat quel que soit l'état de la session (répertoire
+    courant, variables).
+    """
+    if not is_side_effect_free(command):
+        return False
+
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    try:
+        tokens = list(lexer)
+    except ValueError:
+        return False
+
+    simple: List[str] = []
+    piped = False
+    for token in tokens + [";"]:
+        if token not in _OPERATORS:
+            simple.append(token)
+            continue
+        if simple:
+            name = os.path.basename(simple[0])
+            args = simple[1:]
+            if "=" in name or name in EXCLUDED_COMMANDS:
+                return False
+            if name in ("tail", "journalctl") and any(a in FOLLOW_OPTIONS for a in args):
+                return False
+            if not _is_path_independent(name, args, piped):
+                return False
+        simple = []
+        piped = token in ("|", "|&")
+    return True
+
+
+class CommandPrefetcher:
+    """
+    Exécution anticipée des commandes à faible risque proposées par l'IA.
+
+    Dès que la réponse est analysée, les commandes éligibles sont lancées en
+    arrière-plan par le chemin d'exécution isolé (execute_stateless). Le
+    résultat est conservé PREFETCH_TTL secondes : si l'utilisateur lance la
+    même commande, /execute le récupère au lieu de réexécuter. Les résultats
+    non réclamés sont jetés et comptés comme travail perdu.
+    """
+
+    def __init__(self, ttl: int = PREFETCH_TTL, timeout: int = PREFETCH_TIMEOUT,
+                 max_commands: int = PREFETCH_MAX_COMMANDS,
+                 concurrency: int = PREFETCH_CONCURRENCY):
+        self.ttl = ttl
+        self.timeout = timeout
+        self.max_commands = max_commands
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="prefetch")
+        self._lock = threading.Lock()
+        # {clé de session: {commande: {"future", "started"}}}
+        self._entries: Dict[str, Dict[str, Dict]] = {}
+
+    def _run(self, executor, command: str) -> Dict:
+        start = time.monotonic()
+        result = executor.execute_stateless(command, timeout=self.timeout)
+        result["duration"] = time.monotonic() - start
+        metrics.observe("prefetch_seconds", result["duration"])
+        return result
+
+    def _discard(self, entries: Dict[str, Dict], reason: str):
+        """Jette des résultats non réclamés (à appeler hors verrou)."""
+        for entry in entries.values():
+            future: Future = entry["future"]
+            if future.cancel():
+                metrics.inc("prefetch_discarded", 1, reason=reason, state="cancelled")
+                continue
+            metrics.inc("prefetch_discarded", 1, reason=reason, state="executed")
+            if future.done() and not future.exception():
+                metrics.observe("prefetch_wasted_seconds", future.result().get("duration", 0.0))
+
+    def _expired(self, key: str) -> Dict[str, Dict]:
+        """Retire (sous verrou) les entrées expirées d'une session."""
+        now = time.monotonic()
+        entries = self._entries.get(key, {})
+        expired = {cmd: e for cmd, e in entries.items() if now - e["started"] > self.ttl}
+        for cmd in expired:
+            del entries[cmd]
+        return expired
+
+    def prefetch(self, key: str, executor, commands: List[Dict]) -> List[str]:
+        """
+        Lance l'exécution anticipée des commandes éligibles d'une réponse IA.
+        Les résultats encore en attente de la réponse précédente sont jetés.
+
+        Returns:
+            Les commandes lancées
+        """
+        if executor is None or not hasattr(executor, "execute_stateless"):
+            return []
+        selected = []
+        for command in commands:
+            cmd = command.get("cmd", "")
+            if command.get("risk") == LOW and cmd not in selected and is_prefetchable(cmd):
+                selected.append(cmd)
+            if len(selected) >= self.max_commands:
+                break
+
+        with self._lock:
+            previous = self._entries.pop(key, {})
+            # Une commande identique déjà lancée est conservée
+            kept = {cmd: previous.pop(cmd) for cmd in selected if cmd in previous}
+            entries = self._entries[key] = kept
+            for cmd in selected:
+                if cmd not in entries:
+                    entries[cmd] = {"future": self._pool.submit(self._run, executor, cmd),
+                                    "started": time.monotonic()}
+                    metrics.inc("prefetch_started", 1)
+        self._discard(previous, "superseded")
+        for command in commands:
+            if command.get("cmd") in selected:
+                command["prefetched"] = True
+        return selected
+
+    def claim(self, key: str, command: str) -> Optional[Dict]:
+        """
+        Récupère le résultat anticipé d'une commande (attend la fin de son
+        exécution si elle est en cours). Retourne None si rien n'a été lancé.
+
+        Le préfixe "cd <répertoire> &&" de l'interface est ignoré : seules des
+        commandes indépendantes du répertoire courant sont anticipées.
+        """
+        with self._lock:
+            expired = self._expired(key)
+            entry = self._entries.get(key, {}).pop(strip_cd_prefix(command), None)
+        self._discard(expired, "expired")
+
+        if entry is None:
+            metrics.inc("prefetch_claims", 1, outcome="miss")
+            return None
+        ready = entry["future"].done()
+        try:
+            result = entry["future"].result(timeout=self.timeout + 5)
+        except Exception as e:
+            logger.warning(f"Exécution anticipée échouée ({command[:60]}): {e}")
+            metrics.inc("prefetch_claims", 1, outcome="error")
+            return None
+        metrics.inc("prefetch_claims", 1, outcome="hit" if ready else "wait")
+        metrics.observe("prefetch_result_age_seconds", time.monotonic() - entry["started"])
+        result = dict(result)
+        result.pop("duration", None)
+        result["prefetched"] = True
+        return result
+
+    def invalidate(self, key: str, reason: str = "invalidated"):
+        """Jette les résultats d'une session (état de l'hôte ou de la session modifié)."""
+        with self._lock:
+            entries = self._entries.pop(key, {})
+        self._discard(entries, reason)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"sessions": len(self._entries),
+                    "pending": sum(len(e) for e in self._entries.values())}
+
+
+# Instance globale
+command_prefetcher = CommandPrefetcher()
@@ -1,58 +1,118 @@
 # core/profile_manager.py
 
 import json
+import os
+import threading
+import time
 from pathlib import Path
 from typing import List, Dict, Optional
+import logging
+
+from .fileutil import UnreadableFileError, atomic_write_json, file_signature
+
+logger = logging.getLogger(__name__)
+
+# Intervalle minimal entre deux stat() du fichier : les modifications faites
+# hors de l'application sont vues au plus tard après ce délai (0 = à chaque appel)
+PROFILES_STAT_INTERVAL = float(os.getenv("PROFILES_STAT_INTERVAL", "2"))
 
 
 class ProfileManager:
-    """Gère les profils de prompt IA par utilisateur."""
+    """
+    Gère les profils de prompt IA par utilisateur.
+
+    Les profils sont gardés en mémoire, indexés par id ; le fichier n'est
+    relu que si sa signature (mtime, taille, inode) a changé. Les écritures
+    passent par la mémoire puis sont persistées de façon atomique ; elles sont
+    refusées tant que le fichier est illisible (il serait écrasé).
+    """
 
     def __init__(self, profiles_file: Path):
         self.profiles_file = profiles_file
         self.profiles_file.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # {id: profil}, dans l'ordre du fichier
+        self._profiles: Dict[str, Dict] = {}
+        self._signature = None
+        self._loaded = False
+        self._checked_at = 0.0
+        # Signature du fichier s'il n'a pas pu être lu (None s'il est lisible)
+        self._unreadable = None
 
-    def _load(self) -> List[Dict]:
-        if not self.profiles_file.exists():
-            return []
-        with open(self.profiles_file, encoding='utf-8') as f:
-            return json.load(f)
+    def _refresh(self):
+        """Recharge le fichier s'il a changé depuis la dernière lecture (sous verrou)."""
+        now = time.monotonic()
+        if self._loaded and now - self._checked_at < PROFILES_STAT_INTERVAL:
+            return
+        self._checked_at = now
+        signature = file_signature(self.profiles_file)
+        if self._loaded and signature == self._signature:
+            return
+        if signature is not None and signature == self._unreadable:
+            return
+        profiles = {}
+        if signature is not None:
+            try:
+                with open(self.profiles_file, encoding='utf-8') as f:
+                    profiles = {p['id']: p for p in json.load(f) if p.get('id')}
+            except (json.JSONDecodeError, OSError, TypeError, KeyError, AttributeError) as e:
+                # Lectures servies depuis la dernière version lue (vide au premier
+                # chargement), écritures refusées jusqu'à ce que le fichier change
+                logger.error(f"Profils illisibles ({self.profiles_file}): {e}")
+                self._unreadable = signature
+                return
+        self._profiles = profiles
+        self._signature = signature
+        self._loaded = True
+        self._unreadable = None
 
-    def _save(self, profiles: List[Dict]):
-        with open(self.profiles_file, 'w', encoding='utf-8') as f:
-            json.dump(profiles, f, indent=2, ensure_ascii=False)
+    def _refresh_for_write(self):
+        """Comme _refresh, mais lève UnreadableFileError si le fichier est illisible."""
+        self._refresh()
+        if self._unreadable is not None:
+            raise UnreadableFileError(f"{self.profiles_file.name} illisible : corrigez le fichier "
+                                      "avant de modifier les profils")
+
+    def _save(self, profiles: Dict[str, Dict]):
+        """Persiste puis remplace le cache (inchangé si l'écriture échoue)."""
+        atomic_write_json(self.profiles_file, list(profiles.values()))
+        self._profiles = profiles
+        self._signature = file_signature(self.profiles_file)
+        self._checked_at = time.monotonic()
 
     def list_profiles(self) -> List[Dict]:
-        return self._load()
+        with self._lock:
+            self._refresh()
+            return [dict(p) for p in self._profiles.values()]
 
     def get_profile(self, profile_id: str) -> Optional[Dict]:
-        for p in self._load():
-            if p.get('id') == profile_id:
-                return p
-        return None
+        with self._lock:
+            self._refresh()
+            profile = self._profiles.get(profile_id)
+            return dict(profile) if profile else None
 
     def create_profile(self, data: Dict) -> bool:
-        profiles = self._load()
-        # Vérifier que l'ID n'existe pas déjà
-        if any(p.get('id') == data.get('id') for p in profiles):
-            return False
-        profiles.append(data)
-        self._save(profiles)
-        return True
+        with self._lock:
+            self._refresh_for_write()
+            # Vérifier que l'ID n'existe pas déjà
+            if data.get('id') in self._profiles:
+                return False
+            self._save({**self._profiles, data.get('id'): dict(data)})
+            return True
 
     def update_profile(self, profile_id: str, data: Dict) -> bool:
-        profiles = self._load()
-        for i, p in enumerate(profiles):
-            if p.get('id') == profile_id:
-                profiles[i] = {**p, **data, 'id': profile_id}
-                self._save(profiles)
-                return True
-        return False
+        with self._lock:
+            self._refresh_for_write()
+            profile = self._profiles.get(profile_id)
+            if profile is None:
+                return False
+            self._save({**self._profiles, profile_id: {**profile, **data, 'id': profile_id}})
+            return True
 
     def delete_profile(self, profile_id: str) -> bool:
-        profiles = self._load()
-        new_profiles = [p for p in profiles if p.get('id') != profile_id]
-        if len(new_profiles) < len(profiles):
-            self._save(new_profiles)
+        with self._lock:
+            self._refresh_for_write()
+            if profile_id not in self._profiles:
+                return False
+            self._save({k: p for k, p in self._profiles.items() if k != profile_id})
             return True
-        return False
@@ -0,0 +1,221 @@
+# core/rate_limiter.py
+
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, Optional
+import logging
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Valeurs par défaut (surchargées par API dans apis.json : rate_limit_rps, rate_limit_burst, max_concurrency)
+AI_RATE_LIMIT_RPS = float(os.getenv("AI_RATE_LIMIT_RPS", "0"))      # 0 = pas de limite de débit
+AI_RATE_LIMIT_BURST = int(os.getenv("AI_RATE_LIMIT_BURST", "5"))
+AI_MAX_CONCURRENCY = int(os.getenv("AI_MAX_CONCURRENCY", "8"))
+AI_MAX_RETRIES = int(os.getenv("AI_MAX_RETRIES", "3"))
+AI_BACKOFF_BASE = float(os.getenv("AI_BACKOFF_BASE", "0.5"))
+AI_BACKOFF_MAX = float(os.getenv("AI_BACKOFF_MAX", "30"))
+
+# Codes HTTP qui justifient une nouvelle tentative (429 rate limit, 529 overloaded)
+RETRYABLE_STATUS = (429, 529)
+
+
+class KeyLimiter:
+    """
+    Limiteur par clé API : token bucket + nombre maximal d'appels simultanés.
+
+    Les requêtes en attente sont servies équitablement entre utilisateurs
+    (round-robin sur des files FIFO par utilisateur) : un utilisateur qui
+    envoie beaucoup de requêtes ne bloque pas les autres.
+    """
+
+    def __init__(self, name: str, rate: float = 0, burst: int = 5, max_concurrency: int = 8):
+        self.name = name
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max(1, max_concurrency)
+
+        self._cond = threading.Condition()
+        self._tokens = float(self.burst)
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._active = 0
+        self._queues: Dict[str, deque] = {}
+        self._round_robin: deque = deque()
+        self._waiting = 0
+
+    def configure(self, rate: float, burst: int, max_concurrency: int):
+        """
+        Applique de nouveaux réglages (apis.json modifié) en conservant les files
+        d'attente et les appels en cours.
+        """
+        with self._cond:
+            self._refill(time.monotonic())
+            self.rate = rate
+            self.burst = max(1, burst)
+            self.max_concurrency = max(1, max_concurrency)
+            self._tokens = min(self._tokens, float(self.burst))
+            self._cond.notify_all()
+
+    def _refill(self, now: float):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _head(self):
+        """Ticket du prochain appel à servir (round-robin entre utilisateurs)."""
+        if not self._round_robin:
+            return None
+        return self._queues[self._round_robin[0]][0]
+
+    def _delay_before_grant(self, now: float) -> Optional[float]:
+        """Temps d'attente avant de pouvoir servir la tête de file (0 = immédiat)."""
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._active >= self.max_concurrency:
+            return None  # Attendre une libération (notify)
+        if self.rate > 0 and self._tokens < 1:
+            return (1 - self._tokens) / self.rate
+        return 0.0
+
+    def acquire(self, user: str = "anonymous") -> float:
+        """Bloque jusqu'à obtenir un créneau ; retourne le temps d'attente en secondes."""
+        ticket = object()
+        start = time.monotonic()
+        with self._cond:
+            queue = self._queues.get(user)
+            if queue is None:
+                queue = self._queues[user] = deque()
+                self._round_robin.append(user)
+            queue.append(ticket)
+            self._waiting += 1
+            metrics.set_gauge("ai_limiter_queue_depth", self._waiting, key=self.name)
+
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._head() is ticket:
+                    delay = self._delay_before_grant(now)
+                    if delay == 0.0:
+                        break
+                else:
+                    delay = None
+                self._cond.wait(timeout=delay)
+
+            # Créneau accordé : consommer un jeton et passer la main à l'utilisateur suivant
+            queue.popleft()
+            self._round_robin.popleft()
+            if queue:
+                self._round_robin.append(user)
+            else:
+                del self._queues[user]
+            if self.rate > 0:
+                self._tokens -= 1
+            self._active += 1
+            self._waiting -= 1
+            metrics.set_gauge("ai_limiter_queue_depth", self._waiting, key=self.name)
+            metrics.set_gauge("ai_limiter_active", self._active, key=self.name)
+            self._cond.notify_all()
+
+        waited = time.monotonic() - start
+        metrics.observe("ai_limiter_wait_seconds", waited, key=self.name)
+        return waited
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            metrics.set_gauge("ai_limiter_active", self._active, key=self.name)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        """Suspend tous les appels sur cette clé (ex: après un 429 avec retry-after)."""
+        with self._cond:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Lit l'en-tête retry-after (secondes) de la réponse d'erreur si présent."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    for header in ("retry-after-ms", "retry-after"):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            seconds = float(value)
+        except ValueError:
+            continue
+        return seconds / 1000 if header == "retry-after-ms" else seconds
+    return None
+
+
+def call_with_limits(limiter: Optional[KeyLimiter], user: str, fn: Callable,
+                     max_retries: int = AI_MAX_RETRIES):
+    """
+    Exécute fn() sous le limiteur de la clé, avec nouvelles tentatives sur 429/529 :
+    retry-after si fourni par l'API, sinon backoff exponentiel avec jitter.
+    """
+    attempt = 0
+    while True:
+        if limiter:
+            limiter.acquire(user)
+        try:
+            return fn()
+        except Exception as e:
+            status = _status_code(e)
+            if status not in RETRYABLE_STATUS or attempt >= max_retries:
+                raise
+            delay = _retry_after(e)
+            if delay is None:
+                # Full jitter : uniforme entre 0 et le plafond exponentiel
+                delay = random.uniform(0, min(AI_BACKOFF_MAX, AI_BACKOFF_BASE * (2 ** attempt)))
+            name = limiter.name if limiter else "-"
+            logger.warning(f"API {name}: HTTP {status}, nouvelle tentative dans {delay:.2f}s")
+            metrics.inc("ai_limiter_retries", 1, key=name, status=status)
+            if limiter:
+                limiter.pause(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+        finally:
+            if limiter:
+                limiter.release()
+
+
+# Registre global : un limiteur par clé API, partagé par tous les utilisateurs
+_limiters: Dict[str, KeyLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(api_key: str, rate: Optional[float] = None, burst: Optional[int] = None,
+                max_concurrency: Optional[int] = None) -> KeyLimiter:
+    """
+    Retourne le limiteur associé à une clé API (identifiée par un hash, jamais en clair).
+    Si la configuration de la clé a changé, le limiteur existant est reconfiguré.
+    """
+    name = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+    rate = float(AI_RATE_LIMIT_RPS if rate in (None, "") else rate)
+    burst = int(AI_RATE_LIMIT_BURST if burst in (None, "") else burst)
+    max_concurrency = int(AI_MAX_CONCURRENCY if max_concurrency in (None, "") else max_concurrency)
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = KeyLimiter(name, rate=rate, burst=burst,
+                                                   max_concurrency=max_concurrency)
+        elif (limiter.rate, limiter.burst, limiter.max_concurrency) != (rate, max(1, burst), max(1, max_concurrency)):
+            limiter.configure(rate, burst, max_concurrency)
+        return limiter
@@ -0,0 +1,67 @@
+# core/registry.py
+
+import importlib
+import threading
+from typing import Any, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Registres "nom -> module:attribut" : le module (et donc son SDK) n'est importé
+# qu'au premier usage. Un déploiement n'utilisant qu'un fournisseur IA et aucun
+# OAuth n'importe ni openai, ni anthropic, ni google-auth, ni msal.
+AI_PROVIDERS: Dict[str, str] = {
+    "claude": "core.ai_claude:ClaudeProvider",
+    "chatgpt": "core.ai_chatgpt:ChatGPTProvider",
+    "local": "core.ai_local:LocalProvider",
+}
+
+AUTH_PROVIDERS: Dict[str, str] = {
+    "google": "core.google_auth:google_auth_provider",
+    "microsoft": "core.microsoft_auth:microsoft_auth_provider",
+    "facebook": "core.facebook_auth:facebook_auth_provider",
+}
+
+_lock = threading.Lock()
+_resolved: Dict[str, Any] = {}
+
+
+def _resolve(target: str) -> Any:
+    """Importe "module:attribut" une seule fois et met le résultat en cache."""
+    with _lock:
+        if target not in _resolved:
+            module_name, attr = target.split(":", 1)
+            module = importlib.import_module(module_name)
+            _resolved[target] = getattr(module, attr)
+            logger.debug(f"Registre: {target} chargé")
+        return _resolved[target]
+
+
+def register_ai_provider(name: str, target: str):
+    """Déclare un provider IA supplémentaire ("module:Classe")."""
+    AI_PROVIDERS[name.lower()] = target
+
+
+def register_auth_provider(name: str, target: str):
+    """Déclare un provider d'authentification supplémentaire ("module:instance")."""
+    AUTH_PROVIDERS[name.lower()] = target
+
+
+def get_ai_provider_class(name: str):
+    target = AI_PROVIDERS.get(name.lower())
+    if target is None:
+        raise ValueError(f"Provider IA inconnu: {name}")
+    return _resolve(target)
+
+
+def create_ai_provider(name: str, **kwargs):
+    """Instancie un provider IA par son nom (import du SDK au premier appel)."""
+    return get_ai_provider_class(name)(**kwargs)
+
+
+def get_auth_provider(name: str):
+    """Retourne l'instance globale d'un provider OAuth (import au premier appel)."""
+    target = AUTH_PROVIDERS.get(name.lower())
+    if target is None:
+        raise ValueError(f"Provider d'authentification inconnu: {name}")
+    return _resolve(target)
@@ -0,0 +1,190 @@
+# core/response_cache.py
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+from .ai_interface import AIProvider
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Configuration (opt-in) : AI_RESPONSE_CACHE = off | user | global
+AI_RESPONSE_CACHE = os.getenv("AI_RESPONSE_CACHE", "off").lower()
+AI_RESPONSE_CACHE_SIZE = int(os.getenv("AI_RESPONSE_CACHE_SIZE", "512"))
+AI_RESPONSE_CACHE_TTL = int(os.getenv("AI_RESPONSE_CACHE_TTL", "600"))
+
+# Nombre de commandes de contexte réellement envoyées par les providers
+CONTEXT_WINDOW = 5
+
+
+def _normalize(text: Optional[str]) -> str:
+    """Normalise un texte pour la clé de cache (espaces et casse)."""
+    return " ".join((text or "").split()).casefold()
+
+
+def make_cache_key(endpoint: str, model: str, system_profile: Optional[str],
+                   context: List[Dict], user_message: str,
+                   chat_history: Optional[List[Dict]] = None,
+                   scope: Optional[str] = None) -> str:
+    """
+    Calcule la clé (hash SHA-256) d'une requête IA.
+
+    endpoint identifie la ou les APIs appelées (api_id et base_url) : deux
+    APIs du même type mais de serveurs différents ne partagent pas d'entrées.
+    """
+    payload = {
+        "scope": scope or "",
+        "endpoint": endpoint,
+        "model": model,
+        "profile": _normalize(system_profile),
+        "context": [
+            [c.get("command", ""), c.get("stdout", ""), c.get("stderr", "")]
+            for c in context[-CONTEXT_WINDOW:]
+        ],
+        "history": [
+            [m.get("role"), _normalize(m.get("content"))]
+            for m in (chat_history or [])
+        ],
+        "message": _normalize(user_message),
+    }
+    raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class _InFlight:
+    """Requête en cours : les appels identiques concurrents attendent son résultat."""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Optional[Dict] = None
+
+
+class ResponseCache:
+    """
+    Cache LRU borné avec TTL pour les réponses IA, avec dé-duplication
+    (single-flight) des requêtes identiques en cours d'exécution.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl: int = 600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._inflight: Dict[str, _InFlight] = {}
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            return self._get_locked(key)
+
+    def _get_locked(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Dict):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: str, compute: Callable[[], Dict]) -> Tuple[Dict, str]:
+        """
+        Retourne (résultat, origine) où origine vaut "hit", "coalesced" ou "miss".
+        Les résultats en erreur ne sont pas mis en cache.
+        """
+        with self._lock:
+            cached = self._get_locked(key)
+            if cached is not None:
+                return copy.deepcopy(cached), "hit"
+            inflight = self._inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight[key] = _InFlight()
+
+        if not leader:
+            inflight.event.wait()
+            if inflight.result is not None:
+                return copy.deepcopy(inflight.result), "coalesced"
+            # Le leader a échoué : on calcule nous-mêmes
+            return compute(), "miss"
+
+        try:
+            result = compute()
+            if result and not result.get("error"):
+                inflight.result = result
+                self.put(key, result)
+            return copy.deepcopy(result), "miss"
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            inflight.event.set()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CachedProvider(AIProvider):
+    """Enveloppe un AIProvider avec le cache de réponses (clé exacte)."""
+
+    def __init__(self, provider: AIProvider, cache: ResponseCache, endpoint: str,
+                 scope: Optional[str] = None):
+        self.provider = provider
+        self.cache = cache
+        self.endpoint = endpoint
+        self.scope = scope
+
+    def __getattr__(self, name):
+        # Délègue les attributs (model, client...) au provider enveloppé
+        return getattr(self.provider, name)
+
+    def ask(self, context: List[Dict], user_message: str,
+            chat_history: List[Dict] = None,
+            system_profile: Optional[str] = None) -> Dict:
+        model = getattr(self.provider, "model", "")
+        key = make_cache_key(self.endpoint, model, system_profile, context,
+                             user_message, chat_history, scope=self.scope)
+
+        result, origin = self.cache.get_or_compute(
+            key,
+            lambda: self.provider.ask(context, user_message, chat_history, system_profile),
+        )
+        metrics.inc("ai_response_cache", 1, outcome=origin)
+        if origin != "miss":
+            result["cached"] = True
+        return result
+
+
+# Instance globale (partagée entre utilisateurs ; la portée est portée par la clé)
+response_cache = ResponseCache(max_entries=AI_RESPONSE_CACHE_SIZE, ttl=AI_RESPONSE_CACHE_TTL)
+
+
+def wrap_with_cache(provider: AIProvider, user: str, endpoints: List[Tuple[str, str]]) -> AIProvider:
+    """
+    Active le cache de réponses autour du provider si AI_RESPONSE_CACHE le demande.
+
+    Args:
+        endpoints: [(api_id, base_url)] des APIs derrière le provider, dans l'ordre
+    """
+    if AI_RESPONSE_CACHE not in ("user", "global"):
+        return provider
+    scope = user if AI_RESPONSE_CACHE == "user" else None
+    endpoint = ",".join(f"{api_id}@{base_url}" for api_id, base_url in endpoints)
+    return CachedProvider(provider, response_cache, endpoint=endpoint, scope=scope)
@@ -0,0 +1,401 @@
+# core/risk_classifier.py
+
+import os
+import re
+import shlex
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+LOW, MEDIUM, HIGH = "low", "medium", "high"
+LEVEL_ORDER = {LOW: 0, MEDIUM: 1, HIGH: 2}
+
+# Politique appliquée par /execute : off | confirm_high | block_high
+EXECUTE_RISK_POLICY = os.getenv("EXECUTE_RISK_POLICY", "off").lower()
+
+# Commandes en lecture seule (risque faible sauf règle contraire)
+READ_ONLY_COMMANDS = frozenset("""
+    ls ll la cat less more head tail grep egrep fgrep zgrep rg find locate df du ps pstree top htop
+    free uptime w who whoami id groups uname hostname hostnamectl ip ifconfig ss netstat lsblk blkid
+    lscpu lsmem lspci lsusb lsof lsmod journalctl dmesg echo printf pwd which whereis type stat file
+    wc sort uniq cut awk tr date cal env printenv history ping traceroute tracepath mtr dig nslookup
+    host curl md5sum sha1sum sha256sum diff cmp tree realpath readlink basename dirname test true
+    false vmstat iostat mpstat sar nproc getent timedatectl last lastlog ulimit alias cd column jq
+    openssl tcpdump sed
+""".split())
+
+# Préfixes transparents : la commande réelle suit
+WRAPPERS = frozenset(["env", "nohup", "nice", "ionice", "time", "exec", "command", "builtin",
+                      "stdbuf", "unbuffer", "xargs", "watch", "timeout"])
+ELEVATION = frozenset(["sudo", "doas", "pkexec"])
+# Options de préfixe suivies d'une valeur (sudo -u www-data, nice -n 10...)
+WRAPPER_OPTIONS_WITH_ARG = frozenset(["-u", "-g", "-C", "-h", "-p", "-U", "-r", "-t", "-n", "-c", "-I", "-s", "-k"])
+
+# Interpréteurs : un pipe vers eux exécute du code arbitraire
+SHELLS = r"(?:ba|z|k|c|tc|da|fi)?sh|python[0-9.]*|perl|ruby|node|php"
+
+# Commandes enveloppées (sh -c, ssh hôte, python -c...) : analysées récursivement
+MAX_NESTING = 4
+# Options de ssh suivies d'une valeur (ssh -p 2222 -i clé hôte commande)
+SSH_OPTIONS_WITH_ARG = frozenset(["-b", "-c", "-D", "-E", "-e", "-F", "-I", "-i", "-J", "-L", "-l",
+                                  "-m", "-O", "-o", "-p", "-Q", "-R", "-S", "-W", "-w"])
+# Option introduisant du code en ligne, par interpréteur (dernière lettre d'un groupe : perl -ne)
+INLINE_CODE_FLAGS = {"python": "c", "perl": "eE", "ruby": "e", "node": "ep", "php": "r"}
+
+# Table des règles (niveau, raison, motif). Chaque motif est ancré sur la forme
+# canonique d'une commande simple : "nom arg1 arg2 ... >cible". Pour une commande,
+# la première règle qui correspond s'applique (les cas particuliers d'abord).
+RULES: List[Tuple[str, str, str]] = [
+    # Suppression / écrasement de données
+    (HIGH, "suppression récursive", r"rm\b.*\s(?:-[a-zA-Z]*[rR][a-zA-Z]*|--recursive)\b"),
+    (HIGH, "suppression à la racine", r"rm\b.*\s(?:/|/\*|~|\*)(?:\s|$)"),
+    (MEDIUM, "suppression de fichiers", r"(?:rm|rmdir|unlink)\b"),
+    (HIGH, "écriture brute sur disque", r"(?:dd|shred|wipefs|mkfs(?:\.\w+)?|mkswap|fdisk|sfdisk|gdisk|parted|cfdisk)\b"),
+    (HIGH, "suppression via find", r"find\b.*\s(?:-delete|-(?:exec|ok)(?:dir)?\s+rm)\b"),
+    (MEDIUM, "exécution via find", r"find\b.*\s-(?:exec|ok)(?:dir)?\b"),
+    (MEDIUM, "écriture via find", r"find\b.*\s-f(?:print0?|printf|ls)\b"),
+    (HIGH, "réécriture de fichier en place", r"truncate\b"),
+    # sed et awk : le programme passé en argument peut écrire ou exécuter
+    (HIGH, "exécution via sed", r"sed\b.*(?:s(?P<sed_e>[^\s\w\\])(?:\\.|(?!(?P=sed_e)).)*(?P=sed_e)"
+                                r"(?:\\.|(?!(?P=sed_e)).)*(?P=sed_e)[gpiImMw0-9]*e|(?:\s|[;{}\d$/!])\s*e(?:\s|;|$))"),
+    (MEDIUM, "modification de fichier en place", r"sed\b.*\s(?:-[a-zA-Z]*i|--in-place)"),
+    (MEDIUM, "écriture via sed", r"sed\b.*(?:s(?P<sed_w>[^\s\w\\])(?:\\.|(?!(?P=sed_w)).)*(?P=sed_w)"
+                                r"(?:\\.|(?!(?P=sed_w)).)*(?P=sed_w)[gpiImMe0-9]*w|(?:\s|[;{}\d$/!])\s*[wW](?:\s|;|$))"),
+    (MEDIUM, "script sed externe", r"sed\b.*\s(?:-[a-zA-Z]*f|--file)\b"),
+    (HIGH, "exécution via awk", r"[gmn]?awk\b.*(?:system\s*\(|(?:\s|\")\|\s*[A-Za-z_\"(]|\|\s*(?:\"|getline\b)|\|&)"),
+    (MEDIUM, "écriture via awk", r"[gmn]?awk\b.*(?:(?:print|printf)\b[^;}]*>|\s-i\s*inplace\b|\s(?:-f|--file)\b)"),
+    (MEDIUM, "écriture de fichiers", r"(?:sort\b.*\s(?:-[a-zA-Z]*o|--output)|tree\b.*\s-o|sar\b.*\s-o)\b"),
+    (MEDIUM, "écriture de fichiers", r"uniq(?:\s+-\S+(?:\s+\d+)?)*\s+(?!\d+\s)[^-\s>]\S*\s+[^-\s>]"),
+    (MEDIUM, "écriture de fichiers", r"(?:mv|cp|ln|touch|mkdir|tee|install|rsync|scp|tar|unzip|gzip|gunzip|patch)\b"),
+    # Arrêt / redémarrage du système
+    (HIGH, "arrêt ou redémarrage", r"(?:shutdown|reboot|halt|poweroff)\b"),
+    (HIGH, "changement de runlevel", r"(?:init|telinit)\s+[016]\b"),
+    (HIGH, "arrêt ou redémarrage", r"systemctl\b.*\s(?:reboot|poweroff|halt|kexec|rescue|emergency)\b"),
+    # Services
+    (LOW, "consultation de service", r"systemctl\b.*\s(?:status|show|is-active|is-enabled|is-failed|list-\S+|cat)\b"),
+    (HIGH, "arrêt de service", r"systemctl\b.*\s(?:stop|disable|mask|kill)\b"),
+    (MEDIUM, "modification de service", r"systemctl\b.*\s(?:start|restart|reload|enable|unmask|daemon-reload|try-restart|reload-or-restart)\b"),
+    (LOW, "consultation de service", r"service\s+\S+\s+status\b|service\s+--status-all\b"),
+    (HIGH, "arrêt de service", r"service\s+\S+\s+stop\b"),
+    (MEDIUM, "modification de service", r"service\s+\S+\s+(?:start|restart|reload)\b"),
+    (LOW, "consultation de service", r"systemctl(?:\s+-\S+)*$"),
+    (MEDIUM, "gestion de service", r"(?:systemctl|service)\b"),
+    (HIGH, "shell privilégié", r"(?:su|sudoedit)\b"),
+    # Processus
+    (HIGH, "arrêt de processus critique", r"kill\b.*\s(?:-9\s+|-KILL\s+|-s\s+KILL\s+)?1(?:\s|$)"),
+    (MEDIUM, "arrêt de processus", r"(?:kill|killall|pkill|skill)\b"),
+    # Droits et comptes
+    (HIGH, "changement de droits récursif", r"(?:chmod|chown|chgrp|setfacl)\b.*\s(?:-[a-zA-Z]*R[a-zA-Z]*|--recursive)\b"),
+    (HIGH, "droits ouverts à tous", r"chmod\b.*\s(?:0?777|a\+rwx)\b"),
+    (MEDIUM, "changement de droits", r"(?:chmod|chown|chgrp|setfacl|chattr)\b"),
+    (HIGH, "suppression de compte", r"(?:userdel|deluser|groupdel|delgroup)\b"),
+    (MEDIUM, "gestion des comptes", r"(?:useradd|adduser|usermod|passwd|chpasswd|groupadd|visudo)\b"),
+    # Réseau et pare-feu
+    (HIGH, "pare-feu vidé ou désactivé", r"(?:iptables|ip6tables)\b.*\s(?:-F|--flush|-X|-P\s+\S+\s+DROP)\b|ufw\s+(?:disable|reset)\b|nft\s+flush\b"),
+    (MEDIUM, "modification du pare-feu", r"(?:iptables|ip6tables|ufw|nft|firewall-cmd)\b"),
+    (MEDIUM, "modification réseau", r"ip\b.*\s(?:set|add|del|delete|flush|change|replace|append|prepend|exec|attach|detach|restore)\b|ifdown\b|ifup\b"),
+    (LOW, "consultation réseau", r"ifconfig(?:\s+-[asv]+)*(?:\s+[^-\s]\S*)?$"),
+    (MEDIUM, "modification réseau", r"ifconfig\b"),
+    (MEDIUM, "fermeture de connexions", r"ss\b.*\s(?:-[a-zA-Z]*K|--kill)\b"),
+    (HIGH, "exécution via tcpdump", r"tcpdump\b.*\s-[a-zA-Z]*z"),
+    (MEDIUM, "écriture de capture", r"tcpdump\b.*\s-[a-zA-Z]*w"),
+    (MEDIUM, "scan réseau", r"nmap\b"),
+    (MEDIUM, "ping intensif", r"ping6?\b.*\s(?:-[a-zA-Z]*f|-l\s*\d|-i\s*0*\.\d)"),
+    # Heure, nom d'hôte, noyau, historique
+    (MEDIUM, "modification de l'heure système", r"date\b.*\s(?:-u?s|--set)(?:\s|=|$)|date(?:\s+-u)?\s+\d{4}"),
+    (LOW, "consultation de l'heure système", r"timedatectl(?:\s+-\S+)*(?:\s+(?:status|show|list-timezones|timesync-status|show-timesync))?(?:\s+-\S+)*$"),
+    (MEDIUM, "modification de l'heure système", r"timedatectl\b"),
+    (MEDIUM, "changement du nom d'hôte", r"hostname(?:\s+-[a-zA-Z]+)*\s+(?:[^-\s>]|-[a-zA-Z]*[Fb]|--file|--boot)"),
+    (LOW, "consultation du nom d'hôte", r"hostnamectl(?:\s+-\S+)*(?:\s+(?:status|hostname|icon-name|chassis|deployment|location))?(?:\s+-\S+)*$"),
+    (MEDIUM, "changement du nom d'hôte", r"hostnamectl\b"),
+    (MEDIUM, "modification du journal noyau", r"dmesg\b.*\s(?:-[a-zA-Z]*[cCDEn]|--(?:clear|read-clear|console-\S+))"),
+    (MEDIUM, "modification de l'historique", r"history\b.*\s-[a-zA-Z]*[cdwarns]"),
+    (MEDIUM, "modification des journaux de connexion", r"lastlog\b.*\s(?:-[a-zA-Z]*[CS]|--clear|--set)\b"),
+    (MEDIUM, "écriture de clés ou certificats", r"openssl\b.*\s-(?:out|keyout|certout)\b|openssl\s+ca\b"),
+    (MEDIUM, "exécution via rg", r"rg\b.*\s--pre\b"),
+    # Paquets
+    (LOW, "consultation des paquets", r"(?:apt|apt-get|apt-cache|yum|dnf)\s+(?:list|search|show|info|policy|check-update|history)\b|dpkg\s+(?:-l|-L|-s|--list|--status)\b|rpm\s+-q|pip3?\s+(?:list|show|freeze)\b|npm\s+(?:ls|list|view|outdated)\b"),
+    (HIGH, "suppression de paquets", r"(?:apt|apt-get|yum|dnf|zypper)\s+(?:.*\s)?(?:remove|purge|autoremove|erase)\b|dpkg\s+(?:-r|-P|--remove|--purge)\b|rpm\s+-e\b|pip3?\s+uninstall\b"),
+    (MEDIUM, "installation ou mise à jour de paquets", r"(?:apt|apt-get|yum|dnf|zypper|dpkg|rpm|snap|pip|pip3|npm|gem)\b"),
+    # Conteneurs et orchestrateurs
+    (LOW, "consultation docker", r"docker\s+(?:ps|images|logs|inspect|stats|top|version|info|port|history|diff)\b|docker\s+(?:container|image|volume|network)\s+(?:ls|list|inspect)\b"),
+    (HIGH, "suppression docker", r"docker\s+(?:rm|rmi|kill)\b|docker\s+(?:system|container|image|volume|network|builder)\s+(?:prune|rm)\b|docker\s+compose\s+down\b.*\s-v\b"),
+    (MEDIUM, "modification docker", r"docker(?:-compose)?\b"),
+    (LOW, "consultation kubernetes", r"kubectl\s+(?:get|describe|logs|top|explain|version|config\s+view|api-resources)\b"),
+    (HIGH, "suppression kubernetes", r"kubectl\s+(?:delete|drain)\b"),
+    (MEDIUM, "modification kubernetes", r"kubectl\b"),
+    # Git
+    (LOW, "consultation git", r"git\s+(?:status|log|diff|show|branch|remote|tag|blame|rev-parse|ls-files|config\s+--get)\b"),
+    (HIGH, "réécriture git", r"git\s+(?:push\b.*\s(?:-f|--force)\b|reset\s+--hard\b|clean\b.*\s-[a-zA-Z]*f)"),
+    (MEDIUM, "modification git", r"git\b"),
+    # Planification
+    (HIGH, "suppression de la crontab", r"crontab\b.*\s-r\b"),
+    (LOW, "consultation de la crontab", r"crontab\b.*\s-l\b"),
+    (MEDIUM, "modification de la crontab", r"crontab\b"),
+    # Journaux
+    (MEDIUM, "purge des journaux", r"journalctl\b.*\s--(?:vacuum-\S+|rotate|flush|sync|relinquish-var|smart-relinquish-var|setup-keys|update-catalog)\b"),
+    # Téléchargements et exécution dynamique
+    (MEDIUM, "téléchargement ou envoi HTTP", r"curl\b.*\s(?:-o|-O|--output|-T|--upload-file|-d|--data\S*|-X\s*(?:POST|PUT|DELETE|PATCH))\b|wget\b"),
+    (MEDIUM, "exécution dynamique", r"(?:eval|source|\.)\s"),
+    (MEDIUM, "montage", r"(?:mount|umount|swapon|swapoff)\b"),
+    (HIGH, "modification du noyau", r"(?:sysctl\s+-w|modprobe\s+-r|rmmod|insmod)\b"),
+    # Interpréteur invoqué directement (ex : "bash script.sh")
+    (MEDIUM, "exécution d'un script", rf"(?:{SHELLS})\b"),
+]
+
+# Règles cumulatives, évaluées en plus de la règle de commande.
+# Redirections : les cibles sont ajoutées à la forme canonique sous la forme ">cible".
+REDIRECTION_RULES: List[Tuple[str, str, str]] = [
+    (HIGH, "écriture sur un périphérique", r"(?:.*\s)?>(?:/dev/(?:sd|hd|vd|xvd|nvme|mmcblk|disk|mapper)\S*)"),
+    (HIGH, "écriture dans un fichier système", r"(?:.*\s)?>(?:/etc|/boot|/usr|/bin|/sbin|/lib|/var/lib|/proc|/sys)/"),
+    (MEDIUM, "redirection vers un fichier", r"(?:.*\s)?>(?!/dev/null(?:\s|$)|/dev/std(?:out|err)(?:\s|$)|&)"),
+]
+
+_ALL_RULES = RULES + REDIRECTION_RULES
+
+# Un seul automate : une assertion avant optionnelle par règle, toutes évaluées
+# depuis le début de la forme canonique en un seul appel à match().
+_AUTOMATON = re.compile(
+    "".join(f"(?:(?=(?P<r{i}>{pattern})))?" for i, (_, _, pattern) in enumerate(_ALL_RULES))
+)
+
+_FORK_BOMB = re.compile(r":\s*\(\s*\)\s*\{.*:\s*\|\s*:")
+_PIPE_TO_SHELL = re.compile(rf"^(?:{SHELLS})$")
+_CONTROL_OPERATORS = {";", "&&", "||", "|", "|&", "&", ";;", "(", ")", "{", "}"}
+_REDIRECTIONS = {">", ">>", ">|", "&>", "&>>", "<", "<<", "<<<", "<>", ">&", "<&"}
+_ARITHMETIC = re.compile(r"\$\(\([^()]*\)\)")
+_ASSIGNMENT = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*=")
+_SHELL_NAME = re.compile(r"^(?:ba|z|k|c|tc|da|fi)?sh$")
+_INTERPRETER_NAME = re.compile(r"^(python|perl|ruby|node|php)[0-9.]*$")
+_SUDO_SHELL_OPTION = re.compile(r"^(?:-[a-zA-Z]*[is][a-zA-Z]*|--login|--shell)$")
+# Code en ligne : suppression de fichiers, ou lancement de commandes (dont les
+# chaînes littérales sont alors analysées comme des lignes shell)
+_CODE_DELETION = re.compile(r"\b(?:rmtree|removedirs|unlink(?:Sync)?|rmdir(?:Sync)?|rmSync|rm_rf?|"
+                            r"remove_dir\w*|os\.remove|File\.delete|truncate)\b")
+_CODE_EXECUTION = re.compile(r"\b(?:system|popen|subprocess|exec[lv]?p?e?|spawn\w*|execSync|execFile\w*|"
+                             r"check_output|check_call|call|run|passthru|shell_exec|proc_open)\s*[(\"'\[]|`|\bqx\b")
+_STRING_LITERAL = re.compile(r'"((?:\\.|[^"\\])*)"|\'((?:\\.|[^\'\\])*)\'')
+
+
+def _max_level(a: str, b: str) -> str:
+    return a if LEVEL_ORDER[a] >= LEVEL_ORDER[b] else b
+
+
+def _tokenize(command: str) -> Tuple[List[str], bool]:
+    """Découpe la ligne en jetons shell ; retourne (jetons, analyse complète)."""
+    # Les substitutions de commande sont évaluées comme des commandes à part entière
+    text = _ARITHMETIC.sub("0", command)
+    text = text.replace("\n", " ; ").replace("`", " ; ").replace("$(", " ; (")
+    lexer = shlex.shlex(text, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    try:
+        return list(lexer), True
+    except ValueError:
+        # Guillemets non fermés : découpage approximatif, jugé plus sévèrement
+        return text.split(), False
+
+
+def _split_simple_commands(tokens: List[str]) -> List[Tuple[List[str], bool]]:
+    """Sépare les commandes simples ; le booléen indique une entrée de pipe."""
+    commands, current, piped = [], [], False
+    for token in tokens:
+        if token in _CONTROL_OPERATORS:
+            if current:
+                commands.append((current, piped))
+            current = []
+            piped = token in ("|", "|&")
+            continue
+        current.append(token)
+    if current:
+        commands.append((current, piped))
+    return commands
+
+
+def _canonical(tokens: List[str]) -> Tuple[str, str, bool, List[str], bool]:
+    """
+    Forme canonique d'une commande simple : "nom args... >cible".
+
+    Returns:
+        (nom, forme canonique, élévation de privilèges, arguments, shell
+        privilégié demandé par une option de sudo/doas comme -i ou -s)
+    """
+    elevated = privileged_shell = False
+    args, redirects = [], []
+    i = 0
+    # Affectations de variables et préfixes transparents (sudo, env, nohup...)
+    while i < len(tokens):
+        token = tokens[i]
+        if _ASSIGNMENT.match(token):
+            i += 1
+        elif token in WRAPPERS or token in ELEVATION:
+            elevated = elevated or token in ELEVATION
+            i += 1
+            # Options du préfixe (sudo -u www-data, timeout 10s...)
+            while i < len(tokens) and (tokens[i].startswith("-") or
+                                       (token == "timeout" and tokens[i][:1].isdigit())):
+                if token in ELEVATION and _SUDO_SHELL_OPTION.match(tokens[i]):
+                    privileged_shell = True
+                    i += 1
+                    continue
+                i += 2 if tokens[i] in WRAPPER_OPTIONS_WITH_ARG else 1
+        else:
+            break
+
+    while i < len(tokens):
+        token = tokens[i]
+        if token in _REDIRECTIONS:
+            target = tokens[i + 1] if i + 1 < len(tokens) else ""
+            if token.startswith(">") or token.startswith("&>"):
+                if token != ">&" or not target.isdigit():
+                    redirects.append(">" + target)
+            i += 2
+            continue
+        # Descripteur précédant une redirection (2>, 1>>)
+        if token.isdigit() and i + 1 < len(tokens) and tokens[i + 1] in _REDIRECTIONS:
+            i += 1
+            continue
+        args.append(token)
+        i += 1
+
+    if not args:
+        return "", " ".join(redirects), elevated, args, privileged_shell
+    name = os.path.basename(args[0])
+    return name, " ".join([name] + args[1:] + redirects), elevated, args, privileged_shell
+
+
+def _shell_payload(args: List[str]) -> Optional[str]:
+    """Script passé à "sh -c script" (None sans option -c)."""
+    has_c = False
+    i = 1
+    while i < len(args) and args[i][:1] in "-+" and args[i] not in ("-", "--"):
+        option = args[i]
+        if option[:1] == "-" and not option.startswith("--") and "c" in option:
+            has_c = True
+        # -o pipefail, -O extglob : l'option est suivie d'un nom
+        i += 2 if option in ("-o", "+o", "-O", "+O") else 1
+    if args[i:i + 1] == ["--"]:
+        i += 1
+    return args[i] if has_c and i < len(args) else None
+
+
+def _ssh_payload(args: List[str]) -> Optional[str]:
+    """Commande distante de "ssh [options] hôte commande..." (None pour une session interactive)."""
+    i = 1
+    while i < len(args) and args[i].startswith("-"):
+        i += 2 if args[i] in SSH_OPTIONS_WITH_ARG else 1
+    remote = args[i + 1:]
+    return " ".join(remote) if remote else None
+
+
+def _inline_code(name: str, args: List[str]) -> Optional[str]:
+    """Code passé en ligne à un interpréteur (python -c, perl -e, node --eval, php -r)."""
+    flags = INLINE_CODE_FLAGS[_INTERPRETER_NAME.match(name).group(1)]
+    for i, arg in enumerate(args[1:-1], 1):
+        if arg in ("--eval", "--print") and name.startswith("node"):
+            return args[i + 1]
+        if re.match(rf"^-[a-zA-Z]*[{flags}]$", arg):
+            return args[i + 1]
+    return None
+
+
+def _classify_code(code: str, depth: int) -> Tuple[str, Tuple[str, ...]]:
+    """Niveau du code en ligne d'un interpréteur (au moins MEDIUM par la règle d'interpréteur)."""
+    if _CODE_DELETION.search(code):
+        return HIGH, ("suppression via code en ligne",)
+    if not _CODE_EXECUTION.search(code):
+        return LOW, ()
+    # Les chaînes littérales sont les commandes lancées, seules ou en liste (["rm", "-rf", "/"])
+    literals = [a if a is not None else b for a, b in _STRING_LITERAL.findall(code)]
+    level, reasons = MEDIUM, ["exécution de commandes via code en ligne"]
+    for candidate in literals + [" ".join(literals)]:
+        sub_level, sub_reasons = _classify(candidate, depth + 1)
+        level = _max_level(level, sub_level)
+        reasons += [r for r in sub_reasons if r not in reasons]
+    return level, tuple(reasons)
+
+
+@lru_cache(maxsize=4096)
+def _classify(command: str, depth: int = 0) -> Tuple[str, Tuple[str, ...]]:
+    level, reasons = LOW, []
+
+    def raise_to(new_level: str, reason: str):
+        nonlocal level
+        level = _max_level(level, new_level)
+        # Seuls les motifs d'inquiétude sont rapportés
+        if new_level != LOW and reason not in reasons:
+            reasons.append(reason)
+
+    def raise_nested(nested: Tuple[str, Tuple[str, ...]]):
+        nested_level, nested_reasons = nested
+        raise_to(nested_level, nested_reasons[0] if nested_reasons else "commande enveloppée")
+        for reason in nested_reasons[1:]:
+            raise_to(MEDIUM, reason)
+
+    if depth > MAX_NESTING:
+        return HIGH, ("commandes imbriquées trop profondément",)
+    if _FORK_BOMB.search(command):
+        raise_to(HIGH, "fork bomb")
+
+    tokens, complete = _tokenize(command)
+    if not complete:
+        raise_to(MEDIUM, "ligne shell non analysable")
+
+    for simple, piped in _split_simple_commands(tokens):
+        name, canonical, elevated, args, privileged_shell = _canonical(simple)
+        if elevated:
+            raise_to(MEDIUM, "élévation de privilèges")
+
+        # Commande enveloppée : son contenu compte autant qu'une commande directe
+        payload = None
+        if _SHELL_NAME.match(name):
+            payload = _shell_payload(args)
+        elif name == "ssh":
+            payload = _ssh_payload(args)
+        elif name == "eval":
+            payload = " ".join(args[1:])
+        if payload is not None:
+            raise_nested(_classify(payload.strip(), depth + 1))
+        elif _INTERPRETER_NAME.match(name):
+            code = _inline_code(name, args)
+            if code is not None:
+                raise_nested(_classify_code(code, depth))
+        # sudo -i, sudo -s, sudo bash : shell root interactif
+        if privileged_shell or (elevated and _SHELL_NAME.match(name) and payload is None):
+            raise_to(HIGH, "shell privilégié")
+        if piped and _PIPE_TO_SHELL.match(name):
+            raise_to(HIGH, "pipe vers un interpréteur")
+
+        groups = _AUTOMATON.match(canonical).groupdict()
+        matched = sorted(int(key[1:]) for key, value in groups.items() if value is not None)
+        command_rules = [i for i in matched if i < len(RULES)]
+        if command_rules:
+            rule_level, reason, _ = RULES[command_rules[0]]
+            raise_to(rule_level, reason)
+        elif name and name not in READ_ONLY_COMMANDS:
+            raise_to(MEDIUM, f"commande inconnue: {name}")
+        for i in matched:
+            if i >= len(RULES):
+                raise_to(_ALL_RULES[i][0], _ALL_RULES[i][1])
+
+    return level, tuple(reasons)
+
+
+def classify_command(command: str) -> Dict:
+    """
+    Évalue le risque d'une ligne de commande, sans appel réseau.
+
+    Returns:
+        {"level": "low"|"medium"|"high", "reasons": [...]}
+    """
+    level, reasons = _classify(command.strip())
+    metrics.inc("command_risk", 1, level=level)
+    return {"level": level, "reasons": list(reasons)}
+
+
+def max_risk(a: str, b: str) -> str:
+    """Niveau le plus élevé des deux (valeurs inconnues traitées comme 'high')."""
+    return _max_level(a if a in LEVEL_ORDER else HIGH, b if b in LEVEL_ORDER else HIGH)
@@ -0,0 +1,387 @@
+# core/runbook_index.py
+
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+from .fileutil import UnreadableFileError, atomic_write_json
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# numpy n'est importé qu'à la première construction d'index (démarrage plus rapide)
+_numpy_module = None
+_numpy_checked = False
+
+
+def _numpy():
+    """Module numpy, ou None s'il n'est pas installé (repli en Python pur)."""
+    global _numpy_module, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy
+            _numpy_module = numpy
+        except ImportError:
+            _numpy_module = None
+        _numpy_checked = True
+    return _numpy_module
+
+# Sélection des extraits injectés dans le prompt
+RUNBOOK_TOP_K = int(os.getenv("RUNBOOK_TOP_K", "3"))
+RUNBOOK_TOKEN_BUDGET = int(os.getenv("RUNBOOK_TOKEN_BUDGET", "800"))
+RUNBOOK_MIN_SCORE = float(os.getenv("RUNBOOK_MIN_SCORE", "0.1"))
+# Taille cible d'un extrait (un runbook long est découpé par sections)
+RUNBOOK_SNIPPET_TOKENS = int(os.getenv("RUNBOOK_SNIPPET_TOKENS", "300"))
+
+# Même estimation que le provider local
+CHARS_PER_TOKEN = 4
+
+_TERM = re.compile(r"[a-z0-9][a-z0-9_.\-]*[a-z0-9]|[a-z0-9]", re.IGNORECASE)
+_HEADING = re.compile(r"^#{1,6}\s", re.MULTILINE)
+STOPWORDS = frozenset("""
+    a an and are as at be by for from how i in is it of on or that the this to was what when where
+    which why with my me do does can not no
+    le la les un une des du de et ou est en au aux pour par sur dans que qui quoi comment pourquoi
+    ce cette ces mon ma mes je il elle pas ne se sa son avec
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Termes indexés : mots et identifiants techniques (nginx, 502, php-fpm, /var/log)."""
+    terms = []
+    for match in _TERM.finditer(text.lower()):
+        term = match.group(0)
+        if term in STOPWORDS:
+            continue
+        terms.append(term)
+        # "php-fpm.service" est aussi indexé sous "php", "fpm", "service"
+        if "-" in term or "." in term or "_" in term:
+            terms.extend(p for p in re.split(r"[-._]", term) if p and p not in STOPWORDS)
+    return terms
+
+
+def split_snippets(content: str, max_tokens: int = RUNBOOK_SNIPPET_TOKENS) -> List[str]:
+    """Découpe un runbook en extraits : par section markdown, puis par paragraphe."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    starts = [m.start() for m in _HEADING.finditer(content)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    sections = [content[a:b].strip() for a, b in zip(starts, starts[1:] + [len(content)])]
+
+    snippets = []
+    for section in filter(None, sections):
+        if len(section) <= max_chars:
+            snippets.append(section)
+            continue
+        current = ""
+        for paragraph in section.split("\n\n"):
+            if current and len(current) + len(paragraph) + 2 > max_chars:
+                snippets.append(current.strip())
+                current = ""
+            current += paragraph + "\n\n"
+        if current.strip():
+            snippets.append(current.strip())
+    return snippets
+
+
+class RunbookIndex:
+    """
+    Index TF-IDF en mémoire des extraits de runbooks.
+
+    Les termes de chaque extrait sont comptés une seule fois à l'ajout ; l'ajout
+    ou la suppression d'un runbook ne touche que ses extraits (les fréquences
+    documentaires sont mises à jour en place). Les pondérations sont
+    recalculées paresseusement à la recherche suivante : avec NumPy, sur des
+    tableaux (extrait, terme, poids) ; sinon en Python pur.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._vocabulary: Dict[str, int] = {}
+        self._df: List[int] = []
+        # Emplacements d'extraits (None = libéré, réutilisé au prochain ajout)
+        self._snippets: List[Optional[Dict]] = []
+        self._free: List[int] = []
+        self._by_runbook: Dict[str, List[int]] = {}
+        self._dirty = True
+        self._arrays = None
+        self._norms: Dict[int, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._snippets) - len(self._free)
+
+    def _term_id(self, term: str) -> int:
+        term_id = self._vocabulary.get(term)
+        if term_id is None:
+            term_id = self._vocabulary[term] = len(self._df)
+            self._df.append(0)
+        return term_id
+
+    def add(self, runbook: Dict):
+        """Indexe (ou réindexe) un runbook {id, title, content, tags}."""
+        with self._lock:
+            self._remove(runbook["id"])
+            slots = []
+            title = runbook.get("title") or runbook["id"]
+            tags = " ".join(runbook.get("tags") or [])
+            for text in split_snippets(runbook.get("content", "")):
+                counts = Counter(tokenize(f"{title} {tags} {text}"))
+                if not counts:
+                    continue
+                # Poids tf sous-linéaire
+                weights = {self._term_id(t): 1.0 + math.log(c) for t, c in counts.items()}
+                for term_id in weights:
+                    self._df[term_id] += 1
+                snippet = {"runbook_id": runbook["id"], "title": title, "text": text,
+                           "scope": runbook.get("scope", "user"), "weights": weights}
+                if self._free:
+                    slot = self._free.pop()
+                    self._snippets[slot] = snippet
+                else:
+                    slot = len(self._snippets)
+                    self._snippets.append(snippet)
+                slots.append(slot)
+            self._by_runbook[runbook["id"]] = slots
+            self._dirty = True
+
+    def _remove(self, runbook_id: str):
+        for slot in self._by_runbook.pop(runbook_id, []):
+            for term_id in self._snippets[slot]["weights"]:
+                self._df[term_id] -= 1
+            self._snippets[slot] = None
+            self._free.append(slot)
+            self._dirty = True
+
+    def remove(self, runbook_id: str):
+        with self._lock:
+            self._remove(runbook_id)
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def _idf(self, term_id: int, n_docs: int) -> float:
+        return math.log((n_docs + 1) / (self._df[term_id] + 1)) + 1.0
+
+    def _prepare(self):
+        """Recalcule les pondérations après une modification (sous verrou)."""
+        if not self._dirty:
+            return
+        n_docs = len(self)
+        np = _numpy()
+        if np is not None:
+            rows, cols, values = [], [], []
+            for slot, snippet in enumerate(self._snippets):
+                if snippet is None:
+                    continue
+                rows.extend([slot] * len(snippet["weights"]))
+                cols.extend(snippet["weights"].keys())
+                values.extend(snippet["weights"].values())
+            rows = np.asarray(rows, dtype=np.int64)
+            cols = np.asarray(cols, dtype=np.int64)
+            df = np.asarray(self._df, dtype=np.float64)
+            idf = np.log((n_docs + 1) / (df + 1)) + 1.0
+            weighted = np.asarray(values, dtype=np.float64) * idf[cols]
+            norms = np.sqrt(np.bincount(rows, weights=weighted ** 2, minlength=len(self._snippets)))
+            self._arrays = (rows, cols, weighted, norms, idf)
+        else:
+            self._norms = {
+                slot: math.sqrt(sum((w * self._idf(t, n_docs)) ** 2 for t, w in snippet["weights"].items()))
+                for slot, snippet in enumerate(self._snippets) if snippet is not None
+            }
+        self._dirty = False
+
+    def search(self, query: str, top_k: int = RUNBOOK_TOP_K,
+               min_score: float = RUNBOOK_MIN_SCORE) -> List[Dict]:
+        """Extraits les plus proches de la question (similarité cosinus TF-IDF)."""
+        with self._lock:
+            counts = Counter(t for t in tokenize(query) if t in self._vocabulary)
+            if not counts or not len(self):
+                return []
+            self._prepare()
+            n_docs = len(self)
+            query_weights = {self._vocabulary[t]: 1.0 + math.log(c) for t, c in counts.items()}
+
+            np = _numpy()
+            if np is not None:
+                rows, cols, weighted, norms, idf = self._arrays
+                q = np.zeros(len(idf))
+                for term_id, w in query_weights.items():
+                    q[term_id] = w * idf[term_id]
+                q_norm = np.linalg.norm(q)
+                dots = np.bincount(rows, weights=weighted * q[cols], minlength=len(norms))
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    scores = np.where(norms > 0, dots / (norms * q_norm), 0.0)
+                # Tri stable et scores nuls écartés, comme en Python pur
+                best = np.argsort(-scores, kind="stable")[:top_k]
+                ranked = [(int(slot), float(scores[slot])) for slot in best if scores[slot] > 0]
+            else:
+                q = {t: w * self._idf(t, n_docs) for t, w in query_weights.items()}
+                q_norm = math.sqrt(sum(v * v for v in q.values()))
+                ranked = []
+                for slot, snippet in enumerate(self._snippets):
+                    if snippet is None or not self._norms.get(slot):
+                        continue
+                    dot = sum(snippet["weights"][t] * self._idf(t, n_docs) * v
+                              for t, v in q.items() if t in snippet["weights"])
+                    if dot:
+                        ranked.append((slot, dot / (self._norms[slot] * q_norm)))
+                ranked = sorted(ranked, key=lambda x: -x[1])[:top_k]
+
+            return [
+                {"runbook_id": self._snippets[slot]["runbook_id"], "title": self._snippets[slot]["title"],
+                 "scope": self._snippets[slot]["scope"], "text": self._snippets[slot]["text"],
+                 "score": round(score, 4)}
+                for slot, score in ranked
+                if score >= min_score and self._snippets[slot] is not None
+            ]
+
+
+class RunbookStore:
+    """
+    Runbooks stockés dans un fichier JSON (liste de {id, title, content, tags}),
+    avec leur index de recherche. Le fichier est relu (et l'index reconstruit)
+    s'il a été modifié en dehors de l'application ; tant qu'il est illisible,
+    les écritures sont refusées (elles l'écraseraient).
+    """
+
+    def __init__(self, runbooks_file: Path, scope: str = "user"):
+        self.runbooks_file = Path(runbooks_file)
+        self.scope = scope
+        self.index = RunbookIndex()
+        self._lock = threading.Lock()
+        self._mtime: Optional[float] = None
+        self._runbooks: Dict[str, Dict] = {}
+        # mtime du fichier s'il n'a pas pu être lu (None s'il est lisible)
+        self._unreadable: Optional[float] = None
+
+    def _stat(self) -> Optional[float]:
+        try:
+            return self.runbooks_file.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self):
+        """Recharge le fichier s'il a changé depuis la dernière lecture (sous verrou)."""
+        mtime = self._stat()
+        if mtime == self._mtime and (mtime is not None or not self._runbooks):
+            return
+        if mtime is not None and mtime == self._unreadable:
+            return
+        runbooks = {}
+        if mtime is not None:
+            try:
+                with open(self.runbooks_file, encoding="utf-8") as f:
+                    runbooks = {r["id"]: r for r in json.load(f) if r.get("id")}
+            except (json.JSONDecodeError, OSError, TypeError, AttributeError) as e:
+                # L'index précédent reste servi jusqu'à ce que le fichier change
+                logger.error(f"Runbooks illisibles ({self.runbooks_file}): {e}")
+                self._unreadable = mtime
+                return
+        self._unreadable = None
+        start = time.monotonic()
+        self.index.clear()
+        for runbook in runbooks.values():
+            self.index.add({**runbook, "scope": self.scope})
+        self._runbooks = runbooks
+        self._mtime = mtime
+        metrics.observe("runbook_index_build_seconds", time.monotonic() - start)
+        logger.info(f"Index des runbooks ({self.scope}): {len(runbooks)} runbooks, {len(self.index)} extraits")
+
+    def _refresh_for_write(self):
+        """Comme _refresh, mais lève UnreadableFileError si le fichier est illisible."""
+        self._refresh()
+        if self._unreadable is not None:
+            raise UnreadableFileError(f"{self.runbooks_file.name} illisible : corrigez le fichier "
+                                      "avant de modifier les runbooks")
+
+    def _save(self):
+        atomic_write_json(self.runbooks_file, list(self._runbooks.values()))
+        self._mtime = self._stat()
+
+    def list_runbooks(self) -> List[Dict]:
+        with self._lock:
+            self._refresh()
+            return [{**r, "scope": self.scope} for r in self._runbooks.values()]
+
+    def get_runbook(self, runbook_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._refresh()
+            runbook = self._runbooks.get(runbook_id)
+            return {**runbook, "scope": self.scope} if runbook else None
+
+    def create_runbook(self, data: Dict) -> bool:
+        with self._lock:
+            self._refresh_for_write()
+            if data["id"] in self._runbooks:
+                return False
+            self._runbooks[data["id"]] = data
+            self._save()
+            self.index.add({**data, "scope": self.scope})
+            return True
+
+    def update_runbook(self, runbook_id: str, data: Dict) -> bool:
+        with self._lock:
+            self._refresh_for_write()
+            if runbook_id not in self._runbooks:
+                return False
+            runbook = {**self._runbooks[runbook_id], **data, "id": runbook_id}
+            self._runbooks[runbook_id] = runbook
+            self._save()
+            self.index.add({**runbook, "scope": self.scope})
+            return True
+
+    def delete_runbook(self, runbook_id: str) -> bool:
+        with self._lock:
+            self._refresh_for_write()
+            if self._runbooks.pop(runbook_id, None) is None:
+                return False
+            self._save()
+            self.index.remove(runbook_id)
+            return True
+
+    def search(self, query: str, top_k: int = RUNBOOK_TOP_K) -> List[Dict]:
+        with self._lock:
+            self._refresh()
+        return self.index.search(query, top_k=top_k)
+
+
+def select_snippets(query: str, stores: List[RunbookStore], top_k: int = RUNBOOK_TOP_K,
+                    token_budget: int = RUNBOOK_TOKEN_BUDGET) -> List[Dict]:
+    """Meilleurs extraits de plusieurs stores, dans la limite du budget de tokens."""
+    start = time.monotonic()
+    candidates = []
+    for store in stores:
+        candidates.extend(store.search(query, top_k=top_k))
+    candidates.sort(key=lambda s: -s["score"])
+
+    selected, used = [], 0
+    for snippet in candidates:
+        cost = (len(snippet["title"]) + len(snippet["text"])) // CHARS_PER_TOKEN + 1
+        if used + cost > token_budget:
+            continue
+        selected.append(snippet)
+        used += cost
+        if len(selected) >= top_k:
+            break
+    metrics.observe("runbook_search_seconds", time.monotonic() - start)
+    metrics.inc("runbook_snippets_injected", len(selected))
+    return selected
+
+
+def format_snippets(snippets: List[Dict]) -> str:
+    """Bloc des extraits, joint au message utilisateur comme document de référence."""
+    if not snippets:
+        return ""
+    parts = [f"### {s['title']}\n{s['text']}" for s in snippets]
+    return "**Relevant team runbooks (use them when they apply):**\n\n" + "\n\n".join(parts)
@@ -0,0 +1,292 @@
+# core/safe_commands.py
+
+import re
+import shlex
+from typing import Callable, FrozenSet, List, NamedTuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Liste blanche stricte des invocations sans effet de bord (commande + options
+# autorisées). Elle conditionne tout ce que le serveur exécute sans clic de
+# l'utilisateur (exécution anticipée, agent) ; contrairement au classifieur de
+# risque, tout ce qui n'est pas explicitement listé est refusé.
+
+
+class _Spec(NamedTuple):
+    flags: FrozenSet[str]                 # options sans valeur ("-l", "--all")
+    valued: FrozenSet[str]                # options suivies d'une valeur ("-n 20", "--lines=20")
+    max_operands: Optional[int]           # None = illimité
+    operand: Optional["re.Pattern"]       # motif imposé à chaque opérande
+    check: Optional[Callable[[List[str]], bool]]
+    word_options: bool                    # options longues à un tiret (find -name)
+
+
+def _spec(flags: str = "", valued: str = "", max_operands: Optional[int] = None,
+          operand: Optional[str] = None, check: Optional[Callable[[List[str]], bool]] = None,
+          word_options: bool = False) -> _Spec:
+    return _Spec(frozenset(flags.split()), frozenset(valued.split()), max_operands,
+                 re.compile(operand) if operand else None, check, word_options)
+
+
+# Outils sans aucune option d'écriture ni d'exécution : arguments libres
+_ANY = _spec()
+
+# Motif "-20" (head -20, journalctl -b -1)
+_NUM = "-NUM"
+
+_IP_OBJECTS = frozenset("link l addr address a route r ro neigh neighbor n rule ru maddr netns".split())
+_IP_VERBS = frozenset("show list ls lst get".split())
+_SYSTEMCTL_READ = frozenset("""
+    status show is-active is-enabled is-failed list-units list-unit-files list-timers
+    list-sockets list-dependencies cat
+""".split())
+_DOCKER_READ = frozenset("ps images version info".split())
+
+
+def _ip_check(operands: List[str]) -> bool:
+    if not operands:
+        return True
+    if operands[0] not in _IP_OBJECTS:
+        return False
+    return len(operands) == 1 or operands[1] in _IP_VERBS
+
+
+def _subcommand_check(allowed: FrozenSet[str]) -> Callable[[List[str]], bool]:
+    return lambda operands: not operands or operands[0] in allowed
+
+
+SAFE_COMMANDS = {
+    # Fichiers
+    "ls": _spec("-a -A -l -h -t -r -S -d -1 -i -n -R -F -G -g -o -p -s -U -X -c -u -Q -b -C -x -m -L -H -Z -k -v "
+                "--all --almost-all --human-readable --full-time --group-directories-first --si --inode "
+                "--numeric-uid-gid --recursive --classify --reverse --directory --dereference --no-group --color",
+                "--color --sort --time --time-style --format -I --ignore -w --width --block-size --hide "
+                "--quoting-style --indicator-style"),
+    "cat": _spec("-n -b -A -E -s -T -v -e -t --number --number-nonblank --show-all --squeeze-blank"),
+    "head": _spec(f"-q -v -z {_NUM} --quiet --silent --verbose", "-n -c --lines --bytes"),
+    "tail": _spec(f"-q -v -z {_NUM} --quiet --silent --verbose", "-n -c --lines --bytes"),
+    "wc": _spec("-l -w -c -m -L --lines --words --bytes --chars --max-line-length"),
+    "stat": _spec("-L -f -t --dereference --file-system --terse", "-c --format --printf"),
+    "file": _spec("-b -i -L -z -k -s --mime --mime-type --brief --dereference"),
+    "realpath": _spec("-e -m -s -q -L -P -z --canonicalize-existing --canonicalize-missing --no-symlinks "
+                      "--quiet --logical --physical", "--relative-to --relative-base"),
+    "readlink": _spec("-f -e -m -n -q -s -v -z --canonicalize --canonicalize-existing --canonicalize-missing"),
+    "basename": _spec("-a -z --multiple --zero", "-s --suffix"),
+    "dirname": _spec("-z --zero"),
+    "du": _spec("-s -h -a -c -x -k -m -b -l -L -S --apparent-size --si --summarize --human-readable --total "
+                "--one-file-system", "-d --max-depth -B --block-size --exclude -t --threshold"),
+    "df": _spec("-h -H -T -i -a -l -P -k -m --total --human-readable --si --inodes --print-type --local "
+                "--portability --output", "-x -t --type --exclude-type --output -B --block-size"),
+    "tree": _spec("-a -d -f -h -s -p -u -g -D -C -n -F -i -l -x -r -t --du --noreport --dirsfirst",
+                  "-L -I -P --filelimit --charset"),
+    "find": _spec("-print -print0 -ls -empty -xdev -mount -readable -writable -executable -o -a -or -and "
+                  "-not -follow -prune -L -H -P -depth -daystart -true -false -nouser -nogroup",
+                  "-name -iname -type -mtime -mmin -atime -amin -ctime -cmin -size -maxdepth -mindepth -path "
+                  "-ipath -user -group -perm -newer -regex -iregex -links -inum -uid -gid -samefile -wholename "
+                  "-iwholename -lname -ilname -xtype -fstype -printf -regextype", word_options=True),
+    "md5sum": _ANY, "sha1sum": _ANY, "sha256sum": _ANY, "sha512sum": _ANY,
+    "diff": _ANY, "cmp": _ANY,
+    # Texte (sed et awk sont programmables : exclus)
+    "grep": _spec(f"-i -v -n -c -l -L -r -R -E -F -G -P -w -x -o -h -H -s -q -a -I -z -Z -b -T -U {_NUM} "
+                  "--color --colour --null --recursive --ignore-case --invert-match --line-number --count "
+                  "--files-with-matches --files-without-match --extended-regexp --fixed-strings --word-regexp "
+                  "--line-regexp --only-matching --no-filename --with-filename --no-messages --quiet --silent "
+                  "--text",
+                  "-e -A -B -C -m -d -D --include --exclude --exclude-dir --color --colour --max-count "
+                  "--context --after-context --before-context --regexp --binary-files --label"),
+    "rg": _spec("-i -v -n -N -c -l -w -F -S -s -u -H -o -z -L --hidden --no-ignore --files --json "
+                "--no-heading --heading --color --ignore-case --smart-case --case-sensitive --fixed-strings "
+                "--count --files-with-matches --line-number --no-line-number --only-matching --follow",
+                "-e -g --glob -t --type -T --type-not -A -B -C -m --max-count --color -M --max-columns "
+                "-j --threads --max-depth -d --max-filesize --regexp"),
+    "sort": _spec("-n -r -u -h -f -b -V -M -s -g -c -C -d -i -z --numeric-sort --reverse --unique "
+                  "--human-numeric-sort --ignore-case --version-sort --stable --check --general-numeric-sort",
+                  "-k -t --key --field-separator"),
+    "uniq": _spec("-c -d -u -i -D -z --count --repeated --unique --ignore-case",
+                  "-f -s -w --skip-fields --skip-chars --check-chars", max_operands=1),
+    "cut": _spec("-s -z --complement --only-delimited",
+                 "-d -f -c -b --delimiter --fields --characters --bytes --output-delimiter"),
+    "tr": _spec("-d -s -c -C -t --delete --squeeze-repeats --complement --truncate-set1", max_operands=2),
+    "column": _spec("-t -n -e -x -J --table --json", "-s -o -c -N --separator --output-separator"),
+    "jq": _ANY,
+    "echo": _spec("-n -e -E"),
+    # Système
+    "pwd": _spec("-L -P", max_operands=0),
+    "whoami": _spec(max_operands=0),
+    "id": _ANY, "groups": _ANY,
+    "uname": _spec("-a -s -n -r -v -m -p -i -o --all --kernel-name --nodename --kernel-release "
+                   "--kernel-version --machine --processor --hardware-platform --operating-system",
+                   max_operands=0),
+    "hostname": _spec("-f -s -d -i -I -A -y --fqdn --short --domain --ip-address --all-ip-addresses "
+                      "--all-fqdns", max_operands=0),
+    "hostnamectl": _spec("--no-pager --static --transient --pretty", max_operands=1, operand=r"status"),
+    "timedatectl": _spec("--no-pager -a --all --value",
+                         max_operands=1, operand=r"status|show|timesync-status|show-timesync|list-timezones"),
+    "date": _spec("-u -R --utc --universal --rfc-email", "-d --date -r --reference -I --iso-8601 --rfc-3339",
+                  max_operands=1, operand=r"\+.*"),
+    "uptime": _spec("-p -s --pretty --since", max_operands=0),
+    "free": _spec("-h -m -g -k -b -t -w -l --si --total --human --mega --giga --kilo --bytes --wide --lohi",
+                  max_operands=0),
+    "nproc": _spec("--all", max_operands=0),
+    "ps": _ANY,
+    "pstree": _spec("-a -p -u -n -l -h -g -s -A -U -T --arguments --show-pids --long"),
+    "who": _spec("-a -b -q -r -u -H -d -l -m -p -t -T -w --all --boot --count --runlevel --users --heading"),
+    "w": _spec("-h -s -u -i -f --no-header --short --ip-addr --from"),
+    "last": _spec("-x -F -w -i -a -R -d --fulltimes --fullnames --ip --nohostname --dns --system", "-n --limit"),
+    "lscpu": _ANY, "lsmem": _ANY, "lspci": _ANY, "lsusb": _ANY, "lsmod": _ANY,
+    "lsblk": _spec("-a -f -l -p -m -t -b -d -J -O -P -r -S -n --all --fs --list --paths --json --bytes",
+                   "-o --output -e --exclude -I --include"),
+    "vmstat": _spec("-a -f -m -s -d -D -w -t --active --forks --slabs --stats --disk --disk-sum --wide "
+                    "--timestamp", "-S --unit", max_operands=0),
+    "iostat": _spec("-x -d -c -k -m -h -t -z -N -y -p", max_operands=0),
+    "mpstat": _spec("-A -u", "-I -P", max_operands=0),
+    "getent": _ANY,
+    "printenv": _ANY,
+    "env": _spec(max_operands=0),
+    "which": _spec("-a"),
+    "whereis": _spec("-b -m -s -u"),
+    "cal": _ANY,
+    # Journaux, services, conteneurs
+    "journalctl": _spec(f"--no-pager -r --reverse -x --catalog -q --quiet -k --dmesg -a --all --utc "
+                        f"--list-boots -m --merge --system --no-hostname -b {_NUM}",
+                        "-u --unit -n --lines -p --priority --since --until -S -U -o --output -g --grep "
+                        "-t --identifier --boot",
+                        operand=r"-?\d+|[A-Z_]+=\S+|/\S+"),
+    "dmesg": _spec("-T --ctime -k --kernel -x --decode -t --notime -r --raw -S --syslog -u --userspace "
+                   "--nopager", "-l --level -f --facility --time-format", max_operands=0),
+    "systemctl": _spec("--no-pager --all -a --failed -l --full --plain --no-legend -q --quiet --user --system",
+                       "--type -t --state -p --property -n --lines -o --output",
+                       check=_subcommand_check(_SYSTEMCTL_READ)),
+    "docker": _spec("-a -q -s -l --all --quiet --size --latest --no-trunc --digests",
+                    "--format -f --filter -n --last", max_operands=1,
+                    check=_subcommand_check(_DOCKER_READ)),
+    # Réseau (état local uniquement ; aucune sonde réseau)
+    "ip": _spec("-br -brief -4 -6 -s -stats -d -details -c -color -j -json -p -pretty -o -oneline",
+                check=_ip_check, word_options=True),
+    "ss": _spec("-t -u -l -n -p -a -s -4 -6 -x -w -e -m -o -i -r -H -O -Z -0 --tcp --udp --listening "
+                "--numeric --processes --all --summary --extended --memory --options --info --no-header"),
+    "netstat": _spec("-t -u -l -n -p -a -r -i -s -e -W -4 -6 -x -w -g -v --tcp --udp --listening --numeric "
+                     "--programs --all --route --interfaces --statistics --extend --wide"),
+    "lsof": _spec("-n -P -t -l -i -U -b -w", "-p -u -c -g -d -a"),
+}
+
+# Caractères refusés : substitutions, redirections, arrière-plan, sous-shells
+_FORBIDDEN_CHARS = set("$`<>&(){}\n\\")
+_OPERATORS = {";", "&&", "||", "|", "|&"}
+_GLOB_CHARS = set("*?[")
+
+
+def _has_unquoted_glob(command: str) -> bool:
+    """Vrai si un motif de fichiers (*, ?, [) n'est pas protégé par des guillemets."""
+    quote = None
+    for ch in command:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch in _GLOB_CHARS:
+            return True
+    return False
+
+
+def _value_ok(value: str) -> bool:
+    # Une valeur d'option ne doit pas pouvoir être prise pour une option (sauf -7, -1...)
+    return not value.startswith("-") or bool(re.fullmatch(r"-\d\S*", value))
+
+
+def _arguments_allowed(spec: _Spec, args: List[str]) -> bool:
+    operands: List[str] = []
+    i = 0
+    end_of_options = False
+    while i < len(args):
+        arg = args[i]
+        i += 1
+        if end_of_options or not arg.startswith("-") or arg == "-":
+            operands.append(arg)
+            continue
+        if arg == "--":
+            end_of_options = True
+            continue
+        if _NUM in spec.flags and re.fullmatch(r"-\d+", arg):
+            continue
+        if arg.startswith("--") or spec.word_options:
+            option, has_value, _ = arg.partition("=")
+            if option in spec.flags and not has_value:
+                continue
+            if option not in spec.valued:
+                return False
+            if not has_value:
+                if i >= len(args) or not _value_ok(args[i]):
+                    return False
+                i += 1
+            continue
+        # Options courtes, éventuellement groupées (-la, -n20)
+        for j in range(1, len(arg)):
+            option = "-" + arg[j]
+            if option in spec.valued:
+                if j + 1 == len(arg):
+                    if i >= len(args) or not _value_ok(args[i]):
+                        return False
+                    i += 1
+                break
+            if option not in spec.flags:
+                return False
+
+    if spec.max_operands is not None and len(operands) > spec.max_operands:
+        return False
+    if spec.operand and not all(spec.operand.fullmatch(o) for o in operands):
+        return False
+    return spec.check(operands) if spec.check else True
+
+
+def split_simple_commands(command: str) -> Optional[List[List[str]]]:
+    """
+    Commandes simples d'une ligne sans substitution ni redirection
+    (séparées par ;, &&, || ou |), ou None si la ligne ne s'y prête pas.
+    """
+    if not command or any(ch in _FORBIDDEN_CHARS for ch in command):
+        return None
+    lexer = shlex.shlex(command, posix=True, punctuation_chars=True)
+    lexer.whitespace_split = True
+    try:
+        tokens = list(lexer)
+    except ValueError:
+        return None
+    commands, current = [], []
+    for token in tokens:
+        if token in _OPERATORS:
+            if not current:
+                return None
+            commands.append(current)
+            current = []
+        elif all(ch in ";&|" for ch in token):
+            return None
+        else:
+            current.append(token)
+    if current:
+        commands.append(current)
+    return commands or None
+
+
+def is_side_effect_free(command: str) -> bool:
+    """
+    Vrai si chaque commande simple de la ligne est une invocation de la liste
+    blanche (nom nu, options autorisées), sans motif de fichiers non protégé :
+    la commande ne peut ni écrire, ni exécuter autre chose, ni modifier l'hôte.
+    """
+    if _has_unquoted_glob(command or ""):
+        return False
+    commands = split_simple_commands(command)
+    if not commands:
+        return False
+    for simple in commands:
+        name = simple[0]
+        # Chemins (./ls) et affectations (VAR=x cmd) refusés
+        if "/" in name or "=" in name:
+            return False
+        spec = SAFE_COMMANDS.get(name)
+        if spec is None or not _arguments_allowed(spec, simple[1:]):
+            return False
+    return True
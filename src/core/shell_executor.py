@@ -1,15 +1,20 @@
 # core/shell_executor.py
 
 import subprocess
-from typing import Dict, Optional
+import threading
+from typing import Dict, Optional, TYPE_CHECKING
 import logging
 import sys
 import uuid
-import pexpect
-from pexpect.popen_spawn import PopenSpawn
 
 from . import secret_manager
-from .ssh_executor import SSHExecutor
+
+if TYPE_CHECKING:
+    from pexpect.popen_spawn import PopenSpawn
+    from .ssh_executor import SSHExecutor
+
+# pexpect et paramiko (via ssh_executor) sont importés au premier usage :
+# un déploiement sans SSH ne charge jamais paramiko
 
 logger = logging.getLogger(__name__)
 
@@ -43,17 +48,20 @@ class ShellExecutor:
             wsl_distribution: Distribution WSL à utiliser (optionnel, par défaut la distribution par défaut)
         """
         self.mode = mode.lower()
-        self.ssh_executor: Optional[SSHExecutor] = None
+        # La session persistante ne supporte qu'une commande à la fois
+        self._lock = threading.Lock()
+        self.ssh_executor: Optional["SSHExecutor"] = None
         self.wsl_distribution = wsl_distribution
 
         # Session persistante pour local et WSL (utilise pexpect)
-        self.persistent_session: Optional[PopenSpawn] = None
+        self.persistent_session: Optional["PopenSpawn"] = None
 
         if self.mode == "remote":
             if not ssh_host or not ssh_user:
                 raise ValueError("ssh_host et ssh_user sont requis en mode remote")
 
             logger.info(f"🌐 Mode distant activé: {ssh_user}@{ssh_host}:{ssh_port}")
+            from .ssh_executor import SSHExecutor
             self.ssh_executor = SSHExecutor(
                 host=ssh_host,
                 username=ssh_user,
@@ -82,6 +90,8 @@ class ShellExecutor:
 
     def _start_persistent_wsl_session(self):
         """Démarre une session bash persistante dans WSL avec pexpect."""
+        from pexpect.popen_spawn import PopenSpawn
+
         try:
             # Commande WSL
             if self.wsl_distribution:
@@ -120,6 +130,8 @@ class ShellExecutor:
 
     def _start_persistent_local_session(self):
         """Démarre une session shell persistante locale avec pexpect."""
+        from pexpect.popen_spawn import PopenSpawn
+
         try:
             # Détecter le shell selon le système
             if sys.platform == 'win32':
@@ -174,15 +186,54 @@ class ShellExecutor:
         # Remplace les secrets avant exécution
         safe_command = secret_manager.replace_in_command(command)
 
+        with self._lock:
+            if self.mode == "remote":
+                return self._execute_remote(safe_command, timeout)
+            elif self.mode in ["wsl", "local"]:
+                return self._execute_persistent(safe_command, timeout)
+            else:
+                return self._execute_persistent(safe_command, timeout)
+
+    def execute_stateless(self, command: str, timeout: int = 30) -> Dict:
+        """
+        Exécute une commande dans un processus (ou canal SSH) séparé, sans passer
+        par la session persistante : pas de verrou, pas d'effet sur le répertoire
+        courant ni sur les variables de la session de l'utilisateur.
+        """
+        safe_command = secret_manager.replace_in_command(command)
+
         if self.mode == "remote":
-            return self._execute_remote(safe_command, timeout)
-        elif self.mode in ["wsl", "local"]:
-            return self._execute_persistent(safe_command, timeout)
+            if not self.ssh_executor:
+                return {"stdout": "", "stderr": "SSH executor non initialisé", "return_code": -1, "success": False}
+            return self.ssh_executor.execute_stateless(safe_command, timeout)
+
+        if self.mode == "wsl":
+            args = ["wsl.exe"] + (["-d", self.wsl_distribution] if self.wsl_distribution else []) + \
+                ["--", "bash", "-c", safe_command]
+        elif sys.platform == "win32":
+            args = ["cmd.exe", "/c", safe_command]
         else:
-            return self._execute_persistent(safe_command, timeout)
+            args = ["bash", "-c", safe_command]
+
+        try:
+            proc = subprocess.run(args, capture_output=True, text=True, timeout=timeout,
+                                  errors="replace", stdin=subprocess.DEVNULL)
+            return {
+                "stdout": proc.stdout,
+                "stderr": proc.stderr,
+                "return_code": proc.returncode,
+                "success": proc.returncode == 0
+            }
+        except subprocess.TimeoutExpired:
+            return {"stdout": "", "stderr": f"Timeout après {timeout}s", "return_code": -1, "success": False}
+        except Exception as e:
+            logger.error(f"Erreur lors de l'exécution isolée: {e}")
+            return {"stdout": "", "stderr": str(e), "return_code": -1, "success": False}
 
     def _execute_persistent(self, command: str, timeout: int = 30) -> Dict:
         """Exécute une commande dans la session persistante (WSL ou local)."""
+        import pexpect
+
         if not self.persistent_session or self.persistent_session.proc.poll() is not None:
             return {
                 "stdout": "",
@@ -199,6 +199,39 @@ class SSHExecutor:
                 "success": False
             }
 
+    def execute_stateless(self, command: str, timeout: int = 30) -> Dict:
+        """
+        Exécute une commande sur un canal exec dédié, hors du shell persistant :
+        pas d'effet sur le répertoire courant, utilisable en parallèle.
+        """
+        if not self.client or not self.client.get_transport() or not self.client.get_transport().is_active():
+            if not self.connect():
+                return {
+                    "stdout": "",
+                    "stderr": "Impossible de se connecter au serveur SSH",
+                    "return_code": -1,
+                    "success": False
+                }
+        try:
+            _, stdout, stderr = self.client.exec_command(command, timeout=timeout)
+            out = stdout.read().decode('utf-8', errors='replace')
+            err = stderr.read().decode('utf-8', errors='replace')
+            return_code = stdout.channel.recv_exit_status()
+            return {
+                "stdout": out,
+                "stderr": err,
+                "return_code": return_code,
+                "success": return_code == 0
+            }
+        except Exception as e:
+            logger.error(f"❌ Erreur d'exécution SSH (exec): {e}")
+            return {
+                "stdout": "",
+                "stderr": str(e),
+                "return_code": -1,
+                "success": False
+            }
+
     @staticmethod
     def _clean_ansi(text: str) -> str:
         """Supprime les séquences d'échappement ANSI/VT100."""
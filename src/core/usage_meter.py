@@ -0,0 +1,241 @@
+# core/usage_meter.py
+
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+from .ai_interface import AIProvider
+from .metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+USAGE_DB_PATH = Path(__file__).parent.parent.parent / "data" / "usage.db"
+
+# Budget quotidien par défaut en tokens (0 = illimité), surchargé par utilisateur via set_budget
+AI_DAILY_TOKEN_BUDGET = int(os.getenv("AI_DAILY_TOKEN_BUDGET", "0"))
+
+# Colonnes autorisées pour les regroupements (protège la requête SQL)
+GROUP_COLUMNS = {
+    "hour": "hour",
+    "day": "(hour / 86400) * 86400",
+    "user": "user",
+    "api_id": "api_id",
+    "model": "model",
+    "outcome": "outcome",
+}
+
+
+class BudgetExceededError(Exception):
+    """Levée quand un utilisateur a épuisé son budget de tokens."""
+
+
+class UsageMeter:
+    """
+    Journal append-only des appels IA (tokens, latences, résultat) dans SQLite,
+    avec agrégats par heure, utilisateur, API et modèle, et budgets par utilisateur.
+    """
+
+    def __init__(self, db_path: Path = USAGE_DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._init_db()
+
+    def _init_db(self):
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS usage_events (
+                    ts INTEGER NOT NULL,
+                    hour INTEGER NOT NULL,
+                    user TEXT NOT NULL,
+                    api_id TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+                    completion_tokens INTEGER NOT NULL DEFAULT 0,
+                    cached_tokens INTEGER NOT NULL DEFAULT 0,
+                    ttft_ms INTEGER,
+                    latency_ms INTEGER NOT NULL DEFAULT 0,
+                    outcome TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_usage_user_hour ON usage_events (user, hour);
+                CREATE INDEX IF NOT EXISTS idx_usage_hour ON usage_events (hour);
+                CREATE TABLE IF NOT EXISTS budgets (
+                    user TEXT PRIMARY KEY,
+                    daily_tokens INTEGER NOT NULL
+                );
+            """)
+            self._conn.commit()
+
+    def record(self, user: str, api_id: str, model: str, prompt_tokens: int = 0,
+               completion_tokens: int = 0, cached_tokens: int = 0,
+               ttft: Optional[float] = None, latency: float = 0.0, outcome: str = "ok"):
+        """Ajoute un événement d'usage (append-only) ; ttft None si l'appel n'était pas streamé."""
+        now = int(time.time())
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO usage_events (ts, hour, user, api_id, model, prompt_tokens, "
+                "completion_tokens, cached_tokens, ttft_ms, latency_ms, outcome) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (now, now - now % 3600, user, api_id, model, prompt_tokens, completion_tokens,
+                 cached_tokens, None if ttft is None else int(ttft * 1000), int(latency * 1000), outcome),
+            )
+            self._conn.commit()
+
+    def rollup(self, group_by: List[str], since: Optional[int] = None,
+               until: Optional[int] = None, user: Optional[str] = None) -> List[Dict]:
+        """
+        Agrège les événements.
+
+        Args:
+            group_by: colonnes parmi hour, day, user, api_id, model, outcome
+            since / until: bornes (timestamps epoch)
+            user: restreindre à un utilisateur
+        """
+        unknown = [g for g in group_by if g not in GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Regroupement non supporté: {', '.join(unknown)}")
+
+        select = [f"{GROUP_COLUMNS[g]} AS {g}" for g in group_by]
+        where, params = [], []
+        if since is not None:
+            where.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("ts < ?")
+            params.append(until)
+        if user is not None:
+            where.append("user = ?")
+            params.append(user)
+
+        sql = "SELECT " + ", ".join(select + [
+            "COUNT(*) AS calls",
+            "SUM(prompt_tokens) AS prompt_tokens",
+            "SUM(completion_tokens) AS completion_tokens",
+            "SUM(cached_tokens) AS cached_tokens",
+            "AVG(ttft_ms) AS avg_ttft_ms",
+            "AVG(latency_ms) AS avg_latency_ms",
+            "MAX(latency_ms) AS max_latency_ms",
+            "SUM(outcome != 'ok') AS failed_calls",
+        ]) + " FROM usage_events"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        if group_by:
+            sql += " GROUP BY " + ", ".join(group_by) + " ORDER BY " + ", ".join(group_by)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+    def set_budget(self, user: str, daily_tokens: Optional[int]):
+        """Fixe le budget quotidien d'un utilisateur (None = revenir au défaut)."""
+        with self._lock:
+            if daily_tokens is None:
+                self._conn.execute("DELETE FROM budgets WHERE user = ?", (user,))
+            else:
+                self._conn.execute(
+                    "INSERT INTO budgets (user, daily_tokens) VALUES (?, ?) "
+                    "ON CONFLICT(user) DO UPDATE SET daily_tokens = excluded.daily_tokens",
+                    (user, daily_tokens),
+                )
+            self._conn.commit()
+
+    def get_budget(self, user: str) -> Dict:
+        """Retourne le budget quotidien et la consommation du jour (UTC)."""
+        now = int(time.time())
+        day_start = now - now % 86400
+        with self._lock:
+            row = self._conn.execute("SELECT daily_tokens FROM budgets WHERE user = ?", (user,)).fetchone()
+            used = self._conn.execute(
+                "SELECT COALESCE(SUM(prompt_tokens + completion_tokens), 0) FROM usage_events "
+                "WHERE user = ? AND hour >= ?",
+                (user, day_start),
+            ).fetchone()[0]
+        limit = row["daily_tokens"] if row else AI_DAILY_TOKEN_BUDGET
+        return {"daily_tokens": limit, "used_tokens": used, "resets_at": day_start + 86400}
+
+    def check_budget(self, user: str):
+        """Lève BudgetExceededError si le budget du jour est épuisé (0 = illimité)."""
+        budget = self.get_budget(user)
+        if budget["daily_tokens"] and budget["used_tokens"] >= budget["daily_tokens"]:
+            metrics.inc("ai_budget_rejections", 1)
+            raise BudgetExceededError(
+                f"Budget quotidien de {budget['daily_tokens']} tokens atteint"
+            )
+
+
+def normalize_usage(usage: Optional[Dict]) -> Dict[str, int]:
+    """Ramène les compteurs des différents providers à prompt/completion/cached."""
+    usage = usage or {}
+    cached = usage.get("cache_read_input_tokens", 0) or 0
+    prompt = (usage.get("input_tokens", 0) or 0) + (usage.get("cache_creation_input_tokens", 0) or 0) + cached
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": usage.get("output_tokens", 0) or 0,
+        "cached_tokens": cached,
+    }
+
+
+class MeteredProvider(AIProvider):
+    """Enveloppe un AIProvider : vérifie le budget avant l'appel et journalise l'usage."""
+
+    def __init__(self, provider: AIProvider, meter: "UsageMeter", user: str, api_id: str):
+        self.provider = provider
+        self.meter = meter
+        self.user = user
+        self.api_id = api_id
+
+    def __getattr__(self, name):
+        return getattr(self.provider, name)
+
+    def ask(self, context: List[Dict], user_message: str,
+            chat_history: List[Dict] = None,
+            system_profile: Optional[str] = None) -> Dict:
+        # Refus avant tout appel réseau
+        self.meter.check_budget(self.user)
+
+        start = time.monotonic()
+        outcome = "error"
+        result: Dict = {}
+        try:
+            result = self.provider.ask(context, user_message, chat_history, system_profile)
+            outcome = "error" if result.get("error") else "ok"
+            return result
+        finally:
+            latency = time.monotonic() - start
+            try:
+                self.meter.record(
+                    user=self.user,
+                    api_id=self.api_id,
+                    model=result.get("model") or getattr(self.provider, "model", ""),
+                    # Sans streaming, pas de premier token distinct de la réponse complète
+                    ttft=result.get("time_to_first_token"),
+                    latency=latency,
+                    outcome=outcome,
+                    **normalize_usage(result.get("usage")),
+                )
+            except Exception as e:
+                logger.error(f"Impossible d'enregistrer l'usage IA: {e}")
+
+
+# Instance globale
+usage_meter = UsageMeter()
+
+
+if __name__ == "__main__":
+    # python -m core.usage_meter set-budget <email> <tokens|default>
+    if len(sys.argv) == 4 and sys.argv[1] == "set-budget":
+        tokens = None if sys.argv[3] == "default" else int(sys.argv[3])
+        usage_meter.set_budget(sys.argv[2], tokens)
+        print(f"Budget de {sys.argv[2]}: {usage_meter.get_budget(sys.argv[2])}")
+    else:
+        print("Usage: python -m core.usage_meter set-budget <email> <tokens|default>")
+        sys.exit(1)
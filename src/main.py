@@ -1,24 +1,42 @@
 # main.py
 
 from fastapi import FastAPI, Request, Depends, HTTPException, status
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, StreamingResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import Optional, List, Dict
 from pathlib import Path
 from datetime import timedelta
+import json
 import os
+import time
 import urllib.parse
 
-from core.ai_chatgpt import ChatGPTProvider
-from core.ai_claude import ClaudeProvider
+from core.registry import create_ai_provider, get_auth_provider
 from core.shell_executor import ShellExecutor
 from core.context_store import ContextStore
-from core.environment_manager import EnvironmentManager
-from core.api_manager import APIManager
-from core.profile_manager import ProfileManager
-from core.auth import user_manager, create_access_token, verify_token, ACCESS_TOKEN_EXPIRE_MINUTES
+from core.conversation_store import ConversationStore
+from core.config_store import create_config_managers
+from core.runbook_index import RunbookStore, select_snippets, format_snippets
+from core.metrics import metrics
+from core.response_cache import wrap_with_cache
+from core.ai_router import RoutedProvider
+from core.rate_limiter import get_limiter
+from core.usage_meter import usage_meter, MeteredProvider, BudgetExceededError
+from core.batch_jobs import BatchJobManager
+from core.command_parser import attach_commands
+from core.ai_interface import with_reference
+from core.risk_classifier import classify_command, EXECUTE_RISK_POLICY
+from core.host_facts import host_facts_cache
+from core.prefetch import command_prefetcher, PREFETCH_ENABLED
+from core.agent import AgentLoop, AGENT_MAX_ITERATIONS, AGENT_MAX_SECONDS, AGENT_MAX_TOKENS, AGENT_MAX_RISK
+from core import http_client
+from core.password_hasher import login_rate_limiter, password_hasher, HasherOverloadedError, LoginRateLimitedError
+from core.fileutil import UnreadableFileError
+from core.auth import (user_manager, create_access_token, verify_token, user_claims, user_from_claims,
+                       ACCESS_TOKEN_EXPIRE_MINUTES)
 
 # Load environment variables from the environments/ folder
 try:
@@ -48,10 +66,8 @@ except ImportError:
     print("⚠️  python-dotenv not installed — using system environment variables")
     print("   Install with: pip install python-dotenv")
 
-# Import OAuth providers AFTER load_dotenv so variables are available
-from core.google_auth import google_auth_provider
-from core.microsoft_auth import microsoft_auth_provider
-from core.facebook_auth import facebook_auth_provider
+# OAuth providers are resolved lazily through core.registry (after load_dotenv,
+# so variables are available) — their SDKs are imported on first use only
 
 # ============================================================================
 # Init app
@@ -59,11 +75,20 @@ from core.facebook_auth import facebook_auth_provider
 
 app = FastAPI()
 
+
+@app.on_event("shutdown")
+async def close_http_client():
+    """Ferme le client HTTP partagé des fournisseurs OAuth."""
+    await http_client.aclose()
+
+
 # Base paths
 PROJECT_ROOT = Path(__file__).parent.parent
 USERS_DIR = PROJECT_ROOT / "users"
 GLOBAL_ENVIRONMENTS_DIR = PROJECT_ROOT / "environments"
 GLOBAL_APIS_FILE = PROJECT_ROOT / "apis.json"
+# Runbooks partagés par tous les utilisateurs (fichier géré hors de l'application)
+global_runbooks = RunbookStore(PROJECT_ROOT / "runbooks.json", scope="global")
 
 # Validation error handler
 @app.exception_handler(RequestValidationError)
@@ -77,6 +102,21 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": exc.errors(), "body": body.decode()},
     )
 
+# Authentification : quota de tentatives dépassé ou pool de hachage saturé
+@app.exception_handler(LoginRateLimitedError)
+async def login_rate_limited_handler(request: Request, exc: LoginRateLimitedError):
+    return JSONResponse(status_code=429, content={"detail": str(exc)},
+                        headers={"Retry-After": str(int(exc.retry_after) + 1)})
+
+@app.exception_handler(HasherOverloadedError)
+async def hasher_overloaded_handler(request: Request, exc: HasherOverloadedError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+# Fichier de données illisible : la modification l'écraserait
+@app.exception_handler(UnreadableFileError)
+async def unreadable_file_handler(request: Request, exc: UnreadableFileError):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
 # ============================================================================
 # Sessions utilisateur (per-user state)
 # ============================================================================
@@ -89,14 +129,89 @@ class UserSession:
         self.context_store = ContextStore()
         self.shell_executor = None
         self.ai_provider = None
-        self.env_manager = EnvironmentManager(
-            environments_dir=USERS_DIR / email / "environments"
+        # Fichiers ou base SQLite selon SHELLIA_CONFIG_BACKEND
+        self.env_manager, self.api_manager, self.profile_manager = create_config_managers(
+            email, USERS_DIR / email
+        )
+        self.runbook_store = RunbookStore(
+            runbooks_file=USERS_DIR / email / "runbooks.json"
+        )
+        self.conversation_store = ConversationStore(
+            conversations_dir=USERS_DIR / email / "conversations"
+        )
+        self.batch_manager = BatchJobManager(
+            batches_dir=USERS_DIR / email / "batches", meter=usage_meter, user=email
         )
-        self.api_manager = APIManager(
-            config_file=USERS_DIR / email / "apis.json"
+        # Batches distants soumis avant un redémarrage : l'interrogation reprend
+        self.batch_manager.resume(self.create_ai_provider_for)
+        self.ai_api_ids: List[str] = []
+        # Clé du relevé de l'hôte de l'environnement chargé (cache host_facts)
+        self.host_facts_key: Optional[str] = None
+        # Exécution anticipée des commandes à faible risque proposées par l'IA
+        self.prefetch_enabled = PREFETCH_ENABLED
+
+    def create_ai_provider_for(self, ai_api_id: str):
+        """
+        Instancie le provider IA d'une API, avec comptage d'usage et budget
+        (sans cache ni routage : utilisé aussi pour les jobs batch).
+        """
+        return MeteredProvider(
+            self._build_ai_provider(ai_api_id), usage_meter, user=self.email, api_id=ai_api_id
         )
-        self.profile_manager = ProfileManager(
-            profiles_file=USERS_DIR / email / "profiles.json"
+
+    def _build_ai_provider(self, ai_api_id: str):
+        """Instancie le provider IA correspondant à une API configurée."""
+        api_config = self.api_manager.get_api(ai_api_id)
+        if not api_config:
+            raise ValueError(f"API {ai_api_id} non trouvée dans la configuration")
+
+        ai_provider_type = api_config.get("provider", "chatgpt").lower()
+        api_key = api_config.get("api_key", "")
+
+        if ai_provider_type == "local":
+            # Serveur compatible OpenAI sur le réseau local (clé API facultative)
+            base_url = api_config.get("base_url", "")
+            if not base_url:
+                raise ValueError(f"base_url manquante pour l'API locale {ai_api_id}")
+            return create_ai_provider(
+                "local",
+                base_url=base_url,
+                model=api_config.get("model") or "local",
+                api_key=api_key,
+                context_length=int(api_config.get("context_length") or 8192),
+                max_tokens=int(api_config.get("max_tokens") or 1024),
+                stream=str(api_config.get("stream", True)).lower() not in ("false", "0", "no"),
+                limiter=get_limiter(base_url, max_concurrency=api_config.get("max_concurrency")),
+                user=self.email,
+            )
+
+        if not api_key:
+            raise ValueError(f"Clé API manquante pour {ai_api_id}")
+
+        # Limiteur partagé par tous les utilisateurs de la même clé
+        limiter = get_limiter(
+            api_key,
+            rate=api_config.get("rate_limit_rps"),
+            burst=api_config.get("rate_limit_burst"),
+            max_concurrency=api_config.get("max_concurrency"),
+        )
+
+        # Commandes via appel d'outil natif plutôt qu'un bloc JSON dans le markdown
+        native_commands = str(api_config.get("native_commands", False)).lower() in ("true", "1", "yes")
+
+        if ai_provider_type == "claude":
+            model = api_config.get("model", "claude-sonnet-4-20250514")
+            return create_ai_provider(
+                "claude",
+                api_key=api_key, model=model, base_url=api_config.get("base_url") or None,
+                limiter=limiter, user=self.email, fast_model=api_config.get("fast_model") or None,
+                native_commands=native_commands
+            )
+        return create_ai_provider(
+            "chatgpt",
+            api_key=api_key, model=api_config.get("model") or "gpt-4o-mini",
+            limiter=limiter, user=self.email, fast_model=api_config.get("fast_model") or None,
+            native_commands=native_commands
         )
 
     def init_from_environment(self, env_name: str, ssh_password: Optional[str] = None):
@@ -138,29 +253,40 @@ class UserSession:
         else:
             self.shell_executor = ShellExecutor(mode="local")
 
-        # Init AI Provider
-        ai_api_id = env_data.get("AI_API_ID", "")
-
-        if ai_api_id:
-            api_config = self.api_manager.get_api(ai_api_id)
-            if not api_config:
-                raise ValueError(f"API {ai_api_id} non trouvée dans la configuration")
-
-            ai_provider_type = api_config.get("provider", "chatgpt").lower()
-            api_key = api_config.get("api_key", "")
-
-            if not api_key:
-                raise ValueError(f"Clé API manquante pour {ai_api_id}")
-
-            if ai_provider_type == "claude":
-                model = api_config.get("model", "claude-sonnet-4-20250514")
-                self.ai_provider = ClaudeProvider(api_key=api_key, model=model)
-            else:
-                self.ai_provider = ChatGPTProvider(api_key=api_key)
+        # Résultats anticipés de l'environnement précédent : obsolètes
+        command_prefetcher.invalidate(self.email, reason="environment")
+        self.prefetch_enabled = str(env_data.get("PREFETCH_COMMANDS", PREFETCH_ENABLED)).lower() in ("true", "1", "yes")
+
+        # Relevé de l'hôte en arrière-plan : la première réponse IA connaît déjà le système
+        self.host_facts_key = f"{self.email}:{env_name}"
+        host_facts_cache.gather_async(self.host_facts_key, self.shell_executor)
+
+        # Init AI Provider (AI_API_IDS : liste ordonnée pour le routage multi-APIs)
+        api_ids = [a.strip() for a in env_data.get("AI_API_IDS", "").split(",") if a.strip()]
+        if not api_ids and env_data.get("AI_API_ID", ""):
+            api_ids = [env_data["AI_API_ID"]]
+        self.ai_api_ids = api_ids
+
+        if len(api_ids) == 1:
+            self.ai_provider = self.create_ai_provider_for(api_ids[0])
+        elif api_ids:
+            self.ai_provider = RoutedProvider(
+                [(api_id, self.create_ai_provider_for(api_id)) for api_id in api_ids],
+                policy=env_data.get("AI_ROUTING_POLICY", "failover").lower(),
+                hedge_ms=int(env_data.get("AI_HEDGE_MS", "0") or 0),
+                timeout=float(env_data.get("AI_TIMEOUT", "60") or 60),
+            )
         else:
             # No AI_API_ID configured — AI provider must be set up via the web interface (Settings → APIs)
             self.ai_provider = None
 
+        if self.ai_provider:
+            # Clé du cache : api_id et base_url (type de provider pour l'API officielle)
+            configs = [(api_id, self.api_manager.get_api(api_id) or {}) for api_id in api_ids]
+            endpoints = [(api_id, config.get("base_url") or config.get("provider", ""))
+                         for api_id, config in configs]
+            self.ai_provider = wrap_with_cache(self.ai_provider, user=self.email, endpoints=endpoints)
+
         return env_data
 
 
@@ -168,6 +294,13 @@ class UserSession:
 user_sessions: dict[str, UserSession] = {}
 
 
+@app.on_event("shutdown")
+def stop_batch_jobs():
+    """Interrompt les jobs batch en cours (les batches distants sont repris au redémarrage)."""
+    for session in list(user_sessions.values()):
+        session.batch_manager.shutdown()
+
+
 def get_user_session(email: str) -> UserSession:
     """Récupère ou crée la session d'un utilisateur."""
     if email not in user_sessions:
@@ -229,7 +362,8 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     if not email:
         raise HTTPException(status_code=401, detail="Token invalide")
 
-    user = user_manager.get_user_by_email(email)
+    # Profil signé dans le token, sinon cache mémoire : pas de lecture SQLite par requête
+    user = user_from_claims(payload) or user_manager.get_user_cached(email)
     if not user:
         raise HTTPException(status_code=401, detail="Utilisateur non trouvé")
 
@@ -259,27 +393,32 @@ def login_page():
 @app.get("/auth/config")
 def auth_config():
     """Retourne la configuration d'authentification (providers activés)."""
+    google_auth_provider = get_auth_provider("google")
     return {
         "google_enabled": google_auth_provider.is_enabled(),
         "google_client_id": google_auth_provider.client_id if google_auth_provider.is_enabled() else None,
-        "microsoft_enabled": microsoft_auth_provider.is_enabled(),
-        "facebook_enabled": facebook_auth_provider.is_enabled(),
+        "microsoft_enabled": get_auth_provider("microsoft").is_enabled(),
+        "facebook_enabled": get_auth_provider("facebook").is_enabled(),
     }
 
 
 @app.post("/auth/register")
-def register(req: RegisterRequest):
+async def register(req: RegisterRequest, request: Request):
     """Inscription d'un nouvel utilisateur."""
+    login_rate_limiter.check(request.client.host if request.client else None)
+    # Hachage attendu sans bloquer de thread de requête
+    hashed_password = await password_hasher.hash_async(req.password) if req.password else None
     try:
-        user = user_manager.create_user(
+        user = await run_in_threadpool(
+            user_manager.create_user,
             email=req.email,
-            password=req.password,
-            full_name=req.full_name
+            full_name=req.full_name,
+            hashed_password=hashed_password,
         )
 
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": user["email"]},
+            data={"sub": user["email"], **user_claims(user)},
             expires_delta=access_token_expires
         )
 
@@ -294,16 +433,19 @@ def register(req: RegisterRequest):
 
 
 @app.post("/auth/login")
-def login(req: LoginRequest):
+async def login(req: LoginRequest, request: Request):
     """Connexion avec email et mot de passe."""
-    user = user_manager.authenticate_user(req.email, req.password)
+    # Avant tout hachage : une rafale de tentatives est rejetée sans coût CPU.
+    # request.client.host est l'IP du client si uvicorn fait confiance au proxy (FORWARDED_ALLOW_IPS)
+    login_rate_limiter.check(request.client.host if request.client else None, req.email)
+    user = await user_manager.authenticate_user_async(req.email, req.password)
 
     if not user:
         raise HTTPException(status_code=401, detail="Email ou mot de passe incorrect")
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["email"]},
+        data={"sub": user["email"], **user_claims(user)},
         expires_delta=access_token_expires
     )
 
@@ -317,6 +459,7 @@ def login(req: LoginRequest):
 @app.post("/auth/google")
 def google_login(req: GoogleAuthRequest):
     """Connexion avec Google OpenID."""
+    google_auth_provider = get_auth_provider("google")
     if not google_auth_provider.is_enabled():
         raise HTTPException(status_code=400, detail="Authentification Google non configurée")
 
@@ -345,7 +488,7 @@ def google_login(req: GoogleAuthRequest):
 
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["email"]},
+        data={"sub": user["email"], **user_claims(user)},
         expires_delta=access_token_expires
     )
 
@@ -359,6 +502,7 @@ def google_login(req: GoogleAuthRequest):
 @app.get("/auth/microsoft/login")
 def microsoft_login(request: Request):
     """Redirige vers la page de connexion Microsoft."""
+    microsoft_auth_provider = get_auth_provider("microsoft")
     if not microsoft_auth_provider.is_enabled():
         raise HTTPException(status_code=400, detail="Authentification Microsoft non configurée")
 
@@ -370,6 +514,7 @@ def microsoft_login(request: Request):
 @app.get("/auth/microsoft/callback")
 def microsoft_callback(request: Request):
     """Callback après authentification Microsoft."""
+    microsoft_auth_provider = get_auth_provider("microsoft")
     if not microsoft_auth_provider.is_enabled():
         raise HTTPException(status_code=400, detail="Authentification Microsoft non configurée")
 
@@ -401,7 +546,7 @@ def microsoft_callback(request: Request):
     # Créer un token JWT
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["email"]},
+        data={"sub": user["email"], **user_claims(user)},
         expires_delta=access_token_expires
     )
 
@@ -413,6 +558,7 @@ def microsoft_callback(request: Request):
 @app.get("/auth/facebook/login")
 def facebook_login(request: Request):
     """Redirige vers la page de connexion Facebook."""
+    facebook_auth_provider = get_auth_provider("facebook")
     if not facebook_auth_provider.is_enabled():
         raise HTTPException(status_code=400, detail="Authentification Facebook non configurée")
 
@@ -422,8 +568,9 @@ def facebook_login(request: Request):
 
 
 @app.get("/auth/facebook/callback")
-def facebook_callback(request: Request):
+async def facebook_callback(request: Request):
     """Callback après authentification Facebook."""
+    facebook_auth_provider = get_auth_provider("facebook")
     if not facebook_auth_provider.is_enabled():
         raise HTTPException(status_code=400, detail="Authentification Facebook non configurée")
 
@@ -434,19 +581,21 @@ def facebook_callback(request: Request):
         error = request.query_params.get("error_description", "Authentification annulée")
         return RedirectResponse(url=f"/login?error={urllib.parse.quote(error)}")
 
-    fb_user = facebook_auth_provider.verify_facebook_callback(code, redirect_uri)
+    # Appels HTTP asynchrones : aucun thread du pool bloqué pendant l'échange OAuth
+    fb_user = await facebook_auth_provider.verify_facebook_callback(code, redirect_uri)
 
     if not fb_user:
         return RedirectResponse(url="/login?error=facebook_auth_failed")
 
     email = fb_user["email"]
 
-    # Vérifier si l'utilisateur existe déjà
-    user = user_manager.get_user_by_email(email)
+    # Vérifier si l'utilisateur existe déjà (SQLite : hors de la boucle asyncio)
+    user = await run_in_threadpool(user_manager.get_user_by_email, email)
 
     if not user:
         try:
-            user = user_manager.create_user(
+            user = await run_in_threadpool(
+                user_manager.create_user,
                 email=email,
                 google_id=fb_user.get("facebook_id"),
                 full_name=fb_user.get("full_name")
@@ -457,7 +606,7 @@ def facebook_callback(request: Request):
     # Créer un token JWT
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user["email"]},
+        data={"sub": user["email"], **user_claims(user)},
         expires_delta=access_token_expires
     )
 
@@ -472,18 +621,69 @@ def get_me(current_user: dict = Depends(get_current_user)):
     return current_user
 
 
+@app.get("/metrics")
+def get_metrics(current_user: dict = Depends(get_current_user)):
+    """Retourne les métriques internes (tokens, cache de prompt, latences...)."""
+    return metrics.snapshot()
+
+
 # ============================================================================
 # Endpoints protégés - IA et Exécution
 # ============================================================================
 
 class AiRequest(BaseModel):
     message: str
+    # Déprécié : préférer conversation_id (l'historique est conservé côté serveur)
     chat_history: Optional[List[Dict]] = None
+    conversation_id: Optional[str] = None
     profile_id: Optional[str] = None
 
 
 class ExecuteRequest(BaseModel):
     command: str
+    # Confirmation explicite d'une commande à risque élevé (EXECUTE_RISK_POLICY=confirm_high)
+    confirm: bool = False
+
+
+class RiskRequest(BaseModel):
+    commands: List[str]
+
+
+def _build_system_profile(session: UserSession, profile_id: Optional[str]) -> Optional[str]:
+    """Prompt du profil actif : stable d'une question à l'autre (system prompt mis en cache)."""
+    if profile_id:
+        profile = session.profile_manager.get_profile(profile_id)
+        if profile:
+            return profile.get("prompt")
+    return None
+
+
+def _build_reference(session: UserSession, question: str) -> Optional[str]:
+    """
+    Extraits de runbooks pertinents pour la question et relevé de l'hôte s'il
+    est disponible. Ils changent à chaque question : ils sont joints au
+    dernier message utilisateur (with_reference), pas au system prompt.
+    """
+    parts = []
+    # Quelques extraits de runbooks seulement, dans la limite de RUNBOOK_TOKEN_BUDGET
+    runbooks = format_snippets(select_snippets(question, [session.runbook_store, global_runbooks]))
+    if runbooks:
+        parts.append(runbooks)
+
+    # Caractéristiques de l'hôte (OS, init, ressources) si le relevé est disponible
+    if session.host_facts_key:
+        # Relevé expiré : renouvelé en arrière-plan, l'ancien est servi en attendant
+        facts_summary = host_facts_cache.summary(session.host_facts_key, session.shell_executor)
+        if facts_summary:
+            parts.append(facts_summary)
+    return "\n\n".join(parts) or None
+
+
+def _resolve_conversation(session: UserSession, conversation_id: Optional[str]) -> str:
+    """Conversation existante, ou nouvelle si l'identifiant est absent ou inconnu."""
+    if not conversation_id or not session.conversation_store.exists(conversation_id):
+        conversation_id = session.conversation_store.create_conversation()
+    return conversation_id
 
 
 @app.post("/ai/suggest")
@@ -492,35 +692,258 @@ def ai_suggest(req: AiRequest, current_user: dict = Depends(get_current_user)):
     if not session.ai_provider:
         raise HTTPException(status_code=400, detail="Aucun provider IA configuré. Chargez un environnement.")
 
+    # Refus immédiat si le budget de tokens du jour est épuisé (aucun appel réseau)
+    try:
+        usage_meter.check_budget(current_user["email"])
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
     context = session.context_store.get()
-    chat_history = req.chat_history or []
 
-    # Récupérer le prompt du profil actif si spécifié
-    system_profile = None
-    if req.profile_id:
-        profile = session.profile_manager.get_profile(req.profile_id)
-        if profile:
-            system_profile = profile.get("prompt")
+    # Historique : conservé côté serveur, sauf si un client legacy l'envoie encore
+    conversation_id = None
+    if req.chat_history is not None:
+        chat_history = req.chat_history
+    else:
+        conversation_id = _resolve_conversation(session, req.conversation_id)
+        chat_history = session.conversation_store.get_history(conversation_id)
+
+    system_profile = _build_system_profile(session, req.profile_id)
 
     result = session.ai_provider.ask(
         context=context,
-        user_message=req.message,
+        user_message=with_reference(req.message, _build_reference(session, req.message)),
         chat_history=chat_history,
         system_profile=system_profile
     )
+    # Providers tiers (registre) : extraction côté serveur si elle n'a pas été faite
+    if "commands" not in result:
+        attach_commands(result)
+
+    # Les commandes en lecture seule sont lancées avant le clic de l'utilisateur
+    if session.prefetch_enabled and result.get("commands"):
+        command_prefetcher.prefetch(session.email, session.shell_executor, result["commands"])
+
+    if conversation_id:
+        session.conversation_store.append(conversation_id, "user", req.message)
+        session.conversation_store.append(conversation_id, "assistant", result.get("markdown", ""))
+        result["conversation_id"] = conversation_id
+
     return result
 
 
+class AgentRequest(BaseModel):
+    message: str
+    conversation_id: Optional[str] = None
+    profile_id: Optional[str] = None
+    # Budgets demandés (bornés par les plafonds AGENT_* du serveur)
+    max_risk: Optional[str] = None
+    max_iterations: Optional[int] = None
+    max_seconds: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+
+@app.post("/ai/agent")
+def ai_agent(req: AgentRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Mode agent : le serveur enchaîne lui-même proposition IA et exécution des
+    commandes à faible risque. Chaque étape est diffusée en NDJSON.
+    """
+    session = get_user_session(current_user["email"])
+    if not session.ai_provider:
+        raise HTTPException(status_code=400, detail="Aucun provider IA configuré. Chargez un environnement.")
+    if not session.shell_executor:
+        raise HTTPException(status_code=400, detail="Aucun shell configuré. Chargez un environnement.")
+    try:
+        usage_meter.check_budget(current_user["email"])
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    # L'agent exécute lui-même des commandes dans la session
+    command_prefetcher.invalidate(session.email, reason="state_changed")
+
+    conversation_id = _resolve_conversation(session, req.conversation_id)
+    agent = AgentLoop(
+        provider=session.ai_provider,
+        executor=session.shell_executor,
+        context_store=session.context_store,
+        max_iterations=req.max_iterations or AGENT_MAX_ITERATIONS,
+        max_seconds=req.max_seconds or AGENT_MAX_SECONDS,
+        max_tokens=req.max_tokens or AGENT_MAX_TOKENS,
+        max_risk_level=(req.max_risk or AGENT_MAX_RISK).lower(),
+        system_profile=_build_system_profile(session, req.profile_id),
+        reference=_build_reference(session, req.message),
+        chat_history=session.conversation_store.get_history(conversation_id),
+    )
+
+    def stream():
+        try:
+            for event in agent.run(req.message):
+                if event["type"] == "done":
+                    event["conversation_id"] = conversation_id
+                yield json.dumps(event, ensure_ascii=False) + "\n"
+        finally:
+            # Conserver les tours de l'agent, même si le client s'est déconnecté
+            for turn in agent.transcript:
+                session.conversation_store.append(conversation_id, turn["role"], turn["content"])
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/usage")
+def get_usage(group_by: str = "hour,api_id,model", hours: int = 24,
+              current_user: dict = Depends(get_current_user)):
+    """Agrégats d'usage IA de l'utilisateur (tokens, latences) sur les dernières heures."""
+    try:
+        return usage_meter.rollup(
+            group_by=[g.strip() for g in group_by.split(",") if g.strip()],
+            since=int(time.time()) - hours * 3600,
+            user=current_user["email"],
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/usage/budget")
+def get_usage_budget(current_user: dict = Depends(get_current_user)):
+    """Budget quotidien de tokens et consommation du jour."""
+    return usage_meter.get_budget(current_user["email"])
+
+
+@app.get("/conversations")
+def list_conversations(current_user: dict = Depends(get_current_user)):
+    """Liste les conversations IA de l'utilisateur."""
+    session = get_user_session(current_user["email"])
+    return session.conversation_store.list_conversations()
+
+
+@app.get("/conversations/{conversation_id}")
+def get_conversation(conversation_id: str, before: Optional[int] = None, limit: int = 50,
+                     current_user: dict = Depends(get_current_user)):
+    """Retourne une page de messages (chargement paresseux des anciens tours)."""
+    session = get_user_session(current_user["email"])
+    page = session.conversation_store.get_page(conversation_id, before=before, limit=min(limit, 200))
+    if page is None:
+        raise HTTPException(status_code=404, detail="Conversation non trouvée")
+    return page
+
+
+@app.delete("/conversations/{conversation_id}")
+def delete_conversation(conversation_id: str, current_user: dict = Depends(get_current_user)):
+    session = get_user_session(current_user["email"])
+    success = session.conversation_store.delete_conversation(conversation_id)
+    return {"success": success, "message": "Conversation supprimée" if success else "Conversation non trouvée"}
+
+
+class BatchItem(BaseModel):
+    question: str
+    context: Optional[List[Dict]] = None
+    id: Optional[str] = None
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    profile_id: Optional[str] = None
+
+
+@app.post("/batch")
+def create_batch(req: BatchRequest, current_user: dict = Depends(get_current_user)):
+    """Soumet un lot d'analyses (API batch du fournisseur, sinon appels interactifs bornés)."""
+    session = get_user_session(current_user["email"])
+    if not session.ai_api_ids:
+        raise HTTPException(status_code=400, detail="Aucun provider IA configuré. Chargez un environnement.")
+
+    try:
+        usage_meter.check_budget(current_user["email"])
+    except BudgetExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+    system_profile = None
+    if req.profile_id:
+        profile = session.profile_manager.get_profile(req.profile_id)
+        if profile:
+            system_profile = profile.get("prompt")
+
+    # API principale, sans cache ni routage : le lot part en une seule soumission
+    api_id = session.ai_api_ids[0]
+    try:
+        provider = session.create_ai_provider_for(api_id)
+        items = [
+            {"question": item.question, "context": item.context or [],
+             "id": item.id, "system_profile": system_profile}
+            for item in req.items
+        ]
+        return session.batch_manager.submit(provider, items, api_id=api_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/batch")
+def list_batches(current_user: dict = Depends(get_current_user)):
+    """Liste les jobs batch de l'utilisateur."""
+    session = get_user_session(current_user["email"])
+    return session.batch_manager.list_jobs()
+
+
+@app.get("/batch/{job_id}")
+def get_batch(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Statut et résultats disponibles d'un job batch."""
+    session = get_user_session(current_user["email"])
+    job = session.batch_manager.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job batch non trouvé")
+    return job
+
+
 @app.post("/execute")
 def execute(req: ExecuteRequest, current_user: dict = Depends(get_current_user)):
     session = get_user_session(current_user["email"])
     if not session.shell_executor:
         raise HTTPException(status_code=400, detail="Aucun shell configuré. Chargez un environnement.")
-    result = session.shell_executor.execute(req.command)
+
+    # Évaluation locale du risque, sans appel à l'IA
+    risk = classify_command(req.command)
+    if risk["level"] == "high":
+        if EXECUTE_RISK_POLICY == "block_high":
+            raise HTTPException(status_code=403, detail={
+                "message": "Commande à risque élevé refusée par la politique du serveur", "risk": risk})
+        if EXECUTE_RISK_POLICY == "confirm_high" and not req.confirm:
+            raise HTTPException(status_code=409, detail={
+                "message": "Commande à risque élevé : confirmation requise", "risk": risk})
+
+    result = None
+    if session.prefetch_enabled:
+        if risk["level"] == "low":
+            result = command_prefetcher.claim(session.email, req.command)
+        else:
+            # La commande peut modifier l'hôte : les résultats anticipés ne sont plus fiables
+            command_prefetcher.invalidate(session.email, reason="state_changed")
+    if result is None:
+        result = session.shell_executor.execute(req.command)
     session.context_store.add(req.command, result["stdout"], result["stderr"])
+    result["risk"] = risk
     return result
 
 
+@app.get("/host-facts")
+def get_host_facts(refresh: bool = False, current_user: dict = Depends(get_current_user)):
+    """Relevé de l'hôte de l'environnement chargé (refresh=true pour le renouveler)."""
+    session = get_user_session(current_user["email"])
+    if not session.shell_executor or not session.host_facts_key:
+        raise HTTPException(status_code=400, detail="Aucun shell configuré. Chargez un environnement.")
+    if refresh:
+        facts = host_facts_cache.gather(session.host_facts_key, session.shell_executor)
+    else:
+        facts = host_facts_cache.get(session.host_facts_key)
+    return {"facts": facts, "summary": host_facts_cache.summary(session.host_facts_key)}
+
+
+@app.post("/risk")
+def classify_commands(req: RiskRequest, current_user: dict = Depends(get_current_user)):
+    """Évalue le risque de commandes (low / medium / high) sans les exécuter."""
+    return [{"command": command, **classify_command(command)} for command in req.commands[:500]]
+
+
 # ============================================================================
 # Endpoints protégés - Gestion des APIs IA
 # ============================================================================
@@ -654,7 +1077,7 @@ def load_environment(env_name: str, body: LoadEnvironmentBody = LoadEnvironmentB
             "execution_mode": execution_mode
         }
 
-        ai_api_id = env_data.get("AI_API_ID", "")
+        ai_api_id = env_data.get("AI_API_ID", "") or env_data.get("AI_API_IDS", "").split(",")[0].strip()
         if ai_api_id:
             api_config = session.api_manager.get_api(ai_api_id)
             if api_config:
@@ -717,3 +1140,57 @@ def delete_profile(profile_id: str, current_user: dict = Depends(get_current_use
     session = get_user_session(current_user["email"])
     success = session.profile_manager.delete_profile(profile_id)
     return {"success": success, "message": "Profil supprimé" if success else "Profil non trouvé"}
+
+
+# ============================================================================
+# Endpoints protégés - Runbooks (extraits injectés dans le prompt)
+# ============================================================================
+
+class RunbookData(BaseModel):
+    title: str
+    content: str
+    tags: Optional[List[str]] = None
+
+
+@app.get("/runbooks")
+def list_runbooks(current_user: dict = Depends(get_current_user)):
+    """Runbooks de l'utilisateur et runbooks partagés (scope user / global)."""
+    session = get_user_session(current_user["email"])
+    return session.runbook_store.list_runbooks() + global_runbooks.list_runbooks()
+
+
+@app.get("/runbooks/search")
+def search_runbooks(q: str, current_user: dict = Depends(get_current_user)):
+    """Extraits qui seraient ajoutés au prompt pour cette question."""
+    session = get_user_session(current_user["email"])
+    return select_snippets(q, [session.runbook_store, global_runbooks])
+
+
+@app.get("/runbooks/{runbook_id}")
+def get_runbook(runbook_id: str, current_user: dict = Depends(get_current_user)):
+    session = get_user_session(current_user["email"])
+    runbook = session.runbook_store.get_runbook(runbook_id) or global_runbooks.get_runbook(runbook_id)
+    if runbook is None:
+        raise HTTPException(status_code=404, detail="Runbook non trouvé")
+    return runbook
+
+
+@app.post("/runbooks/{runbook_id}")
+def create_runbook(runbook_id: str, payload: RunbookData, current_user: dict = Depends(get_current_user)):
+    session = get_user_session(current_user["email"])
+    success = session.runbook_store.create_runbook({"id": runbook_id, **payload.model_dump(exclude_none=True)})
+    return {"success": success, "message": "Runbook créé" if success else "ID déjà utilisé"}
+
+
+@app.put("/runbooks/{runbook_id}")
+def update_runbook(runbook_id: str, payload: RunbookData, current_user: dict = Depends(get_current_user)):
+    session = get_user_session(current_user["email"])
+    success = session.runbook_store.update_runbook(runbook_id, payload.model_dump(exclude_none=True))
+    return {"success": success, "message": "Runbook mis à jour" if success else "Runbook non trouvé"}
+
+
+@app.delete("/runbooks/{runbook_id}")
+def delete_runbook(runbook_id: str, current_user: dict = Depends(get_current_user)):
+    session = get_user_session(current_user["email"])
+    success = session.runbook_store.delete_runbook(runbook_id)
+    return {"success": success, "message": "Runbook supprimé" if success else "Runbook non trouvé"}
@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+SRC_DIR = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(SRC_DIR))
+
+os.environ.setdefault("SECRET_KEY", "test-secret")
+# core.auth ouvre sa base au chargement : jamais celle de data/ pendant les tests
+os.environ.setdefault("USERS_DB_PATH", str(Path(tempfile.mkdtemp()) / "users.db"))
@@ -0,0 +1,116 @@
+from core.agent import AgentLoop
+
+STATE_CHANGING = [
+    "date -s 2020-01-01",
+    "hostname evil",
+    "hostnamectl set-hostname x",
+    "ifconfig eth0 down",
+    "sort -o /etc/passwd /tmp/x",
+    "dmesg -C",
+    "timedatectl set-timezone UTC",
+    "find / -fprint /tmp/x",
+    "ss -K dst 10.0.0.1",
+    "openssl genrsa -out /tmp/key.pem 2048",
+]
+
+
+class FakeProvider:
+    def __init__(self, commands):
+        self.answers = [commands, []]
+
+    def ask(self, context, user_message, chat_history=None, system_profile=None):
+        commands = self.answers.pop(0) if self.answers else []
+        return {"markdown": "diagnostic", "commands": [dict(c) for c in commands],
+                "usage": {"input_tokens": 10, "output_tokens": 5}}
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.executed = []
+
+    def execute(self, command, timeout=30):
+        self.executed.append(command)
+        return {"stdout": "ok", "stderr": "", "return_code": 0}
+
+
+class FakeContext:
+    def get(self):
+        return ""
+
+    def add(self, command, stdout, stderr):
+        pass
+
+
+def run_agent(commands):
+    executor = FakeExecutor()
+    loop = AgentLoop(FakeProvider(commands), executor, FakeContext(), max_risk_level="low")
+    events = list(loop.run("check the host"))
+    return executor, events
+
+
+def test_state_changing_commands_labelled_low_are_not_run():
+    commands = [{"cmd": cmd, "risk": "low"} for cmd in STATE_CHANGING]
+    executor, events = run_agent(commands)
+
+    assert executor.executed == []
+    skipped = [e["cmd"] for e in events if e["type"] == "skipped"]
+    assert skipped == STATE_CHANGING
+    assert events[-1]["reason"] == "approval_required"
+
+
+def test_read_only_commands_are_run():
+    commands = [{"cmd": "df -h", "risk": "low"}, {"cmd": "hostname evil", "risk": "low"},
+                {"cmd": "systemctl status nginx", "risk": "low"}]
+    executor, events = run_agent(commands)
+
+    assert executor.executed == ["df -h", "systemctl status nginx"]
+    assert [e["cmd"] for e in events if e["type"] == "skipped"] == ["hostname evil"]
+    assert events[-1]["reason"] == "answered"
+    assert events[-1]["tokens"] == 30
+
+
+class RecordingProvider(FakeProvider):
+    def __init__(self, commands):
+        super().__init__(commands)
+        self.calls = []
+
+    def ask(self, context, user_message, chat_history=None, system_profile=None):
+        self.calls.append((user_message, system_profile))
+        return super().ask(context, user_message, chat_history, system_profile)
+
+
+def test_reference_sent_with_the_first_message_only():
+    provider = RecordingProvider([{"cmd": "df -h", "risk": "low"}])
+    loop = AgentLoop(provider, FakeExecutor(), FakeContext(), system_profile="profile",
+                     reference="## Runbook: disk full")
+    list(loop.run("disk full"))
+
+    first, second = provider.calls
+    assert "## Runbook: disk full" in first[0]
+    assert "## Runbook: disk full" not in second[0]
+    assert first[1] == second[1] == "profile"
+    assert all("## Runbook" not in turn["content"] for turn in loop.transcript)
+
+
+class EndlessProvider(FakeProvider):
+    """Propose toujours une commande : seul un budget arrête la boucle."""
+
+    def __init__(self):
+        super().__init__([])
+
+    def ask(self, context, user_message, chat_history=None, system_profile=None):
+        self.answers = [[{"cmd": "uptime", "risk": "low"}]]
+        return super().ask(context, user_message, chat_history, system_profile)
+
+
+def test_loop_stops_on_the_token_budget():
+    executor = FakeExecutor()
+    loop = AgentLoop(EndlessProvider(), executor, FakeContext(), max_risk_level="low",
+                     max_iterations=10, max_tokens=40)
+    events = list(loop.run("check the host"))
+
+    # 15 tokens par appel : le budget de 40 est atteint après le troisième
+    assert [e["tokens"] for e in events if e["type"] == "ai"] == [15, 30, 45]
+    assert executor.executed == ["uptime"] * 3
+    assert events[-1]["reason"] == "tokens"
+    assert events[-1]["iterations"] == 3
@@ -0,0 +1,82 @@
+import json
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+
+from core.ai_chatgpt import ChatGPTProvider
+from core.ai_interface import BatchFailedError
+
+
+def make_provider(error):
+    def create(**params):
+        raise error
+
+    provider = ChatGPTProvider(api_key="sk-test")
+    provider.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return provider
+
+
+def test_api_error_is_returned_as_error_result():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    provider = make_provider(openai.APIConnectionError(request=request))
+
+    result = provider.ask(context=[], user_message="df -h ?")
+
+    assert result["error"]
+    assert result["commands"] == []
+    assert result["markdown"].startswith("## ❌ Erreur API OpenAI")
+
+
+def test_rate_limit_after_retries_is_returned_as_error_result():
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(429, request=request, headers={"retry-after": "0"})
+    provider = make_provider(openai.RateLimitError("rate limited", response=response, body=None))
+
+    result = provider.ask(context=[], user_message="df -h ?")
+
+    assert "rate limited" in result["error"]
+
+
+class FakeBatches:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.calls = 0
+
+    def retrieve(self, batch_id):
+        self.calls += 1
+        status = self.statuses.pop(0)
+        if isinstance(status, Exception):
+            raise status
+        return SimpleNamespace(status=status, output_file_id="out", error_file_id=None)
+
+
+def make_batch_provider(statuses, lines=()):
+    provider = ChatGPTProvider(api_key="sk-test")
+    batches = FakeBatches(statuses)
+    content = SimpleNamespace(text="\n".join(json.dumps(line) for line in lines))
+    provider.client = SimpleNamespace(batches=batches,
+                                      files=SimpleNamespace(content=lambda file_id: content))
+    return provider, batches
+
+
+@pytest.mark.parametrize("status", ["failed", "expired", "cancelled"])
+def test_terminal_batch_status_raises_batch_failed(status):
+    provider, _ = make_batch_provider([status])
+    with pytest.raises(BatchFailedError, match=status):
+        provider.poll_batch("batch-1")
+
+
+def test_poll_batch_retries_rate_limits(monkeypatch):
+    monkeypatch.setattr("core.rate_limiter.time.sleep", lambda seconds: None)
+    request = httpx.Request("GET", "https://api.openai.com/v1/batches/batch-1")
+    response = httpx.Response(429, request=request, headers={"retry-after": "0"})
+    line = {"custom_id": "item-0", "response": {"status_code": 200, "body": {
+        "model": "gpt-4o", "choices": [{"message": {"role": "assistant", "content": "ok"}}]}}}
+    provider, batches = make_batch_provider(
+        [openai.RateLimitError("rate limited", response=response, body=None), "in_progress", "completed"], [line])
+
+    assert provider.poll_batch("batch-1") is None
+    assert batches.calls == 2
+    assert provider.poll_batch("batch-1")["item-0"]["markdown"].startswith("ok")
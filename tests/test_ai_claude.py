@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+
+from core.ai_claude import CACHE_CONTROL, ClaudeProvider
+from core.metrics import metrics
+
+
+class FakeMessages:
+    def __init__(self, usage):
+        self.usage = usage
+        self.requests = []
+
+    def create(self, **params):
+        self.requests.append(params)
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text="Utilisez `df -h`.")],
+            usage=SimpleNamespace(**self.usage),
+        )
+
+
+def make_provider(**usage):
+    provider = ClaudeProvider(api_key="sk-ant-test", model="claude-test")
+    provider.client = SimpleNamespace(messages=FakeMessages(
+        {"input_tokens": 20, "output_tokens": 10, "cache_creation_input_tokens": 0,
+         "cache_read_input_tokens": 0, **usage}))
+    return provider
+
+
+def counter(name):
+    return sum(c["value"] for c in metrics.snapshot()["counters"].get(name, []))
+
+
+def cached_blocks(params):
+    """(emplacement, texte) des blocs portant cache_control."""
+    marked = [("system", b["text"]) for b in params["system"] if b.get("cache_control") == CACHE_CONTROL]
+    for i, message in enumerate(params["messages"]):
+        if isinstance(message["content"], list):
+            marked += [(f"messages[{i}]", b["text"]) for b in message["content"]
+                       if b.get("cache_control") == CACHE_CONTROL]
+    return marked
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_cache_breakpoint_on_static_prompt_without_profile_or_history():
+    provider = make_provider()
+    provider.ask(context=[], user_message="Espace disque ?")
+    params = provider.client.messages.requests[0]
+
+    assert len(params["system"]) == 1
+    assert [where for where, _ in cached_blocks(params)] == ["system"]
+    assert params["messages"] == [{"role": "user", "content": "Espace disque ?"}]
+
+
+def test_cache_breakpoints_on_profile_and_history_prefix():
+    provider = make_provider(cache_read_input_tokens=1500, cache_creation_input_tokens=300)
+    history = [{"role": "user", "content": "q1"}, {"role": "assistant", "content": "r1"},
+               {"role": "user", "content": "q2"}, {"role": "assistant", "content": "r2"}]
+    result = provider.ask(context=[], user_message="q3", chat_history=history,
+                          system_profile="Serveurs web nginx")
+    params = provider.client.messages.requests[0]
+
+    # Prompt statique sans marqueur, profil marqué, puis fin de l'historique marquée
+    assert "cache_control" not in params["system"][0]
+    assert cached_blocks(params) == [("system", "**Active profile context:**\nServeurs web nginx"),
+                                     ("messages[3]", "r2")]
+    assert [m["content"] for m in params["messages"][:3]] == ["q1", "r1", "q2"]
+    assert params["messages"][-1] == {"role": "user", "content": "q3"}
+
+    # Les compteurs de cache atteignent le résultat et les métriques
+    assert result["usage"]["cache_read_input_tokens"] == 1500
+    assert result["usage"]["cache_creation_input_tokens"] == 300
+    assert counter("ai_prompt_cache_read_tokens") == 1500
+    assert counter("ai_prompt_cache_write_tokens") == 300
+    assert counter("ai_input_tokens") == 20
+    assert [c["labels"]["outcome"] for c in metrics.snapshot()["counters"]["ai_prompt_cache_requests"]] == ["hit"]
+
+
+def test_cache_miss_is_counted():
+    provider = make_provider(cache_creation_input_tokens=1200)
+    provider.ask(context=[], user_message="uptime ?")
+    assert counter("ai_prompt_cache_write_tokens") == 1200
+    assert counter("ai_prompt_cache_read_tokens") == 0
+    assert [c["labels"]["outcome"] for c in metrics.snapshot()["counters"]["ai_prompt_cache_requests"]] == ["miss"]
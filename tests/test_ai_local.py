@@ -0,0 +1,138 @@
+import json
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core import ai_local
+from core.ai_local import LocalProvider
+
+
+def sse(*chunks):
+    return [f"data: {json.dumps(c)}" for c in chunks] + ["data: [DONE]"]
+
+
+class StubServer:
+    """Serveur local compatible OpenAI : SSE si "stream" est demandé, JSON sinon."""
+
+    def __init__(self):
+        self.requests = []
+        self.stream_lines = []
+        self.completion = {}
+        self.status = 200
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                payload = json.loads(body)
+                server.requests.append({"path": self.path, "headers": dict(self.headers),
+                                        "payload": payload})
+                if server.status != 200:
+                    self.send_response(server.status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if payload.get("stream"):
+                    data = "".join(f"{line}\n\n" for line in server.stream_lines).encode()
+                    content_type = "text/event-stream"
+                else:
+                    data = json.dumps(server.completion).encode()
+                    content_type = "application/json"
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = StubServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture(params=["httpx", "urllib"])
+def transport(request, monkeypatch):
+    """Exécute chaque test avec httpx puis avec le repli urllib."""
+    if request.param == "urllib":
+        monkeypatch.setattr(ai_local, "_HAS_HTTPX", False)
+        monkeypatch.setattr(ai_local, "urllib", urllib, raising=False)
+    elif not ai_local._HAS_HTTPX:
+        pytest.skip("httpx non installé")
+    return request.param
+
+
+def test_stream_requests_and_reads_usage(server, transport):
+    server.stream_lines = [": keep-alive"] + sse(
+        {"choices": [{"delta": {"content": "Disk "}}]},
+        {"choices": [{"delta": {"content": "is fine."}}]},
+        {"choices": [], "usage": {"prompt_tokens": 120, "completion_tokens": 4}},
+    )
+    provider = LocalProvider(server.url, api_key="secret", stream=True)
+    result = provider.ask([], "df -h?")
+
+    sent = server.requests[0]
+    assert sent["path"] == "/v1/chat/completions"
+    assert sent["headers"]["Authorization"] == "Bearer secret"
+    assert sent["payload"]["stream"] is True
+    assert sent["payload"]["stream_options"] == {"include_usage": True}
+    assert result["markdown"] == "Disk is fine."
+    assert result["usage"] == {"input_tokens": 120, "output_tokens": 4}
+    assert "time_to_first_token" in result
+
+
+def test_stream_extracts_commands(server, transport):
+    block = '```json\n{"commands": [{"cmd": "df -h", "risk": "low", "description": "disk"}]}\n```'
+    server.stream_lines = sse(*({"choices": [{"delta": {"content": block[i:i + 7]}}]}
+                                for i in range(0, len(block), 7)))
+    result = LocalProvider(server.url, stream=True).ask([], "disk?")
+
+    assert [c["cmd"] for c in result["commands"]] == ["df -h"]
+
+
+def test_usage_is_estimated_when_the_server_sends_none(server, transport):
+    server.stream_lines = sse({"choices": [{"delta": {"content": "x" * 40}}]})
+    result = LocalProvider(server.url, stream=True).ask([], "df -h?")
+
+    assert result["usage"]["estimated"] is True
+    assert result["usage"]["output_tokens"] == 10
+    assert result["usage"]["input_tokens"] > 0
+
+
+def test_non_streaming_path(server, transport):
+    server.completion = {
+        "choices": [{"message": {"content": "All good."}}],
+        "usage": {"prompt_tokens": 50, "completion_tokens": 3},
+    }
+    result = LocalProvider(server.url + "/v1", model="llama", stream=False).ask([], "uptime?")
+
+    sent = server.requests[0]
+    assert sent["path"] == "/v1/chat/completions"
+    assert sent["payload"]["stream"] is False
+    assert "stream_options" not in sent["payload"]
+    assert sent["payload"]["model"] == "llama"
+    assert "Authorization" not in sent["headers"]
+    assert result["markdown"] == "All good."
+    assert result["usage"] == {"input_tokens": 50, "output_tokens": 3}
+
+
+def test_server_error_is_reported(server, transport):
+    server.status = 500
+    result = LocalProvider(server.url, stream=False).ask([], "uptime?")
+
+    assert result["commands"] == []
+    assert "500" in result["error"]
@@ -0,0 +1,85 @@
+import time
+
+import pytest
+
+from core.ai_router import RoutedProvider
+from core.metrics import metrics
+
+
+class SleepyProvider:
+    def __init__(self, delay, answer="ok", error=None):
+        self.delay = delay
+        self.answer = answer
+        self.error = error
+        self.calls = 0
+
+    def ask(self, context, user_message, chat_history=None, system_profile=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise RuntimeError(self.error)
+        return {"markdown": self.answer}
+
+
+def attempts():
+    counters = metrics.snapshot()["counters"].get("ai_route_attempts", [])
+    return sorted((c["labels"]["api_id"], c["labels"]["outcome"], c["value"]) for c in counters)
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_failover_on_error():
+    router = RoutedProvider([("a", SleepyProvider(0, error="boom")), ("b", SleepyProvider(0, "from b"))])
+    result = router.ask([], "uptime?")
+    assert result["markdown"] == "from b" and result["api_id"] == "b"
+    assert attempts() == [("a", "error", 1), ("b", "ok", 1)]
+
+
+def test_timed_out_attempt_is_counted_once():
+    slow = SleepyProvider(0.5, "late")
+    router = RoutedProvider([("slow", slow), ("fast", SleepyProvider(0, "from fast"))], timeout=0.1)
+    result = router.ask([], "uptime?")
+    assert result["api_id"] == "fast"
+
+    time.sleep(0.6)  # l'appel abandonné se termine en arrière-plan
+    assert attempts() == [("fast", "ok", 1), ("slow", "timeout", 1)]
+
+
+def test_hedge_does_not_extend_the_first_attempt_deadline():
+    first = SleepyProvider(1.0, "late")
+    second = SleepyProvider(1.0, "late too")
+    router = RoutedProvider([("a", first), ("b", second)], hedge_ms=100, timeout=0.3)
+
+    start = time.monotonic()
+    result = router.ask([], "uptime?")
+    elapsed = time.monotonic() - start
+
+    assert result["error"] == "timeout"
+    # a échoue à 0.3 s, b (lancé à 0.1 s) à 0.4 s : pas de remise à zéro de l'échéance
+    assert elapsed < 0.6
+    assert second.calls == 1
+    time.sleep(1.0)
+    assert attempts() == [("a", "timeout", 1), ("b", "timeout", 1)]
+
+
+def test_first_attempt_keeps_its_own_deadline_after_a_hedge():
+    # a répond à 0.35 s : au-delà de son échéance (0.3 s), même si b a été lancé à 0.1 s
+    router = RoutedProvider([("a", SleepyProvider(0.35, "late")), ("b", SleepyProvider(1.0, "later"))],
+                            hedge_ms=100, timeout=0.3)
+    result = router.ask([], "uptime?")
+
+    assert result["error"] == "timeout"
+    time.sleep(1.0)
+    assert attempts() == [("a", "timeout", 1), ("b", "timeout", 1)]
+
+
+def test_hedged_request_returns_first_valid_answer():
+    router = RoutedProvider([("a", SleepyProvider(0.5, "slow")), ("b", SleepyProvider(0, "hedged"))],
+                            hedge_ms=50, timeout=2)
+    result = router.ask([], "uptime?")
+    assert result["api_id"] == "b"
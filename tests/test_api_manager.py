@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from core.api_manager import APIManager, rotate_secret
+
+OLD, NEW = "old-secret", "new-secret"
+
+
+@pytest.fixture
+def apis_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("SECRET_KEY", OLD)
+    manager = APIManager(tmp_path / "apis.json")
+    manager.create_api({"id": "claude", "name": "Claude", "provider": "claude", "api_key": "sk-claude"})
+    manager.create_api({"id": "openai", "name": "OpenAI", "provider": "chatgpt", "api_key": "sk-openai"})
+    return tmp_path / "apis.json"
+
+
+def _keys(path):
+    return {api["id"]: api["api_key"] for api in json.loads(path.read_text())["apis"]}
+
+
+def test_rotation_reencrypts_keys_for_the_new_secret(apis_file, monkeypatch):
+    before = _keys(apis_file)
+    assert all(value.startswith("enc:") for value in before.values())
+    # Fills the decrypted-key cache under the old secret
+    assert APIManager(apis_file).get_api("claude")["api_key"] == "sk-claude"
+
+    assert rotate_secret([apis_file], OLD, NEW) == {"files": 1, "keys": 2, "failed": 0}
+    after = _keys(apis_file)
+    assert all(after[i] != before[i] and after[i].startswith("enc:") for i in after)
+
+    monkeypatch.setenv("SECRET_KEY", NEW)
+    manager = APIManager(apis_file)
+    assert manager.get_api("claude")["api_key"] == "sk-claude"
+    assert manager.get_api("openai")["api_key"] == "sk-openai"
+    monkeypatch.setenv("SECRET_KEY", OLD)
+    assert APIManager(apis_file).get_api("claude")["api_key"] == ""
+
+
+def test_rotation_can_be_resumed(apis_file):
+    rotate_secret([apis_file], OLD, NEW)
+    rotated = _keys(apis_file)
+    assert rotate_secret([apis_file], OLD, NEW) == {"files": 1, "keys": 0, "failed": 0}
+    assert _keys(apis_file) == rotated
+
+
+def test_rotation_encrypts_plain_keys_and_reports_failures(tmp_path, apis_file, monkeypatch):
+    data = json.loads(apis_file.read_text())
+    data["apis"][0]["api_key"] = "sk-plain"
+    data["apis"][1]["api_key"] = APIManager(apis_file)._encrypt_key("x").replace("enc:", "enc:A", 1)
+    apis_file.write_text(json.dumps(data))
+    broken = tmp_path / "broken.json"
+    broken.write_text("{")
+    progress = []
+
+    totals = rotate_secret([broken, apis_file], OLD, NEW, lambda *args: progress.append(args[-2:]))
+    assert totals == {"files": 2, "keys": 1, "failed": 2}
+    assert progress == [(0, 1), (1, 1)]
+    assert _keys(apis_file)["openai"] == data["apis"][1]["api_key"]  # left unchanged
+    monkeypatch.setenv("SECRET_KEY", NEW)
+    assert APIManager(apis_file).get_api("claude")["api_key"] == "sk-plain"
+
+
+def test_rotation_requires_both_secrets(apis_file):
+    with pytest.raises(ValueError):
+        rotate_secret([apis_file], OLD, "")
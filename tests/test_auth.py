@@ -0,0 +1,155 @@
+import pytest
+
+from core import auth
+from core.auth import UserManager, create_access_token, user_claims, user_from_claims, verify_token
+from core.metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    monkeypatch.setattr(auth, "DB_PATH", tmp_path / "users.db")
+    manager = UserManager()
+    manager.reads = 0
+    read = manager.get_user_by_email
+
+    def counting_read(email):
+        manager.reads += 1
+        return read(email)
+
+    manager.get_user_by_email = counting_read
+    return manager
+
+
+def add_user(manager, email, full_name="Alice"):
+    manager.db.execute("INSERT INTO users (email, hashed_password, full_name) VALUES (?, ?, ?)",
+                       (email, "hash", full_name))
+
+
+def outcomes():
+    counters = metrics.snapshot()["counters"].get("auth_user_cache", [])
+    return {c["labels"]["outcome"]: c["value"] for c in counters}
+
+
+def test_hit_within_ttl(manager):
+    add_user(manager, "a@example.com")
+
+    first = manager.get_user_cached("a@example.com")
+    second = manager.get_user_cached("a@example.com")
+
+    assert first == second and first["full_name"] == "Alice"
+    assert manager.reads == 1
+    assert outcomes() == {"miss": 1, "hit": 1}
+    # Les appelants reçoivent une copie : le cache n'est pas modifiable de l'extérieur
+    second["full_name"] = "Mallory"
+    assert manager.get_user_cached("a@example.com")["full_name"] == "Alice"
+
+
+def test_miss_after_ttl(manager, monkeypatch):
+    add_user(manager, "a@example.com")
+    clock = [1000.0]
+    monkeypatch.setattr(auth.time, "monotonic", lambda: clock[0])
+
+    manager.get_user_cached("a@example.com")
+    clock[0] += auth.AUTH_USER_CACHE_TTL - 1
+    manager.get_user_cached("a@example.com")
+    assert manager.reads == 1
+
+    clock[0] += 2
+    manager.get_user_cached("a@example.com")
+    assert manager.reads == 2
+
+
+def test_unknown_users_are_not_cached(manager):
+    assert manager.get_user_cached("ghost@example.com") is None
+    add_user(manager, "ghost@example.com")
+    assert manager.get_user_cached("ghost@example.com")["email"] == "ghost@example.com"
+
+
+def test_updates_invalidate_the_cache(manager):
+    add_user(manager, "a@example.com")
+    assert manager.get_user_cached("a@example.com")["last_login"] is None
+
+    manager._update_last_login("a@example.com")
+    assert manager.get_user_cached("a@example.com")["last_login"] is not None
+    assert manager.reads == 2
+
+    manager._update_password_hash("a@example.com", "new-hash")
+    manager.get_user_cached("a@example.com")
+    assert manager.reads == 3
+
+
+def test_concurrent_invalidation_does_not_recache_a_stale_read(manager):
+    add_user(manager, "a@example.com")
+    read = manager.get_user_by_email
+
+    def read_then_update(email):
+        user = read(email)
+        # Modification par un autre thread entre la lecture et la mise en cache
+        manager.db.execute("UPDATE users SET full_name = 'Bob' WHERE email = ?", (email,))
+        manager.invalidate_user(email)
+        return user
+
+    manager.get_user_by_email = read_then_update
+    assert manager.get_user_cached("a@example.com")["full_name"] == "Alice"
+
+    manager.get_user_by_email = read
+    assert manager.get_user_cached("a@example.com")["full_name"] == "Bob"
+
+
+def test_lru_eviction(manager, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_USER_CACHE_SIZE", 2)
+    for name in "abc":
+        add_user(manager, f"{name}@example.com")
+
+    manager.get_user_cached("a@example.com")
+    manager.get_user_cached("b@example.com")
+    manager.get_user_cached("a@example.com")  # a redevient le plus récent
+    manager.get_user_cached("c@example.com")  # évince b
+
+    assert list(manager._cache) == ["a@example.com", "c@example.com"]
+    reads = manager.reads
+    manager.get_user_cached("a@example.com")
+    assert manager.reads == reads
+    manager.get_user_cached("b@example.com")
+    assert manager.reads == reads + 1
+
+
+def test_zero_ttl_disables_the_cache(manager, monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_USER_CACHE_TTL", 0)
+    add_user(manager, "a@example.com")
+
+    manager.get_user_cached("a@example.com")
+    manager.get_user_cached("a@example.com")
+    assert manager.reads == 2
+    assert not manager._cache
+
+
+USER = {"id": 7, "email": "a@example.com", "full_name": "Alice", "is_active": True,
+        "is_google_auth": False, "created_at": "2024-01-01 00:00:00"}
+
+
+def test_token_claims_are_off_by_default():
+    assert auth.AUTH_TRUST_TOKEN_CLAIMS is False
+    assert user_claims(USER) == {}
+
+    # Même un token portant un profil signé repasse par la base
+    payload = {"sub": USER["email"], auth.USER_CLAIM: {"id": 7, "is_active": True}}
+    assert user_from_claims(payload) is None
+
+
+def test_token_claims_round_trip_when_enabled(monkeypatch):
+    monkeypatch.setattr(auth, "AUTH_TRUST_TOKEN_CLAIMS", True)
+    token = create_access_token({"sub": USER["email"], **user_claims(USER)})
+
+    user = user_from_claims(verify_token(token))
+
+    assert user == {**USER, "last_login": None}
+    assert user_from_claims({"sub": USER["email"]}) is None
+    assert user_from_claims({auth.USER_CLAIM: {"id": 7}}) is None
@@ -0,0 +1,119 @@
+import json
+import time
+
+from core.ai_interface import BatchFailedError
+from core.batch_jobs import COMPLETED, FAILED, INTERRUPTED, RUNNING, BatchJobManager
+
+
+class FakeBatchProvider:
+    def __init__(self, poll_failures=0, pending_polls=0, terminal_status=None):
+        self.poll_failures = poll_failures
+        self.terminal_status = terminal_status
+        self.pending_polls = pending_polls
+        self.polls = 0
+        self.submitted = []
+
+    def ask(self, context, user_message, chat_history=None, system_profile=None):
+        return {"markdown": user_message.upper()}
+
+    def submit_batch(self, items):
+        self.submitted = [item["custom_id"] for item in items]
+        return "batch-1"
+
+    def poll_batch(self, batch_id):
+        self.polls += 1
+        if self.terminal_status:
+            raise BatchFailedError(f"batch {self.terminal_status}")
+        if self.poll_failures:
+            self.poll_failures -= 1
+            raise ConnectionError("temporary failure")
+        if self.pending_polls:
+            self.pending_polls -= 1
+            return None
+        return {cid: {"markdown": f"ok {cid}"} for cid in self.submitted or ["item-0", "item-1"]}
+
+
+class InteractiveProvider:
+    def ask(self, context, user_message, chat_history=None, system_profile=None):
+        return {"markdown": user_message.upper()}
+
+
+def wait_for(manager, job_id, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = manager.get_job(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id}: {manager.get_job(job_id)['status']} != {status}")
+
+
+ITEMS = [{"question": "a"}, {"question": "b"}]
+
+
+def test_poll_errors_are_retried(tmp_path):
+    manager = BatchJobManager(tmp_path, poll_interval=0.01)
+    provider = FakeBatchProvider(poll_failures=3)
+    job = wait_for(manager, manager.submit(provider, ITEMS)["id"], COMPLETED)
+
+    assert provider.polls == 4
+    assert [i["result"]["markdown"] for i in job["items"]] == ["ok item-0", "ok item-1"]
+
+
+def test_terminal_batch_status_fails_the_job_immediately(tmp_path):
+    # Un intervalle long : une nouvelle tentative ferait expirer wait_for
+    manager = BatchJobManager(tmp_path, poll_interval=30)
+    provider = FakeBatchProvider(terminal_status="expired")
+    job = wait_for(manager, manager.submit(provider, ITEMS)["id"], FAILED)
+
+    assert provider.polls == 1
+    assert "expired" in job["error"]
+
+
+def test_submitted_batch_is_resumed_after_restart(tmp_path):
+    manager = BatchJobManager(tmp_path, poll_interval=0.05)
+    provider = FakeBatchProvider(pending_polls=1000)
+    job_id = manager.submit(provider, ITEMS)["id"]
+    deadline = time.monotonic() + 5
+    while not manager.get_job(job_id)["provider_batch_id"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    manager.shutdown()
+    time.sleep(0.1)
+    saved = json.loads((tmp_path / f"{job_id}.json").read_text())
+    assert saved["status"] == RUNNING and saved["provider_batch_id"] == "batch-1"
+
+    restarted = BatchJobManager(tmp_path, poll_interval=0.01)
+    restarted.resume(lambda api_id: FakeBatchProvider())
+    job = wait_for(restarted, job_id, COMPLETED)
+    assert job["done"] == 2 and job["errors"] == 0
+
+
+def test_resume_without_provider_interrupts_job(tmp_path):
+    manager = BatchJobManager(tmp_path, poll_interval=0.05)
+    job_id = manager.submit(FakeBatchProvider(pending_polls=1000), ITEMS)["id"]
+    deadline = time.monotonic() + 5
+    while not manager.get_job(job_id)["provider_batch_id"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    manager.shutdown()
+    time.sleep(0.1)
+
+    def missing(api_id):
+        raise ValueError("API supprimée")
+
+    restarted = BatchJobManager(tmp_path)
+    restarted.resume(missing)
+    assert restarted.get_job(job_id)["status"] == INTERRUPTED
+
+
+def test_interactive_progress_writes_are_throttled(tmp_path, monkeypatch):
+    manager = BatchJobManager(tmp_path, concurrency=4)
+    saves = []
+    original = manager._save
+    monkeypatch.setattr(manager, "_save", lambda job: (saves.append(job["done"]), original(job)))
+    items = [{"question": f"q{i}"} for i in range(200)]
+    job = wait_for(manager, manager.submit(InteractiveProvider(), items)["id"], COMPLETED)
+
+    assert job["done"] == 200
+    assert len(saves) < 20
+    saved = json.loads((tmp_path / f"{job['id']}.json").read_text())
+    assert saved["status"] == COMPLETED and saved["done"] == 200
@@ -0,0 +1,76 @@
+import pytest
+
+from core.command_parser import (CommandStreamParser, attach_commands, extract_commands,
+                                 render_commands_block, repair_json)
+
+
+@pytest.mark.parametrize("text", [
+    '{"commands": [{"cmd": "df -h", "risk": "low",},],}',              # virgules finales
+    '{"commands": [ // commentaire\n {"cmd": "df -h", /* x */ "risk": "low"}]}',
+    '{“commands”: [{“cmd”: “df -h”, “risk”: “low”}]}',                  # guillemets typographiques
+    "{'commands': [{'cmd': 'df -h', 'risk': 'low', 'sudo': false}]}",   # syntaxe Python
+    '{"commands": [{"cmd": "df -h", "risk": "low"}, {"cmd": "uptime", "ri',  # tronqué
+])
+def test_repair_json_fixes_common_model_mistakes(text):
+    payload, repaired = repair_json(text)
+    assert repaired
+    assert payload["commands"][0]["cmd"] == "df -h"
+
+
+def test_repair_json_leaves_valid_json_alone_and_salvages_objects():
+    assert repair_json('{"commands": []}') == ({"commands": []}, False)
+    payload, repaired = repair_json('[{"cmd": "uptime"} oops {"cmd": "free -m", "risk": "low"}')
+    assert repaired and [c["cmd"] for c in payload["commands"]] == ["uptime", "free -m"]
+    assert repair_json("pas du json") == (None, True)
+
+
+def test_extract_commands_normalizes_and_raises_risk():
+    markdown = ('Voici :\n```json\n{"commands": [\n'
+                '  {"cmd": "$ df -h", "risk": "safe", "description": "disque"},\n'
+                '  {"command": "rm -rf /tmp/x", "risk": "low"},\n'
+                '  {"cmd": "ls", "risk": "bizarre"},\n'
+                '  {"cmd": ""}\n]}\n```')
+    commands, warnings, repaired = extract_commands(markdown)
+    assert not repaired
+    assert [(c["cmd"], c["risk"]) for c in commands] == [
+        ("df -h", "low"), ("rm -rf /tmp/x", "high"), ("ls", "high")]
+    assert commands[0]["description"] == "disque"
+    assert len(warnings) == 2  # risque inconnu + cmd vide
+
+
+def test_stream_parser_handles_split_fences_and_duplicates():
+    parser = CommandStreamParser()
+    chunks = ["texte ``", "`js", "on\n[{\"cmd\": \"upt", "ime\"}]\n``", "`\n",
+              "```json\n{\"cmd\": \"uptime\"}\n```"]
+    emitted = [c["cmd"] for chunk in chunks for c in parser.feed(chunk)]
+    assert emitted == ["uptime"]
+    assert parser.close() == [] and not parser.repaired
+
+
+def test_stream_parser_close_repairs_truncated_block():
+    parser = CommandStreamParser()
+    assert parser.feed('```json\n{"commands": [{"cmd": "free -m", "risk": "low"') == []
+    assert [c["cmd"] for c in parser.close()] == ["free -m"]
+    assert parser.repaired
+
+
+def test_attach_commands_sources():
+    native = attach_commands({"markdown": "", "commands": [{"cmd": "uptime", "risk": "low"}]})
+    assert native["commands"][0]["risk"] == "low"
+
+    parsed = attach_commands({"markdown": render_commands_block([{"cmd": "uptime", "risk": "low"}])})
+    assert [c["cmd"] for c in parsed["commands"]] == ["uptime"]
+
+    invalid = attach_commands({"markdown": "```json\n[42]\n```"})
+    assert invalid["commands"] == [] and invalid["command_warnings"]
+
+    error = attach_commands({"markdown": "```json\n[\"uptime\"]\n```", "error": True})
+    assert error["commands"] == []
+
+
+def test_python_literal_repair_leaves_string_contents_alone():
+    payload, repaired = repair_json("[{'cmd': 'echo null > /dev/null; test true', 'sudo': false},"
+                                    " {'cmd': \"grep -q true f\", 'x': null}]")
+    assert repaired
+    assert payload == [{"cmd": "echo null > /dev/null; test true", "sudo": False},
+                       {"cmd": "grep -q true f", "x": None}]
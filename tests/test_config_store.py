@@ -0,0 +1,134 @@
+import json
+
+import pytest
+
+from core.config_store import (ConfigImportError, ConfigStore, SQLiteAPIManager,
+                               SQLiteEnvironmentManager, SQLiteProfileManager)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConfigStore(tmp_path / "config.db")
+    yield store
+    store.db.close()
+
+
+def _user_dir(tmp_path, apis='{"apis": [{"id": "a1", "name": "Claude"}]}',
+              profiles='[{"id": "p1", "name": "Web"}, {"name": "sans id"}]'):
+    user_dir = tmp_path / "alice@example.com"
+    user_dir.mkdir(exist_ok=True)
+    (user_dir / "apis.json").write_text(apis, encoding="utf-8")
+    (user_dir / "profiles.json").write_text(profiles, encoding="utf-8")
+    return user_dir
+
+
+def test_import_is_counted_and_done_once(store, tmp_path):
+    user_dir = _user_dir(tmp_path)
+    assert store.import_owner("alice", user_dir) == {"environments": 0, "apis": 1, "profiles": 1}
+    assert store.get("apis", "alice", "a1")["name"] == "Claude"
+    assert [p["id"] for p in store.list_rows("profiles", "alice")] == ["p1"]
+    assert store.import_owner("alice", user_dir) is None
+
+
+@pytest.mark.parametrize("name, content", [
+    ("apis.json", '{"apis": [{"id": "a1"'),
+    ("profiles.json", "[{"),
+    ("profiles.json", '{"id": "p1"}'),
+])
+def test_unreadable_file_aborts_import_without_marking_owner(store, tmp_path, name, content):
+    user_dir = _user_dir(tmp_path)
+    valid = (user_dir / name).read_text(encoding="utf-8")
+    (user_dir / name).write_text(content, encoding="utf-8")
+
+    with pytest.raises(ConfigImportError):
+        store.import_owner("alice", user_dir)
+    assert store.list_rows("apis", "alice") == []
+    assert store.db.fetchone("SELECT 1 FROM imported_owners WHERE owner = ?", ("alice",)) is None
+
+    # Une fois le fichier réparé, l'import a lieu au prochain accès
+    (user_dir / name).write_text(valid, encoding="utf-8")
+    assert store.import_owner("alice", user_dir)["apis"] == 1
+    assert json.loads((user_dir / name).read_text(encoding="utf-8"))  # fichier laissé en place
+
+
+def test_missing_files_import_empty_configuration(store, tmp_path):
+    assert store.import_owner("bob", tmp_path / "bob") == {"environments": 0, "apis": 0, "profiles": 0}
+
+
+def test_sqlite_environment_manager(store):
+    manager = SQLiteEnvironmentManager(store, "alice")
+    assert manager.create_environment("prod", {"ENV_NAME": "Production", "EXECUTION_MODE": "remote"})
+    assert manager.create_environment("dev", {"ENV_NAME": "Dev"})
+    assert not manager.create_environment("dev", {"ENV_NAME": "doublon"})
+    assert [e["filename"] for e in manager.list_environments()] == ["dev", "prod"]
+    assert manager.list_environments()[1]["execution_mode"] == "remote"
+
+    # Le contenu est remplacé, comme une réécriture du fichier .env
+    assert manager.update_environment("dev", {"ENV_NAME": "Dev 2"})
+    assert manager.get_environment("dev") == {"ENV_NAME": "Dev 2"}
+    assert not manager.update_environment("absent", {})
+
+    manager.current_env = "prod"
+    assert not manager.delete_environment("prod")
+    assert manager.delete_environment("dev") and not manager.delete_environment("dev")
+    assert SQLiteEnvironmentManager(store, "bob").list_environments() == []
+
+
+def test_sqlite_api_manager_encrypts_keys(store):
+    manager = SQLiteAPIManager(store, "alice")
+    assert manager.create_api({"id": "b", "name": "B", "provider": "claude", "api_key": "sk-b"})
+    assert manager.create_api({"id": "a", "name": "A", "provider": "chatgpt", "api_key": "sk-a"})
+    assert not manager.create_api({"id": "a", "name": "doublon", "provider": "claude"})
+    # Ordre de création, clés chiffrées en base, jamais listées
+    assert [a["id"] for a in manager.list_apis()] == ["b", "a"]
+    assert store.get("apis", "alice", "a")["api_key"].startswith("enc:")
+    assert "api_key" not in manager.list_apis()[0]
+    assert manager.get_api("a")["api_key"] == "sk-a"
+
+    assert manager.update_api("a", {"model": "gpt-4o"})
+    assert manager.get_api("a")["api_key"] == "sk-a"
+    assert manager.update_api("a", {"api_key": "sk-a2"})
+    assert manager.get_api("a") == {"id": "a", "name": "A", "provider": "chatgpt",
+                                    "api_key": "sk-a2", "model": "gpt-4o"}
+    assert not manager.update_api("absent", {"name": "x"})
+    assert manager.delete_api("b") and not manager.delete_api("b")
+    assert [a["id"] for a in manager.list_apis()] == ["a"]
+    assert SQLiteAPIManager(store, "bob").get_api("a") is None
+
+
+def test_sqlite_profile_manager(store):
+    manager = SQLiteProfileManager(store, "alice")
+    assert manager.create_profile({"id": "web", "name": "Web"})
+    assert manager.create_profile({"id": "db", "name": "DB"})
+    assert not manager.create_profile({"id": "web", "name": "doublon"})
+    assert [p["id"] for p in manager.list_profiles()] == ["web", "db"]
+
+    assert manager.update_profile("db", {"name": "Base", "id": "ignoré"})
+    assert manager.get_profile("db") == {"id": "db", "name": "Base"}
+    assert not manager.update_profile("absent", {})
+    assert manager.delete_profile("web") and not manager.delete_profile("web")
+    # Une nouvelle entrée passe après les existantes, même après une suppression
+    assert manager.create_profile({"id": "web", "name": "Web"})
+    assert [p["id"] for p in manager.list_profiles()] == ["db", "web"]
+
+
+def test_rotate_api_keys_in_database(store, monkeypatch):
+    monkeypatch.setenv("SECRET_KEY", "old-secret")
+    alice, bob = SQLiteAPIManager(store, "alice"), SQLiteAPIManager(store, "bob")
+    alice.create_api({"id": "a", "name": "A", "provider": "claude", "api_key": "sk-alice"})
+    bob.create_api({"id": "a", "name": "A", "provider": "claude", "api_key": "sk-bob"})
+    bob.create_api({"id": "nokey", "name": "Local", "provider": "local"})
+    store.insert("apis", "bob", "plain", {"id": "plain", "name": "P", "provider": "claude", "api_key": "sk-plain"})
+    store.insert("apis", "bob", "lost", {"id": "lost", "name": "L", "provider": "claude", "api_key": "enc:corrompue"})
+
+    assert store.rotate_api_keys("old-secret", "new-secret") == {"keys": 3, "failed": 1}
+    monkeypatch.setenv("SECRET_KEY", "new-secret")
+    assert alice.get_api("a")["api_key"] == "sk-alice"
+    assert bob.get_api("a")["api_key"] == "sk-bob"
+    assert bob.get_api("plain")["api_key"] == "sk-plain"
+    assert store.get("apis", "bob", "lost")["api_key"] == "enc:corrompue"
+
+    # Reprise après interruption : rien à refaire
+    assert store.rotate_api_keys("old-secret", "new-secret") == {"keys": 0, "failed": 1}
+    with pytest.raises(ValueError):
+        store.rotate_api_keys("old-secret", "")
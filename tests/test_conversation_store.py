@@ -0,0 +1,58 @@
+from core.conversation_store import ConversationStore
+
+
+def fill(store, conversation_id, exchanges):
+    for i in range(exchanges):
+        store.append(conversation_id, "user", f"question {i}")
+        store.append(conversation_id, "assistant", f"answer {i}")
+
+
+def test_cache_is_bounded(tmp_path):
+    store = ConversationStore(tmp_path, cache_size=2)
+    ids = [store.create_conversation() for _ in range(5)]
+    for conversation_id in ids:
+        store.append(conversation_id, "user", "hello")
+
+    assert len(store._cache) == 2
+    assert list(store._cache) == ids[-2:]
+    # Une conversation évincée est relue depuis le disque
+    assert store.get_history(ids[0]) == [{"role": "user", "content": "hello"}]
+
+
+def test_history_is_windowed_and_summarised(tmp_path):
+    store = ConversationStore(tmp_path, history_messages=10)
+    conversation_id = store.create_conversation()
+    fill(store, conversation_id, 30)
+
+    history = store.get_history(conversation_id)
+    assert len(history) <= 10
+    assert history[0]["role"] == "user"
+    assert history[0]["content"].startswith("[Earlier in this conversation")
+    assert "- question 0" in history[0]["content"]
+    assert history[-1] == {"role": "assistant", "content": "answer 29"}
+    # L'historique complet reste disponible page par page
+    assert store.get_page(conversation_id, limit=100)["total"] == 60
+
+
+def test_history_prefix_is_stable_between_turns(tmp_path):
+    store = ConversationStore(tmp_path, history_messages=10)
+    conversation_id = store.create_conversation()
+    fill(store, conversation_id, 8)
+    before = store.get_history(conversation_id)
+    fill(store, conversation_id, 1)
+    after = store.get_history(conversation_id)
+
+    assert after[:len(before)] == before
+
+
+def test_history_respects_the_character_budget(tmp_path):
+    store = ConversationStore(tmp_path, history_messages=50, history_chars=1000)
+    conversation_id = store.create_conversation()
+    for i in range(6):
+        store.append(conversation_id, "user", f"q{i} " + "x" * 300)
+        store.append(conversation_id, "assistant", "y" * 300)
+
+    history = store.get_history(conversation_id)
+    kept = sum(len(m["content"]) for m in history[1:]) + len(history[0]["content"].split("\n\n")[-1])
+    assert kept <= 1000
+    assert history[0]["role"] == "user"
@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+from core.db import SQLitePool, split_statements
+
+MIGRATIONS = [
+    (1, "table des notes", """
+        CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT NOT NULL, updated INTEGER DEFAULT 0);
+        -- valeur par défaut contenant un point-virgule
+        INSERT INTO notes (body) VALUES ('a; b');
+    """),
+    (2, "trigger de mise à jour", """
+        CREATE TRIGGER notes_touch AFTER UPDATE OF body ON notes
+        BEGIN
+            UPDATE notes SET updated = updated + 1 WHERE id = NEW.id;
+        END;
+    """),
+    (3, "index (liste d'instructions)", [
+        "CREATE INDEX idx_notes_body ON notes(body)",
+        "INSERT INTO notes (body) VALUES ('c')",
+    ]),
+]
+
+
+def test_split_statements_keeps_strings_and_triggers_whole():
+    assert split_statements(MIGRATIONS[0][2])[1].endswith("VALUES ('a; b');")
+    assert len(split_statements(MIGRATIONS[1][2])) == 1
+    assert split_statements(["SELECT 1", " "]) == ["SELECT 1"]
+
+
+def test_migrations_apply_once_in_order(tmp_path):
+    path = tmp_path / "test.db"
+    pool = SQLitePool(path, migrations=MIGRATIONS)
+    assert pool.schema_version() == 3
+    assert [r["body"] for r in pool.fetchall("SELECT body FROM notes ORDER BY id")] == ["a; b", "c"]
+    pool.execute("UPDATE notes SET body = 'x' WHERE id = 1")
+    assert pool.fetchone("SELECT updated FROM notes WHERE id = 1")["updated"] == 1
+    pool.close()
+
+    # Rouvrir ne rejoue rien
+    pool = SQLitePool(path, migrations=MIGRATIONS)
+    assert pool.fetchone("SELECT COUNT(*) AS n FROM notes")["n"] == 2
+    pool.close()
+
+
+def test_failed_migration_is_rolled_back(tmp_path):
+    broken = MIGRATIONS[:1] + [(2, "cassée", "CREATE TABLE other (id INTEGER); INSERT INTO missing VALUES (1);")]
+    with pytest.raises(sqlite3.OperationalError):
+        SQLitePool(tmp_path / "test.db", migrations=broken)
+
+    pool = SQLitePool(tmp_path / "test.db")
+    tables = {r["name"] for r in pool.fetchall("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "other" not in tables and "notes" not in tables
+    pool.close()
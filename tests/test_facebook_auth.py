@@ -0,0 +1,105 @@
+import asyncio
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core import facebook_auth, http_client
+from core.facebook_auth import FacebookAuthProvider
+
+
+class GraphServer:
+    """Stand-in for graph.facebook.com: token exchange then /me."""
+
+    def __init__(self):
+        self.requests = []
+        self.ports = []
+        self.profile = {"id": "42", "name": "Alice", "email": "alice@example.com"}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                params = dict(urllib.parse.parse_qsl(query))
+                server.requests.append((path, params))
+                server.ports.append(self.client_address[1])
+                if path == "/oauth/access_token":
+                    ok = params.get("code") == "good-code"
+                    data = {"access_token": "fb-token"} if ok else {"error": {"message": "bad code"}}
+                elif params.get("access_token") == "fb-token":
+                    data = server.profile
+                else:
+                    data = {"error": {"message": "bad token"}}
+                body = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    server = GraphServer()
+    monkeypatch.setattr(facebook_auth, "FACEBOOK_TOKEN_URL", server.url + "/oauth/access_token")
+    monkeypatch.setattr(facebook_auth, "FACEBOOK_USER_URL", server.url + "/me")
+    http_client._client = http_client._client_loop = None
+    yield server
+    server.close()
+
+
+def verify(code):
+    provider = FacebookAuthProvider("app-id", "app-secret")
+
+    async def main():
+        try:
+            return await provider.verify_facebook_callback(code, "https://shellia.test/cb")
+        finally:
+            await http_client.aclose()
+
+    return asyncio.run(main())
+
+
+def test_callback_exchanges_the_code_then_reads_the_profile(graph):
+    user = verify("good-code")
+
+    assert user == {"facebook_id": "42", "email": "alice@example.com", "full_name": "Alice"}
+    (token_path, token_params), (me_path, me_params) = graph.requests
+    assert token_path == "/oauth/access_token"
+    assert token_params == {"client_id": "app-id", "client_secret": "app-secret",
+                            "redirect_uri": "https://shellia.test/cb", "code": "good-code"}
+    assert me_path == "/me"
+    assert me_params == {"fields": "id,name,email", "access_token": "fb-token"}
+    # /me part sur la connexion ouverte pour l'échange du code
+    assert graph.ports[0] == graph.ports[1]
+
+
+def test_invalid_code_returns_none(graph):
+    assert verify("bad-code") is None
+    assert len(graph.requests) == 1
+
+
+def test_profile_without_email_returns_none(graph):
+    del graph.profile["email"]
+    assert verify("good-code") is None
+
+
+def test_unconfigured_provider_raises():
+    provider = FacebookAuthProvider("app-id", "")
+    with pytest.raises(ValueError):
+        asyncio.run(provider.verify_facebook_callback("code", "https://shellia.test/cb"))
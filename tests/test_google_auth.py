@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core.google_auth import GoogleCertsCache
+
+
+class CertsServer:
+    """Stand-in for the Google certs endpoint (status, headers and body set per test)."""
+
+    def __init__(self):
+        self.status = 200
+        self.headers = {"Cache-Control": "public, max-age=120, must-revalidate", "Age": "30"}
+        self.body = {"kid-1": "-----BEGIN CERTIFICATE-----\nA\n-----END CERTIFICATE-----\n"}
+        self.delay = 0.0
+        self.requests = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests += 1
+                time.sleep(server.delay)
+                payload = json.dumps(server.body).encode()
+                self.send_response(server.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in server.headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/oauth2/v1/certs"
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = CertsServer()
+    yield server
+    server.close()
+
+
+def make_cache(server, **kwargs):
+    return GoogleCertsCache(url=server.url, refresh_margin=10, max_stale=600, min_ttl=1, **kwargs)
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return
+        time.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+def expire(cache, seconds_ago=1):
+    cache._expires_at = time.time() - seconds_ago
+
+
+def test_max_age_minus_age_sets_the_lifetime(server):
+    cache = make_cache(server)
+    assert json.loads(cache.get()) == server.body
+    # max-age=120 minus 30 s already spent in an intermediate cache
+    assert 85 <= cache._expires_at - time.time() <= 90
+    cache.get()
+    cache.get()
+    assert server.requests == 1
+
+
+def test_refresh_starts_in_background_before_expiry(server):
+    cache = make_cache(server)
+    cache.get()
+    cache._expires_at = time.time() + 5  # inside the 10 s refresh margin
+    server.body = {"kid-2": "new"}
+    assert "kid-1" in json.loads(cache.get())
+    wait_until(lambda: b"kid-2" in cache.get())
+    assert server.requests == 2
+
+
+def test_expired_certs_are_served_at_once_while_google_is_down(server):
+    cache = make_cache(server, retry_base=60)
+    first = cache.get()
+    expire(cache)
+    server.status, server.delay = 503, 1.0
+
+    start = time.monotonic()
+    assert cache.get() == first
+    assert time.monotonic() - start < 0.5
+    wait_until(lambda: cache._failures == 1 and not cache._refreshing)
+
+    # Backoff: further logins neither wait nor hit the failing endpoint again
+    for _ in range(5):
+        assert cache.get() == first
+    time.sleep(0.05)
+    assert server.requests == 2
+
+    # Once the backoff has elapsed and Google is back, the refresh succeeds
+    server.status, server.delay, server.body = 200, 0.0, {"kid-3": "back"}
+    cache._retry_at = 0
+    cache.get()
+    wait_until(lambda: b"kid-3" in cache.get())
+    assert cache._failures == 0
+
+
+def test_backoff_grows_and_is_capped(server):
+    server.status = 503
+    cache = make_cache(server, retry_base=2, retry_max=5)
+    for expected in (2, 4, 5):
+        with pytest.raises(Exception):
+            cache._fetch()
+        assert expected - 1 <= cache._retry_at - time.time() <= expected
+
+
+def test_without_usable_certs_the_error_is_raised(server):
+    server.status = 503
+    with pytest.raises(Exception):
+        make_cache(server).get()
+
+    server.status = 200
+    cache = make_cache(server)
+    cache.get()
+    expire(cache, seconds_ago=601)  # past max_stale
+    server.status = 503
+    with pytest.raises(Exception):
+        cache.get()
@@ -0,0 +1,104 @@
+import threading
+import time
+
+from core import host_facts
+from core.host_facts import HostFactsCache, parse_facts, summarize_facts
+
+OUTPUT = """@@os
+Debian GNU/Linux 12 (bookworm)
+@@kernel
+Linux 6.1.0 x86_64
+@@hostname
+web-1
+@@pkg
+apt
+@@init
+systemd
+@@cpus
+4
+@@load
+0.10 0.20 0.30
+@@mem
+7900 5100
+@@disks
+91% / 2.1G
+40% /var 30G
+@@failed
+nginx.service
+@@top
+postgres 12.5 3.0
+"""
+
+
+class FakeExecutor:
+    mode = "remote"
+
+    def __init__(self, stdout=OUTPUT):
+        self.stdout = stdout
+        self.calls = 0
+        self.done = threading.Event()
+
+    def execute_stateless(self, script, timeout=None):
+        self.calls += 1
+        self.done.set()
+        return {"stdout": self.stdout, "stderr": "" if self.stdout else "connexion refusée"}
+
+
+def wait_gathered(cache, key, executor, calls):
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline:
+        if executor.calls >= calls and not cache._pending.get(key):
+            return
+        time.sleep(0.01)
+    raise AssertionError("relevé non terminé")
+
+
+def test_parse_and_summarize_facts():
+    facts = parse_facts(OUTPUT)
+    assert facts["package_manager"] == "apt"
+    assert facts["memory_mb"] == {"total": "7900", "available": "5100"}
+    assert facts["disks"][0] == {"use": "91%", "mount": "/", "free": "2.1G"}
+    summary = summarize_facts(facts)
+    assert "- OS: Debian GNU/Linux 12 (bookworm) / Linux 6.1.0 x86_64" in summary
+    assert "- packages: apt, init: systemd" in summary
+    assert "- 4 CPU, load 0.10 0.20 0.30, RAM 5100/7900 MB free" in summary
+    assert "/ 91% used (2.1G free)" in summary
+    assert "- Failed units: nginx.service" in summary
+    assert summarize_facts(parse_facts("")) == ""
+
+
+def test_expired_facts_are_served_while_refreshing(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(host_facts.time, "time", lambda: clock[0])
+    cache = HostFactsCache(ttl=60, retry_interval=0)
+    executor = FakeExecutor()
+    cache.gather("k", executor)
+    assert cache.summary("k").startswith("**Host facts")
+
+    clock[0] += 61
+    assert cache.get("k") is None
+    # Sans executor : relevé expiré masqué, comme avant
+    assert cache.summary("k") == ""
+    # Avec l'executor : l'ancien relevé est servi, un nouveau est lancé
+    executor.stdout = OUTPUT.replace("4\n@@load", "8\n@@load")
+    assert "4 CPU" in cache.summary("k", executor)
+    wait_gathered(cache, "k", executor, 2)
+    assert "8 CPU" in cache.summary("k", executor)
+    assert executor.calls == 2
+
+
+def test_failed_refresh_is_retried_after_interval(monkeypatch):
+    cache = HostFactsCache(ttl=60, retry_interval=3600)
+    executor = FakeExecutor(stdout="")
+    assert cache.summary("k", executor) == ""
+    wait_gathered(cache, "k", executor, 1)
+    # Relevé en échec : pas de nouvelle tentative avant retry_interval
+    assert cache.summary("k", executor) == ""
+    time.sleep(0.05)
+    assert executor.calls == 1
+
+    cache.retry_interval = 0
+    executor.stdout = OUTPUT
+    cache.summary("k", executor)
+    wait_gathered(cache, "k", executor, 2)
+    assert "Debian" in cache.summary("k", executor)
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from core import http_client
+
+
+class JsonServer:
+    """Serveur local renvoyant {"path", "query"} et notant le port client de chaque requête."""
+
+    def __init__(self):
+        self.ports = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.ports.append(self.client_address[1])
+                path, _, query = self.path.partition("?")
+                body = json.dumps({"path": path, "query": query}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = JsonServer()
+    yield server
+    server.close()
+
+
+@pytest.fixture(autouse=True)
+def fresh_client():
+    http_client._client = http_client._client_loop = None
+    yield
+    http_client._client = http_client._client_loop = None
+
+
+def test_get_json_reuses_the_connection(server):
+    async def main():
+        first = await http_client.get_json(server.url + "/token", {"code": "abc"})
+        second = await http_client.get_json(server.url + "/me")
+        await http_client.aclose()
+        return first, second
+
+    first, second = asyncio.run(main())
+
+    assert first == {"path": "/token", "query": "code=abc"}
+    assert second == {"path": "/me", "query": ""}
+    assert len(server.ports) == 2 and server.ports[0] == server.ports[1]
+
+
+def test_get_json_without_httpx(server, monkeypatch):
+    monkeypatch.setattr(http_client, "_HAS_HTTPX", False)
+
+    data = asyncio.run(http_client.get_json(server.url + "/me", {"fields": "id"}))
+
+    assert data == {"path": "/me", "query": "fields=id"}
+    assert http_client._client is None
+
+
+def test_client_of_a_finished_loop_is_closed(server):
+    async def fetch():
+        await http_client.get_json(server.url + "/me")
+        return http_client.get_async_client()
+
+    old = asyncio.run(fetch())
+
+    async def replace():
+        new = http_client.get_async_client()
+        assert http_client.get_async_client() is new
+        await asyncio.sleep(0.05)
+        await http_client.aclose()
+        return new
+
+    new = asyncio.run(replace())
+    assert new is not old
+    assert old.is_closed
+
+
+def test_client_of_a_running_loop_is_closed_on_that_loop():
+    other = asyncio.new_event_loop()
+    thread = threading.Thread(target=other.run_forever, daemon=True)
+    thread.start()
+    try:
+        async def create():
+            return http_client.get_async_client()
+
+        old = asyncio.run_coroutine_threadsafe(create(), other).result(5)
+        async def replace():
+            new = http_client.get_async_client()
+            await http_client.aclose()
+            return new
+
+        new = asyncio.run(replace())
+
+        # La fermeture s'exécute sur l'autre boucle : on attend qu'elle y soit passée
+        asyncio.run_coroutine_threadsafe(asyncio.sleep(0.05), other).result(5)
+        assert new is not old
+        assert old.is_closed
+    finally:
+        other.call_soon_threadsafe(other.stop)
+        thread.join(5)
+        other.close()
+
+
+def test_aclose():
+    async def main():
+        client = http_client.get_async_client()
+        await http_client.aclose()
+        return client
+
+    assert asyncio.run(main()).is_closed
+    assert http_client._client is None
@@ -0,0 +1,76 @@
+import json
+import stat
+
+import pytest
+
+from core import microsoft_auth
+from core.microsoft_auth import MicrosoftAuthProvider
+
+CACHE = {
+    "RefreshToken": {
+        "uid.utid-login.microsoftonline.com-refreshtoken-cid--": {
+            "home_account_id": "uid.utid",
+            "environment": "login.microsoftonline.com",
+            "credential_type": "RefreshToken",
+            "client_id": "cid",
+            "secret": "very-secret-refresh-token",
+        }
+    }
+}
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(microsoft_auth, "MSAL_CACHE_DIR", tmp_path)
+    return tmp_path
+
+
+def saved_provider():
+    provider = MicrosoftAuthProvider("cid", "secret")
+    provider._load_caches()
+    provider._token_cache.deserialize(json.dumps(CACHE))
+    provider._token_cache.has_state_changed = True
+    provider._http_cache["authority"] = {"tenant_discovery_endpoint": "https://example.test"}
+    provider._save_caches()
+    return provider
+
+
+def test_caches_round_trip_encrypted(cache_dir):
+    saved_provider()
+
+    token_file = cache_dir / microsoft_auth.MSAL_TOKEN_CACHE_FILE
+    assert b"very-secret-refresh-token" not in token_file.read_bytes()
+    assert stat.S_IMODE(token_file.stat().st_mode) == 0o600
+
+    provider = MicrosoftAuthProvider("cid", "secret")
+    provider._load_caches()
+    assert "very-secret-refresh-token" in provider._token_cache.serialize()
+    assert provider._http_cache == {"authority": {"tenant_discovery_endpoint": "https://example.test"}}
+
+
+def test_unchanged_token_cache_is_not_rewritten(cache_dir):
+    provider = saved_provider()
+    token_file = cache_dir / microsoft_auth.MSAL_TOKEN_CACHE_FILE
+    token_file.write_bytes(b"sentinel")
+
+    provider._save_caches()
+    assert token_file.read_bytes() == b"sentinel"
+
+
+def test_cache_from_another_secret_key_is_ignored(cache_dir, monkeypatch):
+    saved_provider()
+    monkeypatch.setenv("SECRET_KEY", "another-secret")
+
+    provider = MicrosoftAuthProvider("cid", "secret")
+    provider._load_caches()
+    assert "very-secret-refresh-token" not in provider._token_cache.serialize()
+    # Le cache HTTP ne contient pas de secret : il reste utilisable
+    assert "authority" in provider._http_cache
+
+
+def test_corrupt_http_cache_is_ignored(cache_dir):
+    (cache_dir / microsoft_auth.MSAL_HTTP_CACHE_FILE).write_bytes(b"not a pickle")
+
+    provider = MicrosoftAuthProvider("cid", "secret")
+    provider._load_caches()
+    assert provider._http_cache == {}
@@ -0,0 +1,23 @@
+from core.ai_interface import split_reference, with_reference
+from core.model_router import FAST, STRONG, classify_request
+
+RUNBOOK = "## Nginx crash\n" + "Why nginx fails: debug the error log, fix the config. " * 40
+
+
+def test_reference_material_does_not_change_the_tier():
+    message = with_reference("show disk usage", RUNBOOK)
+    tier, reasons = classify_request([], message, [], "Short profile")
+    assert tier == FAST, reasons
+
+
+def test_long_profile_still_routes_to_strong():
+    tier, reasons = classify_request([], "show disk usage", [], "x" * 2000)
+    assert tier == STRONG
+    assert reasons == ["long_profile"]
+
+
+def test_split_reference_round_trip():
+    message = with_reference("why is nginx down?", RUNBOOK)
+    assert split_reference(message) == ("why is nginx down?", RUNBOOK)
+    assert split_reference("plain question") == ("plain question", None)
+    assert with_reference("q", None) == "q"
@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+import pytest
+
+from core.password_hasher import (
+    HasherOverloadedError, LoginRateLimitedError, LoginRateLimiter, PasswordHasher,
+)
+
+
+def test_attacker_cannot_lock_a_victim_out():
+    limiter = LoginRateLimiter(per_ip=0, per_account=3)
+    for _ in range(3):
+        limiter.check("203.0.113.9", "victim@example.com")
+    with pytest.raises(LoginRateLimitedError) as exc:
+        limiter.check("203.0.113.9", "Victim@example.com")
+    assert exc.value.scope == "account"
+
+    # La victime, depuis sa propre adresse, n'est pas concernée
+    limiter.check("198.51.100.7", "victim@example.com")
+
+
+def test_ip_quota_still_applies_across_accounts():
+    limiter = LoginRateLimiter(per_ip=2, per_account=0)
+    limiter.check("203.0.113.9", "a@example.com")
+    limiter.check("203.0.113.9", "b@example.com")
+    with pytest.raises(LoginRateLimitedError) as exc:
+        limiter.check("203.0.113.9", "c@example.com")
+    assert exc.value.scope == "ip"
+
+
+def test_verify_async_round_trip():
+    hasher = PasswordHasher(workers=1, max_queue=1, rounds=4)
+    hashed = asyncio.run(hasher.hash_async("s3cret"))
+    assert asyncio.run(hasher.verify_async("s3cret", hashed))
+    assert not asyncio.run(hasher.verify_async("wrong", hashed))
+
+
+def test_async_wait_does_not_block_the_event_loop():
+    hasher = PasswordHasher(workers=1, max_queue=1, rounds=4, timeout=0.2)
+    release = threading.Event()
+    hasher._run(release.wait, wait=False)  # occupe le seul worker
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        with pytest.raises(HasherOverloadedError):
+            await hasher.verify_async("pw", "$2b$04$" + "a" * 53)
+        task.cancel()
+        return ticks
+
+    try:
+        assert asyncio.run(scenario()) >= 5
+    finally:
+        release.set()
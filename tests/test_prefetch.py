@@ -0,0 +1,122 @@
+import pytest
+
+from core.prefetch import CommandPrefetcher, is_prefetchable
+from core.safe_commands import is_side_effect_free
+
+SIDE_EFFECT_FREE = [
+    "ls -la /var/log",
+    "df -h",
+    "free -m",
+    "uptime",
+    "ps aux",
+    "cat /etc/os-release",
+    "head -n 20 /var/log/syslog",
+    "tail -n 50 /var/log/syslog",
+    "grep -i error /var/log/syslog | tail -n 20",
+    "ip -br addr",
+    "ip route show",
+    "ss -tlnp",
+    "journalctl -u nginx -n 50 --no-pager",
+    "systemctl status nginx",
+    "date +%s",
+    "date -d yesterday +%F",
+    "hostname -f",
+    "hostnamectl",
+    "timedatectl status",
+    "dmesg -T",
+    "find /etc -name '*.conf' -maxdepth 1",
+    "sort -k2,2n /etc/hosts",
+    "uniq -c /tmp/list",
+    "docker ps -a",
+]
+
+STATE_CHANGING = [
+    "date -s 2020-01-01",
+    "date 010100002020",
+    "hostname evil",
+    "hostnamectl set-hostname x",
+    "ifconfig eth0 down",
+    "ip link set eth0 down",
+    "ip netns exec ns rm -rf /",
+    "sort -o /etc/passwd /tmp/x",
+    "dmesg -C",
+    "timedatectl set-timezone UTC",
+    "find / -fprint /tmp/x",
+    "find / -delete",
+    "find / -exec rm {} ;",
+    "ss -K dst 10.0.0.1",
+    "openssl genrsa -out /tmp/key.pem 2048",
+    "awk 'BEGIN{system(\"id\")}'",
+    "sed -n 'w /tmp/x' /etc/hosts",
+    "uniq /tmp/a /tmp/b",
+    "tail -f /var/log/syslog",
+    "vmstat 1",
+    "systemctl restart nginx",
+    "docker rm -f web",
+    "rg --pre sh x /tmp",
+    "ls /tmp; rm -rf /tmp/x",
+    "ls *",
+    "./ls",
+    "FOO=1 ls",
+    "sudo ls",
+    "cat /etc/passwd > /tmp/x",
+    "echo $(id)",
+]
+
+
+@pytest.mark.parametrize("command", SIDE_EFFECT_FREE)
+def test_allowlisted_invocations(command):
+    assert is_side_effect_free(command)
+
+
+@pytest.mark.parametrize("command", STATE_CHANGING)
+def test_state_changing_invocations_rejected(command):
+    assert not is_side_effect_free(command)
+    assert not is_prefetchable(command)
+
+
+@pytest.mark.parametrize("command", ["ls", "cat notes.txt", "du -sh .", "grep x"])
+def test_cwd_dependent_commands_not_prefetched(command):
+    assert is_side_effect_free(command)
+    assert not is_prefetchable(command)
+
+
+@pytest.mark.parametrize("command", ["df -h", "ls -la /var/log", "ps aux | grep nginx"])
+def test_prefetchable(command):
+    assert is_prefetchable(command)
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.calls = []
+
+    def execute_stateless(self, command, timeout=None):
+        self.calls.append(command)
+        return {"stdout": f"out of {command}", "stderr": "", "return_code": 0}
+
+
+@pytest.mark.parametrize("executed", ["df -h", "  df -h ", "cd /var/www && df -h", "cd ~ && df -h",
+                                      "cd '/srv/my app' &&df -h"])
+def test_claim_matches_prefetched_command(executed):
+    prefetcher = CommandPrefetcher(ttl=60, timeout=5)
+    executor = FakeExecutor()
+    commands = [{"cmd": "df -h", "risk": "low"}, {"cmd": "ls", "risk": "low"},
+                {"cmd": "systemctl restart nginx", "risk": "low"}]
+    assert prefetcher.prefetch("alice", executor, commands) == ["df -h"]
+    assert commands[0]["prefetched"] and "prefetched" not in commands[1]
+
+    result = prefetcher.claim("alice", executed)
+    assert result["stdout"] == "out of df -h" and result["prefetched"]
+    # Un résultat anticipé ne sert qu'une fois
+    assert prefetcher.claim("alice", executed) is None
+    assert executor.calls == ["df -h"]
+
+
+def test_claim_misses_other_commands_and_sessions():
+    prefetcher = CommandPrefetcher(ttl=60, timeout=5)
+    prefetcher.prefetch("alice", FakeExecutor(), [{"cmd": "df -h", "risk": "low"}])
+    assert prefetcher.claim("bob", "df -h") is None
+    assert prefetcher.claim("alice", "cd /tmp && df -h; rm x") is None
+    assert prefetcher.claim("alice", "cd /tmp && free -m") is None
+    prefetcher.invalidate("alice")
+    assert prefetcher.claim("alice", "df -h") is None
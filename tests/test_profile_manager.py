@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from core import profile_manager as pm
+from core.fileutil import UnreadableFileError
+from core.profile_manager import ProfileManager
+
+
+@pytest.fixture(autouse=True)
+def no_stat_interval(monkeypatch):
+    monkeypatch.setattr(pm, "PROFILES_STAT_INTERVAL", 0)
+
+
+def test_crud_and_external_changes(tmp_path):
+    path = tmp_path / "profiles.json"
+    manager = ProfileManager(path)
+    assert manager.list_profiles() == []
+    assert manager.create_profile({"id": "a", "name": "A"})
+    assert not manager.create_profile({"id": "a", "name": "doublon"})
+    assert manager.update_profile("a", {"name": "A2", "id": "ignoré"})
+    assert manager.get_profile("a") == {"id": "a", "name": "A2"}
+    assert not manager.update_profile("absent", {})
+
+    # Une modification hors de l'application est vue à la lecture suivante
+    path.write_text(json.dumps([{"id": "a", "name": "A2"}, {"id": "b", "name": "B"}, {"name": "sans id"}]))
+    assert [p["id"] for p in manager.list_profiles()] == ["a", "b"]
+    assert manager.delete_profile("a") and not manager.delete_profile("a")
+    assert json.loads(path.read_text()) == [{"id": "b", "name": "B"}]
+
+
+@pytest.mark.parametrize("loaded_first", [False, True])
+def test_unreadable_file_is_never_overwritten(tmp_path, loaded_first):
+    path = tmp_path / "profiles.json"
+    manager = ProfileManager(path)
+    if loaded_first:
+        manager.create_profile({"id": "a", "name": "A"})
+    truncated = '[{"id": "a", "name": "A"}, {"id": "b"'
+    path.write_text(truncated)
+
+    # Lecture : dernière version lue ; écriture : refusée
+    assert [p["id"] for p in manager.list_profiles()] == (["a"] if loaded_first else [])
+    for mutate in (lambda: manager.create_profile({"id": "new"}),
+                   lambda: manager.update_profile("a", {"name": "x"}),
+                   lambda: manager.delete_profile("a")):
+        with pytest.raises(UnreadableFileError):
+            mutate()
+    assert path.read_text() == truncated
+
+    # Une fois le fichier réparé, les écritures reprennent
+    path.write_text('[{"id": "a", "name": "A"}, {"id": "b", "name": "B"}]')
+    assert manager.create_profile({"id": "new"})
+    assert [p["id"] for p in json.loads(path.read_text())] == ["a", "b", "new"]
+
+
+def test_deleted_unreadable_file_allows_writes_again(tmp_path):
+    path = tmp_path / "profiles.json"
+    path.write_text("{")
+    manager = ProfileManager(path)
+    with pytest.raises(UnreadableFileError):
+        manager.create_profile({"id": "a"})
+    path.unlink()
+    assert manager.create_profile({"id": "a"})
@@ -0,0 +1,198 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core import rate_limiter
+from core.metrics import metrics
+from core.rate_limiter import KeyLimiter, call_with_limits, get_limiter
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return
+        time.sleep(0.005)
+    raise AssertionError("condition not met")
+
+
+class ApiError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    limiter = KeyLimiter("k", rate=20, burst=2)
+    waits = []
+    for _ in range(4):
+        waits.append(limiter.acquire())
+        limiter.release()
+
+    assert waits[0] < 0.02 and waits[1] < 0.02
+    # Jetons suivants : un toutes les 50 ms
+    assert 0.03 < waits[2] < 0.2
+    assert 0.03 < waits[3] < 0.2
+
+
+def test_zero_rate_means_no_rate_limit():
+    limiter = KeyLimiter("k", rate=0, burst=1)
+    start = time.monotonic()
+    for _ in range(50):
+        limiter.acquire()
+        limiter.release()
+    assert time.monotonic() - start < 0.5
+
+
+def test_concurrency_cap():
+    limiter = KeyLimiter("k", max_concurrency=2)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def call():
+        limiter.acquire()
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        limiter.release()
+
+    threads = [threading.Thread(target=call) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+
+    assert peak[0] == 2
+    assert limiter._active == 0
+
+
+def test_waiting_users_are_served_round_robin():
+    limiter = KeyLimiter("k", max_concurrency=1)
+    limiter.acquire("holder")
+    order = []
+
+    def call(user):
+        limiter.acquire(user)
+        order.append(user)
+        limiter.release()
+
+    threads = []
+    for user in ["heavy", "heavy", "heavy", "light"]:
+        thread = threading.Thread(target=call, args=(user,))
+        thread.start()
+        threads.append(thread)
+        wait_until(lambda: limiter._waiting == len(threads))
+
+    limiter.release()
+    for t in threads:
+        t.join(5)
+
+    # L'utilisateur arrivé en dernier passe avant les autres requêtes de "heavy"
+    assert order == ["heavy", "light", "heavy", "heavy"]
+
+
+def test_429_retry_after_pauses_the_key():
+    limiter = KeyLimiter("k")
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise ApiError(429, {"retry-after": "0.2"})
+        return "ok"
+
+    assert call_with_limits(limiter, "alice", fn) == "ok"
+    assert calls[1] - calls[0] >= 0.19
+    assert limiter._active == 0
+    retries = metrics.snapshot()["counters"]["ai_limiter_retries"]
+    assert retries[0]["labels"] == {"key": "k", "status": "429"}
+    assert retries[0]["value"] == 1
+
+
+def test_pause_applies_to_every_user_of_the_key():
+    limiter = KeyLimiter("k")
+    limiter.pause(0.15)
+    assert limiter.acquire("bob") >= 0.14
+    limiter.release()
+
+
+def test_retry_after_ms_header():
+    limiter = KeyLimiter("k")
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ApiError(529, {"retry-after-ms": "100"})
+        return "ok"
+
+    start = time.monotonic()
+    assert call_with_limits(limiter, "alice", fn) == "ok"
+    assert 0.09 <= time.monotonic() - start < 1
+
+
+def test_non_retryable_errors_are_raised_at_once():
+    limiter = KeyLimiter("k")
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        raise ApiError(500)
+
+    with pytest.raises(ApiError):
+        call_with_limits(limiter, "alice", fn)
+    assert len(attempts) == 1
+    assert limiter._active == 0
+
+
+def test_retries_are_bounded():
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        raise ApiError(429, {"retry-after": "0"})
+
+    with pytest.raises(ApiError):
+        call_with_limits(KeyLimiter("k"), "alice", fn, max_retries=2)
+    assert len(attempts) == 3
+
+
+def test_get_limiter_shares_one_limiter_per_key():
+    limiter = get_limiter("sk-test-shared", rate=1, burst=2, max_concurrency=3)
+
+    assert get_limiter("sk-test-shared", rate=1, burst=2, max_concurrency=3) is limiter
+    assert "sk-test" not in limiter.name
+    assert get_limiter("sk-test-other", rate=1, burst=2, max_concurrency=3) is not limiter
+
+
+def test_get_limiter_applies_a_changed_config():
+    limiter = get_limiter("sk-test-config", rate=1, burst=5, max_concurrency=4)
+    limiter.acquire()
+
+    updated = get_limiter("sk-test-config", rate=10, burst=2, max_concurrency=1)
+
+    assert updated is limiter
+    assert (limiter.rate, limiter.burst, limiter.max_concurrency) == (10, 2, 1)
+    assert limiter._tokens <= 2
+    # L'appel en cours reste compté avec la nouvelle limite
+    assert limiter._active == 1
+    limiter.release()
+
+
+def test_get_limiter_defaults(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "AI_MAX_CONCURRENCY", 3)
+    limiter = get_limiter("sk-test-defaults", max_concurrency="")
+    assert limiter.max_concurrency == 3
@@ -0,0 +1,216 @@
+import threading
+import time
+
+import pytest
+
+from core import response_cache
+from core.metrics import metrics
+from core.response_cache import CachedProvider, ResponseCache, wrap_with_cache
+
+
+class CountingProvider:
+    model = "local"
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.calls = 0
+
+    def ask(self, context, user_message, chat_history=None, system_profile=None):
+        self.calls += 1
+        return {"markdown": self.answer}
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def outcomes():
+    counters = metrics.snapshot()["counters"].get("ai_response_cache", [])
+    return {c["labels"]["outcome"]: c["value"] for c in counters}
+
+
+def cached(provider, cache=None, endpoint="llm@http://127.0.0.1:8000/v1", scope=None):
+    if cache is None:
+        cache = ResponseCache(max_entries=16, ttl=60)
+    return CachedProvider(provider, cache, endpoint=endpoint, scope=scope)
+
+
+def test_same_provider_type_on_different_endpoints_do_not_share_entries():
+    cache = ResponseCache(max_entries=16, ttl=60)
+    gpu_box = CountingProvider("from gpu box")
+    laptop = CountingProvider("from laptop")
+    first = CachedProvider(gpu_box, cache, endpoint="llm@http://10.0.0.5:8000/v1")
+    second = CachedProvider(laptop, cache, endpoint="llm@http://127.0.0.1:11434/v1")
+
+    assert first.ask([], "uptime?")["markdown"] == "from gpu box"
+    assert second.ask([], "uptime?")["markdown"] == "from laptop"
+    assert first.ask([], "uptime?")["cached"] is True
+    assert (gpu_box.calls, laptop.calls) == (1, 1)
+
+
+def test_equivalent_requests_hit_and_results_are_copies():
+    provider = CountingProvider("disk ok")
+    wrapped = cached(provider)
+
+    first = wrapped.ask([], "Disk  usage?", system_profile="web server")
+    first["markdown"] = "tampered"
+    second = wrapped.ask([], "disk usage?", system_profile="Web  Server")
+
+    assert second == {"markdown": "disk ok", "cached": True}
+    assert provider.calls == 1
+    assert outcomes() == {"miss": 1, "hit": 1}
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: clock[0])
+    provider = CountingProvider("disk ok")
+    wrapped = cached(provider, ResponseCache(max_entries=16, ttl=60))
+
+    wrapped.ask([], "uptime?")
+    clock[0] += 59
+    assert wrapped.ask([], "uptime?")["cached"] is True
+    clock[0] += 2
+    assert "cached" not in wrapped.ask([], "uptime?")
+    assert provider.calls == 2
+
+
+def test_size_is_bounded_least_recently_used_first():
+    provider = CountingProvider("answer")
+    cache = ResponseCache(max_entries=2, ttl=60)
+    wrapped = cached(provider, cache)
+
+    wrapped.ask([], "a")
+    wrapped.ask([], "b")
+    wrapped.ask([], "a")  # "a" redevient la plus récente
+    wrapped.ask([], "c")  # évince "b"
+
+    assert len(cache) == 2
+    assert wrapped.ask([], "a")["cached"] is True
+    assert "cached" not in wrapped.ask([], "b")
+    assert provider.calls == 4
+
+
+@pytest.mark.parametrize("other", [
+    {"scope": "bob@example.com"},
+    {"endpoint": "llm@http://10.0.0.9:8000/v1"},
+    {"system_profile": "database server"},
+    {"context": [{"command": "df -h", "stdout": "/ 91%", "stderr": ""}]},
+    {"chat_history": [{"role": "user", "content": "earlier question"}]},
+])
+def test_any_difference_in_the_request_is_a_miss(other):
+    provider = CountingProvider("answer")
+    cache = ResponseCache(max_entries=16, ttl=60)
+    base = {"scope": "alice@example.com", "endpoint": "llm@http://127.0.0.1:8000/v1",
+            "system_profile": "web server", "context": [], "chat_history": []}
+
+    def ask(params):
+        wrapped = cached(provider, cache, endpoint=params["endpoint"], scope=params["scope"])
+        return wrapped.ask(params["context"], "uptime?", params["chat_history"], params["system_profile"])
+
+    ask(base)
+    assert "cached" not in ask({**base, **other})
+    assert provider.calls == 2
+
+
+def test_error_results_are_never_cached():
+    class FailingProvider(CountingProvider):
+        def ask(self, context, user_message, chat_history=None, system_profile=None):
+            self.calls += 1
+            return {"markdown": "## ❌ Erreur", "error": "timeout", "commands": []}
+
+    provider = FailingProvider("")
+    cache = ResponseCache(max_entries=16, ttl=60)
+    wrapped = cached(provider, cache)
+
+    wrapped.ask([], "uptime?")
+    assert "cached" not in wrapped.ask([], "uptime?")
+    assert provider.calls == 2
+    assert len(cache) == 0
+
+
+class BlockingProvider(CountingProvider):
+    """Bloque jusqu'à `release` pour laisser arriver les requêtes concurrentes."""
+
+    def __init__(self, answer, fail_first=False):
+        super().__init__(answer)
+        self.release = threading.Event()
+        self.fail_first = fail_first
+        self._lock = threading.Lock()
+
+    def ask(self, context, user_message, chat_history=None, system_profile=None):
+        with self._lock:
+            self.calls += 1
+            first = self.calls == 1
+        if first:
+            self.release.wait(5)
+            if self.fail_first:
+                return {"markdown": "", "error": "overloaded"}
+        return {"markdown": self.answer}
+
+
+def run_concurrently(wrapped, count):
+    results = [None] * count
+
+    def ask(i):
+        results[i] = wrapped.ask([], "uptime?")
+
+    threads = [threading.Thread(target=ask, args=(i,)) for i in range(count)]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+def wait_for_followers(cache):
+    # Les suiveurs attendent l'événement du leader : le nombre de threads en attente
+    # n'est pas observable, on leur laisse le temps d'arriver
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not cache._inflight:
+        time.sleep(0.005)
+    time.sleep(0.2)
+
+
+def test_concurrent_identical_requests_reach_the_provider_once():
+    provider = BlockingProvider("disk ok")
+    cache = ResponseCache(max_entries=16, ttl=60)
+    threads, results = run_concurrently(cached(provider, cache), 5)
+    wait_for_followers(cache)
+    provider.release.set()
+    for t in threads:
+        t.join(5)
+
+    assert provider.calls == 1
+    assert all(r["markdown"] == "disk ok" for r in results)
+    assert outcomes() == {"miss": 1, "coalesced": 4}
+
+
+def test_followers_compute_themselves_when_the_leader_fails():
+    provider = BlockingProvider("disk ok", fail_first=True)
+    cache = ResponseCache(max_entries=16, ttl=60)
+    threads, results = run_concurrently(cached(provider, cache), 3)
+    wait_for_followers(cache)
+    provider.release.set()
+    for t in threads:
+        t.join(5)
+
+    assert provider.calls == 3
+    assert sorted(bool(r.get("error")) for r in results) == [False, False, True]
+
+
+def test_wrap_with_cache_modes(monkeypatch):
+    provider = CountingProvider("answer")
+    endpoints = [("gpt", "https://api.openai.com/v1")]
+
+    monkeypatch.setattr(response_cache, "AI_RESPONSE_CACHE", "off")
+    assert wrap_with_cache(provider, "alice@example.com", endpoints) is provider
+
+    monkeypatch.setattr(response_cache, "AI_RESPONSE_CACHE", "user")
+    wrapped = wrap_with_cache(provider, "alice@example.com", endpoints)
+    assert wrapped.scope == "alice@example.com"
+    assert wrapped.endpoint == "gpt@https://api.openai.com/v1"
+
+    monkeypatch.setattr(response_cache, "AI_RESPONSE_CACHE", "global")
+    assert wrap_with_cache(provider, "alice@example.com", endpoints).scope is None
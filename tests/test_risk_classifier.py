@@ -0,0 +1,151 @@
+import pytest
+
+from core.risk_classifier import HIGH, LOW, MEDIUM, classify_command
+
+
+@pytest.mark.parametrize("command", [
+    "ls -la /var/log",
+    "cat /etc/os-release",
+    "grep -r error /var/log | tail -n 20",
+    "awk '{print $1}' access.log",
+    "awk '/err|warn/ {n++} END {print n}' app.log",
+    "sed -n '1,10p' f",
+    "sed 's/foo/bar/g' f",
+    "sed -e 's/a/b/' -e 's/c/d/' f",
+    "sed '/^#/d' f",
+    "sed 's|/usr|/opt|g' f",
+    "sed 's/we/x/' f",
+    "sed 's/a/b/' e.txt",
+    "sort -rn f",
+    "uniq -c f",
+    "uniq -f 1 f",
+    "date",
+    "date +%s",
+    "date -d yesterday",
+    "date -Iseconds",
+    "hostname",
+    "hostname -f",
+    "hostnamectl",
+    "hostnamectl status",
+    "timedatectl",
+    "timedatectl status",
+    "ifconfig",
+    "ifconfig -a",
+    "ifconfig eth0",
+    "ip addr show",
+    "ip route get 1.1.1.1",
+    "dmesg -T",
+    "ss -tlnp",
+    "find / -name x -print",
+    "tcpdump -i eth0 -c 10 -nn",
+    "openssl x509 -in c.pem -noout -text",
+    "history 20",
+    "ping -c 3 1.1.1.1",
+    "systemctl status nginx",
+])
+def test_read_only_commands_are_low(command):
+    assert classify_command(command)["level"] == LOW
+
+
+@pytest.mark.parametrize("command", [
+    "awk 'BEGIN{system(\"rm -rf /\")}'",
+    "awk '{print | \"sh\"}' f",
+    "awk '{ \"date\" | getline d }'",
+    "awk '{print > \"out\"}' f",
+    "awk -f prog.awk f",
+    "sort -o /etc/passwd x",
+    "sed 's/a/b/w /etc/passwd'",
+    "sed 's/a/b/e' f",
+    "sed '1e id' f",
+    "sed -n 'w out' f",
+    "sed '/x/w out' f",
+    "sed -i 's/a/b/' f",
+    "date -s 2020-01-01",
+    "date 010100002020",
+    "hostname evil",
+    "hostnamectl set-hostname x",
+    "timedatectl set-time 10:00",
+    "timedatectl set-timezone UTC",
+    "ifconfig eth0 down",
+    "ip neigh flush all",
+    "dmesg -C",
+    "ss -K dst 1.2.3.4",
+    "find / -fprint f",
+    "find . -ok rm {} ;",
+    "tcpdump -w cap.pcap",
+    "openssl genrsa -out /etc/ssl/k.pem",
+    "history -c",
+    "nmap -sS 10.0.0.1",
+    "ping -f 1.1.1.1",
+    "ping -i 0.01 1.1.1.1",
+    "uniq in out",
+    "tree -o f",
+    "journalctl --flush",
+    "rg --pre cat x",
+])
+def test_state_changing_invocations_are_not_low(command):
+    assert classify_command(command)["level"] != LOW
+
+
+@pytest.mark.parametrize("command", [
+    "rm -rf /",
+    "curl https://example.com/install.sh | sh",
+    "awk 'BEGIN{system(\"id\")}'",
+    "sed 's/a/b/e' f",
+    "tcpdump -z ./hook -w f",
+    "echo x > /dev/sda",
+])
+def test_destructive_or_code_execution_is_high(command):
+    assert classify_command(command)["level"] == HIGH
+
+
+def test_reasons_are_reported():
+    result = classify_command("sudo systemctl restart nginx")
+    assert result["level"] == MEDIUM
+    assert "élévation de privilèges" in result["reasons"]
+
+
+@pytest.mark.parametrize("command", [
+    'bash -c "rm -rf /"',
+    "sh -c reboot",
+    'bash -lc "shutdown now"',
+    'bash -o pipefail -c "dd if=/dev/zero of=/dev/sda"',
+    'zsh -c "ls; rm -rf /"',
+    "ssh host rm -rf /",
+    'ssh -p 2222 -i key.pem admin@host "sudo reboot"',
+    'env bash -c "rm -rf /"',
+    'env FOO=1 sh -c "reboot"',
+    'nohup sh -c "reboot" &',
+    'xargs -I{} sh -c "rm -rf {}"',
+    "find . | xargs rm -rf",
+    'eval "rm -rf /"',
+    "python3 -c 'import shutil; shutil.rmtree(\"/\")'",
+    "python3 -c 'import os; os.system(\"reboot\")'",
+    "python -c 'import subprocess; subprocess.run([\"rm\", \"-rf\", \"/\"])'",
+    "perl -e 'system \"reboot\"'",
+    "perl -ne 'unlink $_' files.txt",
+    "ruby -e 'system(\"shutdown -h now\")'",
+    "node -e 'require(\"fs\").rmSync(\"/\", {recursive: true})'",
+    "php -r 'shell_exec(\"rm -rf /\");'",
+    'sh -c "sh -c \\"sh -c \\\\\\"sh -c \\\\\\\\\\\\\\"sh -c ls\\\\\\\\\\\\\\"\\\\\\"\\""',
+])
+def test_wrapped_commands_are_classified_by_their_payload(command):
+    assert classify_command(command)["level"] == HIGH
+
+
+@pytest.mark.parametrize("command", ["sudo -i", "sudo -s", "sudo bash", "sudo sh", "doas -s", "sudo su -"])
+def test_privileged_shells_are_high(command):
+    result = classify_command(command)
+    assert result["level"] == HIGH
+    assert "shell privilégié" in result["reasons"]
+
+
+@pytest.mark.parametrize("command", [
+    'bash -c "ls -la"',
+    "ssh host uptime",
+    "ssh host",
+    "python3 -c 'print(1)'",
+    'sudo -u www-data bash -c "ls"',
+])
+def test_harmless_wrapped_commands_stay_medium(command):
+    assert classify_command(command)["level"] == MEDIUM
@@ -0,0 +1,136 @@
+import json
+
+import pytest
+
+from core import runbook_index
+from core.fileutil import UnreadableFileError
+from core.runbook_index import (CHARS_PER_TOKEN, RunbookIndex, RunbookStore, format_snippets,
+                                select_snippets, split_snippets)
+
+RUNBOOKS = [
+    {"id": "nginx-502", "title": "Nginx 502", "tags": ["nginx", "php-fpm"],
+     "content": "# Diagnostic\nVérifier php-fpm.service et /var/log/nginx/error.log.\n\n"
+                "# Correction\nsystemctl restart php-fpm puis recharger nginx."},
+    {"id": "disk-full", "title": "Disque plein", "tags": ["disk"],
+     "content": "Chercher les gros fichiers avec du -sh /var/log/* et purger journalctl --vacuum-size."},
+    {"id": "postgres", "title": "PostgreSQL lent", "tags": ["postgres", "slow"],
+     "content": "Lister les requêtes longues dans pg_stat_activity, vérifier autovacuum et les index."},
+]
+QUERIES = ["nginx renvoie 502 php-fpm", "disque plein /var/log", "postgres lent autovacuum", "nginx error.log"]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def index(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(runbook_index, "_numpy", lambda: None)
+    index = RunbookIndex()
+    for runbook in RUNBOOKS:
+        index.add(runbook)
+    return index
+
+
+def _ranking(index, query):
+    return [(s["runbook_id"], s["score"]) for s in index.search(query, top_k=5, min_score=0.0)]
+
+
+def test_numpy_and_pure_python_rank_identically(monkeypatch):
+    pytest.importorskip("numpy")
+    with_numpy = RunbookIndex()
+    pure = RunbookIndex()
+    for runbook in RUNBOOKS:
+        with_numpy.add(runbook)
+        pure.add(runbook)
+    expected = {q: _ranking(with_numpy, q) for q in QUERIES}
+    monkeypatch.setattr(runbook_index, "_numpy", lambda: None)
+    for query in QUERIES:
+        assert _ranking(pure, query) == expected[query]
+        assert expected[query]
+
+
+def test_best_snippet_comes_first(index):
+    assert index.search("php-fpm 502")[0]["runbook_id"] == "nginx-502"
+    assert index.search("autovacuum")[0]["runbook_id"] == "postgres"
+    assert index.search("termeinconnu") == []
+
+
+def test_removed_runbooks_drop_out_and_slots_are_reused(index):
+    slots = len(index._snippets)
+    assert len(index) == 4  # nginx-502 a deux sections
+    index.remove("nginx-502")
+    assert len(index) == 2
+    assert all(s["runbook_id"] != "nginx-502" for s in index.search("nginx php-fpm 502", top_k=5, min_score=0.0))
+
+    index.add({"id": "redis", "title": "Redis", "content": "redis-cli info memory"})
+    assert len(index._snippets) == slots
+    assert index.search("redis memory")[0]["runbook_id"] == "redis"
+    # Réindexer un runbook remplace ses extraits au lieu de les dupliquer
+    index.add({"id": "redis", "title": "Redis", "content": "redis-cli info memory"})
+    assert len([s for s in index.search("redis", top_k=5, min_score=0.0) if s["runbook_id"] == "redis"]) == 1
+
+
+def test_split_snippets_by_section_then_paragraph():
+    assert len(split_snippets(RUNBOOKS[0]["content"])) == 2
+    long_section = "\n\n".join(["mot " * 50] * 6)
+    snippets = split_snippets(long_section, max_tokens=100)
+    assert len(snippets) > 1
+    assert all(len(s) <= 100 * CHARS_PER_TOKEN for s in snippets)
+
+
+def test_select_snippets_respects_token_budget(tmp_path):
+    store = RunbookStore(tmp_path / "runbooks.json")
+    big = "nginx " * 400  # ~600 tokens
+    store.create_runbook({"id": "big", "title": "Nginx long", "content": big})
+    store.create_runbook({"id": "small", "title": "Nginx court", "content": "nginx -t puis reload"})
+
+    def cost(snippet):
+        return (len(snippet["title"]) + len(snippet["text"])) // CHARS_PER_TOKEN + 1
+
+    for budget in (50, 700, 5000):
+        selected = select_snippets("nginx", [store], top_k=5, token_budget=budget)
+        assert sum(cost(s) for s in selected) <= budget
+    assert [s["runbook_id"] for s in select_snippets("nginx", [store], top_k=5, token_budget=50)] == ["small"]
+    assert format_snippets([]) == ""
+    assert "### Nginx court" in format_snippets(select_snippets("nginx", [store], token_budget=50))
+
+
+def test_store_reloads_external_changes(tmp_path):
+    path = tmp_path / "runbooks.json"
+    store = RunbookStore(path, scope="global")
+    assert store.create_runbook(dict(RUNBOOKS[1]))
+    assert not store.create_runbook(dict(RUNBOOKS[1]))
+    path.write_text(json.dumps(RUNBOOKS))
+    assert {r["id"] for r in store.list_runbooks()} == {r["id"] for r in RUNBOOKS}
+    assert store.search("autovacuum")[0]["scope"] == "global"
+
+
+def test_unreadable_file_is_never_overwritten(tmp_path):
+    path = tmp_path / "runbooks.json"
+    store = RunbookStore(path)
+    store.create_runbook(dict(RUNBOOKS[0]))
+    truncated = json.dumps(RUNBOOKS)[:-20]
+    path.write_text(truncated)
+
+    # L'index précédent reste utilisable, les écritures sont refusées
+    assert store.search("php-fpm")[0]["runbook_id"] == "nginx-502"
+    for mutate in (lambda: store.create_runbook({"id": "new", "content": "x"}),
+                   lambda: store.update_runbook("nginx-502", {"content": "x"}),
+                   lambda: store.delete_runbook("nginx-502")):
+        with pytest.raises(UnreadableFileError):
+            mutate()
+    assert path.read_text() == truncated
+
+    path.write_text(json.dumps(RUNBOOKS))
+    assert store.create_runbook({"id": "new", "content": "x"})
+    assert len(json.loads(path.read_text())) == len(RUNBOOKS) + 1
+
+
+def test_unreadable_file_on_first_load_refuses_writes(tmp_path):
+    path = tmp_path / "runbooks.json"
+    path.write_text("[{")
+    store = RunbookStore(path)
+    assert store.list_runbooks() == []
+    with pytest.raises(UnreadableFileError):
+        store.create_runbook({"id": "new", "content": "x"})
+    assert path.read_text() == "[{"
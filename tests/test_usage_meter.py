@@ -0,0 +1,13 @@
+from core.usage_meter import UsageMeter
+
+
+def test_non_streamed_call_has_no_ttft(tmp_path):
+    meter = UsageMeter(tmp_path / "usage.db")
+    meter.record(user="u", api_id="a", model="m", latency=2.0)
+    meter.record(user="u", api_id="a", model="m", ttft=0.5, latency=1.0)
+
+    rows = meter._conn.execute("SELECT ttft_ms, latency_ms FROM usage_events ORDER BY latency_ms").fetchall()
+    assert [tuple(r) for r in rows] == [(500, 1000), (None, 2000)]
+    # AVG ignore les appels non streamés
+    assert meter.rollup([])[0]["avg_ttft_ms"] == 500
+